@@ -13,9 +13,11 @@
 # limitations under the License.
 import re
 import textwrap
+from collections import defaultdict
 from _py2tmp import ir3
+from _py2tmp import module_interface
 import typed_ast.ast3 as ast
-from typing import List, Tuple, Dict, Optional, Union
+from typing import List, Tuple, Dict, Optional, Union, Callable
 from _py2tmp.utils import ast_to_string
 
 class Symbol:
@@ -120,6 +122,32 @@ class CompilationContext:
                                                   is_only_partially_defined=False,
                                                   is_function_that_may_throw=False)
 
+    def add_imported_custom_type(self,
+                                 custom_type: ir3.CustomType,
+                                 import_ast_node: ast.ImportFrom,
+                                 is_imported_by_name: bool):
+        # A type can be reachable through multiple imports (e.g. if 2 imported modules import it from a 3rd one), that's
+        # fine as long as it's the same type. It's only added to the symbol table (so that it can be referenced by name)
+        # if it's explicitly imported, but it's always added to the table of custom types since it must not clash with
+        # other types (e.g. defined in this module) in the generated code.
+        symbol_lookup_result = self.custom_types_symbol_table.get_symbol_definition(custom_type.name)
+        if not (symbol_lookup_result and symbol_lookup_result.symbol.type == custom_type):
+            self._check_not_already_defined(custom_type.name, import_ast_node)
+            self.custom_types_symbol_table.add_symbol(name=custom_type.name,
+                                                      type=custom_type,
+                                                      definition_ast_node=import_ast_node,
+                                                      is_only_partially_defined=False,
+                                                      is_function_that_may_throw=False)
+        if is_imported_by_name:
+            if self.symbol_table.get_symbol_definition(custom_type.name):
+                self._check_not_already_defined(custom_type.name, import_ast_node)
+            self.symbol_table.add_symbol(name=custom_type.name,
+                                         type=ir3.FunctionType(argtypes=[arg.type for arg in custom_type.arg_types],
+                                                               returns=custom_type),
+                                         definition_ast_node=import_ast_node,
+                                         is_only_partially_defined=False,
+                                         is_function_that_may_throw=False)
+
     def add_symbol_for_function_with_unknown_return_type(self,
                                                          name: str,
                                                          definition_ast_node: ast.FunctionDef):
@@ -198,7 +226,16 @@ class CompilationError(Exception):
                         line=compilation_context.source_lines[first_line_number - 1],
                         error_marker=error_marker)
 
-def module_ast_to_ir3(module_ast_node: ast.Module, filename: str, source_lines: List[str]):
+def module_ast_to_ir3(module_ast_node: ast.Module,
+                      filename: str,
+                      source_lines: List[str],
+                      module_interface_loader: Optional[Callable[[str], Optional[module_interface.ModuleInterface]]] = None):
+    '''Converts a TMPPy module to IR3.
+
+    If `module_interface_loader` is specified, it's used to import other TMPPy modules: it's called with the name of the
+    imported module and returns its interface, or None if there's no such module. It can raise ModuleImportError if the
+    module exists but can't be imported.
+    '''
     compilation_context = CompilationContext(SymbolTable(),
                                              SymbolTable(),
                                              filename,
@@ -206,7 +243,10 @@ def module_ast_to_ir3(module_ast_node: ast.Module, filename: str, source_lines:
 
     function_defns = []
     toplevel_assertions = []
+    # The number of toplevel assertions seen so far with a given source text, used for their scope names.
+    toplevel_assertion_count_by_source_text = defaultdict(int)  # type: Dict[str, int]
     custom_types = []
+    import_ast_node_by_name_reserved_by_imports = dict()  # type: Dict[str, ast.ImportFrom]
 
     # First pass: process everything except function bodies and toplevel assertions
     for ast_node in module_ast_node.body:
@@ -231,16 +271,44 @@ def module_ast_to_ir3(module_ast_node: ast.Module, filename: str, source_lines:
                 'typing': ('List', 'Set', 'Callable')
             }
             supported_imports = supported_imports_by_module.get(ast_node.module)
-            if not supported_imports:
+            imported_module = None
+            if not supported_imports and module_interface_loader and ast_node.module and not ast_node.level:
+                try:
+                    imported_module = module_interface_loader(ast_node.module)
+                except module_interface.ModuleImportError as e:
+                    raise CompilationError(compilation_context, ast_node, e.args[0])
+            if not supported_imports and not imported_module:
                 raise CompilationError(compilation_context, ast_node,
-                                       'The only modules that can be imported in TMPPy are: ' + ', '.join(sorted(supported_imports_by_module.keys())))
+                                       'The only modules that can be imported in TMPPy are: ' + ', '.join(sorted(supported_imports_by_module.keys()))
+                                       + (' and the TMPPy modules in the module path' if module_interface_loader else ''))
             if len(ast_node.names) == 0:
                 raise CompilationError(compilation_context, ast_node, 'Imports must import at least 1 symbol.')  # pragma: no cover
             for imported_name in ast_node.names:
                 if not isinstance(imported_name, ast.alias) or imported_name.asname:
                     raise CompilationError(compilation_context, ast_node, 'TMPPy only supports imports of the form "from some_module import some_symbol, some_other_symbol".')
-                if imported_name.name not in supported_imports:
+                if imported_module:
+                    importable_names = set(imported_module.function_types_by_name.keys()).union(custom_type.name
+                                                                                                 for custom_type in imported_module.custom_types)
+                    if imported_name.name not in importable_names:
+                        raise CompilationError(compilation_context, ast_node,
+                                               'The module %s doesn\'t define a function or type called %s.' % (ast_node.module, imported_name.name))
+                elif imported_name.name not in supported_imports:
                     raise CompilationError(compilation_context, ast_node, 'The only supported imports from %s are: %s.' % (ast_node.module, ', '.join(sorted(supported_imports))))
+            if imported_module:
+                for name in imported_module.all_global_names:
+                    import_ast_node_by_name_reserved_by_imports.setdefault(name, ast_node)
+                imported_names = set(imported_name.name for imported_name in ast_node.names)
+                for custom_type in imported_module.all_custom_types:
+                    compilation_context.add_imported_custom_type(custom_type=custom_type,
+                                                                 import_ast_node=ast_node,
+                                                                 is_imported_by_name=custom_type.name in imported_names and custom_type in imported_module.custom_types)
+                for function_name, function_type in sorted(imported_module.function_types_by_name.items()):
+                    if function_name in imported_names:
+                        compilation_context.add_symbol(name=function_name,
+                                                       type=function_type,
+                                                       definition_ast_node=ast_node,
+                                                       is_only_partially_defined=False,
+                                                       is_function_that_may_throw=imported_module.function_may_throw_by_name[function_name])
         elif isinstance(ast_node, ast.Import):
             raise CompilationError(compilation_context, ast_node,
                                    'TMPPy only supports imports of the form "from some_module import some_symbol, some_other_symbol".')
@@ -256,6 +324,15 @@ def module_ast_to_ir3(module_ast_node: ast.Module, filename: str, source_lines:
             # raise CompilationError(compilation_context, ast_node, 'This Python construct is not supported in TMPPy:\n%s' % ast_to_string(ast_node))
             raise CompilationError(compilation_context, ast_node, 'This Python construct is not supported in TMPPy')
 
+    # The functions and types defined in the imported modules are global names in the generated code even when they're
+    # not imported explicitly, so they can't be redefined here.
+    for ast_node in module_ast_node.body:
+        if isinstance(ast_node, (ast.FunctionDef, ast.ClassDef)) and ast_node.name in import_ast_node_by_name_reserved_by_imports:
+            import_ast_node = import_ast_node_by_name_reserved_by_imports[ast_node.name]
+            raise CompilationError(compilation_context, ast_node,
+                                   '%s is already defined in the imported module %s (or in a module imported by it).' % (ast_node.name, import_ast_node.module),
+                                   notes=[(import_ast_node, 'The module was imported here.')])
+
     # 2nd pass: process function bodies and toplevel assertions
     for ast_node in module_ast_node.body:
         if isinstance(ast_node, ast.FunctionDef):
@@ -268,7 +345,13 @@ def module_ast_to_ir3(module_ast_node: ast.Module, filename: str, source_lines:
                                       argtypes=[arg.type
                                                    for arg in new_function_defn.args]))
         elif isinstance(ast_node, ast.Assert):
-            toplevel_assertions.append(assert_ast_to_ir3(ast_node, compilation_context))
+            # The identifiers generated for a toplevel assertion are scoped by its source text (and its index among the
+            # assertions with the same text) instead of its line, so that they don't change when other code is added
+            # or removed before it.
+            source_text = source_lines[ast_node.lineno - 1].strip()
+            scope_name = '%s/%s' % (source_text, toplevel_assertion_count_by_source_text[source_text])
+            toplevel_assertion_count_by_source_text[source_text] += 1
+            toplevel_assertions.append(assert_ast_to_ir3(ast_node, compilation_context, scope_name=scope_name))
 
     return ir3.Module(function_defns=function_defns,
                       assertions=toplevel_assertions,
@@ -373,7 +456,7 @@ def return_stmt_ast_to_ir3(ast_node: ast.Return,
 
     expression = expression_ast_to_ir3(expression, compilation_context)
 
-    return ir3.ReturnStmt(expr=expression)
+    return ir3.ReturnStmt(expr=expression, source_line=ast_node.lineno)
 
 def if_stmt_ast_to_ir3(ast_node: ast.If,
                       compilation_context: CompilationContext,
@@ -415,7 +498,8 @@ def if_stmt_ast_to_ir3(ast_node: ast.If,
                                   else_branch_compilation_context,
                                   else_stmts)
 
-    return ir3.IfStmt(cond_expr=cond_expr, if_stmts=if_stmts, else_stmts=else_stmts), previous_return_stmt
+    return ir3.IfStmt(cond_expr=cond_expr, if_stmts=if_stmts, else_stmts=else_stmts,
+                      source_line=ast_node.lineno), previous_return_stmt
 
 def _join_definitions_in_branches(parent_context: CompilationContext,
                                   branch1_context: CompilationContext,
@@ -494,7 +578,7 @@ def raise_stmt_ast_to_ir3(ast_node: ast.Raise, compilation_context: CompilationC
         raise CompilationError(compilation_context, ast_node.exc,
                                'Can\'t raise an exception of type "%s", because it\'s not a subclass of Exception.' % str(exception_expr.type),
                                notes=notes)
-    return ir3.RaiseStmt(expr=exception_expr)
+    return ir3.RaiseStmt(expr=exception_expr, source_line=ast_node.lineno)
 
 def try_stmt_ast_to_ir3(ast_node: ast.Try,
                        compilation_context: CompilationContext,
@@ -566,7 +650,8 @@ def try_stmt_ast_to_ir3(ast_node: ast.Try,
     try_except_stmt = ir3.TryExcept(try_body=body_stmts,
                                     caught_exception_type=caught_exception_type,
                                     caught_exception_name=handler.name,
-                                    except_body=except_body_stmts)
+                                    except_body=except_body_stmts,
+                                    source_line=ast_node.lineno)
 
     return try_except_stmt, previous_return_stmt
 
@@ -712,9 +797,10 @@ def function_def_ast_to_ir3(ast_node: ast.FunctionDef, compilation_context: Comp
     return ir3.FunctionDefn(name=ast_node.name,
                             args=args,
                             body=statements,
-                            return_type=return_type)
+                            return_type=return_type,
+                            source_line=ast_node.lineno)
 
-def assert_ast_to_ir3(ast_node: ast.Assert, compilation_context: CompilationContext):
+def assert_ast_to_ir3(ast_node: ast.Assert, compilation_context: CompilationContext, scope_name: Optional[str] = None):
     expr = expression_ast_to_ir3(ast_node.test, compilation_context)
     assert isinstance(expr.type, ir3.BoolType)
 
@@ -732,7 +818,7 @@ def assert_ast_to_ir3(ast_node: ast.Assert, compilation_context: CompilationCont
         line=compilation_context.source_lines[first_line_number - 1])
     message = message.replace('\\', '\\\\').replace('"', '\"').replace('\n', '\\n')
 
-    return ir3.Assert(expr=expr, message=message)
+    return ir3.Assert(expr=expr, message=message, source_line=ast_node.lineno, scope_name=scope_name)
 
 def assignment_ast_to_ir3(ast_node: Union[ast.Assign, ast.AnnAssign, ast.AugAssign],
                          compilation_context: CompilationContext):
@@ -782,7 +868,8 @@ def assignment_ast_to_ir3(ast_node: Union[ast.Assign, ast.AnnAssign, ast.AugAssi
 
         return ir3.UnpackingAssignment(lhs_list=var_refs,
                                           rhs=expr,
-                                          error_message=message)
+                                          error_message=message,
+                                          source_line=ast_node.lineno)
 
     elif isinstance(target, ast.Name):
         # This is a "normal" assignment
@@ -798,7 +885,8 @@ def assignment_ast_to_ir3(ast_node: Union[ast.Assign, ast.AnnAssign, ast.AugAssi
                                                    name=target.id,
                                                    is_global_function=False,
                                                    is_function_that_may_throw=isinstance(expr.type, ir3.FunctionType)),
-                                 rhs=expr)
+                                 rhs=expr,
+                                 source_line=ast_node.lineno)
     else:
         raise CompilationError(compilation_context, ast_node, 'Assignment not supported.')
 
@@ -838,6 +926,10 @@ def compare_ast_to_ir3(ast_node: ast.Compare, compilation_context: CompilationCo
         return int_comparison_ast_to_ir3(lhs, rhs, '>', compilation_context)
     elif isinstance(op, ast.GtE):
         return int_comparison_ast_to_ir3(lhs, rhs, '>=', compilation_context)
+    elif isinstance(op, ast.In):
+        return in_ast_to_ir3(lhs, rhs, compilation_context)
+    elif isinstance(op, ast.NotIn):
+        return ir3.NotExpr(expr=in_ast_to_ir3(lhs, rhs, compilation_context))
     else:
         raise CompilationError(compilation_context, ast_node, 'Comparison not supported.')  # pragma: no cover
 
@@ -964,6 +1056,20 @@ def int_binary_op_expression_ast_to_ir3(ast_node: ast.BinOp, op: str, compilatio
 
     return ir3.IntBinaryOpExpr(lhs=lhs, rhs=rhs, op=op)
 
+def comprehension_condition_ast_to_ir3(ifs: List[ast.AST], comprehension_kind: str, compilation_context: CompilationContext):
+    # [... for x in l if a if b] is equivalent to [... for x in l if a and b].
+    condition_expr = None
+    for if_ast_node in ifs:
+        expr = expression_ast_to_ir3(if_ast_node, compilation_context)
+        if expr.type != ir3.BoolType():
+            raise CompilationError(compilation_context, if_ast_node,
+                                   'The condition in a %s comprehension must have type bool, but was: %s' % (comprehension_kind, str(expr.type)))
+        if condition_expr is None:
+            condition_expr = expr
+        else:
+            condition_expr = ir3.AndExpr(lhs=condition_expr, rhs=expr)
+    return condition_expr
+
 def list_comprehension_ast_to_ir3(ast_node: ast.ListComp, compilation_context: CompilationContext):
     assert ast_node.generators
     if len(ast_node.generators) > 1:
@@ -971,9 +1077,6 @@ def list_comprehension_ast_to_ir3(ast_node: ast.ListComp, compilation_context: C
                                'List comprehensions with multiple "for" clauses are not currently supported.')
 
     [generator] = ast_node.generators
-    if generator.ifs:
-        raise CompilationError(compilation_context, generator.ifs[0],
-                               '"if" clauses in list comprehensions are not currently supported.')
     if not isinstance(generator.target, ast.Name):
         raise CompilationError(compilation_context, generator.target,
                                'Only list comprehensions of the form [... for var_name in ...] are supported.')
@@ -991,7 +1094,7 @@ def list_comprehension_ast_to_ir3(ast_node: ast.ListComp, compilation_context: C
 
     child_context = compilation_context.create_child_context(function_name=compilation_context.current_function_name)
     child_context.add_symbol(name=generator.target.id,
-                             type=list_expr.elem_type,
+                             type=list_expr.type.elem_type,
                              definition_ast_node=generator.target,
                              is_only_partially_defined=False,
                              is_function_that_may_throw=False)
@@ -1003,10 +1106,11 @@ def list_comprehension_ast_to_ir3(ast_node: ast.ListComp, compilation_context: C
 
     return ir3.ListComprehension(list_expr=list_expr,
                                  loop_var=ir3.VarReference(name=generator.target.id,
-                                                           type=list_expr.elem_type,
+                                                           type=list_expr.type.elem_type,
                                                            is_global_function=False,
                                                            is_function_that_may_throw=False),
-                                 result_elem_expr=result_elem_expr)
+                                 result_elem_expr=result_elem_expr,
+                                 condition_expr=comprehension_condition_ast_to_ir3(generator.ifs, 'list', child_context))
 
 def set_comprehension_ast_to_ir3(ast_node: ast.SetComp, compilation_context: CompilationContext):
     assert ast_node.generators
@@ -1015,9 +1119,6 @@ def set_comprehension_ast_to_ir3(ast_node: ast.SetComp, compilation_context: Com
                                'Set comprehensions with multiple "for" clauses are not currently supported.')
 
     [generator] = ast_node.generators
-    if generator.ifs:
-        raise CompilationError(compilation_context, generator.ifs[0],
-                               '"if" clauses in set comprehensions are not currently supported.')
     if not isinstance(generator.target, ast.Name):
         raise CompilationError(compilation_context, generator.target,
                                'Only set comprehensions of the form {... for var_name in ...} are supported.')
@@ -1035,7 +1136,7 @@ def set_comprehension_ast_to_ir3(ast_node: ast.SetComp, compilation_context: Com
 
     child_context = compilation_context.create_child_context(function_name=compilation_context.current_function_name)
     child_context.add_symbol(name=generator.target.id,
-                             type=set_expr.elem_type,
+                             type=set_expr.type.elem_type,
                              definition_ast_node=generator.target,
                              is_only_partially_defined=False,
                              is_function_that_may_throw=False)
@@ -1047,10 +1148,11 @@ def set_comprehension_ast_to_ir3(ast_node: ast.SetComp, compilation_context: Com
 
     return ir3.SetComprehension(set_expr=set_expr,
                                 loop_var=ir3.VarReference(name=generator.target.id,
-                                                          type=set_expr.elem_type,
+                                                          type=set_expr.type.elem_type,
                                                           is_global_function=False,
                                                           is_function_that_may_throw=False),
-                                result_elem_expr=result_elem_expr)
+                                result_elem_expr=result_elem_expr,
+                                condition_expr=comprehension_condition_ast_to_ir3(generator.ifs, 'set', child_context))
 
 
 def add_expression_ast_to_ir3(ast_node: ast.BinOp, compilation_context: CompilationContext):
@@ -1083,6 +1185,10 @@ def expression_ast_to_ir3(ast_node: ast.AST, compilation_context: CompilationCon
         return empty_list_literal_ast_to_ir3(ast_node, compilation_context)
     elif isinstance(ast_node, ast.Call) and isinstance(ast_node.func, ast.Name) and ast_node.func.id == 'empty_set':
         return empty_set_literal_ast_to_ir3(ast_node, compilation_context)
+    elif isinstance(ast_node, ast.Call) and isinstance(ast_node.func, ast.Name) and ast_node.func.id == 'range':
+        return int_range_expr_ast_to_ir3(ast_node, compilation_context)
+    elif isinstance(ast_node, ast.Call) and isinstance(ast_node.func, ast.Name) and ast_node.func.id == 'len':
+        return list_len_expr_ast_to_ir3(ast_node, compilation_context)
     elif isinstance(ast_node, ast.Call) and isinstance(ast_node.func, ast.Name) and ast_node.func.id == 'sum':
         return int_iterable_sum_expr_ast_to_ir3(ast_node, compilation_context)
     elif isinstance(ast_node, ast.Call) and isinstance(ast_node.func, ast.Name) and ast_node.func.id == 'all':
@@ -1103,6 +1209,8 @@ def expression_ast_to_ir3(ast_node: ast.AST, compilation_context: CompilationCon
         return set_expression_ast_to_ir3(ast_node, compilation_context)
     elif isinstance(ast_node, ast.Attribute) and isinstance(ast_node.ctx, ast.Load):
         return attribute_expression_ast_to_ir3(ast_node, compilation_context)
+    elif isinstance(ast_node, ast.Subscript) and isinstance(ast_node.ctx, ast.Load):
+        return list_index_expr_ast_to_ir3(ast_node, compilation_context)
     elif isinstance(ast_node, ast.Num):
         return number_literal_expression_ast_to_ir3(ast_node, compilation_context, positive=True)
     elif isinstance(ast_node, ast.UnaryOp) and isinstance(ast_node.op, ast.USub) and isinstance(ast_node.operand, ast.Num):
@@ -1187,6 +1295,69 @@ def empty_set_literal_ast_to_ir3(ast_node: ast.Call, compilation_context: Compil
     elem_type = type_declaration_ast_to_ir3_expression_type(arg, compilation_context)
     return ir3.SetExpr(elem_type=elem_type, elem_exprs=[])
 
+def int_range_expr_ast_to_ir3(ast_node: ast.Call, compilation_context: CompilationContext):
+    if ast_node.keywords:
+        raise CompilationError(compilation_context, ast_node.keywords[0].value, 'Keyword arguments are not supported.')
+    if len(ast_node.args) not in (1, 2):
+        raise CompilationError(compilation_context, ast_node, 'range() takes 1 or 2 arguments. Got: %s' % len(ast_node.args))
+    arg_exprs = []
+    for arg in ast_node.args:
+        arg_expr = expression_ast_to_ir3(arg, compilation_context)
+        if not isinstance(arg_expr.type, ir3.IntType):
+            notes = []
+            if isinstance(arg_expr, ir3.VarReference):
+                lookup_result = compilation_context.get_symbol_definition(arg_expr.name)
+                assert lookup_result
+                assert not lookup_result.is_only_partially_defined
+                notes.append((lookup_result.ast_node, '%s was defined here' % arg_expr.name))
+            raise CompilationError(compilation_context, arg,
+                                   'The arguments of range() must have type int. Got type: %s' % str(arg_expr.type),
+                                   notes=notes)
+        arg_exprs.append(arg_expr)
+    if len(arg_exprs) == 1:
+        [end_expr] = arg_exprs
+        return ir3.IntRangeExpr(begin_expr=ir3.IntLiteral(value=0), end_expr=end_expr)
+    else:
+        [begin_expr, end_expr] = arg_exprs
+        return ir3.IntRangeExpr(begin_expr=begin_expr, end_expr=end_expr)
+
+def list_len_expr_ast_to_ir3(ast_node: ast.Call, compilation_context: CompilationContext):
+    if ast_node.keywords:
+        raise CompilationError(compilation_context, ast_node.keywords[0].value, 'Keyword arguments are not supported.')
+    if len(ast_node.args) != 1:
+        raise CompilationError(compilation_context, ast_node, 'len() takes 1 argument. Got: %s' % len(ast_node.args))
+    [arg] = ast_node.args
+    arg_expr = expression_ast_to_ir3(arg, compilation_context)
+    if not isinstance(arg_expr.type, ir3.ListType):
+        notes = []
+        if isinstance(arg_expr, ir3.VarReference):
+            lookup_result = compilation_context.get_symbol_definition(arg_expr.name)
+            assert lookup_result
+            assert not lookup_result.is_only_partially_defined
+            notes.append((lookup_result.ast_node, '%s was defined here' % arg_expr.name))
+        raise CompilationError(compilation_context, arg,
+                               'The argument of len() must be a list. Got type: %s' % str(arg_expr.type),
+                               notes=notes)
+    return ir3.ListLenExpr(list_expr=arg_expr)
+
+def list_index_expr_ast_to_ir3(ast_node: ast.Subscript, compilation_context: CompilationContext):
+    # Before Python 3.9 the index is wrapped in an ast.Index node.
+    index_ast_node = ast_node.slice.value if isinstance(ast_node.slice, ast.Index) else ast_node.slice
+    if isinstance(index_ast_node, ast.Slice):
+        raise CompilationError(compilation_context, ast_node, 'Slices are not supported.')
+
+    list_expr = expression_ast_to_ir3(ast_node.value, compilation_context)
+    if not isinstance(list_expr.type, ir3.ListType):
+        raise CompilationError(compilation_context, ast_node.value,
+                               'Subscripting is only supported for lists, but this value has type %s.' % str(list_expr.type))
+
+    index_expr = expression_ast_to_ir3(index_ast_node, compilation_context)
+    if index_expr.type != ir3.IntType():
+        raise CompilationError(compilation_context, index_ast_node,
+                               'List indices must be ints, but this value has type %s.' % str(index_expr.type))
+
+    return ir3.ListIndexExpr(list_expr=list_expr, index_expr=index_expr)
+
 def int_iterable_sum_expr_ast_to_ir3(ast_node: ast.Call, compilation_context: CompilationContext):
     if ast_node.keywords:
         raise CompilationError(compilation_context, ast_node.keywords[0].value, 'Keyword arguments are not supported.')
@@ -1288,6 +1459,17 @@ def eq_ast_to_ir3(lhs_node: ast.AST, rhs_node: ast.AST, compilation_context: Com
         raise CompilationError(compilation_context, lhs_node, 'Type not supported in equality comparison: ' + str(lhs.type))
     return ir3.EqualityComparison(lhs=lhs, rhs=rhs)
 
+def in_ast_to_ir3(lhs_node: ast.AST, rhs_node: ast.AST, compilation_context: CompilationContext):
+    lhs = expression_ast_to_ir3(lhs_node, compilation_context)
+    rhs = expression_ast_to_ir3(rhs_node, compilation_context)
+    if not isinstance(rhs.type, ir3.ListType):
+        raise CompilationError(compilation_context, rhs_node,
+                               'The RHS of "in" must be a list, but this value has type %s.' % str(rhs.type))
+    if lhs.type != rhs.type.elem_type:
+        raise CompilationError(compilation_context, lhs_node, 'Type mismatch in "in": %s vs %s' % (
+            str(lhs.type), str(rhs.type)))
+    return ir3.IsInListExpr(elem_expr=lhs, list_expr=rhs)
+
 def not_eq_ast_to_ir3(lhs_node: ast.AST, rhs_node: ast.AST, compilation_context: CompilationContext):
     lhs = expression_ast_to_ir3(lhs_node, compilation_context)
     rhs = expression_ast_to_ir3(rhs_node, compilation_context)
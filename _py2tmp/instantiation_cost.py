@@ -0,0 +1,635 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''A static estimate of the class template instantiations caused by the code generated for a module.
+
+The estimate is computed from IR0, as an upper bound of the number of instantiations (and of the instantiation depth)
+caused by instantiating the template generated for each function. For functions that are (directly or indirectly)
+recursive, these depend on how many times the recursion cycle is executed, so they're expressed as polynomials in a
+variable N(f) for each recursive function f.
+
+The templates of the TMPPy runtime (tmppy.h) are modeled too. Some of them (e.g. the ones operating on lists) cause a
+number of instantiations (or an instantiation depth) that depends on the length of the lists, so that's expressed in
+terms of L, the length of the longest list processed, and of log2(L). The runtime uses different implementations
+depending on the C++ standard and on whether compiler intrinsics are available, so the model depends on these too.
+When the implementation also depends on the compiler, the most expensive one is assumed.
+'''
+
+import math
+from fractions import Fraction
+from typing import List, Dict, Iterable, Optional, Tuple, Union
+
+from _py2tmp import ir0
+from _py2tmp import ir0_to_cpp
+
+# The default of -ftemplate-depth in GCC (it's 1024 in Clang).
+DEFAULT_TEMPLATE_DEPTH = 900
+
+# The variables for the length of the longest list processed by the runtime templates, and for its (base-2, rounded
+# up) logarithm.
+LIST_LENGTH_VARIABLE = 'L'
+LOG_LIST_LENGTH_VARIABLE = 'log2(L)'
+
+def recursion_variable(function_name: str):
+    '''Returns the variable for the number of recursive calls made by the given (recursive) function.'''
+    return 'N(%s)' % function_name
+
+class Polynomial:
+    '''A polynomial with non-negative rational coefficients, e.g. 3*N(f)*N(g) + 1/8*L + 5.'''
+
+    def __init__(self, coefficients_by_monomial: Optional[Dict[Tuple[str, ...], Union[int, Fraction]]] = None):
+        # A monomial is the sorted tuple of its variables (with repetitions), the constant term is the empty tuple.
+        self.coefficients_by_monomial = {monomial: coefficient
+                                         for monomial, coefficient in (coefficients_by_monomial or dict()).items()
+                                         if coefficient}
+
+    @staticmethod
+    def constant(value: Union[int, Fraction]):
+        return Polynomial({(): value})
+
+    @staticmethod
+    def variable(variable: str):
+        return Polynomial({(variable,): 1})
+
+    def __add__(self, other: Union['Polynomial', int, Fraction]):
+        if not isinstance(other, Polynomial):
+            other = Polynomial.constant(other)
+        result = dict(self.coefficients_by_monomial)
+        for monomial, coefficient in other.coefficients_by_monomial.items():
+            result[monomial] = result.get(monomial, 0) + coefficient
+        return Polynomial(result)
+
+    __radd__ = __add__
+
+    def __mul__(self, other: Union['Polynomial', int, Fraction]):
+        if not isinstance(other, Polynomial):
+            other = Polynomial.constant(other)
+        result = dict()
+        for monomial, coefficient in self.coefficients_by_monomial.items():
+            for other_monomial, other_coefficient in other.coefficients_by_monomial.items():
+                product_monomial = tuple(sorted(monomial + other_monomial))
+                result[product_monomial] = result.get(product_monomial, 0) + coefficient * other_coefficient
+        return Polynomial(result)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Polynomial) and self.coefficients_by_monomial == other.coefficients_by_monomial
+
+    def upper_bound_with(self, other: 'Polynomial'):
+        '''Returns a polynomial that is >= both self and other (for any non-negative values of the variables).'''
+        result = dict(self.coefficients_by_monomial)
+        for monomial, coefficient in other.coefficients_by_monomial.items():
+            result[monomial] = max(result.get(monomial, 0), coefficient)
+        return Polynomial(result)
+
+    def times_variable(self, variable: str):
+        return self * Polynomial.variable(variable)
+
+    @property
+    def constant_term(self):
+        return self.coefficients_by_monomial.get((), 0)
+
+    @property
+    def variables(self):
+        return sorted({variable
+                       for monomial in self.coefficients_by_monomial.keys()
+                       for variable in monomial})
+
+    def evaluate(self, values_by_variable: Dict[str, int]):
+        '''Returns the value of the polynomial (rounded up) for the given values of the variables.'''
+        result = 0
+        for monomial, coefficient in self.coefficients_by_monomial.items():
+            term = coefficient
+            for variable in monomial:
+                term *= values_by_variable.get(variable, 0)
+            result += term
+        return math.ceil(result)
+
+    def __str__(self):
+        if not self.coefficients_by_monomial:
+            return '0'
+        terms = []
+        # Higher-degree terms first.
+        for monomial in sorted(self.coefficients_by_monomial.keys(), key=lambda monomial: (-len(monomial), monomial)):
+            coefficient = self.coefficients_by_monomial[monomial]
+            factors = list(monomial)
+            if coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            terms.append('*'.join(factors))
+        return ' + '.join(terms)
+
+class FunctionCostEstimate:
+    def __init__(self,
+                 function_name: str,
+                 instantiations: Polynomial,
+                 depth: Polynomial,
+                 external_templates: List[str],
+                 runtime_templates: List[str]):
+        self.function_name = function_name
+        self.instantiations = instantiations
+        self.depth = depth
+        # The templates defined outside of this module and of the TMPPy runtime that are instantiated. Each of these is
+        # counted as a single instantiation, since their cost is unknown.
+        self.external_templates = external_templates
+        # The templates of the TMPPy runtime that are instantiated (and whose cost is included in the estimate).
+        self.runtime_templates = runtime_templates
+
+class _TemplateCost:
+    def __init__(self,
+                 instantiations: Polynomial,
+                 depth: Polynomial,
+                 external_templates: Iterable[str] = (),
+                 runtime_templates: Iterable[str] = ()):
+        self.instantiations = instantiations
+        self.depth = depth
+        self.external_templates = set(external_templates)
+        self.runtime_templates = set(runtime_templates)
+
+# The runtime templates that instantiate the template passed as their last argument once for each element of a list.
+_TEMPLATES_INSTANTIATING_ARG_PER_ELEMENT = tuple('Transform%sListTo%sList' % (from_kind, to_kind)
+                                                 for from_kind in ('Bool', 'Int64', 'Type')
+                                                 for to_kind in ('Bool', 'Int64', 'Type'))
+
+def _is_at_least_cxx_std(cxx_std: str, min_cxx_std: str):
+    return ir0_to_cpp.SUPPORTED_CXX_STANDARDS.index(cxx_std) >= ir0_to_cpp.SUPPORTED_CXX_STANDARDS.index(min_cxx_std)
+
+def get_runtime_template_costs(cxx_std: str, builtins: bool) -> Dict[str, Tuple[Polynomial, Polynomial]]:
+    '''Returns the (instantiations, depth) caused by instantiating each template of the TMPPy runtime.
+
+    `builtins` is whether the compiler intrinsics used by the runtime are available (see tmppy/config.h). This is an
+    upper bound: the template passed to a Transform*List template is instantiated for each element too, but that's not
+    included here.
+    '''
+    L = Polynomial.variable(LIST_LENGTH_VARIABLE)
+    log_L = Polynomial.variable(LOG_LIST_LENGTH_VARIABLE)
+    def constant(value: int):
+        return Polynomial.constant(value)
+    is_cxx17 = _is_at_least_cxx_std(cxx_std, 'c++17')
+
+    costs = dict()
+
+    # These are never instantiated, since they have no members.
+    for template_name in ('List', 'Int64List', 'BoolList'):
+        costs[template_name] = (constant(0), constant(0))
+
+    # TMPPY_IS_SAME uses the __is_same intrinsic when available, and std::is_same otherwise.
+    is_same_instantiations, is_same_depth = costs['std::is_same'] = ((constant(0), constant(0)) if builtins
+                                                                     else (constant(1), constant(1)))
+
+    for kind in ('Bool', 'Int64', 'Type'):
+        for other_kind in ('Bool', 'Int64', 'Type'):
+            costs['Select1st%s%s' % (kind, other_kind)] = (constant(1), constant(1))
+            costs['Select1st%s%sValue' % (kind, other_kind)] = (constant(1), constant(1))
+        costs['AlwaysTrueFrom%s' % kind] = (constant(1), constant(1))
+        costs['AlwaysTrueFrom%sValue' % kind] = (constant(1), constant(1))
+    costs['AlwaysFalseFromType'] = (constant(1), constant(1))
+    for kind in ('Type', 'Int64', 'Bool'):
+        costs['%sListConcat' % kind] = (constant(1), constant(1))
+        costs['%sListSize' % kind] = (constant(1), constant(1))
+
+    # Int64ListIota (used by other templates) uses an intrinsic when available, and otherwise builds the list by doubling
+    # a list of half the size.
+    iota_instantiations, iota_depth = ((constant(2), constant(2)) if builtins
+                                       else (2 * log_L + 3, log_L + 2))
+
+    costs['Int64ListRange'] = (2 + iota_instantiations, 1 + constant(1).upper_bound_with(iota_depth))
+
+    # The __type_pack_element intrinsic is only available in Clang, so this assumes the implementation without it. That
+    # instantiates a base class for each element.
+    list_get_instantiations = 4 + L + iota_instantiations
+    list_get_depth = 3 + constant(2).upper_bound_with(iota_depth)
+    costs['TypeListGet'] = (list_get_instantiations, list_get_depth)
+    # These also access the value of a std::integral_constant.
+    costs['Int64ListGet'] = costs['BoolListGet'] = (list_get_instantiations + 1, list_get_depth)
+
+    if is_cxx17:
+        # Fold expressions, with no additional instantiations.
+        costs['Int64ListSum'] = costs['BoolListAll'] = costs['BoolListAny'] = (constant(1), constant(1))
+    else:
+        # A recursion that consumes 8 elements at a time (and then the last ones one at a time).
+        costs['Int64ListSum'] = (Fraction(1, 8) * L + 8, Fraction(1, 8) * L + 8)
+        costs['BoolListAll'] = costs['BoolListAny'] = (1 + is_same_instantiations, 1 + is_same_depth)
+
+    # GetFirstError instantiates GetFirstErrorVoid for each element. When there's an error, GetFirstErrorHelper then
+    # skips the leading voids 8 at a time.
+    get_first_error_instantiations = 2 + L + is_same_instantiations + Fraction(1, 8) * L + 8
+    get_first_error_depth = 2 + Fraction(1, 8) * L + 8
+    costs['GetFirstError'] = (get_first_error_instantiations, get_first_error_depth)
+    for template_name in _TEMPLATES_INSTANTIATING_ARG_PER_ELEMENT:
+        costs[template_name] = (1 + get_first_error_instantiations, 1 + get_first_error_depth)
+
+    # With C++17 this is a fold expression, except in Clang. So this assumes the other implementation, that merges the
+    # lists in log2(L) rounds. Each round instantiates a few templates per element, and the next round.
+    list_concat_all_instantiations = log_L * (2 * L + 4 + 2 * iota_instantiations) + 2
+    list_concat_all_depth = log_L + 2 + constant(2).upper_bound_with(iota_depth)
+    for kind in ('Type', 'Int64', 'Bool'):
+        costs['%sListConcatAll' % kind] = (list_concat_all_instantiations, list_concat_all_depth)
+
+    if is_cxx17:
+        is_in_set_instantiations, is_in_set_depth = constant(1), constant(1)
+        is_in_type_set_instantiations = 1 + L * is_same_instantiations
+        is_in_type_set_depth = 1 + is_same_depth
+    else:
+        is_in_set_instantiations, is_in_set_depth = 1 + is_same_instantiations, 1 + is_same_depth
+        # This also instantiates AlwaysFalseFromType for each element.
+        is_in_type_set_instantiations = 1 + L * (1 + is_same_instantiations) + is_same_instantiations
+        is_in_type_set_depth = constant(2)
+    costs['IsInBoolSet'] = costs['IsInInt64Set'] = (is_in_set_instantiations, is_in_set_depth)
+    costs['IsInTypeSet'] = (is_in_type_set_instantiations, is_in_type_set_depth)
+    costs['BoolSetEquals'] = costs['Int64SetEquals'] = (1 + 2 * L * is_in_set_instantiations + is_same_instantiations,
+                                                        1 + is_in_set_depth.upper_bound_with(is_same_depth))
+    costs['TypeSetEquals'] = (1 + 2 * L * is_in_type_set_instantiations + 2 * L + is_same_instantiations,
+                              1 + is_in_type_set_depth.upper_bound_with(is_same_depth))
+
+    costs['AddToBoolSet'] = costs['AddToInt64Set'] = (constant(2), constant(2))
+    # This also instantiates AlwaysFalseFromType for each element.
+    add_to_type_set_instantiations = 2 + L * (1 + is_same_instantiations)
+    costs['AddToTypeSet'] = (add_to_type_set_instantiations, constant(2))
+
+    # These add the elements to the set one at a time, with a recursive template.
+    costs['BoolListToSet'] = costs['Int64ListToSet'] = (1 + 3 * L, 1 + L + 2)
+    costs['TypeListToSet'] = (1 + L * (1 + add_to_type_set_instantiations), 1 + L + 2)
+
+    return costs
+
+def _get_child_exprs(expr: ir0.Expr):
+    if isinstance(expr, (ir0.ComparisonExpr, ir0.Int64BinaryOpExpr)):
+        return [expr.lhs, expr.rhs]
+    elif isinstance(expr, ir0.TemplateInstantiation):
+        return [expr.template_expr] + list(expr.args)
+    elif isinstance(expr, ir0.ClassMemberAccess):
+        return [expr.class_type_expr]
+    elif isinstance(expr, (ir0.NotExpr, ir0.UnaryMinusExpr)):
+        return [expr.expr]
+    else:
+        assert isinstance(expr, (ir0.Literal, ir0.TypeLiteral))
+        return []
+
+def _expr_key(expr: ir0.Expr):
+    '''Returns a hashable value that's the same for structurally-equal expressions.'''
+    if isinstance(expr, ir0.Literal):
+        return ('Literal', expr.value)
+    elif isinstance(expr, ir0.TypeLiteral):
+        return ('TypeLiteral', expr.cpp_type)
+    elif isinstance(expr, ir0.ClassMemberAccess):
+        return ('ClassMemberAccess', _expr_key(expr.class_type_expr), expr.member_name)
+    elif isinstance(expr, (ir0.ComparisonExpr, ir0.Int64BinaryOpExpr)):
+        return (expr.__class__.__name__, expr.op, _expr_key(expr.lhs), _expr_key(expr.rhs))
+    else:
+        return (expr.__class__.__name__,) + tuple(_expr_key(child_expr) for child_expr in _get_child_exprs(expr))
+
+def _get_template_name(expr: ir0.Expr):
+    '''Returns the name of the template in expr, or None if it's not known statically (e.g. a template argument).'''
+    if isinstance(expr, ir0.TypeLiteral) and not expr.is_local:
+        return expr.cpp_type
+    return None
+
+def _get_instantiated_template_names(exprs: Iterable[ir0.Expr]):
+    '''Returns the templates instantiated by the given expressions, once per distinct instantiation.
+
+    The compiler instantiates each template specialization only once, so e.g. accessing both the `value` and the
+    `error` members of the same instantiation counts as a single instantiation. Each element of the result is a
+    (template name, per_element) pair, where the template name is None for the templates that are not known statically
+    (e.g. templates passed as template arguments), and per_element is True for the templates instantiated once for
+    each element of a list (e.g. the one passed to a Transform*List template).
+    '''
+    instantiated_template_names_by_key = dict()
+    def visit(expr: ir0.Expr):
+        if isinstance(expr, ir0.TemplateInstantiation):
+            key = _expr_key(expr)
+            if key not in instantiated_template_names_by_key:
+                template_name = _get_template_name(expr.template_expr)
+                instantiated_template_names_by_key[key] = (template_name, False)
+                if template_name in _TEMPLATES_INSTANTIATING_ARG_PER_ELEMENT:
+                    instantiated_template_names_by_key[('per_element', key)] = (_get_template_name(expr.args[-1]), True)
+        for child_expr in _get_child_exprs(expr):
+            visit(child_expr)
+    for expr in exprs:
+        visit(expr)
+    return list(instantiated_template_names_by_key.values())
+
+def _get_body_exprs(body: List[ir0.TemplateBodyElement]):
+    for elem in body:
+        if isinstance(elem, (ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef)):
+            yield elem.expr
+
+def _get_template_defns(elems: Iterable[ir0.TemplateBodyElement]) -> Iterable[ir0.TemplateDefn]:
+    for elem in elems:
+        if isinstance(elem, ir0.TemplateDefn):
+            yield elem
+            for specialization in [elem.main_definition] + elem.specializations:
+                if specialization:
+                    yield from _get_template_defns(specialization.body)
+
+def _get_strongly_connected_components(nodes: List[str], successors_by_node: Dict[str, List[str]]):
+    '''Returns the SCCs of the graph (with Tarjan's algorithm), with each SCC after the ones reachable from it.'''
+    index_by_node = dict()
+    lowlink_by_node = dict()
+    stack = []
+    on_stack = set()
+    components = []
+
+    # This is iterative instead of recursive, since the call graph of a large module might be deeper than Python's
+    # recursion limit.
+    for root in nodes:
+        if root in index_by_node:
+            continue
+        work_stack = [(root, 0)]
+        while work_stack:
+            node, successor_index = work_stack.pop()
+            if successor_index == 0:
+                index_by_node[node] = lowlink_by_node[node] = len(index_by_node)
+                stack.append(node)
+                on_stack.add(node)
+            successors = successors_by_node[node]
+            if successor_index < len(successors):
+                work_stack.append((node, successor_index + 1))
+                successor = successors[successor_index]
+                if successor not in index_by_node:
+                    work_stack.append((successor, 0))
+                elif successor in on_stack:
+                    lowlink_by_node[node] = min(lowlink_by_node[node], index_by_node[successor])
+                continue
+            if work_stack:
+                parent, _ = work_stack[-1]
+                lowlink_by_node[parent] = min(lowlink_by_node[parent], lowlink_by_node[node])
+            if lowlink_by_node[node] == index_by_node[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+def estimate_instantiation_costs(toplevel_elems: List[Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]],
+                                 function_names: Iterable[str],
+                                 cxx_std: str = 'c++11',
+                                 builtins: bool = True) -> Dict[str, FunctionCostEstimate]:
+    '''Estimates the cost of instantiating the template generated for each of the given functions.
+
+    `cxx_std` and `builtins` determine the implementation of the runtime templates, see get_runtime_template_costs.
+    '''
+    template_defns_by_name = {template_defn.name: template_defn
+                              for template_defn in _get_template_defns(toplevel_elems)}
+    function_names = [name for name in function_names if name in template_defns_by_name]
+    runtime_template_costs = get_runtime_template_costs(cxx_std, builtins)
+
+    # For each template, the instantiated templates in each of its specializations (only one of them is used in each
+    # instantiation).
+    instantiated_template_names_by_specialization_by_template_name = {
+        template_name: [_get_instantiated_template_names(_get_body_exprs(specialization.body))
+                        for specialization in [template_defn.main_definition] + template_defn.specializations
+                        if specialization]
+        for template_name, template_defn in template_defns_by_name.items()}
+    successors_by_template_name = {
+        template_name: sorted({instantiated_template_name
+                               for instantiated_template_names in instantiated_template_names_by_specialization
+                               for instantiated_template_name, _ in instantiated_template_names
+                               if instantiated_template_name in template_defns_by_name})
+        for template_name, instantiated_template_names_by_specialization in instantiated_template_names_by_specialization_by_template_name.items()}
+
+    cost_by_template_name = dict()  # type: Dict[str, _TemplateCost]
+    def get_cost(template_name: Optional[str]):
+        if template_name in cost_by_template_name:
+            return cost_by_template_name[template_name]
+        if template_name in runtime_template_costs:
+            instantiations, depth = runtime_template_costs[template_name]
+            return _TemplateCost(instantiations,
+                                 depth,
+                                 runtime_templates=[template_name] if instantiations.coefficients_by_monomial else [])
+        # A template defined elsewhere (or a template passed as argument).
+        return _TemplateCost(instantiations=Polynomial.constant(1),
+                             depth=Polynomial.constant(1),
+                             external_templates=[template_name] if template_name else [])
+
+    for component in _get_strongly_connected_components(sorted(template_defns_by_name.keys()),
+                                                         successors_by_template_name):
+        component_names = set(component)
+        is_recursive = len(component) > 1 or component[0] in successors_by_template_name[component[0]]
+
+        # The cost of each template in the component, excluding the instantiations of the templates in the component.
+        local_cost_by_template_name = dict()
+        for template_name in component:
+            instantiations = Polynomial()
+            depth = Polynomial()
+            external_templates = set()
+            runtime_templates = set()
+            for instantiated_template_names in instantiated_template_names_by_specialization_by_template_name[template_name]:
+                specialization_instantiations = Polynomial()
+                for instantiated_template_name, per_element in instantiated_template_names:
+                    if instantiated_template_name in component_names:
+                        continue
+                    cost = get_cost(instantiated_template_name)
+                    if per_element:
+                        # These are instantiated within the runtime template that instantiates them, for each element.
+                        specialization_instantiations += cost.instantiations.times_variable(LIST_LENGTH_VARIABLE)
+                        depth = depth.upper_bound_with(cost.depth + 1)
+                    else:
+                        specialization_instantiations += cost.instantiations
+                        depth = depth.upper_bound_with(cost.depth)
+                    external_templates |= cost.external_templates
+                    runtime_templates |= cost.runtime_templates
+                instantiations = instantiations.upper_bound_with(specialization_instantiations)
+            local_cost_by_template_name[template_name] = _TemplateCost(instantiations + Polynomial.constant(1),
+                                                                       depth,
+                                                                       external_templates,
+                                                                       runtime_templates)
+
+        if not is_recursive:
+            [template_name] = component
+            local_cost = local_cost_by_template_name[template_name]
+            cost_by_template_name[template_name] = _TemplateCost(local_cost.instantiations,
+                                                                 local_cost.depth + Polynomial.constant(1),
+                                                                 local_cost.external_templates,
+                                                                 local_cost.runtime_templates)
+            continue
+
+        # In each step of the recursion, each template in the component is instantiated at most once, and the
+        # instantiation stack grows by at most len(component). The recursion variable is named after a function in the
+        # component, if any.
+        variable = recursion_variable(min((name for name in component if name in function_names),
+                                          default=min(component)))
+        step_instantiations = Polynomial()
+        local_depth = Polynomial()
+        external_templates = set()
+        runtime_templates = set()
+        for local_cost in local_cost_by_template_name.values():
+            step_instantiations += local_cost.instantiations
+            local_depth = local_depth.upper_bound_with(local_cost.depth)
+            external_templates |= local_cost.external_templates
+            runtime_templates |= local_cost.runtime_templates
+        step_depth = Polynomial.constant(len(component))
+        # N steps, plus the last one (that doesn't recurse further).
+        instantiations = step_instantiations.times_variable(variable) + step_instantiations
+        depth = step_depth.times_variable(variable) + step_depth + local_depth
+        for template_name in component:
+            cost_by_template_name[template_name] = _TemplateCost(instantiations, depth, external_templates,
+                                                                 runtime_templates)
+
+    return {function_name: FunctionCostEstimate(function_name,
+                                                instantiations=cost_by_template_name[function_name].instantiations,
+                                                depth=cost_by_template_name[function_name].depth,
+                                                external_templates=sorted(cost_by_template_name[function_name].external_templates),
+                                                runtime_templates=sorted(cost_by_template_name[function_name].runtime_templates))
+            for function_name in function_names}
+
+def _max_variable_value(depth: Polynomial, template_depth: int):
+    '''For a depth linear in a single variable, returns the largest value of the variable that fits in template_depth.'''
+    [variable] = depth.variables
+    coefficient = depth.coefficients_by_monomial.get((variable,))
+    if coefficient is None or len(depth.coefficients_by_monomial) > 2:
+        return None
+    return max(0, math.floor((template_depth - depth.constant_term) / coefficient))
+
+def _describe_variable(variable: str):
+    if variable == LIST_LENGTH_VARIABLE:
+        return 'L is the length of the longest list processed (this depends on the arguments)'
+    elif variable == LOG_LIST_LENGTH_VARIABLE:
+        return None
+    else:
+        function_name = variable[len('N('):-len(')')]
+        return '%s is the number of recursive calls made by %s (this depends on the arguments)' % (variable,
+                                                                                                    function_name)
+
+def format_report(filename: str,
+                  estimates: Dict[str, FunctionCostEstimate],
+                  template_depth: int,
+                  cxx_std: str = 'c++11',
+                  builtins: bool = True):
+    lines = ['Estimated template instantiations for the functions in %s (for %s, %s compiler intrinsics):' % (
+        filename, cxx_std, 'with' if builtins else 'without')]
+    for function_name in sorted(estimates.keys()):
+        estimate = estimates[function_name]
+        lines.append('  %s: instantiations: at most %s, instantiation depth: at most %s' % (
+            function_name, estimate.instantiations, estimate.depth))
+        variables = sorted(set(estimate.instantiations.variables + estimate.depth.variables))
+        for variable in variables:
+            description = _describe_variable(variable)
+            if description:
+                lines.append('    %s' % description)
+        if len(estimate.depth.variables) == 1:
+            max_variable_value = _max_variable_value(estimate.depth, template_depth)
+            if max_variable_value is not None:
+                lines.append('    -ftemplate-depth=%s allows %s <= %s' % (
+                    template_depth, estimate.depth.variables[0], max_variable_value))
+        if estimate.runtime_templates:
+            lines.append('    uses these TMPPy runtime templates: %s' % ', '.join(estimate.runtime_templates))
+        if estimate.external_templates:
+            lines.append('    also instantiates templates defined elsewhere (counted once each): %s' % (
+                ', '.join(estimate.external_templates)))
+    return '\n'.join(lines) + '\n'
+
+def check_template_depth(filename: str,
+                         toplevel_elems: List[Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]],
+                         estimates: Dict[str, FunctionCostEstimate],
+                         template_depth: int,
+                         cxx_std: str = 'c++11',
+                         builtins: bool = True) -> List[str]:
+    '''Returns warnings for the instantiations of functions that are likely to exceed template_depth.
+
+    For the functions whose depth doesn't depend on the arguments, this checks the depth itself. For the instantiations
+    in toplevel code (e.g. assertions) of recursive functions, of functions processing lists and of runtime templates
+    processing lists, this assumes that the number of recursive calls and the length of the lists are at most the
+    largest int argument (e.g. the n in range(n)), as in the common case of a recursion on an int argument that's
+    decremented by 1 each time.
+    '''
+    warnings = []
+    for function_name in sorted(estimates.keys()):
+        depth = estimates[function_name].depth
+        if not depth.variables and depth.constant_term > template_depth:
+            warnings.append('%s: warning: the instantiation depth of %s is estimated at %s, exceeding '
+                            '-ftemplate-depth=%s' % (filename, function_name, math.ceil(depth.constant_term),
+                                                     template_depth))
+
+    depth_by_template_name = {template_name: depth
+                              for template_name, (_, depth) in get_runtime_template_costs(cxx_std, builtins).items()
+                              if depth.variables}
+    depth_by_template_name.update((function_name, estimate.depth)
+                                  for function_name, estimate in estimates.items()
+                                  if estimate.depth.variables)
+
+    exprs_by_toplevel_name = dict()  # type: Dict[str, ir0.Expr]
+    # The toplevel elements generated for a toplevel assertion come right before the corresponding StaticAssert.
+    pending_instantiations = []
+    for elem in toplevel_elems:
+        if isinstance(elem, (ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef)):
+            pending_instantiations += _get_toplevel_instantiations(elem.expr, depth_by_template_name,
+                                                                   exprs_by_toplevel_name)
+        if isinstance(elem, (ir0.ConstantDef, ir0.Typedef)):
+            exprs_by_toplevel_name[elem.name] = elem.expr
+        if isinstance(elem, ir0.StaticAssert) or elem is toplevel_elems[-1]:
+            location = filename
+            if isinstance(elem, ir0.StaticAssert) and elem.source_line is not None:
+                location = '%s:%s' % (filename, elem.source_line)
+            reported_template_names = set()
+            for template_name, max_int_arg in pending_instantiations:
+                if template_name in reported_template_names:
+                    continue
+                depth = depth_by_template_name[template_name]
+                values_by_variable = {variable: max_int_arg for variable in depth.variables}
+                values_by_variable[LOG_LIST_LENGTH_VARIABLE] = math.ceil(math.log2(max_int_arg)) if max_int_arg > 1 else 0
+                estimated_depth = depth.evaluate(values_by_variable)
+                if estimated_depth > template_depth:
+                    if template_name in estimates:
+                        description = 'this instantiation of %s (with an int argument up to %s)' % (template_name,
+                                                                                                     max_int_arg)
+                    else:
+                        description = 'this instantiation of %s (with lists of up to %s elements)' % (template_name,
+                                                                                                      max_int_arg)
+                    warnings.append('%s: warning: %s is likely to exceed -ftemplate-depth=%s, its instantiation depth '
+                                    'is estimated at %s' % (location, description, template_depth, estimated_depth))
+                    reported_template_names.add(template_name)
+            pending_instantiations = []
+    return warnings
+
+def _get_toplevel_instantiations(expr: ir0.Expr,
+                                 depth_by_template_name: Dict[str, Polynomial],
+                                 exprs_by_toplevel_name: Dict[str, ir0.Expr]):
+    '''Returns the (template name, largest int argument) pairs for the templates in depth_by_template_name instantiated
+    in expr.
+
+    The int arguments are searched in the template arguments, also in the definitions of the toplevel constants and
+    typedefs that they reference (e.g. the list passed to Int64ListSum might be a typedef for an Int64ListRange).
+    '''
+    def get_int_args(expr: ir0.Expr, visited_names: set):
+        if isinstance(expr, ir0.Literal):
+            return [] if isinstance(expr.value, bool) else [expr.value]
+        if (isinstance(expr, ir0.TypeLiteral)
+                and expr.cpp_type in exprs_by_toplevel_name
+                and expr.cpp_type not in visited_names):
+            visited_names.add(expr.cpp_type)
+            return get_int_args(exprs_by_toplevel_name[expr.cpp_type], visited_names)
+        return [value
+                for child_expr in _get_child_exprs(expr)
+                for value in get_int_args(child_expr, visited_names)]
+
+    result = []
+    def visit(expr: ir0.Expr):
+        if isinstance(expr, ir0.TemplateInstantiation):
+            template_name = _get_template_name(expr.template_expr)
+            if template_name in depth_by_template_name:
+                visited_names = set()
+                int_args = [value
+                            for arg in expr.args
+                            for value in get_int_args(arg, visited_names)]
+                if int_args:
+                    result.append((template_name, max(abs(value) for value in int_args)))
+        for child_expr in _get_child_exprs(expr):
+            visit(child_expr)
+    visit(expr)
+    return result
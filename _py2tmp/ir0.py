@@ -53,13 +53,17 @@ class Expr:
     def get_free_vars(self) -> Iterable['TypeLiteral']: ...  # pragma: no cover
 
 class TemplateBodyElement:
-    pass
+    # The line of the TMPPy source that this element was generated from (if any). This is set by the writers in
+    # ir1_to_ir0, from the statement (or toplevel element) being converted at that point.
+    source_line = None  # type: Optional[int]
 
 class StaticAssert(TemplateBodyElement):
-    def __init__(self, expr: Expr, message: str):
+    def __init__(self, expr: Expr, message: str, scope_name: Optional[str] = None):
         assert expr.kind == ExprKind.BOOL
         self.expr = expr
         self.message = message
+        # For toplevel assertions, the name of the scope of the identifiers generated for it (see ir3.Assert).
+        self.scope_name = scope_name
 
 class ConstantDef(TemplateBodyElement):
     def __init__(self, name: str, expr: Expr, type: ExprType):
@@ -83,6 +87,10 @@ class TemplateArgDecl:
         self.name = name
 
 class TemplateSpecialization:
+    # The line of the TMPPy source that this specialization was generated from (if any), set like
+    # TemplateBodyElement.source_line.
+    source_line = None  # type: Optional[int]
+
     def __init__(self,
                  args: List[TemplateArgDecl],
                  patterns: 'Optional[List[TemplateArgPatternLiteral]]',
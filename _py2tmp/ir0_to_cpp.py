@@ -12,10 +12,89 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List, Iterator, Tuple, Union
+import os
+import re
+import textwrap
+from typing import List, Tuple, Union, Iterable, Optional
 from _py2tmp import ir0
+from _py2tmp import module_interface
+from _py2tmp import utils
+
+# The C++ standards that py2tmp can generate code for, from the oldest to the newest.
+SUPPORTED_CXX_STANDARDS = ('c++11', 'c++14', 'c++17', 'c++20')
+
+# The kinds of output that header_to_cpp can generate:
+# * 'header': a normal header.
+# * 'pch_header': a self-contained umbrella header (with include guards) for the generated templates and the whole TMPPy
+#   runtime, that can be precompiled as-is and then included in the TUs that use it.
+# * 'module': a C++20 module interface unit, that exports the generated templates. Requires C++20.
+OUTPUT_MODES = ('header', 'pch_header', 'module')
+
+# Value members of these class templates can be replaced by the corresponding variable template (that's cheaper to
+# instantiate) when the target C++ standard is at least the one specified here.
+_VARIABLE_TEMPLATE_FOR_VALUE_MEMBER_BY_CLASS_TEMPLATE = {
+    'Select1stBoolBool': ('c++14', 'Select1stBoolBoolValue'),
+    'Select1stBoolInt64': ('c++14', 'Select1stBoolInt64Value'),
+    'Select1stBoolType': ('c++14', 'Select1stBoolTypeValue'),
+    'Select1stInt64Bool': ('c++14', 'Select1stInt64BoolValue'),
+    'Select1stInt64Int64': ('c++14', 'Select1stInt64Int64Value'),
+    'Select1stInt64Type': ('c++14', 'Select1stInt64TypeValue'),
+}
+
+# Value members of these class templates are replaced by the corresponding macro defined in tmppy/config.h, that uses a
+# compiler intrinsic when available (avoiding the template instantiation altogether) and falls back to the class template
+# (or the variable template, when available) otherwise.
+_MACRO_FOR_VALUE_MEMBER_BY_CLASS_TEMPLATE = {
+    'std::is_same': 'TMPPY_IS_SAME',
+}
+
+# With line directives, this line is written before the toplevel code that doesn't correspond to any line of the TMPPy
+# source. expand_line_directives() then replaces it with a #line directive for the line of the generated code itself.
+_NO_SOURCE_LINE_MARKER = '// (no TMPPy source line)'
+
+_LINE_DIRECTIVE_REGEX = re.compile(r'^#line [0-9]+ "')
+
+# The tokens that expand_line_directives() needs to tell apart to find the macro arguments: string and character
+# literals (that might contain parentheses), identifiers and any other single character.
+_CPP_TOKEN_REGEX = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|[A-Za-z_][A-Za-z0-9_]*|\S')
+
+# The TMPPy runtime is split into these headers (in include/tmppy/), so that the generated code only includes the ones
+# that it uses. For each header, this lists the identifiers (defined in it) that the generated code might reference.
+# tmppy/config.h is always included, so it's not listed here.
+_RUNTIME_HEADERS_AND_IDENTIFIERS = (
+    ('tmppy/list.h', ('List', 'Int64List', 'BoolList')),
+    ('tmppy/always.h', ('AlwaysTrueFromBool', 'AlwaysTrueFromInt64', 'AlwaysTrueFromType', 'AlwaysFalseFromType',
+                        'AlwaysTrueFromBoolValue', 'AlwaysTrueFromInt64Value', 'AlwaysTrueFromTypeValue')),
+    ('tmppy/select1st.h', ('Select1stBoolBool', 'Select1stBoolInt64', 'Select1stBoolType',
+                           'Select1stInt64Bool', 'Select1stInt64Int64', 'Select1stInt64Type',
+                           'Select1stTypeBool', 'Select1stTypeInt64', 'Select1stTypeType',
+                           'Select1stBoolBoolValue', 'Select1stBoolInt64Value', 'Select1stBoolTypeValue',
+                           'Select1stInt64BoolValue', 'Select1stInt64Int64Value', 'Select1stInt64TypeValue')),
+    ('tmppy/list_concat.h', ('TypeListConcat', 'Int64ListConcat', 'BoolListConcat',
+                             'TypeListConcatAll', 'Int64ListConcatAll', 'BoolListConcatAll')),
+    ('tmppy/list_range.h', ('Int64ListRange',)),
+    ('tmppy/list_access.h', ('TypeListSize', 'Int64ListSize', 'BoolListSize',
+                             'TypeListGet', 'Int64ListGet', 'BoolListGet')),
+    ('tmppy/list_reductions.h', ('Int64ListSum', 'BoolListAll', 'BoolListAny')),
+    ('tmppy/get_first_error.h', ('GetFirstError',)),
+    ('tmppy/list_transform.h', ('TransformBoolListToBoolList', 'TransformBoolListToInt64List',
+                                'TransformBoolListToTypeList', 'TransformInt64ListToBoolList',
+                                'TransformInt64ListToInt64List', 'TransformInt64ListToTypeList',
+                                'TransformTypeListToBoolList', 'TransformTypeListToInt64List',
+                                'TransformTypeListToTypeList')),
+    ('tmppy/set.h', ('AddToBoolSet', 'AddToInt64Set', 'AddToTypeSet', 'IsInBoolSet', 'IsInInt64Set', 'IsInTypeSet',
+                     'BoolSetEquals', 'Int64SetEquals', 'TypeSetEquals')),
+    ('tmppy/list_to_set.h', ('BoolListToSet', 'Int64ListToSet', 'TypeListToSet')),
+)
+
+def _cxx_std_at_least(cxx_std: str, min_cxx_std: str):
+    return SUPPORTED_CXX_STANDARDS.index(cxx_std) >= SUPPORTED_CXX_STANDARDS.index(min_cxx_std)
 
 class Writer:
+    def __init__(self, cxx_std: str):
+        assert cxx_std in SUPPORTED_CXX_STANDARDS
+        self.cxx_std = cxx_std
+
     def new_id(self) -> str: ... # pragma: no cover
 
     def write_toplevel_elem(self, s: str): ... # pragma: no cover
@@ -24,9 +103,24 @@ class Writer:
 
     def create_child_writer(self) -> 'TemplateElemWriter': ...  # pragma: no cover
 
+    def get_line_directives_filename(self) -> Optional[str]: ...  # pragma: no cover
+
+    def write_line_directive(self, source_line: Optional[int]):
+        filename = self.get_line_directives_filename()
+        if filename is not None and source_line is not None:
+            filename = filename.replace('\\', '\\\\').replace('"', '\\"')
+            self.write_template_body_elem('\n#line {source_line} "{filename}"\n'.format(**locals()))
+
 class ToplevelWriter(Writer):
-    def __init__(self, identifier_generator: Iterator[str]):
+    def __init__(self,
+                 identifier_generator: utils.IdentifierGenerator,
+                 cxx_std: str,
+                 line_directives_filename: Optional[str] = None):
+        super().__init__(cxx_std)
         self.identifier_generator = identifier_generator
+        # If specified, #line directives referencing this file are written before the code generated for each element
+        # with a source line.
+        self.line_directives_filename = line_directives_filename
         self.strings = []
 
     def new_id(self):
@@ -41,8 +135,20 @@ class ToplevelWriter(Writer):
     def create_child_writer(self):
         return TemplateElemWriter(self)
 
+    def get_line_directives_filename(self):
+        return self.line_directives_filename
+
+    def write_line_directive(self, source_line: Optional[int]):
+        if source_line is None and self.line_directives_filename is not None:
+            # Toplevel code with no source line is then pointed back at the generated header by
+            # expand_line_directives(), instead of being reported at the line of the previous element.
+            self.write_toplevel_elem('\n%s\n' % _NO_SOURCE_LINE_MARKER)
+        else:
+            super().write_line_directive(source_line)
+
 class TemplateElemWriter(Writer):
     def __init__(self, toplevel_writer: ToplevelWriter):
+        super().__init__(toplevel_writer.cxx_std)
         self.toplevel_writer = toplevel_writer
         self.strings = []
 
@@ -58,6 +164,9 @@ class TemplateElemWriter(Writer):
     def create_child_writer(self):
         return TemplateElemWriter(self.toplevel_writer)
 
+    def get_line_directives_filename(self):
+        return self.toplevel_writer.get_line_directives_filename()
+
 def expr_to_cpp(expr: ir0.Expr,
                 enclosing_function_defn_args: List[ir0.TemplateArgDecl],
                 writer: Writer) -> str:
@@ -99,19 +208,24 @@ def static_assert_to_cpp(assert_stmt: ir0.StaticAssert,
         # TODO: We could avoid adding a param dependency in more cases by checking for references to local variables
         # that depend (directly or indirectly) on a param.
 
+        if _cxx_std_at_least(writer.cxx_std, 'c++14'):
+            always_true_template_format = '{always_true_template}Value<{bound_var}>'
+        else:
+            always_true_template_format = '{always_true_template}<{bound_var}>::value'
+
         for arg_decl in enclosing_function_defn_args:
             if arg_decl.type.kind == ir0.ExprKind.BOOL:
-                bound_var = arg_decl.name
-                writer.write_template_body_elem('static_assert(AlwaysTrueFromBool<{bound_var}>::value && {cpp_meta_expr}, "{message}");'.format(**locals()))
-                return
+                always_true_template = 'AlwaysTrueFromBool'
             elif arg_decl.type.kind == ir0.ExprKind.INT64:
-                bound_var = arg_decl.name
-                writer.write_template_body_elem('static_assert(AlwaysTrueFromInt64<{bound_var}>::value && {cpp_meta_expr}, "{message}");'.format(**locals()))
-                return
+                always_true_template = 'AlwaysTrueFromInt64'
             elif arg_decl.type.kind == ir0.ExprKind.TYPE:
-                bound_var = arg_decl.name
-                writer.write_template_body_elem('static_assert(AlwaysTrueFromType<{bound_var}>::value && {cpp_meta_expr}, "{message}");'.format(**locals()))
-                return
+                always_true_template = 'AlwaysTrueFromType'
+            else:
+                continue
+            bound_var = arg_decl.name
+            always_true_expr = always_true_template_format.format(**locals())
+            writer.write_template_body_elem('static_assert({always_true_expr} && {cpp_meta_expr}, "{message}");'.format(**locals()))
+            return
 
         # All of this function's params are functions, we can't use any of the predefined AlwaysTrue* templates.
         # We need to define a new AlwaysTrueFromType variant for this specific function type.
@@ -203,6 +317,7 @@ def template_specialization_to_cpp(specialization: ir0.TemplateSpecialization,
                                    writer: Writer):
     template_elem_writer = writer.create_child_writer()
     for elem in specialization.body:
+        template_elem_writer.write_line_directive(elem.source_line)
         if isinstance(elem, ir0.StaticAssert):
             static_assert_to_cpp(elem,
                                  enclosing_function_defn_args=specialization.args,
@@ -260,6 +375,7 @@ def template_defn_to_cpp(template_defn: ir0.TemplateDefn,
     if template_defn.main_definition:
         if template_defn.description:
             writer.write_toplevel_elem('// %s\n' % template_defn.description)
+        writer.write_line_directive(template_defn.main_definition.source_line)
         template_specialization_to_cpp(template_defn.main_definition,
                                        cxx_name=template_name,
                                        enclosing_function_defn_args=enclosing_function_defn_args,
@@ -268,6 +384,7 @@ def template_defn_to_cpp(template_defn: ir0.TemplateDefn,
     for specialization in template_defn.specializations:
         if template_defn.description:
             writer.write_toplevel_elem('// %s\n' % template_defn.description)
+        writer.write_line_directive(specialization.source_line)
         template_specialization_to_cpp(specialization,
                                        cxx_name=template_name,
                                        enclosing_function_defn_args=enclosing_function_defn_args,
@@ -431,7 +548,14 @@ def class_member_access_to_cpp(expr: ir0.ClassMemberAccess,
     else:
         cpp_fun = expr_to_cpp(expr.class_type_expr, enclosing_function_defn_args, writer)
     member_name = expr.member_name
-    if expr.member_kind in (ir0.ExprKind.BOOL, ir0.ExprKind.INT64):
+    macro = _get_macro_for_value_member(expr)
+    variable_template = _get_variable_template_for_value_member(expr, writer)
+    if macro:
+        macro_args = cpp_fun[cpp_fun.index('<') + 1:-1]
+        return '{macro}({macro_args})'.format(**locals())
+    elif variable_template:
+        return variable_template + cpp_fun[cpp_fun.index('<'):]
+    elif expr.member_kind in (ir0.ExprKind.BOOL, ir0.ExprKind.INT64):
         cpp_str_template = '{cpp_fun}::{member_name}'
     elif expr.member_kind in (ir0.ExprKind.TYPE, ir0.ExprKind.TEMPLATE):
         if omit_typename or (expr.member_kind == ir0.ExprKind.TEMPLATE and not parent_expr_is_template_instantiation):
@@ -448,6 +572,23 @@ def class_member_access_to_cpp(expr: ir0.ClassMemberAccess,
         raise NotImplementedError('Member kind: %s' % expr.member_kind)
     return cpp_str_template.format(**locals())
 
+def _get_macro_for_value_member(expr: ir0.ClassMemberAccess):
+    if (expr.member_name == 'value'
+            and isinstance(expr.class_type_expr, ir0.TemplateInstantiation)
+            and isinstance(expr.class_type_expr.template_expr, ir0.TypeLiteral)):
+        return _MACRO_FOR_VALUE_MEMBER_BY_CLASS_TEMPLATE.get(expr.class_type_expr.template_expr.cpp_type)
+    return None
+
+def _get_variable_template_for_value_member(expr: ir0.ClassMemberAccess, writer: Writer):
+    if (expr.member_name == 'value'
+            and isinstance(expr.class_type_expr, ir0.TemplateInstantiation)
+            and isinstance(expr.class_type_expr.template_expr, ir0.TypeLiteral)):
+        min_cxx_std, variable_template = _VARIABLE_TEMPLATE_FOR_VALUE_MEMBER_BY_CLASS_TEMPLATE.get(
+            expr.class_type_expr.template_expr.cpp_type, (None, None))
+        if min_cxx_std and _cxx_std_at_least(writer.cxx_std, min_cxx_std):
+            return variable_template
+    return None
+
 def not_expr_to_cpp(expr: ir0.NotExpr,
                     enclosing_function_defn_args: List[ir0.TemplateArgDecl],
                     writer: Writer):
@@ -460,35 +601,178 @@ def unary_minus_expr_to_cpp(expr: ir0.UnaryMinusExpr,
     inner_expr = expr_to_cpp(expr.expr, enclosing_function_defn_args, writer)
     return '-({inner_expr})'.format(**locals())
 
-def header_to_cpp(header: ir0.Header, identifier_generator: Iterator[str]):
-    writer = ToplevelWriter(identifier_generator)
-    writer.write_toplevel_elem('''\
-        #include <tmppy/tmppy.h>
-        #include <type_traits>
-        ''')
-    for elem in header.content:
+def header_to_cpp(header: ir0.Header,
+                  identifier_generator: utils.IdentifierGenerator,
+                  cxx_std: str = 'c++11',
+                  output_mode: str = 'header',
+                  module_name: str = None,
+                  imported_modules: List[module_interface.ModuleInterface] = (),
+                  line_directives_filename: Optional[str] = None):
+    return toplevel_elems_to_cpp(header.content, identifier_generator, cxx_std, output_mode, module_name,
+                                 imported_modules, line_directives_filename)
+
+def toplevel_elems_to_cpp(toplevel_elems: Iterable[Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]],
+                          identifier_generator: utils.IdentifierGenerator,
+                          cxx_std: str = 'c++11',
+                          output_mode: str = 'header',
+                          module_name: str = None,
+                          imported_modules: List[module_interface.ModuleInterface] = (),
+                          line_directives_filename: Optional[str] = None):
+    '''Like header_to_cpp, but consumes the toplevel elements one at a time (e.g. as they're generated).
+
+    If `line_directives_filename` is specified, the code generated for each template specialization, toplevel element
+    and template member is preceded by a #line directive with the corresponding line of that (TMPPy source) file, so that
+    compiler diagnostics reference the TMPPy source. expand_line_directives() should then be called on the formatted
+    code, to make those lines exact.
+    '''
+    assert output_mode in OUTPUT_MODES
+    if output_mode in ('pch_header', 'module') or imported_modules:
+        assert module_name
+    if output_mode == 'module':
+        assert _cxx_std_at_least(cxx_std, 'c++20')
+
+    # All templates are forward-declared before the definitions, so these are written separately.
+    forward_decls_writer = ToplevelWriter(identifier_generator, cxx_std)
+    writer = ToplevelWriter(identifier_generator, cxx_std, line_directives_filename)
+
+    # In module mode, the generated templates are exported from the module. The static_asserts are left out of the
+    # export blocks, since they don't declare any name. The forward declarations are all in the first export block.
+    in_export_block = True
+    def set_in_export_block(value: bool):
+        nonlocal in_export_block
+        if output_mode == 'module' and value != in_export_block:
+            writer.write_toplevel_elem('export {\n' if value else '}\n')
+            in_export_block = value
+
+    for elem in toplevel_elems:
         # TODO: only do this when needed, many of these forward declarations are unnecessary.
         if isinstance(elem, ir0.TemplateDefn):
-            template_defn_to_cpp_forward_decl(elem,
-                                              enclosing_function_defn_args=[],
-                                              writer=writer)
-    for elem in header.content:
+            with identifier_generator.scope('ir0_to_cpp', 'forward_decl', elem.name):
+                template_defn_to_cpp_forward_decl(elem,
+                                                  enclosing_function_defn_args=[],
+                                                  writer=forward_decls_writer)
+        set_in_export_block(not isinstance(elem, ir0.StaticAssert))
+        if not isinstance(elem, ir0.TemplateDefn):
+            writer.write_line_directive(elem.source_line)
         if isinstance(elem, ir0.TemplateDefn):
-            template_defn_to_cpp(elem,
-                                 enclosing_function_defn_args=[],
-                                 writer=writer)
+            with identifier_generator.scope('ir0_to_cpp', 'template', elem.name):
+                template_defn_to_cpp(elem,
+                                     enclosing_function_defn_args=[],
+                                     writer=writer)
         elif isinstance(elem, ir0.StaticAssert):
-            static_assert_to_cpp(elem,
-                                 enclosing_function_defn_args=[],
-                                 writer=writer)
+            with identifier_generator.scope('ir0_to_cpp', 'static_assert', elem.scope_name):
+                static_assert_to_cpp(elem,
+                                     enclosing_function_defn_args=[],
+                                     writer=writer)
         elif isinstance(elem, ir0.ConstantDef):
-            constant_def_to_cpp(elem,
-                                enclosing_function_defn_args=[],
-                                writer=writer)
+            with identifier_generator.scope('ir0_to_cpp', 'constant', elem.name):
+                constant_def_to_cpp(elem,
+                                    enclosing_function_defn_args=[],
+                                    writer=writer)
         elif isinstance(elem, ir0.Typedef):
-            typedef_to_cpp(elem,
-                           enclosing_function_defn_args=[],
-                           writer=writer)
+            with identifier_generator.scope('ir0_to_cpp', 'typedef', elem.name):
+                typedef_to_cpp(elem,
+                               enclosing_function_defn_args=[],
+                               writer=writer)
         else:
             raise NotImplementedError('Unexpected toplevel element: %s' % str(elem.__class__))
-    return ''.join(writer.strings)
+    set_in_export_block(False)
+    cpp_code = ''.join(forward_decls_writer.strings + writer.strings)
+    if output_mode == 'module':
+        cpp_code = 'export {\n' + cpp_code
+
+    prelude = ''
+    epilogue = ''
+    if output_mode != 'module' and module_name:
+        # Headers generated for TMPPy modules can be included by the ones generated for the modules that import them, so
+        # they need include guards.
+        # We use include guards instead of "#pragma once", since the latter triggers a warning in GCC when the header
+        # is precompiled (as it's the main file).
+        include_guard = 'TMPPY_GENERATED_' + module_name.upper() + '_H'
+        prelude += '#ifndef {include_guard}\n#define {include_guard}\n'.format(**locals())
+        epilogue += '#endif // {include_guard}\n'.format(**locals())
+    if output_mode == 'pch_header':
+        # The whole runtime is included, so that the precompiled header can be used by TUs that also include other
+        # headers generated by py2tmp.
+        runtime_headers = ['tmppy/tmppy.h']
+    else:
+        runtime_headers = ['tmppy/config.h'] + _get_used_runtime_headers(cpp_code)
+    if output_mode == 'module':
+        # The includes go in the global module fragment.
+        prelude += 'module;\n'
+    prelude += ''.join('#include <{header}>\n'.format(header=header)
+                       for header in runtime_headers)
+    if output_mode != 'module':
+        # The generated files are expected to be in the same directory (or at least in the include path).
+        prelude += ''.join('#include "{header}"\n'.format(header=os.path.basename(imported_module.output_file_name))
+                           for imported_module in imported_modules)
+    if cxx_std != SUPPORTED_CXX_STANDARDS[0]:
+        min_cplusplus = {
+            'c++14': '201402L',
+            'c++17': '201703L',
+            'c++20': '202002L',
+        }[cxx_std]
+        prelude += textwrap.dedent('''\
+            #if TMPPY_CPLUSPLUS < {min_cplusplus}
+            #error "This header was generated by py2tmp for {cxx_std} or later."
+            #endif
+            ''').format(**locals())
+    if output_mode == 'module':
+        prelude += 'export module {module_name};\n'.format(**locals())
+        # The imported modules are re-exported, since the generated code can reference templates defined in the modules
+        # that they import (e.g. for exceptions thrown by the imported functions).
+        prelude += ''.join('export import {module_name};\n'.format(module_name=imported_module.module_name)
+                           for imported_module in imported_modules)
+    return prelude + cpp_code + epilogue
+
+def expand_line_directives(cpp_code: str, header_file_name: str):
+    '''Makes the #line directives in code generated by toplevel_elems_to_cpp exact, once the code has been formatted.
+
+    toplevel_elems_to_cpp writes a #line directive before each element, but the code generated for it then spans several
+    lines, and the compiler would count up from the directive's line. Here each #line directive for the TMPPy source is
+    repeated before each of the following lines of code, so that they're all reported at that source line. The toplevel
+    code that doesn't correspond to any line of the source (e.g. the helper templates shared by the whole module) is
+    instead pointed back at its own line in the generated header, `header_file_name`.
+
+    A directive can't appear within the arguments of a macro invocation, so those are joined back into a single line.
+    '''
+    escaped_header_file_name = header_file_name.replace('\\', '\\\\').replace('"', '\\"')
+    result_lines = []
+    # The last #line directive for the TMPPy source, or None in the code that doesn't correspond to any source line.
+    line_directive = None
+    # For each parenthesis that's still open, whether it's the one of a macro invocation.
+    open_parens = []
+    for line in cpp_code.splitlines():
+        stripped_line = line.strip()
+        if _LINE_DIRECTIVE_REGEX.match(stripped_line):
+            line_directive = stripped_line
+            continue
+        if stripped_line == _NO_SOURCE_LINE_MARKER:
+            line_directive = None
+            # The directive applies to the line that follows it, so this is the number of the line after it.
+            result_lines.append('#line %s "%s"' % (len(result_lines) + 2, escaped_header_file_name))
+            continue
+        if any(open_parens):
+            result_lines[-1] += ' ' + stripped_line
+        else:
+            if line_directive is not None and stripped_line and not stripped_line.startswith(('#', '//')):
+                result_lines.append(line_directive)
+            result_lines.append(line)
+
+        if not stripped_line.startswith('#'):
+            previous_token = None
+            for token in _CPP_TOKEN_REGEX.findall(line):
+                if token == '(':
+                    open_parens.append(previous_token in _MACRO_FOR_VALUE_MEMBER_BY_CLASS_TEMPLATE.values())
+                elif token == ')' and open_parens:
+                    open_parens.pop()
+                previous_token = token
+    return ''.join(line + '\n' for line in result_lines)
+
+def _get_used_runtime_headers(cpp_code: str):
+    # This also finds the runtime templates that are only referenced in code generated in this module (e.g. the
+    # AlwaysTrueFrom* and Select1st* templates) and not in the IR0 itself.
+    used_identifiers = set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', cpp_code))
+    return [header
+            for header, identifiers in _RUNTIME_HEADERS_AND_IDENTIFIERS
+            if used_identifiers.intersection(identifiers)]
@@ -569,6 +569,10 @@ class ReturnTypeInfo:
         self.always_returns = always_returns
 
 class Stmt:
+    # The line of the TMPPy source that this statement was generated from (if any). This is set by the writers of the
+    # conversion that generates the statement, from the statement being converted at that point.
+    source_line = None  # type: Optional[int]
+
     # Note: it's the caller's responsibility to de-duplicate VarReference objects that reference the same symbol, if
     # desired.
     def get_free_variables(self) -> 'Iterable[VarReference]': ...  # pragma: no cover
@@ -576,10 +580,12 @@ class Stmt:
     def write(self, writer: Writer, verbose: bool): ...  # pragma: no cover
 
 class Assert(Stmt):
-    def __init__(self, var: VarReference, message: str):
+    def __init__(self, var: VarReference, message: str, scope_name: Optional[str] = None):
         assert isinstance(var.type, BoolType)
         self.var = var
         self.message = message
+        # For toplevel assertions, the name of the scope of the identifiers generated for it (see ir3.Assert).
+        self.scope_name = scope_name
 
     def get_free_variables(self):
         for var in self.var.get_free_variables():
@@ -711,6 +717,9 @@ class IfStmt(Stmt):
                     stmt.write(writer, verbose)
 
 class FunctionDefn:
+    # The line of the TMPPy source that this function was generated from (if any), set like Stmt.source_line.
+    source_line = None  # type: Optional[int]
+
     def __init__(self,
                  name: str,
                  description: str,
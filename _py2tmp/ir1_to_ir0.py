@@ -14,8 +14,10 @@
 
 from _py2tmp import ir0
 from _py2tmp import ir1
+from _py2tmp import module_interface
 from _py2tmp import utils
-from typing import List, Tuple, Optional, Iterator, Union, Callable, Dict
+from typing import List, Tuple, Optional, Union, Callable, Dict, Iterable
+from contextlib import contextmanager
 
 class Writer:
     def new_id(self) -> str: ...  # pragma: no cover
@@ -24,19 +26,55 @@ class Writer:
 
     def get_is_instance_template_name_for_error(self, error_name: str) -> str: ...  # pragma: no cover
 
+    def get_toplevel_writer(self) -> 'ToplevelWriter': ...  # pragma: no cover
+
+    def source_line(self, source_line: Optional[int]):
+        return self.get_toplevel_writer().source_line(source_line)
+
 class ToplevelWriter(Writer):
-    def __init__(self, identifier_generator: Iterator[str]):
+    def __init__(self, identifier_generator: utils.IdentifierGenerator):
         self.identifier_generator = identifier_generator
+        # The line of the TMPPy source of the IR1 element being converted, used for the source_line of the generated
+        # IR0.
+        self.current_source_line = None  # type: Optional[int]
         self.elems = []  # type: List[Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]]
         self.holder_template_name_for_error = dict()  # type: Dict[str, str]
         self.is_instance_template_name_for_error = dict()  # type: Dict[str, str]
+        # This is module-specific so that the headers generated for different modules can be included together.
+        self.check_if_error_template_name = identifier_generator.identifier_for_origin('ir1_to_ir0/CheckIfError')
 
     def new_id(self):
         return next(self.identifier_generator)
 
     def write(self, elem: Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]):
+        self.set_source_line_if_missing(elem)
         self.elems.append(elem)
 
+    def set_source_line_if_missing(self, elem: ir0.TemplateBodyElement):
+        if elem.source_line is None:
+            elem.source_line = self.current_source_line
+        if isinstance(elem, ir0.TemplateDefn):
+            for specialization in [elem.main_definition] + elem.specializations:
+                if specialization and specialization.source_line is None:
+                    specialization.source_line = self.current_source_line
+
+    @contextmanager
+    def source_line(self, source_line: Optional[int]):
+        previous_source_line = self.current_source_line
+        self.current_source_line = source_line
+        try:
+            yield
+        finally:
+            self.current_source_line = previous_source_line
+
+    def get_toplevel_writer(self):
+        return self
+
+    def take_elems(self):
+        elems = self.elems
+        self.elems = []
+        return elems
+
     def set_holder_template_name_for_error(self,
                                            error_name: str,
                                            error_holder_name: str):
@@ -71,6 +109,7 @@ class TemplateBodyWriter(Writer):
         if isinstance(elem, ir0.TemplateDefn):
             self.writer.write(elem)
         else:
+            self.get_toplevel_writer().set_source_line_if_missing(elem)
             self.elems.append(elem)
 
     def write_result_body_elements(self,
@@ -115,6 +154,9 @@ class TemplateBodyWriter(Writer):
     def get_is_instance_template_name_for_error(self, error_name: str):
         return self.writer.get_is_instance_template_name_for_error(error_name)
 
+    def get_toplevel_writer(self):
+        return self.writer.get_toplevel_writer()
+
 def type_to_ir0(type: ir1.ExprType):
     if isinstance(type, ir1.BoolType):
         return ir0.BoolType()
@@ -212,7 +254,7 @@ def _create_metafunction_call(template_expr: ir0.Expr,
     if isinstance(writer, ToplevelWriter) and (not isinstance(template_expr, ir0.TypeLiteral)
                                                or template_expr.is_metafunction_that_may_return_error):
         # using T = CheckIfError<F<x, y>::error>::type;
-        check_if_error_template_instantiation_expr = ir0.TemplateInstantiation(template_expr=ir0.TypeLiteral.for_nonlocal_template(cpp_type='CheckIfError',
+        check_if_error_template_instantiation_expr = ir0.TemplateInstantiation(template_expr=ir0.TypeLiteral.for_nonlocal_template(cpp_type=writer.check_if_error_template_name,
                                                                                                                                    is_metafunction_that_may_return_error=False),
                                                                                args=[ir0.ClassMemberAccess(class_type_expr=template_instantiation_expr,
                                                                                                            member_name='error',
@@ -651,7 +693,9 @@ def list_to_set_expr_to_ir0(expr: ir1.ListToSetExpr):
 
 def assert_to_ir0(assert_stmt: ir1.Assert, writer: Writer):
     expr = var_reference_to_ir0(assert_stmt.var)
-    writer.write(ir0.StaticAssert(expr=expr, message=assert_stmt.message))
+    writer.write(ir0.StaticAssert(expr=expr,
+                                  message=assert_stmt.message,
+                                  scope_name=assert_stmt.scope_name))
 
 def assignment_to_ir0(assignment: ir1.Assignment, writer: Writer):
     lhs = var_reference_to_ir0(assignment.lhs)
@@ -840,6 +884,8 @@ def if_stmt_to_ir0(if_stmt: ir1.IfStmt,
                                                                                          patterns=None,
                                                                                          body=then_writer.elems),
                                               specializations=[])
+        # Attributed to the first statement after the if-else, rather than to the if-else itself.
+        then_template_defn.main_definition.source_line = then_stmts[0].source_line
         writer.write(then_template_defn)
 
         then_function_call_expr, then_function_call_error_expr = _create_metafunction_call(ir0.TypeLiteral.for_nonlocal_template(cpp_type=then_template_defn.name,
@@ -892,6 +938,10 @@ def if_stmt_to_ir0(if_stmt: ir1.IfStmt,
     else_branch_specialization = _create_metafunction_specialization(args=forwarded_vars_args,
                                                                      patterns=forwarded_vars_patterns + [ir0.TemplateArgPatternLiteral('false')],
                                                                      body=else_branch_writer.elems)
+    # Each specialization is attributed to the first statement of the corresponding branch (if any).
+    if_branch_specialization.source_line = if_stmt.if_stmts[0].source_line
+    if if_stmt.else_stmts:
+        else_branch_specialization.source_line = if_stmt.else_stmts[0].source_line
 
     fun_defn = ir0.TemplateDefn(main_definition=None,
                                 name=writer.new_id(),
@@ -1006,22 +1056,23 @@ def stmts_to_ir0(stmts: List[ir1.Stmt],
                  write_continuation_fun_call: Optional[Callable[[TemplateBodyWriter], None]],
                  writer: Writer):
     for index, stmt in enumerate(stmts):
-        if isinstance(stmt, ir1.Assert):
-            assert_to_ir0(stmt, writer)
-        elif isinstance(stmt, ir1.Assignment):
-            assignment_to_ir0(stmt, writer)
-        elif isinstance(stmt, ir1.ReturnStmt):
-            assert isinstance(writer, TemplateBodyWriter)
-            return_stmt_to_ir0(stmt, writer)
-        elif isinstance(stmt, ir1.IfStmt):
-            assert isinstance(writer, TemplateBodyWriter)
-            if_stmt_to_ir0(stmt, stmts[index + 1:], write_continuation_fun_call, writer)
-            break
-        elif isinstance(stmt, ir1.UnpackingAssignment):
-            unpacking_assignment_to_ir0(stmt, stmts[index + 1:], write_continuation_fun_call, writer)
-            break
-        else:
-            raise NotImplementedError('Unexpected statement type: ' + stmt.__class__.__name__)
+        with writer.source_line(stmt.source_line):
+            if isinstance(stmt, ir1.Assert):
+                assert_to_ir0(stmt, writer)
+            elif isinstance(stmt, ir1.Assignment):
+                assignment_to_ir0(stmt, writer)
+            elif isinstance(stmt, ir1.ReturnStmt):
+                assert isinstance(writer, TemplateBodyWriter)
+                return_stmt_to_ir0(stmt, writer)
+            elif isinstance(stmt, ir1.IfStmt):
+                assert isinstance(writer, TemplateBodyWriter)
+                if_stmt_to_ir0(stmt, stmts[index + 1:], write_continuation_fun_call, writer)
+                break
+            elif isinstance(stmt, ir1.UnpackingAssignment):
+                unpacking_assignment_to_ir0(stmt, stmts[index + 1:], write_continuation_fun_call, writer)
+                break
+            else:
+                raise NotImplementedError('Unexpected statement type: ' + stmt.__class__.__name__)
 
     if write_continuation_fun_call:
         assert isinstance(writer, TemplateBodyWriter)
@@ -1091,26 +1142,53 @@ def check_if_error_defn_to_ir0(check_if_error_defn: ir1.CheckIfErrorDefn, writer
                                                                                           kind=ir0.ExprKind.BOOL),
                                                                          message=error_message)])
                        for custom_error_type, error_message in check_if_error_defn.error_types_and_messages]
-    writer.write(ir0.TemplateDefn(name='CheckIfError',
+    writer.write(ir0.TemplateDefn(name=writer.check_if_error_template_name,
                                   description='',
                                   main_definition=main_definition,
                                   specializations=specializations,
                                   args=main_definition.args))
 
-def module_to_ir0(module: ir1.Module, identifier_generator: Iterator[str]):
+def module_to_ir0(module: ir1.Module,
+                  identifier_generator: utils.IdentifierGenerator,
+                  custom_type_template_names: Optional[Dict[str, module_interface.CustomTypeTemplateNames]] = None):
+    '''Converts a module to IR0.
+
+    If specified, `custom_type_template_names` must contain the names of the templates generated for the imported custom
+    types. The names of the templates generated for the custom types defined in this module are then added to it.
+    '''
+    return ir0.Header(content=list(toplevel_elems_to_ir0(module.body, identifier_generator, custom_type_template_names)))
+
+def toplevel_elems_to_ir0(toplevel_elems: Iterable[Union[ir1.FunctionDefn, ir1.Assignment, ir1.Assert, ir1.CustomType, ir1.CheckIfErrorDefn]],
+                          identifier_generator: utils.IdentifierGenerator,
+                          custom_type_template_names: Optional[Dict[str, module_interface.CustomTypeTemplateNames]] = None):
+    '''Like module_to_ir0, but converts the toplevel elements of a module yielding the IR0 elements for each one in turn.'''
     writer = ToplevelWriter(identifier_generator)
-    for toplevel_elem in module.body:
+    if custom_type_template_names is None:
+        custom_type_template_names = dict()
+    for custom_type_name, template_names in custom_type_template_names.items():
+        writer.set_holder_template_name_for_error(custom_type_name, template_names.holder_template_name)
+        writer.set_is_instance_template_name_for_error(custom_type_name, template_names.is_instance_template_name)
+    for toplevel_elem in toplevel_elems:
         if isinstance(toplevel_elem, ir1.FunctionDefn):
-            function_defn_to_ir0(toplevel_elem, writer)
+            with identifier_generator.scope('ir1_to_ir0', 'function', toplevel_elem.name), \
+                    writer.source_line(toplevel_elem.source_line):
+                function_defn_to_ir0(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir1.Assert):
-            assert_to_ir0(toplevel_elem, writer)
+            with identifier_generator.scope('ir1_to_ir0', 'assertion', toplevel_elem.scope_name), \
+                    writer.source_line(toplevel_elem.source_line):
+                assert_to_ir0(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir1.Assignment):
-            assignment_to_ir0(toplevel_elem, writer)
+            with identifier_generator.scope('ir1_to_ir0', 'assignment', toplevel_elem.lhs.name), \
+                    writer.source_line(toplevel_elem.source_line):
+                assignment_to_ir0(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir1.CustomType):
-            custom_type_defn_to_ir0(toplevel_elem, writer)
+            with identifier_generator.scope('ir1_to_ir0', 'custom_type', toplevel_elem.name):
+                custom_type_defn_to_ir0(toplevel_elem, writer)
+            custom_type_template_names[toplevel_elem.name] = module_interface.CustomTypeTemplateNames(
+                holder_template_name=writer.get_holder_template_name_for_error(toplevel_elem.name),
+                is_instance_template_name=writer.get_is_instance_template_name_for_error(toplevel_elem.name))
         elif isinstance(toplevel_elem, ir1.CheckIfErrorDefn):
             check_if_error_defn_to_ir0(toplevel_elem, writer)
         else:
             raise NotImplementedError('Unexpected toplevel element: %s' % str(toplevel_elem.__class__))
-
-    return ir0.Header(content=writer.elems)
+        yield from writer.take_elems()
@@ -560,6 +560,79 @@ class IntBinaryOpExpr(Expr):
     def describe_other_fields(self):
         return '(lhs: %s; rhs: %s)' % (self.lhs.describe_other_fields(), self.rhs.describe_other_fields())
 
+class IntRangeExpr(Expr):
+    def __init__(self, begin: VarReference, end: VarReference):
+        assert begin.type == IntType()
+        assert end.type == IntType()
+        super().__init__(type=ListType(IntType()))
+        self.begin = begin
+        self.end = end
+
+    def get_free_variables(self):
+        for expr in (self.begin, self.end):
+            for var in expr.get_free_variables():
+                yield var
+
+    def __str__(self):
+        return 'range(%s, %s)' % (self.begin.name, self.end.name)
+
+    def describe_other_fields(self):
+        return '(begin: %s; end: %s)' % (self.begin.describe_other_fields(), self.end.describe_other_fields())
+
+class ListLenExpr(Expr):
+    def __init__(self, var: VarReference):
+        assert isinstance(var.type, ListType)
+        super().__init__(type=IntType())
+        self.var = var
+
+    def get_free_variables(self):
+        for var in self.var.get_free_variables():
+            yield var
+
+    def __str__(self):
+        return 'len(%s)' % self.var.name
+
+    def describe_other_fields(self):
+        return self.var.describe_other_fields()
+
+class ListIndexExpr(Expr):
+    def __init__(self, list_var: VarReference, index_var: VarReference):
+        assert isinstance(list_var.type, ListType)
+        assert index_var.type == IntType()
+        super().__init__(type=list_var.type.elem_type)
+        self.list_var = list_var
+        self.index_var = index_var
+
+    def get_free_variables(self):
+        for expr in (self.list_var, self.index_var):
+            for var in expr.get_free_variables():
+                yield var
+
+    def __str__(self):
+        return '%s[%s]' % (self.list_var.name, self.index_var.name)
+
+    def describe_other_fields(self):
+        return '(list_var: %s; index_var: %s)' % (self.list_var.describe_other_fields(), self.index_var.describe_other_fields())
+
+class IsInListExpr(Expr):
+    def __init__(self, elem_var: VarReference, list_var: VarReference):
+        assert isinstance(list_var.type, ListType)
+        assert elem_var.type == list_var.type.elem_type
+        super().__init__(type=BoolType())
+        self.elem_var = elem_var
+        self.list_var = list_var
+
+    def get_free_variables(self):
+        for expr in (self.elem_var, self.list_var):
+            for var in expr.get_free_variables():
+                yield var
+
+    def __str__(self):
+        return '%s in %s' % (self.elem_var.name, self.list_var.name)
+
+    def describe_other_fields(self):
+        return '(elem_var: %s; list_var: %s)' % (self.elem_var.describe_other_fields(), self.list_var.describe_other_fields())
+
 class ListConcatExpr(Expr):
     def __init__(self, lhs: VarReference, rhs: VarReference):
         assert isinstance(lhs.type, ListType)
@@ -579,6 +652,23 @@ class ListConcatExpr(Expr):
     def describe_other_fields(self):
         return '(lhs: %s; rhs: %s)' % (self.lhs.describe_other_fields(), self.rhs.describe_other_fields())
 
+class ListConcatAllExpr(Expr):
+    def __init__(self, var: VarReference):
+        assert isinstance(var.type, ListType)
+        assert isinstance(var.type.elem_type, ListType)
+        super().__init__(type=var.type.elem_type)
+        self.var = var
+
+    def get_free_variables(self):
+        for var in self.var.get_free_variables():
+            yield var
+
+    def __str__(self):
+        return 'concat_all(%s)' % self.var.name
+
+    def describe_other_fields(self):
+        return self.var.describe_other_fields()
+
 class IsInstanceExpr(Expr):
     def __init__(self, var: VarReference, checked_type: CustomType):
         super().__init__(type=BoolType())
@@ -642,6 +732,10 @@ class ReturnTypeInfo:
         self.always_returns = always_returns
 
 class Stmt:
+    # The line of the TMPPy source that this statement was generated from (if any). This is set by the writers of the
+    # conversion that generates the statement, from the statement being converted at that point.
+    source_line = None  # type: Optional[int]
+
     # Note: it's the caller's responsibility to de-duplicate VarReference objects that reference the same symbol, if
     # desired.
     def get_free_variables(self) -> 'Iterable[VarReference]': ...  # pragma: no cover
@@ -649,10 +743,12 @@ class Stmt:
     def write(self, writer: Writer, verbose: bool): ...  # pragma: no cover
 
 class Assert(Stmt):
-    def __init__(self, var: VarReference, message: str):
+    def __init__(self, var: VarReference, message: str, scope_name: Optional[str] = None):
         assert isinstance(var.type, BoolType)
         self.var = var
         self.message = message
+        # For toplevel assertions, the name of the scope of the identifiers generated for it (see ir3.Assert).
+        self.scope_name = scope_name
 
     def get_free_variables(self):
         for var in self.var.get_free_variables():
@@ -786,6 +882,9 @@ class IfStmt(Stmt):
                     stmt.write(writer, verbose)
 
 class FunctionDefn:
+    # The line of the TMPPy source that this function was generated from (if any), set like Stmt.source_line.
+    source_line = None  # type: Optional[int]
+
     def __init__(self,
                  name: str,
                  description: str,
@@ -851,6 +950,23 @@ def get_free_variables_in_stmts(stmts: List[Stmt]):
         elif isinstance(stmt, UnpackingAssignment):
             for var in stmt.lhs_list:
                 local_var_names.add(var.name)
+        elif isinstance(stmt, IfStmt):
+            # E.g. the result of an "and" is assigned in both branches of an if statement.
+            for var_name in _get_assigned_var_names_in_stmts(stmt.if_stmts + stmt.else_stmts):
+                local_var_names.add(var_name)
+
+def _get_assigned_var_names_in_stmts(stmts: List[Stmt]):
+    for stmt in stmts:
+        if isinstance(stmt, Assignment):
+            yield stmt.lhs.name
+            if stmt.lhs2:
+                yield stmt.lhs2.name
+        elif isinstance(stmt, UnpackingAssignment):
+            for var in stmt.lhs_list:
+                yield var.name
+        elif isinstance(stmt, IfStmt):
+            for var_name in _get_assigned_var_names_in_stmts(stmt.if_stmts + stmt.else_stmts):
+                yield var_name
 
 def get_unique_free_variables_in_stmts(stmts: List[Stmt]) -> List[VarReference]:
     var_by_name = dict()
@@ -0,0 +1,819 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''A reference interpreter for IR2, that evaluates a module in Python instead of compiling the generated C++ code.
+
+The interpreter follows the semantics of the generated code rather than the ones of Python where they differ: ints are
+64-bit and the division rounds towards zero, a set is a list in insertion order, all the elements of a list
+comprehension are evaluated even if one of them raises an exception, and so on.
+
+Types are parsed into a normalized structure (e.g. 'const int*' and 'int const *' are the same type, references
+collapse) and `match` picks the most specialized pattern, as the C++ compiler does with template specializations. Types
+that can only be evaluated by a C++ compiler (e.g. 'std::remove_pointer<T>::type') aren't supported.
+'''
+
+import re
+from typing import List, Dict, Optional, Tuple, Union, Any
+
+from _py2tmp import ir2
+
+class EvaluationError(Exception):
+    '''Raised when the evaluation of the module fails, i.e. when the generated code would fail to compile.
+
+    The message is the one of the static_assert that would fail in C++ (for failed assertions and uncaught exceptions),
+    or a description of the error.
+    '''
+
+class UnsupportedConstructError(Exception):
+    '''Raised when the module uses something that the interpreter can't evaluate, e.g. functions of imported modules.'''
+
+# Types are represented as tuples whose first element is the kind, e.g. ('pointer', ('name', 'int')) for 'int*'. The
+# possible forms are:
+#
+# ('name', name)                                  e.g. 'int', 'unsigned long', 'std::string'
+# ('template', name, args)                        e.g. 'std::vector<int>', where args is a tuple of types and values
+# ('int', value), ('bool', value)                 the non-type arguments of templates
+# ('cv', is_const, is_volatile, type)
+# ('pointer', type)
+# ('lvalue_reference', type)
+# ('rvalue_reference', type)
+# ('array', elem_type, size)                      the size is None for arrays of unknown bound
+# ('function', return_type, param_types, is_variadic)
+# ('placeholder', name)                           the arguments of a Type literal and the variables of a TypePattern
+_Type = Tuple
+
+_VOID = ('name', 'void')
+
+_BUILTIN_TYPE_WORDS = ('void', 'bool', 'char', 'wchar_t', 'char16_t', 'char32_t', 'short', 'int', 'long', 'signed',
+                       'unsigned', 'float', 'double')
+
+_UNSUPPORTED_KEYWORDS = ('typename', 'decltype', 'auto', 'sizeof', 'alignof', 'noexcept', 'operator', 'template')
+
+def _cv(type: _Type, is_const: bool, is_volatile: bool):
+    if not is_const and not is_volatile:
+        return type
+    kind = type[0]
+    if kind in ('lvalue_reference', 'rvalue_reference', 'function'):
+        # E.g. 'const T' with T=int& is just int&.
+        return type
+    if kind == 'array':
+        return ('array', _cv(type[1], is_const, is_volatile), type[2])
+    if kind == 'cv':
+        return ('cv', type[1] or is_const, type[2] or is_volatile, type[3])
+    return ('cv', is_const, is_volatile, type)
+
+def _split_cv(type: _Type):
+    if type[0] == 'cv':
+        return type[1], type[2], type[3]
+    return False, False, type
+
+def _pointer(type: _Type):
+    if type[0] in ('lvalue_reference', 'rvalue_reference'):
+        raise EvaluationError('Invalid type: pointer to the reference type %s' % _type_to_cpp(type))
+    return ('pointer', type)
+
+def _reference(type: _Type, is_rvalue: bool):
+    if type == _VOID:
+        raise EvaluationError('Invalid type: reference to void')
+    if type[0] == 'lvalue_reference':
+        return type
+    if type[0] == 'rvalue_reference':
+        return type if is_rvalue else ('lvalue_reference', type[1])
+    return ('rvalue_reference' if is_rvalue else 'lvalue_reference', type)
+
+def _array(elem_type: _Type, size: Optional[int]):
+    if elem_type[0] in ('lvalue_reference', 'rvalue_reference', 'function') or _split_cv(elem_type)[2] == _VOID:
+        raise EvaluationError('Invalid type: array of %s' % _type_to_cpp(elem_type))
+    return ('array', elem_type, size)
+
+def _function(return_type: _Type, param_types: Tuple[_Type, ...], is_variadic: bool):
+    if return_type[0] in ('array', 'function'):
+        raise EvaluationError('Invalid type: function returning %s' % _type_to_cpp(return_type))
+    if param_types == (_VOID,) and not is_variadic:
+        param_types = ()
+    adjusted_param_types = []
+    for param_type in param_types:
+        # The same adjustments that C++ does for the types of function parameters.
+        if param_type[0] == 'array':
+            param_type = _pointer(param_type[1])
+        elif param_type[0] == 'function':
+            param_type = _pointer(param_type)
+        elif param_type[0] == 'cv' and param_type[3][0] != 'placeholder':
+            param_type = param_type[3]
+        adjusted_param_types.append(param_type)
+    return ('function', return_type, tuple(adjusted_param_types), is_variadic)
+
+def _builtin_type(words: List[str]):
+    base_types = [word
+                  for word in words
+                  if word not in ('short', 'long', 'signed', 'unsigned')]
+    if len(base_types) > 1:
+        raise UnsupportedConstructError('Unexpected builtin type: %s' % ' '.join(words))
+    base_type = base_types[0] if base_types else 'int'
+    modifiers = [word for word in words if word != base_type]
+    if base_type == 'char':
+        return ('name', ' '.join(modifiers + ['char']))
+    if base_type == 'double' and modifiers == ['long']:
+        return ('name', 'long double')
+    if base_type != 'int':
+        if modifiers:
+            raise UnsupportedConstructError('Unexpected builtin type: %s' % ' '.join(words))
+        return ('name', base_type)
+    if 'short' in modifiers:
+        name = 'short'
+    elif modifiers.count('long') == 2:
+        name = 'long long'
+    elif 'long' in modifiers:
+        name = 'long'
+    else:
+        name = 'int'
+    if 'unsigned' in modifiers:
+        name = 'unsigned ' + name
+    return ('name', name)
+
+def _type_to_cpp(type: _Type, declarator: str = ''):
+    kind = type[0]
+    if kind in ('name', 'placeholder'):
+        return type[1] + declarator
+    elif kind == 'template':
+        return '%s<%s>%s' % (type[1], ', '.join(_type_to_cpp(arg) for arg in type[2]), declarator)
+    elif kind == 'int':
+        return str(type[1])
+    elif kind == 'bool':
+        return 'true' if type[1] else 'false'
+    elif kind == 'cv':
+        qualifiers = ' '.join(qualifier
+                              for qualifier, is_present in (('const', type[1]), ('volatile', type[2]))
+                              if is_present)
+        if type[3][0] in ('name', 'template', 'placeholder'):
+            return '%s %s' % (qualifiers, _type_to_cpp(type[3], declarator))
+        return _type_to_cpp(type[3], ' %s%s' % (qualifiers, declarator))
+    elif kind in ('pointer', 'lvalue_reference', 'rvalue_reference'):
+        declarator = {'pointer': '*', 'lvalue_reference': '&', 'rvalue_reference': '&&'}[kind] + declarator
+        if type[1][0] in ('array', 'function'):
+            declarator = '(%s)' % declarator
+        return _type_to_cpp(type[1], declarator)
+    elif kind == 'array':
+        return _type_to_cpp(type[1], '%s[%s]' % (declarator, '' if type[2] is None else type[2]))
+    elif kind == 'function':
+        params = [_type_to_cpp(param_type) for param_type in type[2]]
+        if type[3]:
+            params.append('...')
+        return _type_to_cpp(type[1], '%s(%s)' % (declarator, ', '.join(params)))
+    else:
+        raise NotImplementedError('Unexpected type kind: %s' % kind)
+
+class _TypeParser:
+    '''Parses a C++ type (a type-id, in the terms of the C++ standard).
+
+    The identifiers in `placeholder_names` are parsed as placeholders, that must stand for a whole type.
+    '''
+
+    _token_regex = re.compile(r'\s*(?:([A-Za-z_][A-Za-z_0-9]*)|([0-9][A-Za-z_0-9]*)|(::|&&|\.\.\.|[-*&()\[\],<>]))')
+
+    def __init__(self, cpp_type: str, placeholder_names: List[str]):
+        self.cpp_type = cpp_type
+        self.placeholder_names = set(placeholder_names)
+        self.tokens = []  # type: List[str]
+        position = 0
+        while cpp_type[position:].strip():
+            match = self._token_regex.match(cpp_type, position)
+            if not match:
+                self._unsupported()
+            self.tokens.append(match.group(match.lastindex))
+            position = match.end()
+        self.position = 0
+
+    def parse(self):
+        type = self._parse_type_id()
+        if self._peek() is not None:
+            self._unsupported()
+        return type
+
+    def _unsupported(self):
+        raise UnsupportedConstructError('Unsupported type: %s' % self.cpp_type)
+
+    def _peek(self, offset=0):
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            self._unsupported()
+        self.position += 1
+        return token
+
+    def _expect(self, token: str):
+        if self._next() != token:
+            self._unsupported()
+
+    def _is_identifier(self, token: Optional[str]):
+        return token is not None and (token[0].isalpha() or token[0] == '_')
+
+    def _parse_type_id(self):
+        type = self._parse_decl_specifiers()
+        return self._parse_abstract_declarator()(type)
+
+    def _parse_cv_qualifiers(self):
+        is_const = False
+        is_volatile = False
+        while self._peek() in ('const', 'volatile'):
+            if self._next() == 'const':
+                is_const = True
+            else:
+                is_volatile = True
+        return is_const, is_volatile
+
+    def _parse_decl_specifiers(self):
+        is_const = False
+        is_volatile = False
+        builtin_type_words = []
+        type = None
+        while True:
+            token = self._peek()
+            if token in ('const', 'volatile'):
+                is_const_here, is_volatile_here = self._parse_cv_qualifiers()
+                is_const = is_const or is_const_here
+                is_volatile = is_volatile or is_volatile_here
+            elif token in _BUILTIN_TYPE_WORDS and type is None:
+                builtin_type_words.append(self._next())
+            elif token in ('struct', 'class', 'union', 'enum'):
+                self._next()
+            elif token in _UNSUPPORTED_KEYWORDS:
+                self._unsupported()
+            elif type is None and not builtin_type_words and (token == '::' or self._is_identifier(token)):
+                type = self._parse_name()
+            else:
+                break
+        if builtin_type_words:
+            type = _builtin_type(builtin_type_words)
+        if type is None:
+            self._unsupported()
+        return _cv(type, is_const, is_volatile)
+
+    def _parse_name(self):
+        if self._peek() == '::':
+            # '::std::string' and 'std::string' are the same type.
+            self._next()
+        name_parts = []
+        while True:
+            identifier = self._next()
+            if not self._is_identifier(identifier) or identifier in _BUILTIN_TYPE_WORDS:
+                self._unsupported()
+            if identifier in self.placeholder_names and not name_parts:
+                if self._peek() == '::':
+                    # A member of a type that's only known when the code is compiled, e.g. 'T::type'.
+                    self._unsupported()
+                return ('placeholder', identifier)
+            name_parts.append(identifier)
+            if self._peek() == '<':
+                self._next()
+                args = self._parse_template_args()
+                if self._peek() == '::':
+                    # E.g. 'std::remove_pointer<int*>::type'.
+                    self._unsupported()
+                return ('template', '::'.join(name_parts), tuple(args))
+            if self._peek() != '::':
+                return ('name', '::'.join(name_parts))
+            self._next()
+
+    def _parse_template_args(self):
+        args = []
+        if self._peek() == '>':
+            self._next()
+            return args
+        while True:
+            token = self._peek()
+            if token in ('true', 'false'):
+                self._next()
+                args.append(('bool', token == 'true'))
+            elif token == '-' or (token is not None and token[0].isdigit()):
+                args.append(('int', self._parse_int()))
+            else:
+                args.append(self._parse_type_id())
+            token = self._next()
+            if token == '>':
+                return args
+            if token != ',':
+                self._unsupported()
+
+    def _parse_int(self):
+        sign = 1
+        if self._peek() == '-':
+            self._next()
+            sign = -1
+        token = self._next()
+        if not token.isdigit():
+            self._unsupported()
+        return sign * int(token)
+
+    def _parse_abstract_declarator(self):
+        '''Returns a function that, given the type in the decl-specifiers, returns the declared type.'''
+        ptr_operators = []
+        while self._peek() in ('*', '&', '&&'):
+            token = self._next()
+            if token == '*':
+                is_const, is_volatile = self._parse_cv_qualifiers()
+                ptr_operators.append(lambda type, is_const=is_const, is_volatile=is_volatile:
+                                     _cv(_pointer(type), is_const, is_volatile))
+            else:
+                ptr_operators.append(lambda type, is_rvalue=(token == '&&'): _reference(type, is_rvalue))
+
+        nested_declarator = lambda type: type
+        if self._peek() == '(' and self._peek(1) in ('*', '&', '&&'):
+            # E.g. the '(*)' in 'int(*)(float)'.
+            self._next()
+            nested_declarator = self._parse_abstract_declarator()
+            self._expect(')')
+
+        suffixes = []
+        while self._peek() in ('(', '['):
+            if self._next() == '(':
+                param_types, is_variadic = self._parse_function_params()
+                if self._peek() in ('const', 'volatile', '&', '&&'):
+                    # The type of a member function.
+                    self._unsupported()
+                suffixes.append(lambda type, param_types=param_types, is_variadic=is_variadic:
+                                _function(type, param_types, is_variadic))
+            else:
+                size = None
+                if self._peek() != ']':
+                    size = self._parse_int()
+                self._expect(']')
+                suffixes.append(lambda type, size=size: _array(type, size))
+
+        def declarator(type: _Type):
+            for ptr_operator in ptr_operators:
+                type = ptr_operator(type)
+            # In 'int[2][3]' the [2] is the outermost array.
+            for suffix in reversed(suffixes):
+                type = suffix(type)
+            return nested_declarator(type)
+
+        return declarator
+
+    def _parse_function_params(self):
+        param_types = []
+        is_variadic = False
+        if self._peek() == ')':
+            self._next()
+            return tuple(param_types), is_variadic
+        while True:
+            if self._peek() == '...':
+                self._next()
+                is_variadic = True
+                self._expect(')')
+                return tuple(param_types), is_variadic
+            param_types.append(self._parse_type_id())
+            token = self._next()
+            if token == ')':
+                return tuple(param_types), is_variadic
+            if token != ',':
+                self._unsupported()
+
+def _substitute(type: _Type, replacements: Dict[str, _Type]) -> _Type:
+    kind = type[0]
+    if kind == 'placeholder':
+        return replacements[type[1]]
+    elif kind in ('name', 'int', 'bool'):
+        return type
+    elif kind == 'template':
+        return ('template', type[1], tuple(_substitute(arg, replacements) for arg in type[2]))
+    elif kind == 'cv':
+        return _cv(_substitute(type[3], replacements), type[1], type[2])
+    elif kind == 'pointer':
+        return _pointer(_substitute(type[1], replacements))
+    elif kind in ('lvalue_reference', 'rvalue_reference'):
+        return _reference(_substitute(type[1], replacements), is_rvalue=(kind == 'rvalue_reference'))
+    elif kind == 'array':
+        return _array(_substitute(type[1], replacements), type[2])
+    elif kind == 'function':
+        return _function(_substitute(type[1], replacements),
+                         tuple(_substitute(param_type, replacements) for param_type in type[2]),
+                         type[3])
+    else:
+        raise NotImplementedError('Unexpected type kind: %s' % kind)
+
+def _match_type(pattern: _Type, type: _Type, bindings: Dict[str, _Type]):
+    '''Deduces the placeholders in `pattern` so that it becomes `type`, as C++ does for template specializations.'''
+    kind = pattern[0]
+    if kind == 'placeholder':
+        if pattern[1] in bindings:
+            return bindings[pattern[1]] == type
+        bindings[pattern[1]] = type
+        return True
+    if kind == 'cv':
+        is_const, is_volatile, unqualified_type = _split_cv(type)
+        if pattern[3][0] == 'placeholder':
+            # E.g. 'const T' matches 'const volatile int' with T='volatile int'.
+            if (pattern[1] and not is_const) or (pattern[2] and not is_volatile):
+                return False
+            return _match_type(pattern[3],
+                               _cv(unqualified_type, is_const and not pattern[1], is_volatile and not pattern[2]),
+                               bindings)
+        return (pattern[1], pattern[2]) == (is_const, is_volatile) and _match_type(pattern[3], unqualified_type, bindings)
+    if type[0] != kind:
+        return False
+    if kind in ('name', 'int', 'bool'):
+        return pattern == type
+    elif kind == 'template':
+        return (pattern[1] == type[1]
+                and len(pattern[2]) == len(type[2])
+                and all(_match_type(pattern_arg, arg, bindings)
+                        for pattern_arg, arg in zip(pattern[2], type[2])))
+    elif kind in ('pointer', 'lvalue_reference', 'rvalue_reference'):
+        return _match_type(pattern[1], type[1], bindings)
+    elif kind == 'array':
+        return pattern[2] == type[2] and _match_type(pattern[1], type[1], bindings)
+    elif kind == 'function':
+        return (pattern[3] == type[3]
+                and len(pattern[2]) == len(type[2])
+                and _match_type(pattern[1], type[1], bindings)
+                and all(_match_type(pattern_param, param, bindings)
+                        for pattern_param, param in zip(pattern[2], type[2])))
+    else:
+        raise NotImplementedError('Unexpected type kind: %s' % kind)
+
+class TypeValue:
+    '''The value of an expression of type Type.'''
+
+    def __init__(self, type: _Type):
+        self.type = type
+
+    def __eq__(self, other):
+        return isinstance(other, TypeValue) and self.type == other.type
+
+    def __hash__(self):
+        return hash(self.type)
+
+    def __str__(self):
+        return _type_to_cpp(self.type)
+
+    def __repr__(self):
+        return 'Type(%r)' % str(self)
+
+class CustomTypeValue:
+    '''An instance of a custom type (including exceptions).'''
+
+    def __init__(self, type_name: str, field_values: Tuple):
+        self.type_name = type_name
+        self.field_values = field_values
+
+    def __eq__(self, other):
+        return isinstance(other, CustomTypeValue) and (self.type_name, self.field_values) == (other.type_name, other.field_values)
+
+    def __hash__(self):
+        return hash((self.type_name, self.field_values))
+
+    def __repr__(self):
+        return '%s(%s)' % (self.type_name, ', '.join(repr(value) for value in self.field_values))
+
+class FunctionValue:
+    '''A reference to a function, e.g. in a variable of type Callable[[int], int].'''
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, FunctionValue) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return self.name
+
+# Bools and ints are represented as Python bools and ints, lists and sets as tuples (sets keep the insertion order).
+Value = Union[bool, int, TypeValue, CustomTypeValue, FunctionValue, Tuple]
+
+_NO_ERROR = TypeValue(_VOID)
+
+_MIN_INT64 = -2**63
+_MAX_INT64 = 2**63 - 1
+
+def _check_int64(value: int):
+    if not _MIN_INT64 <= value <= _MAX_INT64:
+        raise EvaluationError('Integer overflow: %s does not fit in an int64_t' % value)
+    return value
+
+def _is_error(error: Value):
+    return isinstance(error, CustomTypeValue)
+
+class _Interpreter:
+    def __init__(self, module: ir2.Module):
+        self.module = module
+        self.function_defns_by_name = dict()  # type: Dict[str, ir2.FunctionDefn]
+        self.custom_types_by_name = dict()  # type: Dict[str, ir2.CustomType]
+        self.error_messages_by_type_name = dict()  # type: Dict[str, str]
+        self.global_values = dict()  # type: Dict[str, Value]
+        # C++ instantiates each template only once for the same arguments, so e.g. a naive Fibonacci function takes a
+        # linear number of steps to evaluate, not an exponential one. The interpreter does the same.
+        self.results_by_call = dict()  # type: Dict[Tuple[str, Tuple], Tuple[Value, Value]]
+        self.parsed_types_by_literal = dict()  # type: Dict[Tuple[str, Tuple[str, ...]], _Type]
+
+    def run(self):
+        for toplevel_elem in self.module.body:
+            if isinstance(toplevel_elem, ir2.FunctionDefn):
+                self.function_defns_by_name[toplevel_elem.name] = toplevel_elem
+            elif isinstance(toplevel_elem, ir2.CustomType):
+                self.custom_types_by_name[toplevel_elem.name] = toplevel_elem
+            elif isinstance(toplevel_elem, ir2.CheckIfErrorDefn):
+                for error_type, message in toplevel_elem.error_types_and_messages:
+                    self.error_messages_by_type_name[error_type.name] = message
+
+        for toplevel_elem in self.module.body:
+            if isinstance(toplevel_elem, (ir2.Assignment, ir2.Assert)):
+                result = self.exec_stmt(toplevel_elem, self.global_values)
+                assert result is None
+
+        return self.global_values
+
+    def get_value(self, var: ir2.VarReference, env: Dict[str, Value]):
+        if var.is_global_function:
+            return FunctionValue(var.name)
+        if var.name in env:
+            return env[var.name]
+        if var.name in self.global_values:
+            return self.global_values[var.name]
+        raise UnsupportedConstructError('Reference to a variable not defined in this module: %s' % var.name)
+
+    def call(self, function_name: str, args: Tuple):
+        custom_type = self.custom_types_by_name.get(function_name)
+        if custom_type:
+            return CustomTypeValue(custom_type.name, args), _NO_ERROR
+
+        function_defn = self.function_defns_by_name.get(function_name)
+        if not function_defn:
+            raise UnsupportedConstructError('Call to a function not defined in this module: %s' % function_name)
+
+        key = (function_name, args)
+        result = self.results_by_call.get(key)
+        if result is None:
+            env = {arg_decl.name: arg
+                   for arg_decl, arg in zip(function_defn.args, args)}
+            result = self.exec_stmts(function_defn.body, env)
+            assert result is not None
+            self.results_by_call[key] = result
+        return result
+
+    def exec_stmts(self, stmts: List[ir2.Stmt], env: Dict[str, Value]):
+        for stmt in stmts:
+            result = self.exec_stmt(stmt, env)
+            if result is not None:
+                return result
+        return None
+
+    def exec_stmt(self, stmt: ir2.Stmt, env: Dict[str, Value]) -> Optional[Tuple[Value, Value]]:
+        if isinstance(stmt, ir2.Assert):
+            if not self.get_value(stmt.var, env):
+                raise EvaluationError(stmt.message)
+        elif isinstance(stmt, ir2.Assignment):
+            value, error = self.eval_expr(stmt.rhs, env)
+            env[stmt.lhs.name] = value
+            if stmt.lhs2:
+                env[stmt.lhs2.name] = error
+            elif _is_error(error):
+                # This can only happen at toplevel, where the generated code checks the result with CheckIfError.
+                message = self.error_messages_by_type_name.get(error.type_name)
+                if message is None:
+                    raise UnsupportedConstructError('Uncaught exception of a type defined in another module: %s' % error.type_name)
+                raise EvaluationError(message)
+        elif isinstance(stmt, ir2.UnpackingAssignment):
+            values = self.get_value(stmt.rhs, env)
+            if len(values) != len(stmt.lhs_list):
+                raise EvaluationError(stmt.error_message)
+            for var, value in zip(stmt.lhs_list, values):
+                env[var.name] = value
+        elif isinstance(stmt, ir2.ReturnStmt):
+            return (self.get_value(stmt.result, env) if stmt.result else None,
+                    self.get_value(stmt.error, env) if stmt.error else _NO_ERROR)
+        elif isinstance(stmt, ir2.IfStmt):
+            if self.get_value(stmt.cond, env):
+                return self.exec_stmts(stmt.if_stmts, env)
+            else:
+                return self.exec_stmts(stmt.else_stmts, env)
+        else:
+            raise NotImplementedError('Unexpected statement: %s' % stmt.__class__.__name__)
+        return None
+
+    def eval_expr(self, expr: ir2.Expr, env: Dict[str, Value]) -> Tuple[Value, Value]:
+        '''Returns the value of the expression and the exception that it raised (or _NO_ERROR).'''
+        if isinstance(expr, ir2.FunctionCall):
+            fun = self.get_value(expr.fun, env)
+            return self.call(fun.name, tuple(self.get_value(arg, env) for arg in expr.args))
+        elif isinstance(expr, ir2.MatchExpr):
+            return self.eval_match_expr(expr, env)
+        elif isinstance(expr, ir2.ListComprehensionExpr):
+            return self.eval_list_comprehension_expr(expr, env)
+        else:
+            return self.eval_expr_without_error(expr, env), _NO_ERROR
+
+    def eval_expr_without_error(self, expr: ir2.Expr, env: Dict[str, Value]) -> Value:
+        if isinstance(expr, ir2.VarReference):
+            return self.get_value(expr, env)
+        elif isinstance(expr, (ir2.BoolLiteral, ir2.IntLiteral)):
+            return expr.value
+        elif isinstance(expr, ir2.TypeLiteral):
+            return self.eval_type_literal(expr, env)
+        elif isinstance(expr, ir2.ListExpr):
+            return tuple(self.get_value(elem, env) for elem in expr.elems)
+        elif isinstance(expr, ir2.AddToSetExpr):
+            set_value = self.get_value(expr.set_expr, env)
+            elem = self.get_value(expr.elem_expr, env)
+            return set_value if elem in set_value else set_value + (elem,)
+        elif isinstance(expr, ir2.SetToListExpr):
+            return self.get_value(expr.var, env)
+        elif isinstance(expr, ir2.ListToSetExpr):
+            result = ()
+            for elem in self.get_value(expr.var, env):
+                if elem not in result:
+                    result += (elem,)
+            return result
+        elif isinstance(expr, ir2.EqualityComparison):
+            return self.get_value(expr.lhs, env) == self.get_value(expr.rhs, env)
+        elif isinstance(expr, ir2.SetEqualityComparison):
+            return set(self.get_value(expr.lhs, env)) == set(self.get_value(expr.rhs, env))
+        elif isinstance(expr, ir2.AttributeAccessExpr):
+            return self.eval_attribute_access_expr(expr, env)
+        elif isinstance(expr, ir2.NotExpr):
+            return not self.get_value(expr.var, env)
+        elif isinstance(expr, ir2.UnaryMinusExpr):
+            return _check_int64(-self.get_value(expr.var, env))
+        elif isinstance(expr, ir2.IntListSumExpr):
+            return _check_int64(sum(self.get_value(expr.var, env)))
+        elif isinstance(expr, ir2.BoolListAllExpr):
+            return all(self.get_value(expr.var, env))
+        elif isinstance(expr, ir2.BoolListAnyExpr):
+            return any(self.get_value(expr.var, env))
+        elif isinstance(expr, ir2.IntComparisonExpr):
+            lhs = self.get_value(expr.lhs, env)
+            rhs = self.get_value(expr.rhs, env)
+            return {'<': lhs < rhs, '>': lhs > rhs, '<=': lhs <= rhs, '>=': lhs >= rhs}[expr.op]
+        elif isinstance(expr, ir2.IntBinaryOpExpr):
+            return self.eval_int_binary_op_expr(expr, env)
+        elif isinstance(expr, ir2.IntRangeExpr):
+            return tuple(range(self.get_value(expr.begin, env), self.get_value(expr.end, env)))
+        elif isinstance(expr, ir2.ListLenExpr):
+            return len(self.get_value(expr.var, env))
+        elif isinstance(expr, ir2.ListIndexExpr):
+            values = self.get_value(expr.list_var, env)
+            index = self.get_value(expr.index_var, env)
+            if not -len(values) <= index < len(values):
+                raise EvaluationError('TMPPy list index out of range')
+            return values[index]
+        elif isinstance(expr, ir2.IsInListExpr):
+            return self.get_value(expr.elem_var, env) in self.get_value(expr.list_var, env)
+        elif isinstance(expr, ir2.ListConcatAllExpr):
+            return tuple(elem
+                         for values in self.get_value(expr.var, env)
+                         for elem in values)
+        elif isinstance(expr, ir2.ListConcatExpr):
+            return self.get_value(expr.lhs, env) + self.get_value(expr.rhs, env)
+        elif isinstance(expr, ir2.IsInstanceExpr):
+            value = self.get_value(expr.var, env)
+            return isinstance(value, CustomTypeValue) and value.type_name == expr.checked_type.name
+        elif isinstance(expr, ir2.SafeUncheckedCast):
+            return self.get_value(expr.var, env)
+        else:
+            raise NotImplementedError('Unexpected expression: %s' % expr.__class__.__name__)
+
+    def eval_type_literal(self, expr: ir2.TypeLiteral, env: Dict[str, Value]):
+        arg_names = tuple(sorted(expr.args.keys()))
+        key = (expr.cpp_type, arg_names)
+        type = self.parsed_types_by_literal.get(key)
+        if type is None:
+            type = _TypeParser(expr.cpp_type, list(arg_names)).parse()
+            self.parsed_types_by_literal[key] = type
+        replacements = dict()
+        for arg_name, arg_var in expr.args.items():
+            arg = self.get_value(arg_var, env)
+            if not isinstance(arg, TypeValue):
+                raise UnsupportedConstructError('Unsupported argument of Type(\'%s\'): %s' % (expr.cpp_type, repr(arg)))
+            replacements[arg_name] = arg.type
+        return TypeValue(_substitute(type, replacements))
+
+    def eval_attribute_access_expr(self, expr: ir2.AttributeAccessExpr, env: Dict[str, Value]):
+        value = self.get_value(expr.var, env)
+        if not isinstance(value, CustomTypeValue):
+            # E.g. x.type for x=Type('std::remove_pointer<int*>'), that needs a C++ compiler to be evaluated.
+            raise UnsupportedConstructError('Access to the attribute %s of the type %s' % (expr.attribute_name, str(value)))
+        custom_type = self.custom_types_by_name.get(value.type_name)
+        if not custom_type:
+            raise UnsupportedConstructError('Access to an attribute of a type defined in another module: %s' % value.type_name)
+        for arg_decl, field_value in zip(custom_type.arg_types, value.field_values):
+            if arg_decl.name == expr.attribute_name:
+                return field_value
+        raise NotImplementedError('Unknown attribute %s of %s' % (expr.attribute_name, value.type_name))
+
+    def eval_int_binary_op_expr(self, expr: ir2.IntBinaryOpExpr, env: Dict[str, Value]):
+        lhs = self.get_value(expr.lhs, env)
+        rhs = self.get_value(expr.rhs, env)
+        if expr.op == '+':
+            return _check_int64(lhs + rhs)
+        elif expr.op == '-':
+            return _check_int64(lhs - rhs)
+        elif expr.op == '*':
+            return _check_int64(lhs * rhs)
+        if rhs == 0:
+            raise EvaluationError('Division by zero')
+        # The generated code uses the C++ operators, that round towards zero (unlike Python's // and %).
+        quotient = abs(lhs) // abs(rhs)
+        if (lhs < 0) != (rhs < 0):
+            quotient = -quotient
+        if expr.op == '//':
+            return _check_int64(quotient)
+        elif expr.op == '%':
+            return lhs - rhs * quotient
+        else:
+            raise NotImplementedError('Unexpected int binary operator: %s' % expr.op)
+
+    def parse_type_patterns(self, match_case: ir2.MatchCase):
+        return tuple(_TypeParser(type_pattern, match_case.matched_var_names).parse()
+                     for type_pattern in match_case.type_patterns)
+
+    def eval_match_expr(self, expr: ir2.MatchExpr, env: Dict[str, Value]):
+        matched_values = [self.get_value(var, env) for var in expr.matched_vars]
+        for value in matched_values:
+            if not isinstance(value, TypeValue):
+                raise UnsupportedConstructError('Unsupported value in match(): %s' % repr(value))
+        matched_types = tuple(value.type for value in matched_values)
+
+        matching_cases = []
+        for match_case in expr.match_cases:
+            patterns = self.parse_type_patterns(match_case)
+            bindings = dict()
+            if all(_match_type(pattern, type, bindings)
+                   for pattern, type in zip(patterns, matched_types)):
+                matching_cases.append((match_case, patterns, bindings))
+
+        if not matching_cases:
+            raise EvaluationError('No match for the types (%s) in the match expression'
+                                  % ', '.join(str(value) for value in matched_values))
+
+        # As with C++ partial specializations, the most specialized case is selected: the one whose patterns are
+        # matched by the patterns of all the other matching cases.
+        def is_at_least_as_specialized(patterns1, patterns2):
+            # The placeholders in patterns1 become distinct types, so that they can only be matched by placeholders in
+            # patterns2.
+            types1 = [_substitute(pattern, _UniqueTypesForPlaceholders())
+                      for pattern in patterns1]
+            bindings = dict()
+            return all(_match_type(pattern2, type1, bindings)
+                       for pattern2, type1 in zip(patterns2, types1))
+        selected_cases = [(match_case, bindings)
+                          for match_case, patterns, bindings in matching_cases
+                          if all(is_at_least_as_specialized(patterns, other_patterns)
+                                 for _, other_patterns, _ in matching_cases)]
+        if len(selected_cases) != 1:
+            raise EvaluationError('Ambiguous match for the types (%s) in the match expression'
+                                  % ', '.join(str(value) for value in matched_values))
+        [(match_case, bindings)] = selected_cases
+
+        case_env = dict(env)
+        for var_name in match_case.matched_var_names:
+            case_env[var_name] = TypeValue(bindings[var_name])
+        return self.eval_expr(match_case.expr, case_env)
+
+    def eval_list_comprehension_expr(self, expr: ir2.ListComprehensionExpr, env: Dict[str, Value]):
+        results = []
+        first_error = _NO_ERROR
+        # The generated code instantiates the function for all elements, even after one of them raised an exception.
+        for elem in self.get_value(expr.list_var, env):
+            elem_env = dict(env)
+            elem_env[expr.loop_var.name] = elem
+            result, error = self.eval_expr(expr.result_elem_expr, elem_env)
+            results.append(result)
+            if _is_error(error) and not _is_error(first_error):
+                first_error = error
+        return tuple(results), first_error
+
+class _UniqueTypesForPlaceholders(dict):
+    def __missing__(self, placeholder_name):
+        # The '$' ensures that this can't be the name of any type in the source.
+        return ('name', '$' + placeholder_name)
+
+def interpret_module(module: ir2.Module) -> Dict[str, Value]:
+    '''Evaluates the toplevel assignments and assertions of a module, in order.
+
+    Returns the values of the toplevel variables, e.g. to compare the results of two versions of the same module.
+
+    Raises EvaluationError if the evaluation fails (i.e. if the code generated for the module would not compile), or
+    UnsupportedConstructError if the module uses something that the interpreter doesn't support.
+    '''
+    try:
+        return _Interpreter(module).run()
+    except RecursionError:
+        raise UnsupportedConstructError('The recursion is too deep for the interpreter')
@@ -16,8 +16,10 @@ from _py2tmp import ir0
 from _py2tmp import ir1
 from _py2tmp import ir2
 from _py2tmp import ir1_to_ir0
+from _py2tmp import utils
 
-from typing import List, Iterator, Optional
+from typing import List, Optional, Iterable, Union
+from contextlib import contextmanager
 
 class Writer:
     def new_id(self) -> str: ...  # pragma: no cover
@@ -26,9 +28,15 @@ class Writer:
 
     def get_fun_writer(self) -> 'FunWriter': ...  # pragma: no cover
 
+    def source_line(self, source_line: Optional[int]):
+        return self.get_fun_writer().source_line(source_line)
+
 class FunWriter(Writer):
-    def __init__(self, identifier_generator: Iterator[str]):
+    def __init__(self, identifier_generator: utils.IdentifierGenerator):
         self.identifier_generator = identifier_generator
+        # The line of the TMPPy source of the IR2 element being converted, used for the source_line of the generated
+        # IR1.
+        self.current_source_line = None  # type: Optional[int]
         self.elems = []  # type: List[ir1.Union[ir1.FunctionDefn, ir1.Assignment, ir1.Assert, ir1.CustomType, ir1.CheckIfErrorDefn, ir1.UnpackingAssignment]]
 
     def new_id(self):
@@ -41,8 +49,27 @@ class FunWriter(Writer):
                                 is_function_that_may_throw=isinstance(type, ir1.FunctionType))
 
     def write(self, elem: ir1.Union[ir1.FunctionDefn, ir1.Assignment, ir1.Assert, ir1.CustomType, ir1.CheckIfErrorDefn, ir1.UnpackingAssignment]):
+        self.set_source_line_if_missing(elem)
         self.elems.append(elem)
 
+    def set_source_line_if_missing(self, elem: ir1.Union[ir1.FunctionDefn, ir1.CustomType, ir1.CheckIfErrorDefn, ir1.Stmt]):
+        if isinstance(elem, (ir1.FunctionDefn, ir1.Stmt)) and elem.source_line is None:
+            elem.source_line = self.current_source_line
+
+    @contextmanager
+    def source_line(self, source_line: Optional[int]):
+        previous_source_line = self.current_source_line
+        self.current_source_line = source_line
+        try:
+            yield
+        finally:
+            self.current_source_line = previous_source_line
+
+    def take_elems(self):
+        elems = self.elems
+        self.elems = []
+        return elems
+
     def get_fun_writer(self):
         return self
 
@@ -56,6 +83,7 @@ class StmtWriter(Writer):
 
     def write(self, elem: ir1.Union[ir1.FunctionDefn, ir1.CustomType, ir1.CheckIfErrorDefn, ir1.Stmt]):
         if isinstance(elem, ir1.Stmt):
+            self.fun_writer.set_source_line_if_missing(elem)
             self.stmts.append(elem)
         else:
             self.fun_writer.write(elem)
@@ -129,8 +157,18 @@ def expr_to_ir1(expr: ir2.Expr) -> ir1.Expr:
         return bool_list_any_expr_to_ir1(expr)
     elif isinstance(expr, ir2.IntBinaryOpExpr):
         return int_binary_op_expr_to_ir1(expr)
+    elif isinstance(expr, ir2.IntRangeExpr):
+        return int_range_expr_to_ir1(expr)
+    elif isinstance(expr, ir2.ListLenExpr):
+        return list_len_expr_to_ir1(expr)
+    elif isinstance(expr, ir2.ListIndexExpr):
+        return list_index_expr_to_ir1(expr)
+    elif isinstance(expr, ir2.IsInListExpr):
+        return is_in_list_expr_to_ir1(expr)
     elif isinstance(expr, ir2.ListConcatExpr):
         return list_concat_expr_to_ir1(expr)
+    elif isinstance(expr, ir2.ListConcatAllExpr):
+        return list_concat_all_expr_to_ir1(expr)
     elif isinstance(expr, ir2.ListComprehensionExpr):
         return list_comprehension_expr_to_ir1(expr)
     elif isinstance(expr, ir2.IsInstanceExpr):
@@ -275,6 +313,110 @@ def int_binary_op_expr_to_ir1(expr: ir2.IntBinaryOpExpr):
                                rhs=var_reference_to_ir1(expr.rhs),
                                op=expr.op)
 
+def int_range_expr_to_ir1(expr: ir2.IntRangeExpr):
+    # range(begin, end)
+    #
+    # Becomes:
+    #
+    # Int64ListRange<begin, end>::type
+
+    template_instantiation = ir1.TemplateInstantiation(template_name='Int64ListRange',
+                                                       args=[var_reference_to_ir1(expr.begin),
+                                                             var_reference_to_ir1(expr.end)],
+                                                       instantiation_might_trigger_static_asserts=False)
+
+    return ir1.ClassMemberAccess(class_type_expr=template_instantiation,
+                                 member_name='type',
+                                 member_type=ir1.TypeType())
+
+def list_len_expr_to_ir1(expr: ir2.ListLenExpr):
+    # len(l)
+    #
+    # Becomes (if l is a list of ints):
+    #
+    # Int64ListSize<l>::value
+
+    elem_kind = ir1_to_ir0.type_to_ir0(type_to_ir1(expr.var.type.elem_type)).kind
+    if elem_kind == ir0.ExprKind.BOOL:
+        template_name = 'BoolListSize'
+    elif elem_kind == ir0.ExprKind.INT64:
+        template_name = 'Int64ListSize'
+    elif elem_kind == ir0.ExprKind.TYPE:
+        template_name = 'TypeListSize'
+    else:
+        raise NotImplementedError('elem_kind: %s' % elem_kind)
+
+    template_instantiation = ir1.TemplateInstantiation(template_name=template_name,
+                                                       args=[var_reference_to_ir1(expr.var)],
+                                                       instantiation_might_trigger_static_asserts=False)
+
+    return ir1.ClassMemberAccess(class_type_expr=template_instantiation,
+                                 member_name='value',
+                                 member_type=ir1.IntType())
+
+def list_index_expr_to_ir1(expr: ir2.ListIndexExpr):
+    # l[i]
+    #
+    # Becomes (if l is a list of ints):
+    #
+    # Int64ListGet<l, i>::value
+    #
+    # Or (if l is a list of types):
+    #
+    # TypeListGet<l, i>::type
+
+    elem_kind = ir1_to_ir0.type_to_ir0(type_to_ir1(expr.type)).kind
+    if elem_kind == ir0.ExprKind.BOOL:
+        template_name = 'BoolListGet'
+        member_name = 'value'
+    elif elem_kind == ir0.ExprKind.INT64:
+        template_name = 'Int64ListGet'
+        member_name = 'value'
+    elif elem_kind == ir0.ExprKind.TYPE:
+        template_name = 'TypeListGet'
+        member_name = 'type'
+    else:
+        raise NotImplementedError('elem_kind: %s' % elem_kind)
+
+    # This static_asserts if the index is out of range.
+    template_instantiation = ir1.TemplateInstantiation(template_name=template_name,
+                                                       args=[var_reference_to_ir1(expr.list_var),
+                                                             var_reference_to_ir1(expr.index_var)],
+                                                       instantiation_might_trigger_static_asserts=True)
+
+    return ir1.ClassMemberAccess(class_type_expr=template_instantiation,
+                                 member_name=member_name,
+                                 member_type=type_to_ir1(expr.type))
+
+def is_in_list_expr_to_ir1(expr: ir2.IsInListExpr):
+    # x in l
+    #
+    # Becomes (if l is a list of ints):
+    #
+    # IsInInt64Set<l, x>::value
+    #
+    # Sets have the same representation as lists (they're just lists without duplicates), so the IsIn*Set templates
+    # can be used for lists too.
+
+    elem_kind = ir1_to_ir0.type_to_ir0(type_to_ir1(expr.elem_var.type)).kind
+    if elem_kind == ir0.ExprKind.BOOL:
+        template_name = 'IsInBoolSet'
+    elif elem_kind == ir0.ExprKind.INT64:
+        template_name = 'IsInInt64Set'
+    elif elem_kind == ir0.ExprKind.TYPE:
+        template_name = 'IsInTypeSet'
+    else:
+        raise NotImplementedError('elem_kind: %s' % elem_kind)
+
+    template_instantiation = ir1.TemplateInstantiation(template_name=template_name,
+                                                       args=[var_reference_to_ir1(expr.list_var),
+                                                             var_reference_to_ir1(expr.elem_var)],
+                                                       instantiation_might_trigger_static_asserts=False)
+
+    return ir1.ClassMemberAccess(class_type_expr=template_instantiation,
+                                 member_name='value',
+                                 member_type=ir1.BoolType())
+
 def list_concat_expr_to_ir1(expr: ir2.ListConcatExpr):
     # l1 + l2
     #
@@ -301,6 +443,31 @@ def list_concat_expr_to_ir1(expr: ir2.ListConcatExpr):
                                  member_name='type',
                                  member_type=ir1.TypeType())
 
+def list_concat_all_expr_to_ir1(expr: ir2.ListConcatAllExpr):
+    # concat_all(l)
+    #
+    # Becomes (if l is a list of lists of ints):
+    #
+    # Int64ListConcatAll<l>::type
+
+    elem_kind = ir1_to_ir0.type_to_ir0(type_to_ir1(expr.type.elem_type)).kind
+    if elem_kind == ir0.ExprKind.BOOL:
+        list_concat_all_template_name = 'BoolListConcatAll'
+    elif elem_kind == ir0.ExprKind.INT64:
+        list_concat_all_template_name = 'Int64ListConcatAll'
+    elif elem_kind == ir0.ExprKind.TYPE:
+        list_concat_all_template_name = 'TypeListConcatAll'
+    else:
+        raise NotImplementedError('elem_kind: %s' % elem_kind)
+
+    template_instantiation = ir1.TemplateInstantiation(template_name=list_concat_all_template_name,
+                                                       args=[var_reference_to_ir1(expr.var)],
+                                                       instantiation_might_trigger_static_asserts=False)
+
+    return ir1.ClassMemberAccess(class_type_expr=template_instantiation,
+                                 member_name='type',
+                                 member_type=ir1.TypeType())
+
 def list_comprehension_expr_to_ir1(expr: ir2.ListComprehensionExpr):
     return ir1.ListComprehensionExpr(list_var=var_reference_to_ir1(expr.list_var),
                                      loop_var=var_reference_to_ir1(expr.loop_var),
@@ -334,7 +501,8 @@ def set_to_list_expr_to_ir1(expr: ir2.SetToListExpr):
 
 def assert_to_ir1(assert_stmt: ir2.Assert, writer: Writer):
     writer.write(ir1.Assert(var=var_reference_to_ir1(assert_stmt.var),
-                            message=assert_stmt.message))
+                            message=assert_stmt.message,
+                            scope_name=assert_stmt.scope_name))
 
 def assignment_to_ir1(assignment: ir2.Assignment, writer: Writer):
     writer.write(ir1.Assignment(lhs=var_reference_to_ir1(assignment.lhs),
@@ -368,18 +536,19 @@ def check_if_error_defn_to_ir1(toplevel_elem: ir2.CheckIfErrorDefn, writer: Writ
 
 def stmts_to_ir1(stmts: List[ir2.Stmt], writer: StmtWriter):
     for index, stmt in enumerate(stmts):
-        if isinstance(stmt, ir2.IfStmt):
-            if_stmt_to_ir1(stmt, writer)
-        elif isinstance(stmt, ir2.Assignment):
-            assignment_to_ir1(stmt, writer)
-        elif isinstance(stmt, ir2.UnpackingAssignment):
-            unpacking_assignment_to_ir1(stmt, writer)
-        elif isinstance(stmt, ir2.ReturnStmt):
-            return_stmt_to_ir1(stmt, writer)
-        elif isinstance(stmt, ir2.Assert):
-            assert_to_ir1(stmt, writer)
-        else:
-            raise NotImplementedError('Unexpected statement: %s' % str(stmt.__class__))
+        with writer.source_line(stmt.source_line):
+            if isinstance(stmt, ir2.IfStmt):
+                if_stmt_to_ir1(stmt, writer)
+            elif isinstance(stmt, ir2.Assignment):
+                assignment_to_ir1(stmt, writer)
+            elif isinstance(stmt, ir2.UnpackingAssignment):
+                unpacking_assignment_to_ir1(stmt, writer)
+            elif isinstance(stmt, ir2.ReturnStmt):
+                return_stmt_to_ir1(stmt, writer)
+            elif isinstance(stmt, ir2.Assert):
+                assert_to_ir1(stmt, writer)
+            else:
+                raise NotImplementedError('Unexpected statement: %s' % str(stmt.__class__))
 
 def function_defn_to_ir1(function_defn: ir2.FunctionDefn, writer: FunWriter):
     return_type = type_to_ir1(function_defn.return_type)
@@ -394,20 +563,30 @@ def function_defn_to_ir1(function_defn: ir2.FunctionDefn, writer: FunWriter):
                                   body=stmt_writer.stmts,
                                   return_type=return_type))
 
-def module_to_ir1(module: ir2.Module, identifier_generator: Iterator[str]):
+def module_to_ir1(module: ir2.Module, identifier_generator: utils.IdentifierGenerator):
+    return ir1.Module(body=list(toplevel_elems_to_ir1(module.body, identifier_generator)))
+
+def toplevel_elems_to_ir1(toplevel_elems: Iterable[Union[ir2.FunctionDefn, ir2.Assignment, ir2.Assert, ir2.CustomType, ir2.CheckIfErrorDefn]],
+                          identifier_generator: utils.IdentifierGenerator):
+    '''Converts the toplevel elements of a module to IR1, yielding the IR1 elements generated for each one in turn.'''
     writer = FunWriter(identifier_generator)
-    for toplevel_elem in module.body:
+    for toplevel_elem in toplevel_elems:
         if isinstance(toplevel_elem, ir2.FunctionDefn):
-            function_defn_to_ir1(toplevel_elem, writer)
+            with identifier_generator.scope('ir2_to_ir1', 'function', toplevel_elem.name), \
+                    writer.source_line(toplevel_elem.source_line):
+                function_defn_to_ir1(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir2.Assignment):
-            assignment_to_ir1(toplevel_elem, writer)
+            with identifier_generator.scope('ir2_to_ir1', 'assignment', toplevel_elem.lhs.name), \
+                    writer.source_line(toplevel_elem.source_line):
+                assignment_to_ir1(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir2.Assert):
-            assert_to_ir1(toplevel_elem, writer)
+            with identifier_generator.scope('ir2_to_ir1', 'assertion', toplevel_elem.scope_name), \
+                    writer.source_line(toplevel_elem.source_line):
+                assert_to_ir1(toplevel_elem, writer)
         elif isinstance(toplevel_elem, ir2.CustomType):
             writer.write(custom_type_to_ir1(toplevel_elem))
         elif isinstance(toplevel_elem, ir2.CheckIfErrorDefn):
             check_if_error_defn_to_ir1(toplevel_elem, writer)
         else:
             raise NotImplementedError('Unexpected toplevel element: %s' % str(toplevel_elem.__class__))
-
-    return ir1.Module(body=writer.elems)
+        yield from writer.take_elems()
@@ -406,6 +406,55 @@ class IntBinaryOpExpr(Expr):
             for var in expr.get_free_variables():
                 yield var
 
+class IntRangeExpr(Expr):
+    def __init__(self, begin_expr: Expr, end_expr: Expr):
+        assert begin_expr.type == IntType()
+        assert end_expr.type == IntType()
+        super().__init__(type=ListType(IntType()))
+        self.begin_expr = begin_expr
+        self.end_expr = end_expr
+
+    def get_free_variables(self):
+        for expr in (self.begin_expr, self.end_expr):
+            for var in expr.get_free_variables():
+                yield var
+
+class ListLenExpr(Expr):
+    def __init__(self, list_expr: Expr):
+        assert isinstance(list_expr.type, ListType)
+        super().__init__(type=IntType())
+        self.list_expr = list_expr
+
+    def get_free_variables(self):
+        for var in self.list_expr.get_free_variables():
+            yield var
+
+class ListIndexExpr(Expr):
+    def __init__(self, list_expr: Expr, index_expr: Expr):
+        assert isinstance(list_expr.type, ListType)
+        assert index_expr.type == IntType()
+        super().__init__(type=list_expr.type.elem_type)
+        self.list_expr = list_expr
+        self.index_expr = index_expr
+
+    def get_free_variables(self):
+        for expr in (self.list_expr, self.index_expr):
+            for var in expr.get_free_variables():
+                yield var
+
+class IsInListExpr(Expr):
+    def __init__(self, elem_expr: Expr, list_expr: Expr):
+        assert isinstance(list_expr.type, ListType)
+        assert elem_expr.type == list_expr.type.elem_type
+        super().__init__(type=BoolType())
+        self.elem_expr = elem_expr
+        self.list_expr = list_expr
+
+    def get_free_variables(self):
+        for expr in (self.elem_expr, self.list_expr):
+            for var in expr.get_free_variables():
+                yield var
+
 class ListConcatExpr(Expr):
     def __init__(self, lhs: Expr, rhs: Expr):
         assert isinstance(lhs.type, ListType)
@@ -423,36 +472,46 @@ class ListComprehension(Expr):
     def __init__(self,
                  list_expr: Expr,
                  loop_var: VarReference,
-                 result_elem_expr: Expr):
+                 result_elem_expr: Expr,
+                 condition_expr: Optional[Expr] = None):
+        assert condition_expr is None or condition_expr.type == BoolType()
         super().__init__(type=ListType(result_elem_expr.type))
         self.list_expr = list_expr
         self.loop_var = loop_var
         self.result_elem_expr = result_elem_expr
+        self.condition_expr = condition_expr
 
     def get_free_variables(self):
         for var in self.list_expr.get_free_variables():
             yield var
-        for var in self.result_elem_expr.get_free_variables():
-            if var.name != self.loop_var.name:
-                yield var
+        for expr in (self.result_elem_expr, self.condition_expr):
+            if expr is not None:
+                for var in expr.get_free_variables():
+                    if var.name != self.loop_var.name:
+                        yield var
 
 class SetComprehension(Expr):
     def __init__(self,
                  set_expr: Expr,
                  loop_var: VarReference,
-                 result_elem_expr: Expr):
+                 result_elem_expr: Expr,
+                 condition_expr: Optional[Expr] = None):
         assert isinstance(set_expr.type, SetType)
+        assert condition_expr is None or condition_expr.type == BoolType()
         super().__init__(type=SetType(result_elem_expr.type))
         self.set_expr = set_expr
         self.loop_var = loop_var
         self.result_elem_expr = result_elem_expr
+        self.condition_expr = condition_expr
 
     def get_free_variables(self):
         for var in self.set_expr.get_free_variables():
             yield var
-        for var in self.result_elem_expr.get_free_variables():
-            if var.name != self.loop_var.name:
-                yield var
+        for expr in (self.result_elem_expr, self.condition_expr):
+            if expr is not None:
+                for var in expr.get_free_variables():
+                    if var.name != self.loop_var.name:
+                        yield var
 
 class ReturnTypeInfo:
     def __init__(self, type: Optional[ExprType], always_returns: bool):
@@ -462,28 +521,35 @@ class ReturnTypeInfo:
         self.always_returns = always_returns
 
 class Stmt:
+    # Each statement has a `source_line` field, with the line of the TMPPy source where it's defined.
+
     def get_return_type(self) -> ReturnTypeInfo: ...  # pragma: no cover
 
 class Assert(Stmt):
-    def __init__(self, expr: Expr, message: str):
+    def __init__(self, expr: Expr, message: str, source_line: int, scope_name: Optional[str] = None):
         assert isinstance(expr.type, BoolType)
         self.expr = expr
         self.message = message
+        self.source_line = source_line
+        # For toplevel assertions, the name of the scope of the identifiers generated for the assertion (in all the
+        # conversion stages): its source text, followed by its index among the toplevel assertions with that text.
+        self.scope_name = scope_name
 
     def get_return_type(self):
         return ReturnTypeInfo(type=None, always_returns=False)
 
 class Assignment(Stmt):
-    def __init__(self, lhs: VarReference, rhs: Expr):
+    def __init__(self, lhs: VarReference, rhs: Expr, source_line: int):
         assert lhs.type == rhs.type
         self.lhs = lhs
         self.rhs = rhs
+        self.source_line = source_line
 
     def get_return_type(self):
         return ReturnTypeInfo(type=None, always_returns=False)
 
 class UnpackingAssignment(Stmt):
-    def __init__(self, lhs_list: List[VarReference], rhs: Expr, error_message: str):
+    def __init__(self, lhs_list: List[VarReference], rhs: Expr, error_message: str, source_line: int):
         assert isinstance(rhs.type, ListType)
         assert lhs_list
         for lhs in lhs_list:
@@ -491,13 +557,15 @@ class UnpackingAssignment(Stmt):
         self.lhs_list = lhs_list
         self.rhs = rhs
         self.error_message = error_message
+        self.source_line = source_line
 
     def get_return_type(self):
         return ReturnTypeInfo(type=None, always_returns=False)
 
 class ReturnStmt(Stmt):
-    def __init__(self, expr: Expr):
+    def __init__(self, expr: Expr, source_line: int):
         self.expr = expr
+        self.source_line = source_line
 
     def get_return_type(self):
         return ReturnTypeInfo(type=self.expr.type, always_returns=True)
@@ -520,21 +588,23 @@ def _combine_return_type_of_branches(branch1_stmts: List[Stmt], branch2_stmts: L
                           always_returns=branch1_return_type_info.always_returns and branch2_return_type_info.always_returns)
 
 class IfStmt(Stmt):
-    def __init__(self, cond_expr: Expr, if_stmts: List[Stmt], else_stmts: List[Stmt]):
+    def __init__(self, cond_expr: Expr, if_stmts: List[Stmt], else_stmts: List[Stmt], source_line: int):
         assert cond_expr.type == BoolType()
         assert if_stmts
         self.cond_expr = cond_expr
         self.if_stmts = if_stmts
         self.else_stmts = else_stmts
+        self.source_line = source_line
 
     def get_return_type(self):
         return _combine_return_type_of_branches(self.if_stmts, self.else_stmts)
 
 class RaiseStmt(Stmt):
-    def __init__(self, expr: Expr):
+    def __init__(self, expr: Expr, source_line: int):
         assert isinstance(expr.type, CustomType)
         assert expr.type.is_exception_class
         self.expr = expr
+        self.source_line = source_line
 
     def get_return_type(self):
         return ReturnTypeInfo(type=None, always_returns=True)
@@ -544,11 +614,13 @@ class TryExcept(Stmt):
                  try_body: List[Stmt],
                  caught_exception_type: ExprType,
                  caught_exception_name: str,
-                 except_body: List[Stmt]):
+                 except_body: List[Stmt],
+                 source_line: int):
         self.try_body = try_body
         self.caught_exception_type = caught_exception_type
         self.caught_exception_name = caught_exception_name
         self.except_body = except_body
+        self.source_line = source_line
 
     def get_return_type(self):
         return _combine_return_type_of_branches(self.try_body, self.except_body)
@@ -558,11 +630,13 @@ class FunctionDefn:
                  name: str,
                  args: List[FunctionArgDecl],
                  body: List[Stmt],
-                 return_type: ExprType):
+                 return_type: ExprType,
+                 source_line: int):
         self.name = name
         self.args = args
         self.body = body
         self.return_type = return_type
+        self.source_line = source_line
 
 class Module:
     def __init__(self,
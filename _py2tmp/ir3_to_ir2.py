@@ -12,26 +12,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
 from _py2tmp import ir2
 from _py2tmp import ir3
 from _py2tmp import utils
-from typing import List, Iterator, Optional, Dict
+from typing import List, Optional, Dict
 from contextlib import contextmanager
 
 class FunWriter:
-    def __init__(self, identifier_generator: Iterator[str]):
+    def __init__(self, identifier_generator: utils.IdentifierGenerator):
         self.identifier_generator = identifier_generator
-        self.is_error_fun_ref = self.new_var(ir2.FunctionType(argtypes=[ir2.ErrorOrVoidType()],
-                                                              returns=ir2.BoolType()),
-                                             is_global_function=True)
-        self.function_defns = [self._create_is_error_fun_defn()]
-        self.obfuscated_identifiers_by_identifier = defaultdict(lambda: self.new_id())  # type: Dict[str, str]
+        # The line of the TMPPy statement (or function) being converted, used for the source_line of the generated IR2.
+        self.current_source_line = None  # type: Optional[int]
+        with identifier_generator.scope('ir3_to_ir2', 'is_error'):
+            self.is_error_fun_ref = self.new_var(ir2.FunctionType(argtypes=[ir2.ErrorOrVoidType()],
+                                                                  returns=ir2.BoolType()),
+                                                 is_global_function=True)
+            self.function_defns = [self._create_is_error_fun_defn()]
+        self.obfuscated_identifiers_by_identifier = dict()  # type: Dict[str, str]
 
     def new_id(self):
         return next(self.identifier_generator)
 
     def obfuscate_identifier(self, identifier: str):
+        # The obfuscated identifier only depends on the identifier, not on where it's first used.
+        if identifier not in self.obfuscated_identifiers_by_identifier:
+            self.obfuscated_identifiers_by_identifier[identifier] = self.identifier_generator.identifier_for_origin(
+                'ir3_to_ir2/identifier/' + identifier)
         return self.obfuscated_identifiers_by_identifier[identifier]
 
     def new_var(self, type: ir2.ExprType, is_global_function: bool = False):
@@ -41,8 +47,24 @@ class FunWriter:
                                 is_function_that_may_throw=isinstance(type, ir2.FunctionType))
 
     def write_function(self, fun_defn: ir2.FunctionDefn):
+        if fun_defn.source_line is None:
+            fun_defn.source_line = self.current_source_line
         self.function_defns.append(fun_defn)
 
+    @contextmanager
+    def source_line(self, source_line: int):
+        previous_source_line = self.current_source_line
+        self.current_source_line = source_line
+        try:
+            yield
+        finally:
+            self.current_source_line = previous_source_line
+
+    def take_function_defns(self):
+        function_defns = self.function_defns
+        self.function_defns = []
+        return function_defns
+
     def _create_is_error_fun_defn(self):
         # def is_error(x: ErrorOrVoid):
         #   v = Type('void')
@@ -85,8 +107,18 @@ class StmtWriter:
         self.fun_writer.write_function(fun_defn)
 
     def write_stmt(self, stmt: ir2.Stmt):
+        if stmt.source_line is None:
+            stmt.source_line = self.fun_writer.current_source_line
         self.stmts.append(stmt)
 
+    def source_line(self, source_line: int):
+        return self.fun_writer.source_line(source_line)
+
+    def take_stmts(self):
+        stmts = self.stmts
+        self.stmts = []
+        return stmts
+
     def new_id(self):
         return self.fun_writer.new_id()
 
@@ -238,6 +270,14 @@ def expr_to_ir2(expr: ir3.Expr, writer: StmtWriter) -> ir2.VarReference:
         return int_comparison_expr_to_ir2(expr, writer)
     elif isinstance(expr, ir3.IntBinaryOpExpr):
         return int_binary_op_expr_to_ir2(expr, writer)
+    elif isinstance(expr, ir3.IntRangeExpr):
+        return int_range_expr_to_ir2(expr, writer)
+    elif isinstance(expr, ir3.ListLenExpr):
+        return list_len_expr_to_ir2(expr, writer)
+    elif isinstance(expr, ir3.ListIndexExpr):
+        return list_index_expr_to_ir2(expr, writer)
+    elif isinstance(expr, ir3.IsInListExpr):
+        return is_in_list_expr_to_ir2(expr, writer)
     elif isinstance(expr, ir3.ListConcatExpr):
         return list_concat_expr_to_ir2(expr, writer)
     elif isinstance(expr, ir3.ListComprehension):
@@ -427,6 +467,21 @@ def int_binary_op_expr_to_ir2(expr: ir3.IntBinaryOpExpr, writer: StmtWriter):
                                                        rhs=expr_to_ir2(expr.rhs, writer),
                                                        op=expr.op))
 
+def int_range_expr_to_ir2(expr: ir3.IntRangeExpr, writer: StmtWriter):
+    return writer.new_var_for_expr(ir2.IntRangeExpr(begin=expr_to_ir2(expr.begin_expr, writer),
+                                                    end=expr_to_ir2(expr.end_expr, writer)))
+
+def list_len_expr_to_ir2(expr: ir3.ListLenExpr, writer: StmtWriter):
+    return writer.new_var_for_expr(ir2.ListLenExpr(expr_to_ir2(expr.list_expr, writer)))
+
+def list_index_expr_to_ir2(expr: ir3.ListIndexExpr, writer: StmtWriter):
+    return writer.new_var_for_expr(ir2.ListIndexExpr(list_var=expr_to_ir2(expr.list_expr, writer),
+                                                     index_var=expr_to_ir2(expr.index_expr, writer)))
+
+def is_in_list_expr_to_ir2(expr: ir3.IsInListExpr, writer: StmtWriter):
+    return writer.new_var_for_expr(ir2.IsInListExpr(elem_var=expr_to_ir2(expr.elem_expr, writer),
+                                                    list_var=expr_to_ir2(expr.list_expr, writer)))
+
 def list_concat_expr_to_ir2(expr: ir3.ListConcatExpr, writer: StmtWriter):
     return writer.new_var_for_expr(ir2.ListConcatExpr(lhs=expr_to_ir2(expr.lhs, writer),
                                                       rhs=expr_to_ir2(expr.rhs, writer)))
@@ -434,6 +489,7 @@ def list_concat_expr_to_ir2(expr: ir3.ListConcatExpr, writer: StmtWriter):
 def deconstructed_list_comprehension_expr_to_ir2(list_var: ir3.VarReference,
                                                  loop_var: ir2.VarReference,
                                                  result_elem_expr: ir2.Expr,
+                                                 condition_expr: Optional[ir3.Expr],
                                                  writer: StmtWriter):
     # [f(x, y) * 2
     #  for x in l]
@@ -445,12 +501,57 @@ def deconstructed_list_comprehension_expr_to_ir2(list_var: ir3.VarReference,
     #
     # [g(x, y)
     #  for x in l]
+    #
+    # While:
+    #
+    # [f(x, y) * 2
+    #  for x in l
+    #  if h(x, y)]
+    #
+    # Becomes:
+    #
+    # def g(x, y):
+    #   b = h(x, y)
+    #   if b:
+    #     return [f(x, y) * 2]  # (in fact, this will be converted further)
+    #   else:
+    #     return []
+    #
+    # l2 = [g(x, y)
+    #       for x in l]
+    # concat_all(l2)
+    #
+    # So that all elements are still computed in a single list comprehension, instead of recursing on the list.
 
     result_elem_type = type_to_ir2(result_elem_expr.type)
+    if condition_expr is None:
+        helper_fun_return_type = result_elem_type
+    else:
+        helper_fun_return_type = ir2.ListType(result_elem_type)
     helper_fun_writer = StmtWriter(writer.fun_writer,
-                                   current_fun_return_type=result_elem_type)
-    helper_fun_writer.write_stmt(ir2.ReturnStmt(result=expr_to_ir2(result_elem_expr, helper_fun_writer),
-                                                error=None))
+                                   current_fun_return_type=helper_fun_return_type)
+    if condition_expr is None:
+        helper_fun_writer.write_stmt(ir2.ReturnStmt(result=expr_to_ir2(result_elem_expr, helper_fun_writer),
+                                                    error=None))
+    else:
+        cond_var = expr_to_ir2(condition_expr, helper_fun_writer)
+
+        if_branch_writer = StmtWriter(writer.fun_writer,
+                                      current_fun_return_type=helper_fun_return_type)
+        elem_var = expr_to_ir2(result_elem_expr, if_branch_writer)
+        singleton_list_var = if_branch_writer.new_var_for_expr(ir2.ListExpr(elem_type=result_elem_type,
+                                                                            elems=[elem_var]))
+        if_branch_writer.write_stmt(ir2.ReturnStmt(result=singleton_list_var, error=None))
+
+        else_branch_writer = StmtWriter(writer.fun_writer,
+                                        current_fun_return_type=helper_fun_return_type)
+        empty_list_var = else_branch_writer.new_var_for_expr(ir2.ListExpr(elem_type=result_elem_type,
+                                                                          elems=[]))
+        else_branch_writer.write_stmt(ir2.ReturnStmt(result=empty_list_var, error=None))
+
+        helper_fun_writer.write_stmt(ir2.IfStmt(cond=cond_var,
+                                                if_stmts=if_branch_writer.stmts,
+                                                else_stmts=else_branch_writer.stmts))
     forwarded_vars = ir2.get_unique_free_variables_in_stmts(helper_fun_writer.stmts)
     helper_fun_name = writer.new_id()
     writer.write_function(ir2.FunctionDefn(name=helper_fun_name,
@@ -458,18 +559,22 @@ def deconstructed_list_comprehension_expr_to_ir2(list_var: ir3.VarReference,
                                            args=[ir2.FunctionArgDecl(type=var.type, name=var.name)
                                                  for var in forwarded_vars],
                                            body=helper_fun_writer.stmts,
-                                           return_type=result_elem_type))
+                                           return_type=helper_fun_return_type))
 
     helper_fun_call = ir2.FunctionCall(fun=ir2.VarReference(name=helper_fun_name,
                                                             type=ir2.FunctionType(argtypes=[var.type
                                                                                             for var in forwarded_vars],
-                                                                                  returns=result_elem_type),
+                                                                                  returns=helper_fun_return_type),
                                                             is_global_function=True,
                                                             is_function_that_may_throw=True),
                                        args=forwarded_vars)
-    return writer.new_var_for_expr_with_error_checking(ir2.ListComprehensionExpr(list_var=list_var,
-                                                                                 loop_var=var_reference_to_ir2(loop_var, writer),
-                                                                                 result_elem_expr=helper_fun_call))
+    result_var = writer.new_var_for_expr_with_error_checking(ir2.ListComprehensionExpr(list_var=list_var,
+                                                                                       loop_var=var_reference_to_ir2(loop_var, writer),
+                                                                                       result_elem_expr=helper_fun_call))
+    if condition_expr is None:
+        return result_var
+    else:
+        return writer.new_var_for_expr(ir2.ListConcatAllExpr(result_var))
 
 
 def list_comprehension_expr_to_ir2(expr: ir3.ListComprehension, writer: StmtWriter):
@@ -478,18 +583,21 @@ def list_comprehension_expr_to_ir2(expr: ir3.ListComprehension, writer: StmtWrit
     return deconstructed_list_comprehension_expr_to_ir2(list_var=l_var,
                                                         loop_var=expr.loop_var,
                                                         result_elem_expr=expr.result_elem_expr,
+                                                        condition_expr=expr.condition_expr,
                                                         writer=writer)
 
 
 def set_comprehension_expr_to_ir2(expr: ir3.SetComprehension, writer: StmtWriter):
     # {f(x, y) * 2
-    #  for x in s}
+    #  for x in s
+    #  if h(x, y)}
     #
     # Becomes:
     #
     # l = set_to_list(s)
     # l2 = [f(x, y) * 2
-    #       for x in l] # (in fact, this will be converted further)
+    #       for x in l
+    #       if h(x, y)] # (in fact, this will be converted further)
     # list_to_set(l2)
 
     s_var = expr_to_ir2(expr.set_expr, writer)
@@ -498,13 +606,15 @@ def set_comprehension_expr_to_ir2(expr: ir3.SetComprehension, writer: StmtWriter
     l2_var = deconstructed_list_comprehension_expr_to_ir2(list_var=l_var,
                                                           loop_var=expr.loop_var,
                                                           result_elem_expr=expr.result_elem_expr,
+                                                          condition_expr=expr.condition_expr,
                                                           writer=writer)
 
     return writer.new_var_for_expr(ir2.ListToSetExpr(l2_var))
 
 def assert_to_ir2(assert_stmt: ir3.Assert, writer: StmtWriter):
     writer.write_stmt(ir2.Assert(var=expr_to_ir2(assert_stmt.expr, writer),
-                                 message=assert_stmt.message))
+                                 message=assert_stmt.message,
+                                 scope_name=assert_stmt.scope_name))
 
 def try_except_stmt_to_ir2(try_except_stmt: ir3.TryExcept,
                           then_stmts: List[ir3.Stmt],
@@ -676,23 +786,24 @@ def if_stmt_to_ir2(if_stmt: ir3.IfStmt, writer: StmtWriter):
 
 def stmts_to_ir2(stmts: List[ir3.Stmt], writer: StmtWriter):
     for index, stmt in enumerate(stmts):
-        if isinstance(stmt, ir3.IfStmt):
-            if_stmt_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.Assignment):
-            assignment_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.UnpackingAssignment):
-            unpacking_assignment_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.ReturnStmt):
-            return_stmt_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.RaiseStmt):
-            raise_stmt_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.Assert):
-            assert_to_ir2(stmt, writer)
-        elif isinstance(stmt, ir3.TryExcept):
-            try_except_stmt_to_ir2(stmt, stmts[index + 1:], writer)
-            return
-        else:
-            raise NotImplementedError('Unexpected statement: %s' % str(stmt.__class__))
+        with writer.source_line(stmt.source_line):
+            if isinstance(stmt, ir3.IfStmt):
+                if_stmt_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.Assignment):
+                assignment_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.UnpackingAssignment):
+                unpacking_assignment_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.ReturnStmt):
+                return_stmt_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.RaiseStmt):
+                raise_stmt_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.Assert):
+                assert_to_ir2(stmt, writer)
+            elif isinstance(stmt, ir3.TryExcept):
+                try_except_stmt_to_ir2(stmt, stmts[index + 1:], writer)
+                return
+            else:
+                raise NotImplementedError('Unexpected statement: %s' % str(stmt.__class__))
 
 def function_defn_to_ir2(function_defn: ir3.FunctionDefn, writer: FunWriter):
     return_type = type_to_ir2(function_defn.return_type)
@@ -707,16 +818,70 @@ def function_defn_to_ir2(function_defn: ir3.FunctionDefn, writer: FunWriter):
                                            body=stmt_writer.stmts,
                                            return_type=return_type))
 
-def module_to_ir2(module: ir3.Module, identifier_generator: Iterator[str]):
+def module_to_ir2(module: ir3.Module,
+                  identifier_generator: utils.IdentifierGenerator,
+                  imported_exception_types: List[ir3.CustomType] = ()):
+    return ir2.Module(body=list(module_to_ir2_toplevel_elems(module, identifier_generator, imported_exception_types)))
+
+def module_to_ir2_toplevel_elems(module: ir3.Module,
+                                 identifier_generator: utils.IdentifierGenerator,
+                                 imported_exception_types: List[ir3.CustomType] = ()):
+    '''Like module_to_ir2, but yields the IR2 toplevel elements as they're generated.
+
+    Each function (and toplevel assertion) is converted only when the elements generated for the previous one have been
+    consumed, so the following stages can process them before that.
+    '''
+    writer = FunWriter(identifier_generator)
+    yield from _module_prologue_to_ir2(module, writer, imported_exception_types)
+    yield from _function_defns_and_assertions_to_ir2(module.function_defns, module.assertions, writer)
+
+def module_prologue_to_ir2(module: ir3.Module,
+                           identifier_generator: utils.IdentifierGenerator,
+                           imported_exception_types: List[ir3.CustomType] = ()):
+    '''Converts the elements of the module that its functions and assertions depend on (e.g. the custom types).
+
+    The functions and assertions can then be converted separately (even in different processes) with
+    function_defns_and_assertions_to_ir2.
+    '''
+    return list(_module_prologue_to_ir2(module, FunWriter(identifier_generator), imported_exception_types))
+
+def function_defns_and_assertions_to_ir2(function_defns: List[ir3.FunctionDefn],
+                                         assertions: List[ir3.Assert],
+                                         identifier_generator: utils.IdentifierGenerator):
+    '''Converts some of the functions and assertions of a module, yielding the IR2 toplevel elements for each in turn.'''
     writer = FunWriter(identifier_generator)
-    for function_defn in module.function_defns:
-        function_defn_to_ir2(function_defn, writer)
+    # The is_error function is part of the module prologue.
+    writer.take_function_defns()
+    yield from _function_defns_and_assertions_to_ir2(function_defns, assertions, writer)
+
+def _module_prologue_to_ir2(module: ir3.Module,
+                            writer: FunWriter,
+                            imported_exception_types: List[ir3.CustomType]):
+    for type in module.custom_types:
+        yield type_to_ir2(type)
+
+    # The exceptions thrown by the imported functions might also reach the toplevel.
+    yield ir2.CheckIfErrorDefn([(type_to_ir2(type), type.exception_message)
+                                for type in list(module.custom_types) + list(imported_exception_types)
+                                if type.is_exception_class])
+
+    # The is_error function.
+    yield from writer.take_function_defns()
+
+def _function_defns_and_assertions_to_ir2(function_defns: List[ir3.FunctionDefn],
+                                          assertions: List[ir3.Assert],
+                                          writer: FunWriter):
+    identifier_generator = writer.identifier_generator
+    for function_defn in function_defns:
+        with identifier_generator.scope('ir3_to_ir2', 'function', function_defn.name), \
+                writer.source_line(function_defn.source_line):
+            function_defn_to_ir2(function_defn, writer)
+        yield from writer.take_function_defns()
 
     stmt_writer = StmtWriter(writer, current_fun_return_type=None)
-    for assertion in module.assertions:
-        assert_to_ir2(assertion, stmt_writer)
-
-    custom_types_defns = [type_to_ir2(type) for type in module.custom_types]
-    check_if_error_defn = ir2.CheckIfErrorDefn([(type_to_ir2(type), type.exception_message)
-                                                for type in module.custom_types if type.is_exception_class])
-    return ir2.Module(body=custom_types_defns + [check_if_error_defn] + writer.function_defns + stmt_writer.stmts)
+    for assertion in assertions:
+        with identifier_generator.scope('ir3_to_ir2', 'assertion', assertion.scope_name), \
+                stmt_writer.source_line(assertion.source_line):
+            assert_to_ir2(assertion, stmt_writer)
+        yield from writer.take_function_defns()
+        yield from stmt_writer.take_stmts()
@@ -0,0 +1,123 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Saving and loading the IR of a module after one of the conversion stages (py2tmp --emit-ir and --from-ir).
+
+IR files are pickles, and unpickling a file can execute arbitrary code. So IR files must be trusted local artifacts,
+written by the same py2tmp (e.g. an earlier step of the same build), and must never be loaded from a shared or remote
+cache or from another untrusted source.
+
+Each file also contains a checksum of its content, computed with the hash of the py2tmp sources as key. A file
+written by a different version of py2tmp (or modified or truncated after it was written) is rejected before
+unpickling. This is not a security boundary, since the py2tmp sources are public: anyone can compute a valid checksum
+for a crafted file.
+'''
+
+import hashlib
+import hmac
+import pickle
+from typing import Dict, List, Tuple, Union
+
+from _py2tmp import ir0
+from _py2tmp import ir1
+from _py2tmp import ir2
+from _py2tmp import ir3
+from _py2tmp import module_interface
+from _py2tmp import utils
+
+# The IRs that a conversion goes through, in order. The conversion can be stopped after any of these stages (saving the
+# IR to a file) and later resumed from there.
+IR_STAGES = ('ir3', 'ir2', 'ir1', 'ir0')
+
+# Saved IR files start with this, so that passing some other file as IR fails with a clear error.
+_MAGIC = b'TMPPyIR\0'
+
+# This must be bumped whenever the format of the IR files (or of any IR) changes, so that IR files written by an older
+# py2tmp are rejected instead of being misinterpreted.
+_FORMAT_VERSION = 7
+
+class IrLoadError(Exception):
+    pass
+
+class IrSnapshot:
+    '''The state of the conversion of a module after one of the IR_STAGES.
+
+    Other than the IR itself, this contains all the module-wide information that the following stages need (e.g. the
+    identifier generator, so that resuming from a snapshot generates exactly the same code as a conversion that
+    wasn't interrupted).
+    '''
+    def __init__(self,
+                 stage: str,
+                 ir: Union[ir3.Module, ir2.Module, ir1.Module, ir0.Header],
+                 identifier_generator: utils.IdentifierGenerator,
+                 filename: str,
+                 module_name: str,
+                 source_hash: str,
+                 function_types_by_name: Dict[str, ir3.FunctionType],
+                 custom_types: List[ir3.CustomType],
+                 imported_modules: List[module_interface.ModuleInterface],
+                 imported_custom_types: List[ir3.CustomType],
+                 custom_type_template_names: Dict[str, module_interface.CustomTypeTemplateNames],
+                 source_lines_by_toplevel_name: Dict[str, int],
+                 assertion_sources_by_scope_name: Dict[str, Tuple[int, str]]):
+        assert stage in IR_STAGES
+        self.stage = stage
+        self.ir = ir
+        self.identifier_generator = identifier_generator
+        self.filename = filename
+        self.module_name = module_name
+        self.source_hash = source_hash
+        # The signatures of the functions and the types defined in the module, needed for its interface.
+        self.function_types_by_name = function_types_by_name
+        self.custom_types = custom_types
+        self.imported_modules = imported_modules
+        self.imported_custom_types = imported_custom_types
+        self.custom_type_template_names = custom_type_template_names
+        # The lines where the functions and the custom types of the module are defined, for source maps.
+        self.source_lines_by_toplevel_name = source_lines_by_toplevel_name
+        # The line and the (first line of the) statement of the module's toplevel assertions, by their scope name (that
+        # the identifiers generated for an assertion are scoped by, see ir3.Assert).
+        self.assertion_sources_by_scope_name = assertion_sources_by_scope_name
+
+def _compute_checksum(payload: bytes) -> bytes:
+    return hmac.new(module_interface.compute_compiler_hash().encode('utf-8'), payload, hashlib.sha256).digest()
+
+def serialize_ir_snapshot(snapshot: IrSnapshot) -> bytes:
+    payload = pickle.dumps((_FORMAT_VERSION, snapshot), protocol=pickle.HIGHEST_PROTOCOL)
+    return _MAGIC + _compute_checksum(payload) + payload
+
+def deserialize_ir_snapshot(content: bytes) -> IrSnapshot:
+    if not content.startswith(_MAGIC):
+        raise IrLoadError('Not a TMPPy IR file.')
+    checksum_end = len(_MAGIC) + hashlib.sha256().digest_size
+    checksum = content[len(_MAGIC):checksum_end]
+    payload = content[checksum_end:]
+    if not hmac.compare_digest(checksum, _compute_checksum(payload)):
+        raise IrLoadError('This TMPPy IR file was written by a different version of py2tmp (or it was modified), it '
+                          'must be regenerated.')
+    try:
+        format_version, snapshot = pickle.loads(payload)
+    except (EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError) as e:
+        raise IrLoadError('Corrupted TMPPy IR file: %s' % e)
+    if format_version != _FORMAT_VERSION or not isinstance(snapshot, IrSnapshot):
+        raise IrLoadError('This TMPPy IR file was written by a different version of py2tmp, it must be regenerated.')
+    return snapshot
+
+def load_ir_snapshot(file_name: str) -> IrSnapshot:
+    with open(file_name, 'rb') as file:
+        content = file.read()
+    try:
+        return deserialize_ir_snapshot(content)
+    except IrLoadError as e:
+        raise IrLoadError('%s: %s' % (file_name, e.args[0]))
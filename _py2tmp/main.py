@@ -12,75 +12,553 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import itertools
+import os
+import re
+import sys
 import typed_ast.ast3 as ast
+from typing import List, Dict, Optional
 
 from _py2tmp import ast_to_ir3
+from _py2tmp import ir3
 from _py2tmp import ir3_to_ir2
 from _py2tmp import ir2_to_ir1
 from _py2tmp import ir1_to_ir0
 from _py2tmp import ir0_to_cpp
+from _py2tmp import instantiation_cost
+from _py2tmp import ir_serialization
+from _py2tmp import module_interface
+from _py2tmp import parallel_lowering
+from _py2tmp import source_map
 from _py2tmp import utils
 
 import argparse
 
-def convert_to_cpp(python_source, filename='<unknown>', verbose=False):
+def convert_to_cpp(python_source, filename='<unknown>', verbose=False, cxx_std='c++11', output_mode='header',
+                   module_name=None, emit_ir=None, jobs=1):
+    '''Converts TMPPy source code to C++.
+
+    If `emit_ir` is one of ir_serialization.IR_STAGES, the conversion stops after that stage and this returns the
+    serialized IR (that can be converted further with convert_ir_to_cpp) instead of the C++ code.
+
+    If `jobs` is greater than 1, the functions in the module are converted in that many processes. The result is the
+    same, but for large modules it's computed faster.
+    '''
+    result, snapshot = _convert_module_to_cpp(python_source, filename, verbose, cxx_std, output_mode, module_name,
+                                              emit_ir=emit_ir, jobs=jobs)
+    if emit_ir:
+        return ir_serialization.serialize_ir_snapshot(snapshot)
+    return result
+
+def convert_ir_to_cpp(serialized_ir, verbose=False, cxx_std='c++11', output_mode='header', emit_ir=None, jobs=1):
+    '''Resumes a conversion from the IR returned by convert_to_cpp (or by a previous call to this) with emit_ir.'''
+    snapshot = ir_serialization.deserialize_ir_snapshot(serialized_ir)
+    result, snapshot = _continue_conversion(snapshot, verbose, cxx_std, output_mode, emit_ir, jobs)
+    if emit_ir:
+        return ir_serialization.serialize_ir_snapshot(snapshot)
+    return result
+
+def _convert_module_to_cpp(python_source, filename, verbose, cxx_std, output_mode, module_name,
+                           module_interface_loader=None, emit_ir=None, jobs=1, line_directives=False):
     source_ast = ast.parse(python_source, filename=filename)
 
-    def identifier_generator_fun():
-        for i in itertools.count():
-            yield 'TmppyInternal_%s' % i
-    identifier_generator = iter(identifier_generator_fun())
+    identifier_generator = utils.IdentifierGenerator(module_name or '')
 
-    module_ir3 = ast_to_ir3.module_ast_to_ir3(source_ast, filename, python_source.splitlines())
+    imported_modules = []  # type: List[module_interface.ModuleInterface]
+    def load_module_interface(imported_module_name: str):
+        imported_module = module_interface_loader(imported_module_name)
+        if imported_module and imported_module not in imported_modules:
+            imported_modules.append(imported_module)
+        return imported_module
+
+    source_lines = python_source.splitlines()
+    module_ir3 = ast_to_ir3.module_ast_to_ir3(source_ast, filename, source_lines,
+                                              load_module_interface if module_interface_loader else None)
     if verbose:
         print('TMPPy IR3:')
         print(utils.ir_to_string(module_ir3))
         print()
 
-    module_ir2 = ir3_to_ir2.module_to_ir2(module_ir3, identifier_generator)
-    if verbose:
-        print('TMPPy IR2:')
-        print(utils.ir_to_string(module_ir2))
-        print()
+    imported_custom_types = []  # type: List[ir3.CustomType]
+    custom_type_template_names = dict()  # type: Dict[str, module_interface.CustomTypeTemplateNames]
+    for imported_module in imported_modules:
+        for custom_type in imported_module.all_custom_types:
+            if custom_type.name not in custom_type_template_names:
+                imported_custom_types.append(custom_type)
+                custom_type_template_names[custom_type.name] = imported_module.template_names_by_custom_type_name[custom_type.name]
 
-    module_ir1 = ir2_to_ir1.module_to_ir1(module_ir2, identifier_generator)
-    if verbose:
-        print('TMPPy IR1:')
-        print(utils.ir_to_string(module_ir1))
-        print()
+    snapshot = ir_serialization.IrSnapshot(
+        stage='ir3',
+        ir=module_ir3,
+        identifier_generator=identifier_generator,
+        filename=filename,
+        module_name=module_name,
+        source_hash=module_interface.compute_hash(python_source),
+        function_types_by_name={function_defn.name: ir3.FunctionType(argtypes=[arg.type for arg in function_defn.args],
+                                                                     returns=function_defn.return_type)
+                                for function_defn in module_ir3.function_defns},
+        custom_types=module_ir3.custom_types,
+        imported_modules=imported_modules,
+        imported_custom_types=imported_custom_types,
+        custom_type_template_names=custom_type_template_names,
+        source_lines_by_toplevel_name={ast_node.name: ast_node.lineno
+                                       for ast_node in source_ast.body
+                                       if isinstance(ast_node, (ast.FunctionDef, ast.ClassDef))},
+        assertion_sources_by_scope_name={assertion.scope_name: (assertion.source_line,
+                                                                source_lines[assertion.source_line - 1].strip())
+                                         for assertion in module_ir3.assertions})
 
-    header_ir0 = ir1_to_ir0.module_to_ir0(module_ir1, identifier_generator)
-    if verbose:
-        print('TMPPy IR0:')
-        print(utils.ir_to_string(header_ir0))
-        print()
+    return _continue_conversion(snapshot, verbose, cxx_std, output_mode, emit_ir, jobs, line_directives)
 
-    result = ir0_to_cpp.header_to_cpp(header_ir0, identifier_generator)
-    result = utils.clang_format(result)
+def _continue_conversion(snapshot: ir_serialization.IrSnapshot, verbose, cxx_std, output_mode, emit_ir, jobs=1,
+                         line_directives=False):
+    '''Runs the conversion stages after the one of `snapshot`.
 
-    if verbose:
-        print('Conversion result:')
-        print(result)
-    return result
+    If `emit_ir` is specified, stops after that stage and returns (None, snapshot). Otherwise converts to C++ and returns
+    (C++ code, snapshot), where the snapshot has the module-wide information up to date (e.g. for the module's interface)
+    but might not contain the IR of the last stage.
+    '''
+    if emit_ir and ir_serialization.IR_STAGES.index(emit_ir) < ir_serialization.IR_STAGES.index(snapshot.stage):
+        raise Exception('Can\'t emit %s from an IR that was already converted to %s.' % (emit_ir, snapshot.stage))
+
+    if not emit_ir and not verbose:
+        return _stream_conversion(snapshot, cxx_std, output_mode, jobs, line_directives), snapshot
+
+    identifier_generator = snapshot.identifier_generator
+    while snapshot.stage != emit_ir:
+        if snapshot.stage == 'ir3':
+            snapshot.ir = ir3_to_ir2.module_to_ir2(snapshot.ir, identifier_generator,
+                                                   imported_exception_types=_get_imported_exception_types(snapshot))
+            snapshot.stage = 'ir2'
+        elif snapshot.stage == 'ir2':
+            snapshot.ir = ir2_to_ir1.module_to_ir1(snapshot.ir, identifier_generator)
+            snapshot.stage = 'ir1'
+        elif snapshot.stage == 'ir1':
+            snapshot.ir = ir1_to_ir0.module_to_ir0(snapshot.ir, identifier_generator, snapshot.custom_type_template_names)
+            snapshot.stage = 'ir0'
+        else:
+            assert snapshot.stage == 'ir0'
+            result = ir0_to_cpp.header_to_cpp(snapshot.ir, identifier_generator, cxx_std, output_mode,
+                                              snapshot.module_name, snapshot.imported_modules,
+                                              snapshot.filename if line_directives else None)
+            result = utils.clang_format(result)
+            if verbose:
+                print('Conversion result:')
+                print(result)
+            return result, snapshot
+
+        if verbose:
+            print('TMPPy %s:' % snapshot.stage.upper())
+            print(utils.ir_to_string(snapshot.ir))
+            print()
+
+    return None, snapshot
+
+def _stream_conversion(snapshot: ir_serialization.IrSnapshot, cxx_std, output_mode, jobs, line_directives):
+    # Instead of converting the whole module to each IR in turn, the stages are chained lazily, so that each toplevel
+    # element (e.g. a function) is converted through all of them before the next one is converted. This way only the
+    # elements being converted are in memory in the intermediate IRs, instead of the whole module in all of them.
+    # The result is the same, since the module-wide information is kept by each stage.
+    # With jobs > 1, the functions are instead converted up to IR0 in separate processes (but the result is still the
+    # same).
+    parallel_lowering_result = None
+    if (snapshot.stage == 'ir3' and jobs > 1
+            and len(snapshot.ir.function_defns) + len(snapshot.ir.assertions) > 1):
+        parallel_lowering_result = parallel_lowering.lower_module_to_ir0(snapshot.ir,
+                                                                         snapshot.identifier_generator,
+                                                                         _get_imported_exception_types(snapshot),
+                                                                         snapshot.custom_type_template_names,
+                                                                         jobs)
+
+    if parallel_lowering_result:
+        toplevel_elems, snapshot.identifier_generator = parallel_lowering_result
+    else:
+        identifier_generator = snapshot.identifier_generator
+        if snapshot.stage == 'ir3':
+            toplevel_elems = ir3_to_ir2.module_to_ir2_toplevel_elems(snapshot.ir, identifier_generator,
+                                                                     _get_imported_exception_types(snapshot))
+        elif snapshot.stage in ('ir2', 'ir1'):
+            toplevel_elems = snapshot.ir.body
+        else:
+            toplevel_elems = snapshot.ir.content
+        if snapshot.stage in ('ir3', 'ir2'):
+            toplevel_elems = ir2_to_ir1.toplevel_elems_to_ir1(toplevel_elems, identifier_generator)
+        if snapshot.stage in ('ir3', 'ir2', 'ir1'):
+            toplevel_elems = ir1_to_ir0.toplevel_elems_to_ir0(toplevel_elems, identifier_generator,
+                                                              snapshot.custom_type_template_names)
+    result = ir0_to_cpp.toplevel_elems_to_cpp(toplevel_elems, snapshot.identifier_generator, cxx_std, output_mode,
+                                              snapshot.module_name, snapshot.imported_modules,
+                                              snapshot.filename if line_directives else None)
+    return utils.clang_format(result)
+
+def _get_imported_exception_types(snapshot: ir_serialization.IrSnapshot):
+    return [custom_type
+            for custom_type in snapshot.imported_custom_types
+            if custom_type.is_exception_class]
+
+def _module_name_for_source_file(source_file_name):
+    module_name = os.path.splitext(os.path.basename(source_file_name))[0]
+    module_name = re.sub('[^A-Za-z0-9_]', '_', module_name)
+    # The module name is used in C++ identifiers (e.g. the module declaration and the include guard), so it can't start
+    # with a digit.
+    if module_name[:1].isdigit():
+        module_name = '_' + module_name
+    return module_name
+
+def _depfile_content(output_file_name, dependencies):
+    def escape(file_name):
+        return file_name.replace(' ', '\\ ').replace('#', '\\#').replace('$', '$$')
+    return '%s: %s\n' % (escape(output_file_name),
+                         ' \\\n  '.join(escape(dependency) for dependency in dependencies))
+
+class ModuleConverter:
+    '''Converts TMPPy modules to C++, also converting the modules that they import when needed.
+
+    Each conversion also saves the interface of the converted module, so that the modules importing it can be converted
+    without re-converting it, as long as its source (and those of the modules it imports) didn't change.
+    '''
+    def __init__(self,
+                 module_path: List[str],
+                 output_dir: Optional[str],
+                 verbose: bool,
+                 cxx_std: str,
+                 output_mode: str,
+                 write_depfiles: bool,
+                 jobs: int = 1,
+                 instantiation_report: bool = False,
+                 template_depth: Optional[int] = None,
+                 write_source_maps: bool = False,
+                 line_directives: bool = False,
+                 builtins: bool = True):
+        self.module_path = module_path
+        self.output_dir = output_dir
+        self.verbose = verbose
+        self.cxx_std = cxx_std
+        self.output_mode = output_mode
+        self.write_depfiles = write_depfiles
+        self.jobs = jobs
+        self.instantiation_report = instantiation_report
+        # If specified, warnings are printed for the instantiations likely to exceed this -ftemplate-depth.
+        self.template_depth = template_depth
+        # Whether the generated code will be compiled with the compiler intrinsics used by the TMPPy runtime (i.e.
+        # without TMPPY_DISABLE_BUILTINS). This only affects the instantiation estimates.
+        self.builtins = builtins
+        self.write_source_maps = write_source_maps
+        self.line_directives = line_directives
+        self.compiler_hash = module_interface.compute_compiler_hash()
+        # The modules converted (or whose interface was loaded) in this run, by (absolute) source file name.
+        self.interfaces_by_source_file_name = dict()  # type: Dict[str, module_interface.ModuleInterface]
+        # Used to detect circular imports.
+        self.source_files_being_converted = []  # type: List[str]
+
+    def output_file_name_for_source_file(self, source_file_name: str):
+        suffix = '.py'
+        if not source_file_name.endswith(suffix):
+            raise Exception('An input file name does not end with .py: ' + source_file_name)
+        if self.output_mode == 'module':
+            output_file_name = source_file_name[:-len(suffix)] + '.cppm'
+        else:
+            output_file_name = source_file_name[:-len(suffix)] + '.h'
+        if self.output_dir:
+            output_file_name = os.path.join(self.output_dir, os.path.basename(output_file_name))
+        return output_file_name
+
+    def interface_file_name_for_source_file(self, source_file_name: str):
+        output_file_name = self.output_file_name_for_source_file(source_file_name)
+        return os.path.splitext(output_file_name)[0] + module_interface.INTERFACE_FILE_SUFFIX
+
+    def source_map_file_name_for_source_file(self, source_file_name: str):
+        output_file_name = self.output_file_name_for_source_file(source_file_name)
+        return os.path.splitext(output_file_name)[0] + source_map.SOURCE_MAP_FILE_SUFFIX
+
+    def ir_file_name_for_source_file(self, source_file_name: str, stage: str):
+        output_file_name = self.output_file_name_for_source_file(source_file_name)
+        return os.path.splitext(output_file_name)[0] + '.' + stage
+
+    def convert(self, source_file_name: str, emit_ir: Optional[str] = None):
+        '''Converts a module, returning its interface.
+
+        If `emit_ir` is specified, this instead stops the conversion after that stage, saving the IR to a file (that
+        can be passed to convert_ir_file to resume the conversion) and returns None.
+        '''
+        absolute_source_file_name = os.path.abspath(source_file_name)
+        if absolute_source_file_name in self.interfaces_by_source_file_name and not emit_ir:
+            return self.interfaces_by_source_file_name[absolute_source_file_name]
+
+        # This also checks the file name.
+        self.output_file_name_for_source_file(source_file_name)
+        with open(source_file_name) as source_file:
+            source = source_file.read()
+
+        process_ir0 = self._should_process_ir0(emit_ir)
+        self.source_files_being_converted.append(absolute_source_file_name)
+        try:
+            result, snapshot = _convert_module_to_cpp(
+                source,
+                source_file_name,
+                verbose=self.verbose,
+                cxx_std=self.cxx_std,
+                output_mode=self.output_mode,
+                module_name=_module_name_for_source_file(source_file_name),
+                module_interface_loader=lambda imported_module_name: self.import_module(imported_module_name,
+                                                                                         source_file_name),
+                emit_ir='ir0' if process_ir0 else emit_ir,
+                jobs=self.jobs,
+                line_directives=self.line_directives)
+        finally:
+            self.source_files_being_converted.pop()
+
+        template_source_lines = None
+        if process_ir0:
+            result, snapshot, template_source_lines = self._process_ir0_and_continue(snapshot)
+        return self._write_outputs(source_file_name, result, snapshot, template_source_lines)
+
+    def convert_ir_file(self, ir_file_name: str, emit_ir: Optional[str] = None):
+        '''Like convert(), but resumes the conversion from an IR file saved by a previous conversion with emit_ir.'''
+        snapshot = ir_serialization.load_ir_snapshot(ir_file_name)
+        template_source_lines = None
+        if self._should_process_ir0(emit_ir):
+            _, snapshot = _continue_conversion(snapshot, self.verbose, self.cxx_std, self.output_mode, 'ir0', self.jobs)
+            result, snapshot, template_source_lines = self._process_ir0_and_continue(snapshot)
+        else:
+            result, snapshot = _continue_conversion(snapshot, self.verbose, self.cxx_std, self.output_mode, emit_ir,
+                                                    self.jobs, self.line_directives)
+        return self._write_outputs(ir_file_name, result, snapshot, template_source_lines)
+
+    def _should_process_ir0(self, emit_ir: Optional[str]):
+        # The instantiation cost analysis and the source maps need the IR0 of the whole module, so in that case the
+        # conversion stops at IR0 and _process_ir0_and_continue then generates the C++ code. These are skipped when the
+        # conversion stops before generating C++ code.
+        return (self.instantiation_report or self.template_depth is not None or self.write_source_maps) and not emit_ir
+
+    def _process_ir0_and_continue(self, snapshot: ir_serialization.IrSnapshot):
+        assert snapshot.stage == 'ir0'
+        toplevel_elems = snapshot.ir.content
+        if self.instantiation_report or self.template_depth is not None:
+            estimates = instantiation_cost.estimate_instantiation_costs(toplevel_elems,
+                                                                        snapshot.function_types_by_name.keys(),
+                                                                        self.cxx_std,
+                                                                        self.builtins)
+            template_depth = self.template_depth or instantiation_cost.DEFAULT_TEMPLATE_DEPTH
+            if self.instantiation_report:
+                print(instantiation_cost.format_report(snapshot.filename, estimates, template_depth, self.cxx_std,
+                                                       self.builtins),
+                      end='')
+            if self.template_depth is not None:
+                for warning in instantiation_cost.check_template_depth(snapshot.filename, toplevel_elems, estimates,
+                                                                       self.template_depth, self.cxx_std,
+                                                                       self.builtins):
+                    print(warning, file=sys.stderr)
+        template_source_lines = source_map.get_template_source_lines(toplevel_elems) if self.write_source_maps else None
+        result, snapshot = _continue_conversion(snapshot, self.verbose, self.cxx_std, self.output_mode, None, self.jobs,
+                                                self.line_directives)
+        return result, snapshot, template_source_lines
+
+    def _write_outputs(self,
+                       input_file_name: str,
+                       result: Optional[str],
+                       snapshot: ir_serialization.IrSnapshot,
+                       template_source_lines: Optional[Dict[str, source_map.TemplateSourceLines]]):
+        source_file_name = snapshot.filename
+        if result is None:
+            utils.write_file_if_changed(self.ir_file_name_for_source_file(source_file_name, snapshot.stage),
+                                        ir_serialization.serialize_ir_snapshot(snapshot))
+            return None
+
+        output_file_name = self.output_file_name_for_source_file(source_file_name)
+        if self.line_directives:
+            # The generated files are expected to be included by their base name (see ir0_to_cpp.header_to_cpp).
+            result = ir0_to_cpp.expand_line_directives(result, os.path.basename(output_file_name))
+        absolute_source_file_name = os.path.abspath(source_file_name)
+        all_custom_types = list(snapshot.custom_types)
+        all_global_names = list(snapshot.function_types_by_name.keys()) + [custom_type.name
+                                                                           for custom_type in snapshot.custom_types]
+        source_file_names = [absolute_source_file_name]
+        for imported_module in snapshot.imported_modules:
+            all_custom_types += [custom_type
+                                 for custom_type in imported_module.all_custom_types
+                                 if custom_type not in all_custom_types]
+            all_global_names += [name
+                                 for name in imported_module.all_global_names
+                                 if name not in all_global_names]
+            source_file_names += [imported_source_file_name
+                                  for imported_source_file_name in imported_module.source_file_names
+                                  if imported_source_file_name not in source_file_names]
+        interface = module_interface.ModuleInterface(
+            module_name=snapshot.module_name,
+            output_file_name=os.path.abspath(output_file_name),
+            source_hash=snapshot.source_hash,
+            compiler_hash=self.compiler_hash,
+            cxx_std=self.cxx_std,
+            output_mode=self.output_mode,
+            function_types_by_name=snapshot.function_types_by_name,
+            # The front end doesn't analyze which functions can throw, and conservatively considers every function as
+            # possibly throwing (also in the module that defines it), so the interface does the same.
+            function_may_throw_by_name={function_name: True for function_name in snapshot.function_types_by_name},
+            custom_types=snapshot.custom_types,
+            all_custom_types=all_custom_types,
+            template_names_by_custom_type_name={custom_type.name: snapshot.custom_type_template_names[custom_type.name]
+                                                for custom_type in all_custom_types},
+            all_global_names=all_global_names,
+            source_hashes_by_imported_module_name={imported_module.module_name: imported_module.source_hash
+                                                   for imported_module in snapshot.imported_modules},
+            source_file_names=source_file_names)
+
+        utils.write_file_if_changed(output_file_name, result)
+        utils.write_file_if_changed(self.interface_file_name_for_source_file(source_file_name),
+                                    module_interface.serialize_module_interface(interface))
+        if self.write_source_maps:
+            utils.write_file_if_changed(self.source_map_file_name_for_source_file(source_file_name),
+                                        source_map.serialize_source_map(source_file_name,
+                                                                        source_map.compute_source_map(
+                                                                            snapshot, template_source_lines)))
+        if self.write_depfiles:
+            # The generated code depends on the version of py2tmp used to generate it, so the py2tmp sources are also
+            # dependencies of each output.
+            dependencies = [input_file_name] + source_file_names[1:] + module_interface.get_compiler_source_files()
+            utils.write_file_if_changed(output_file_name + '.d', _depfile_content(output_file_name, dependencies))
+
+        self.interfaces_by_source_file_name[absolute_source_file_name] = interface
+        return interface
+
+    def _find_module(self, module_name: str, importing_source_file_name: str):
+        # Packages are not supported, so module names can't contain dots.
+        if not re.match('^[A-Za-z_][A-Za-z0-9_]*$', module_name):
+            return None
+        for dir_name in [os.path.dirname(os.path.abspath(importing_source_file_name))] + self.module_path:
+            source_file_name = os.path.join(dir_name, module_name + '.py')
+            if os.path.isfile(source_file_name):
+                return source_file_name
+        return None
+
+    def import_module(self, module_name: str, importing_source_file_name: str):
+        source_file_name = self._find_module(module_name, importing_source_file_name)
+        if not source_file_name:
+            return None
+        absolute_source_file_name = os.path.abspath(source_file_name)
+        if absolute_source_file_name in self.interfaces_by_source_file_name:
+            return self.interfaces_by_source_file_name[absolute_source_file_name]
+        if absolute_source_file_name in self.source_files_being_converted:
+            cycle = self.source_files_being_converted[self.source_files_being_converted.index(absolute_source_file_name):]
+            raise module_interface.ModuleImportError('Circular import: ' + ' -> '.join(_module_name_for_source_file(file_name)
+                                                                                       for file_name in cycle + [absolute_source_file_name]))
+        interface = self._load_up_to_date_interface(source_file_name)
+        if interface:
+            self.interfaces_by_source_file_name[absolute_source_file_name] = interface
+            return interface
+        return self.convert(source_file_name)
+
+    def _load_up_to_date_interface(self, source_file_name: str):
+        interface = module_interface.load_module_interface(self.interface_file_name_for_source_file(source_file_name))
+        if not interface:
+            return None
+        with open(source_file_name) as source_file:
+            source_hash = module_interface.compute_hash(source_file.read())
+        if (interface.source_hash != source_hash
+                or interface.compiler_hash != self.compiler_hash
+                or (interface.cxx_std, interface.output_mode) != (self.cxx_std, self.output_mode)
+                or interface.output_file_name != os.path.abspath(self.output_file_name_for_source_file(source_file_name))
+                or not os.path.isfile(interface.output_file_name)):
+            return None
+        # The interface of a module also depends on the ones of the modules it imports (e.g. for the exceptions that
+        # can be thrown by the imported functions), so those must also be up to date.
+        for imported_module_name, imported_module_source_hash in interface.source_hashes_by_imported_module_name.items():
+            try:
+                imported_module = self.import_module(imported_module_name, source_file_name)
+            except module_interface.ModuleImportError:
+                return None
+            if not imported_module or imported_module.source_hash != imported_module_source_hash:
+                return None
+        return interface
 
 def main():
     parser = argparse.ArgumentParser(description='Converts python source code into C++ metafunctions.')
-    parser.add_argument('sources', nargs='+', help='The python source files to convert')
+    parser.add_argument('sources', nargs='+', help='The python source files to convert (or IR files, with --from-ir)')
     parser.add_argument('--output-dir', help='Output dir for the generated files')
     parser.add_argument('--verbose', help='If "true", prints verbose messages during the conversion')
+    parser.add_argument('--cxx-std', choices=ir0_to_cpp.SUPPORTED_CXX_STANDARDS, default='c++11',
+                        help='The C++ standard that the generated code will be compiled with. Newer standards allow '
+                             'py2tmp to generate code that is faster to compile. Default: c++11')
+    parser.add_argument('--output-mode', choices=ir0_to_cpp.OUTPUT_MODES, default='header',
+                        help='The kind of file generated for each source. "header" generates a normal header (.h). '
+                             '"pch_header" generates a self-contained header (.h) with include guards, that also '
+                             'includes the whole TMPPy runtime and can be precompiled as-is. "module" generates a C++20 '
+                             'module interface unit (.cppm) named after the source file, and requires '
+                             '--cxx-std=c++20. Default: header')
+    parser.add_argument('--module-path', action='append', default=[],
+                        help='A directory where to look for the TMPPy modules imported by the sources (can be '
+                             'specified multiple times). Imported modules are first searched in the directory of the '
+                             'importing source. Imported modules are converted too (writing the corresponding output '
+                             'and interface files in the output dir, or next to their sources), unless an up-to-date '
+                             'interface file for them is found.')
+    parser.add_argument('--emit-ir', choices=ir_serialization.IR_STAGES,
+                        help='If specified, stops the conversion of each source after the specified stage, and saves '
+                             'the IR (in the output dir, or next to the source, with the stage name as extension) '
+                             'instead of generating C++ code. The conversion can then be resumed with --from-ir.')
+    parser.add_argument('--from-ir', action='store_true',
+                        help='If specified, the files passed as sources are IR files saved by a previous run with '
+                             '--emit-ir, and the conversion is resumed from there. The output files are named after '
+                             'the original TMPPy sources. IR files are loaded with pickle, so they must be trusted local '
+                             'files written by the same py2tmp version (e.g. in an earlier step of the same build): '
+                             'never load IR files from a shared or remote cache. IR files written by a different '
+                             'py2tmp version are rejected.')
+    parser.add_argument('--write-depfiles', action='store_true',
+                        help='If specified, for each output file also writes a Makefile-style dependency file (with '
+                             'the same name plus a .d suffix) listing the files that the output depends on.')
+    parser.add_argument('--write-source-maps', action='store_true',
+                        help='If specified, for each output file also writes a source map (a JSON file with the same '
+                             'name and a %s extension) mapping the template names used in the generated code to the '
+                             'TMPPy functions, assertions and types they were generated for. This is used e.g. by '
+                             'extras/benchmark/time_trace_profile.py.' % source_map.SOURCE_MAP_FILE_SUFFIX)
+    parser.add_argument('--line-directives', action='store_true',
+                        help='If specified, the generated code contains #line directives referencing the TMPPy source, '
+                             'so that compiler diagnostics (e.g. for a failed assertion) point to the TMPPy code that '
+                             'the C++ code was generated from.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='The number of processes used to convert the functions of each source (0 to use one per '
+                             'CPU core). The generated code doesn\'t depend on this. Default: 1')
+    parser.add_argument('--instantiation-report', action='store_true',
+                        help='If specified, prints (for each source) an estimate of the number of class template '
+                             'instantiations and of the instantiation depth caused by each function. For recursive '
+                             'functions these depend on the number of recursive calls N, and for the functions '
+                             'processing lists on the length L of the lists, so they\'re expressed in terms of N and L. '
+                             'The estimate depends on --cxx-std, since the TMPPy runtime uses different implementations '
+                             'for each C++ standard.')
+    parser.add_argument('--template-depth', type=int,
+                        help='If specified, prints a warning for the functions (and for the instantiations in toplevel '
+                             'code, e.g. in assertions) that are likely to exceed this maximum instantiation depth '
+                             '(the value of -ftemplate-depth that the generated code will be compiled with).')
+    parser.add_argument('--assume-disabled-builtins', action='store_true',
+                        help='If specified, the estimates of --instantiation-report and --template-depth assume that '
+                             'the generated code will be compiled with TMPPY_DISABLE_BUILTINS (or with a compiler that '
+                             'doesn\'t have the intrinsics used by the TMPPy runtime, e.g. __is_same), so that the '
+                             'runtime instantiates more templates.')
 
     args = parser.parse_args()
 
+    if args.output_mode == 'module' and args.cxx_std != 'c++20':
+        parser.error('--output-mode=module requires --cxx-std=c++20')
+    if args.jobs < 0:
+        parser.error('--jobs must not be negative')
+    if args.template_depth is not None and args.template_depth <= 0:
+        parser.error('--template-depth must be positive')
+
+    converter = ModuleConverter(module_path=args.module_path,
+                                 output_dir=args.output_dir,
+                                 verbose=(args.verbose == 'true'),
+                                 cxx_std=args.cxx_std,
+                                 output_mode=args.output_mode,
+                                 write_depfiles=args.write_depfiles,
+                                 jobs=args.jobs or os.cpu_count() or 1,
+                                 instantiation_report=args.instantiation_report,
+                                 template_depth=args.template_depth,
+                                 write_source_maps=args.write_source_maps,
+                                 line_directives=args.line_directives,
+                                 builtins=not args.assume_disabled_builtins)
     for source_file_name in args.sources:
-        with open(source_file_name) as source_file:
-            source = source_file.read()
-        suffix = '.py'
-        if not source_file_name.endswith(suffix):
-            raise Exception('An input file name does not end with .py: ' + source_file_name)
-        output_file_name = source_file_name[:-len(suffix)] + '.h'
-        with open(output_file_name, 'w') as output_file:
-            output_file.write(convert_to_cpp(source, source_file_name, verbose=(args.verbose == 'true')))
+        if args.from_ir:
+            converter.convert_ir_file(source_file_name, emit_ir=args.emit_ir)
+        else:
+            converter.convert(source_file_name, emit_ir=args.emit_ir)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,120 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import glob
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Optional
+
+from _py2tmp import ir3
+
+# The interface of each converted module is saved next to the generated file, with this suffix.
+INTERFACE_FILE_SUFFIX = '.tmppyi'
+
+# This must be bumped whenever the format of the interface files changes, so that interface files written by an older
+# py2tmp are ignored instead of being misinterpreted.
+_FORMAT_VERSION = 2
+
+class ModuleImportError(Exception):
+    pass
+
+class CustomTypeTemplateNames:
+    def __init__(self, holder_template_name: str, is_instance_template_name: str):
+        self.holder_template_name = holder_template_name
+        self.is_instance_template_name = is_instance_template_name
+
+class ModuleInterface:
+    '''What other modules need to know about a TMPPy module to import it, without re-converting it.
+
+    `custom_types` only contains the types defined in the module (that are the ones that can be imported from it),
+    while `all_custom_types` also contains the ones defined in the modules that it (transitively) imports, since their
+    values (and exceptions) can also be returned by the functions of this module.
+    '''
+    def __init__(self,
+                 module_name: str,
+                 output_file_name: str,
+                 source_hash: str,
+                 compiler_hash: str,
+                 cxx_std: str,
+                 output_mode: str,
+                 function_types_by_name: Dict[str, ir3.FunctionType],
+                 function_may_throw_by_name: Dict[str, bool],
+                 custom_types: List[ir3.CustomType],
+                 all_custom_types: List[ir3.CustomType],
+                 template_names_by_custom_type_name: Dict[str, CustomTypeTemplateNames],
+                 all_global_names: List[str],
+                 source_hashes_by_imported_module_name: Dict[str, str],
+                 source_file_names: List[str]):
+        self.module_name = module_name
+        self.output_file_name = output_file_name
+        self.source_hash = source_hash
+        self.compiler_hash = compiler_hash
+        self.cxx_std = cxx_std
+        self.output_mode = output_mode
+        self.function_types_by_name = function_types_by_name
+        # Whether each function can throw an exception. The calls to the functions that can't throw don't need to check
+        # for errors.
+        self.function_may_throw_by_name = function_may_throw_by_name
+        self.custom_types = custom_types
+        self.all_custom_types = all_custom_types
+        self.template_names_by_custom_type_name = template_names_by_custom_type_name
+        # The names of the functions and types defined in this module and in the ones it (transitively) imports. These
+        # are global names in the generated code, so a module importing this one must not define them.
+        self.all_global_names = all_global_names
+        self.source_hashes_by_imported_module_name = source_hashes_by_imported_module_name
+        # The source files of this module and of all the modules that it (transitively) imports.
+        self.source_file_names = source_file_names
+
+    @property
+    def exception_types(self):
+        return [custom_type
+                for custom_type in self.all_custom_types
+                if custom_type.is_exception_class]
+
+def compute_hash(*contents: str):
+    hasher = hashlib.sha256()
+    for content in contents:
+        hasher.update(content.encode('utf-8'))
+        # A separator, so that e.g. ('ab', 'c') and ('a', 'bc') have different hashes.
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+def get_compiler_source_files():
+    '''Returns the py2tmp sources, whose version the generated code (and the saved IRs and interfaces) depend on.'''
+    compiler_dir = os.path.dirname(os.path.abspath(__file__))
+    return sorted(glob.glob(os.path.join(compiler_dir, '*.py')))
+
+@functools.lru_cache()
+def compute_compiler_hash():
+    compiler_sources = []
+    for compiler_source_file_name in get_compiler_source_files():
+        with open(compiler_source_file_name) as compiler_source_file:
+            compiler_sources.append(compiler_source_file.read())
+    return compute_hash(*compiler_sources)
+
+def serialize_module_interface(interface: ModuleInterface) -> bytes:
+    return pickle.dumps((_FORMAT_VERSION, interface), protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_module_interface(file_name: str) -> Optional[ModuleInterface]:
+    '''Loads a module interface saved by a previous conversion, returning None if it's missing or unreadable.'''
+    try:
+        with open(file_name, 'rb') as file:
+            format_version, interface = pickle.load(file)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+        return None
+    if format_version != _FORMAT_VERSION or not isinstance(interface, ModuleInterface):
+        return None
+    return interface
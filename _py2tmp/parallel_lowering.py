@@ -0,0 +1,86 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from _py2tmp import ir0
+from _py2tmp import ir3
+from _py2tmp import ir3_to_ir2
+from _py2tmp import ir2_to_ir1
+from _py2tmp import ir1_to_ir0
+from _py2tmp import module_interface
+from _py2tmp import utils
+
+# Each process gets this many chunks of the module's functions (and assertions) on average, so that a process that got
+# smaller functions can pick up another chunk when it's done.
+_CHUNKS_PER_PROCESS = 4
+
+def lower_module_to_ir0(module: ir3.Module,
+                        identifier_generator: utils.IdentifierGenerator,
+                        imported_exception_types: List[ir3.CustomType],
+                        custom_type_template_names: Dict[str, module_interface.CustomTypeTemplateNames],
+                        jobs: int) -> Optional[Tuple[List[Union[ir0.TemplateDefn, ir0.StaticAssert, ir0.ConstantDef, ir0.Typedef]],
+                                                     utils.IdentifierGenerator]]:
+    '''Converts a module from IR3 to IR0, converting its functions and assertions in `jobs` processes.
+
+    Once the custom types are converted, each function (or assertion) can be converted independently of the others,
+    and the identifiers generated for it only depend on its scope (not on what was converted before), so they're the
+    same in all processes. This returns the IR0 toplevel elements and the identifier generator to use for the rest of
+    the conversion, that are the same as in a sequential conversion.
+
+    Returns None if that's not possible, because two processes generated the same identifier for different things (this
+    is very unlikely to happen, and would be resolved by a sequential conversion).
+    '''
+    identifier_generator = copy.deepcopy(identifier_generator)
+    prologue = ir3_to_ir2.module_prologue_to_ir2(module, identifier_generator, imported_exception_types)
+    prologue = ir2_to_ir1.toplevel_elems_to_ir1(prologue, identifier_generator)
+    # This also adds the template names of the module's custom types to custom_type_template_names.
+    toplevel_elems = list(ir1_to_ir0.toplevel_elems_to_ir0(prologue, identifier_generator, custom_type_template_names))
+
+    tasks = [(function_defns, [])
+             for function_defns in _split_into_chunks(module.function_defns, jobs * _CHUNKS_PER_PROCESS)]
+    # Each toplevel assertion has its own scope (even if there are others with the same source text), so they can also be
+    # converted in different processes.
+    tasks += [([], assertions)
+              for assertions in _split_into_chunks(module.assertions, jobs * _CHUNKS_PER_PROCESS)]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(_lower_function_defns_and_assertions,
+                                    [identifier_generator.module_name] * len(tasks),
+                                    [function_defns for function_defns, _ in tasks],
+                                    [assertions for _, assertions in tasks],
+                                    [custom_type_template_names] * len(tasks)))
+
+    for elems, task_identifier_generator in results:
+        if not identifier_generator.merge(task_identifier_generator):
+            return None
+        toplevel_elems += elems
+    return toplevel_elems, identifier_generator
+
+def _lower_function_defns_and_assertions(module_name: str,
+                                         function_defns: List[ir3.FunctionDefn],
+                                         assertions: List[ir3.Assert],
+                                         custom_type_template_names: Dict[str, module_interface.CustomTypeTemplateNames]):
+    identifier_generator = utils.IdentifierGenerator(module_name)
+    toplevel_elems = ir3_to_ir2.function_defns_and_assertions_to_ir2(function_defns, assertions, identifier_generator)
+    toplevel_elems = ir2_to_ir1.toplevel_elems_to_ir1(toplevel_elems, identifier_generator)
+    toplevel_elems = ir1_to_ir0.toplevel_elems_to_ir0(toplevel_elems, identifier_generator, custom_type_template_names)
+    return list(toplevel_elems), identifier_generator
+
+def _split_into_chunks(elems: list, max_num_chunks: int):
+    num_chunks = min(len(elems), max_num_chunks)
+    return [elems[len(elems) * i // num_chunks:len(elems) * (i + 1) // num_chunks]
+            for i in range(num_chunks)]
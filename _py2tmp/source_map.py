@@ -0,0 +1,188 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Source maps, mapping the names used in the generated C++ code back to the TMPPy source they were generated for.
+
+Source maps are saved as JSON files (next to the generated code) by py2tmp --write-source-maps, for tools like
+profilers that need to attribute something measured on the generated code (e.g. the time spent instantiating a
+template) to the TMPPy source.
+
+The format is:
+
+    {
+      "format_version": 2,
+      "source_file": "foo.py",
+      "identifiers": {
+        "TmppyInternal_1234567890": {"kind": "function", "name": "f", "file": "foo.py", "line": 12,
+                                     "specialization_lines": [14]},
+        "f": {"kind": "function", "name": "f", "file": "foo.py", "line": 10, "specialization_lines": []},
+        "TmppyInternal_abcdef0123": {"kind": "assertion", "name": "assert f(5) == 3", "file": "foo.py", "line": 20,
+                                     "specialization_lines": null},
+        ...
+      }
+    }
+
+Where "kind" is one of "function", "assertion" or "custom_type". For templates, "line" is the line of the statement that
+the main definition was generated for (e.g. the first statement of the code after an if-else, for the helper wrapping
+it), or the statement that the template was generated for if it only has specializations (e.g. the if-else), and
+"specialization_lines" has the line for each specialization (in the order they appear in the generated code); for
+other identifiers "line" is the line of the toplevel definition and "specialization_lines" is null.
+'''
+
+import json
+import re
+from typing import Dict, Optional, List, Tuple
+
+from _py2tmp import ir_serialization, ir0
+
+SOURCE_MAP_FILE_SUFFIX = '.tmppymap'
+
+FORMAT_VERSION = 2
+
+class SourceMapLoadError(Exception):
+    pass
+
+class SourceLocation:
+    def __init__(self,
+                 kind: str,
+                 name: str,
+                 file: str,
+                 line: Optional[int],
+                 specialization_lines: Optional[List[Optional[int]]] = None):
+        assert kind in ('function', 'assertion', 'custom_type')
+        self.kind = kind
+        self.name = name
+        self.file = file
+        self.line = line
+        self.specialization_lines = specialization_lines
+
+    def __str__(self):
+        if self.line is None:
+            return '%s (%s %s)' % (self.file, self.kind.replace('_', ' '), self.name)
+        return '%s:%s (%s %s)' % (self.file, self.line, self.kind.replace('_', ' '), self.name)
+
+    def to_json(self):
+        return {'kind': self.kind, 'name': self.name, 'file': self.file, 'line': self.line,
+                'specialization_lines': self.specialization_lines}
+
+    @staticmethod
+    def from_json(value: dict):
+        return SourceLocation(kind=value['kind'], name=value['name'], file=value['file'], line=value['line'],
+                              specialization_lines=value['specialization_lines'])
+
+# The source line of the main definition of a template (or of the template, if it has no main definition) and of each of
+# its specializations.
+TemplateSourceLines = Tuple[Optional[int], List[Optional[int]]]
+
+def get_template_source_lines(toplevel_elems: List[ir0.TemplateBodyElement]) -> Dict[str, TemplateSourceLines]:
+    '''Returns the source lines of the templates (including the nested ones) in the IR0 of a module.'''
+    result = dict()  # type: Dict[str, TemplateSourceLines]
+    def process_elems(elems: List[ir0.TemplateBodyElement]):
+        for elem in elems:
+            if isinstance(elem, ir0.TemplateDefn):
+                result[elem.name] = (elem.main_definition.source_line if elem.main_definition else elem.source_line,
+                                     [specialization.source_line for specialization in elem.specializations])
+                if elem.main_definition:
+                    process_elems(elem.main_definition.body)
+                for specialization in elem.specializations:
+                    process_elems(specialization.body)
+    process_elems(toplevel_elems)
+    return result
+
+# The scope of an identifier's origin is e.g. "ir3_to_ir2/function/f", possibly followed by "#<index>" (and by
+# "#collision<index>" in case of a hash collision).
+_ORIGIN_REGEX = re.compile(r'^(ir3_to_ir2|ir2_to_ir1|ir1_to_ir0|ir0_to_cpp)/([a-z_]+)/(.*?)(#[0-9]+)?(#collision[0-9]+)?$',
+                           re.DOTALL)
+
+def compute_source_map(snapshot: ir_serialization.IrSnapshot,
+                       template_source_lines: Optional[Dict[str, TemplateSourceLines]] = None) \
+        -> Dict[str, SourceLocation]:
+    '''Returns the source locations of the identifiers generated for the module of `snapshot`.
+
+    Each generated identifier is attributed to the toplevel function, assertion or custom type whose conversion
+    generated it (directly, or through a helper function generated for it).
+
+    If `template_source_lines` (as returned by get_template_source_lines() on the IR0 of the module) is specified, the
+    locations of templates point to the statements they were generated for instead of the toplevel definition.
+    '''
+    origins_by_identifier = snapshot.identifier_generator.origins_by_identifier
+    locations_by_identifier = dict()  # type: Dict[str, Optional[SourceLocation]]
+
+    def location_for_name(name: str, kind: str, visited_identifiers: set) -> Optional[SourceLocation]:
+        if name in origins_by_identifier:
+            # A helper generated in a previous stage (e.g. a function generated for an if-else statement).
+            return location_for_identifier(name, visited_identifiers)
+        # The scopes used in ir0_to_cpp are named after the kind of IR0 element.
+        kind = {'static_assert': 'assertion', 'template': 'function', 'forward_decl': 'function'}.get(kind, kind)
+        if kind == 'assertion':
+            # The scopes of assertions are named after their source text (and their index among the assertions with
+            # the same text).
+            if name in snapshot.assertion_sources_by_scope_name:
+                line, statement = snapshot.assertion_sources_by_scope_name[name]
+                return SourceLocation(kind='assertion', name=statement, file=snapshot.filename, line=line)
+            return SourceLocation(kind='assertion', name=name, file=snapshot.filename, line=None)
+        if kind == 'custom_type' or (kind == 'function' and name in snapshot.function_types_by_name):
+            return SourceLocation(kind=kind, name=name, file=snapshot.filename,
+                                  line=snapshot.source_lines_by_toplevel_name.get(name))
+        return None
+
+    def location_for_identifier(identifier: str, visited_identifiers: set) -> Optional[SourceLocation]:
+        if identifier in locations_by_identifier:
+            return locations_by_identifier[identifier]
+        location = None
+        match = _ORIGIN_REGEX.match(origins_by_identifier[identifier])
+        if match and identifier not in visited_identifiers:
+            _, kind, name, _, _ = match.groups()
+            location = location_for_name(name, kind, visited_identifiers | {identifier})
+        locations_by_identifier[identifier] = location
+        return location
+
+    for identifier in origins_by_identifier.keys():
+        location_for_identifier(identifier, set())
+
+    result = {identifier: location
+              for identifier, location in locations_by_identifier.items()
+              if location}
+    # The templates generated for the module's functions have the same name as the functions.
+    for function_name in snapshot.function_types_by_name.keys():
+        result[function_name] = location_for_name(function_name, 'function', set())
+
+    for identifier, (line, specialization_lines) in (template_source_lines or dict()).items():
+        location = result.get(identifier)
+        if location and location.file == snapshot.filename:
+            result[identifier] = SourceLocation(kind=location.kind,
+                                                name=location.name,
+                                                file=location.file,
+                                                line=line if line is not None else location.line,
+                                                specialization_lines=specialization_lines)
+    return result
+
+def serialize_source_map(source_file: str, locations_by_identifier: Dict[str, SourceLocation]) -> str:
+    return json.dumps({'format_version': FORMAT_VERSION,
+                       'source_file': source_file,
+                       'identifiers': {identifier: location.to_json()
+                                       for identifier, location in sorted(locations_by_identifier.items())}},
+                      indent=1, sort_keys=True) + '\n'
+
+def load_source_map(file_name: str) -> Dict[str, SourceLocation]:
+    try:
+        with open(file_name) as file:
+            content = json.load(file)
+        if content.get('format_version') != FORMAT_VERSION:
+            raise SourceMapLoadError('%s: this source map was written by a different version of py2tmp, it must be '
+                                     'regenerated.' % file_name)
+        return {identifier: SourceLocation.from_json(location)
+                for identifier, location in content['identifiers'].items()}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise SourceMapLoadError('%s: corrupted source map: %s' % (file_name, e))
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import hashlib
 import inspect
 import json
 import os
@@ -23,7 +25,10 @@ import re
 import sys
 import itertools
 import subprocess
+import time
+from contextlib import contextmanager
 from functools import wraps
+from typing import Dict, List, Tuple
 
 import pytest
 
@@ -32,9 +37,12 @@ import typed_ast.ast3 as ast
 from _py2tmp import ast_to_ir3
 from _py2tmp import ir3_to_ir2
 from _py2tmp import ir2_to_ir1
+from _py2tmp import ir2_interpreter
 from _py2tmp import ir1_to_ir0
 from _py2tmp import ir0_to_cpp
 from _py2tmp import ir0
+from _py2tmp import ir_serialization
+from _py2tmp import main as py2tmp_main
 from _py2tmp import utils
 
 
@@ -65,11 +73,11 @@ class CommandFailedException(Exception):
         {stderr}
         ''').format(command=pretty_print_command(self.command), error_code=self.error_code, stdout=self.stdout, stderr=self.stderr)
 
-def run_command(executable, args=[]):
+def run_command(executable, args=[], cwd=None):
     command = [executable] + args
     print('Executing command:', pretty_print_command(command))
     try:
-        p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, cwd=cwd)
         (stdout, stderr) = p.communicate()
     except Exception as e:
         raise Exception("While executing: %s" % command)
@@ -87,6 +95,189 @@ def run_command(executable, args=[]):
 def run_compiled_executable(executable):
     run_command(executable)
 
+try:
+    import fcntl
+    def _try_lock_file(file):
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+except ImportError:
+    import msvcrt
+    def _try_lock_file(file):
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+@contextmanager
+def _compiler_slot():
+    '''Waits until fewer than config.MAX_CONCURRENT_COMPILES compilers are running and reserves a slot until exit.
+
+    The limit is shared by all the test processes using the same build dir (e.g. the pytest-xdist workers): each slot
+    is a lock file, held by the process using it (and released automatically if the process dies).
+    '''
+    num_slots = config.MAX_CONCURRENT_COMPILES or os.cpu_count() or 1
+    slots_dir = os.path.join(os.path.dirname(os.path.abspath(config.__file__)), 'compiler_slots')
+    os.makedirs(slots_dir, exist_ok=True)
+    while True:
+        for slot in range(num_slots):
+            file = open(os.path.join(slots_dir, 'slot%s.lock' % slot), 'a')
+            if _try_lock_file(file):
+                try:
+                    yield
+                finally:
+                    # Closing the file releases the lock.
+                    file.close()
+                return
+            file.close()
+        time.sleep(0.01)
+
+def _run_compiler(executable, args, cwd=None):
+    with _compiler_slot():
+        return run_command(executable, args, cwd)
+
+# When a compilation is expected to fail, only the diagnostics up to the first py2tmp error (a failed static_assert) and
+# a few lines after it are read, and then the compiler is stopped. The rest can be many MBs of instantiation backtraces
+# (for large generated programs), that no test looks at.
+_DIAGNOSTIC_LINES_AFTER_PY2TMP_ERROR = 20
+# The diagnostics that are read when there's no py2tmp error (e.g. in tests that expect other errors) are capped too.
+_MAX_DIAGNOSTIC_LINES = 500
+# The limits passed to the compiler (when it supports them) for the number of errors and for the length of the
+# instantiation backtrace of each error.
+_MAX_ERRORS = 1
+_TEMPLATE_BACKTRACE_LIMIT = 4
+
+def _run_compiler_expecting_errors(executable, args, diagnostics_on_stdout=False):
+    '''Like _run_compiler, but reads the diagnostics as a stream and stops at the first py2tmp error.
+
+    The diagnostics are read from stderr, or from stdout if `diagnostics_on_stdout` is True (MSVC reports them there).
+    The other stream is discarded.
+    '''
+    command = [executable] + args
+    print('Executing command:', pretty_print_command(command))
+    with _compiler_slot():
+        p = subprocess.Popen(command,
+                             stdout=subprocess.PIPE if diagnostics_on_stdout else subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL if diagnostics_on_stdout else subprocess.PIPE,
+                             universal_newlines=True)
+        diagnostics_stream = p.stdout if diagnostics_on_stdout else p.stderr
+        diagnostic_lines = []
+        remaining_lines_after_py2tmp_error = None
+        for line in diagnostics_stream:
+            diagnostic_lines.append(line)
+            if remaining_lines_after_py2tmp_error is None:
+                if re.search(py2tmp_error_message_extraction_regex, line):
+                    remaining_lines_after_py2tmp_error = _DIAGNOSTIC_LINES_AFTER_PY2TMP_ERROR
+            else:
+                remaining_lines_after_py2tmp_error -= 1
+            if remaining_lines_after_py2tmp_error == 0 or len(diagnostic_lines) >= _MAX_DIAGNOSTIC_LINES:
+                # There were errors (with -Werror even warnings are), so the compilation fails anyway.
+                p.kill()
+                break
+        diagnostics_stream.close()
+        p.wait()
+    diagnostics = ''.join(diagnostic_lines)
+    if p.returncode != 0:
+        if diagnostics_on_stdout:
+            raise CommandFailedException(command, diagnostics, '', p.returncode)
+        else:
+            raise CommandFailedException(command, '', diagnostics, p.returncode)
+    print('Execution successful.')
+    return (diagnostics, '') if diagnostics_on_stdout else ('', diagnostics)
+
+# The hashes of the files in the include dirs, indexed by (path, mtime, size), so that they're only re-read when they
+# change.
+_file_hashes_by_stat = dict()  # type: Dict[Tuple[str, int, int], str]
+
+def _hash_file(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes_by_stat:
+        with open(path, 'rb') as file:
+            _file_hashes_by_stat[key] = hashlib.sha256(file.read()).hexdigest()
+    return _file_hashes_by_stat[key]
+
+def _get_compile_cache_placeholders(source, include_dirs):
+    # The temporary files have a different name in each run, only their content matters. The source might be in one of
+    # the include dirs, so it's replaced first.
+    return [(source, '<source>')] + [(include_dir, '<include_dir_%s>' % index)
+                                     for index, include_dir in enumerate(include_dirs)]
+
+def _replace_all(s, replacements):
+    for old, new in replacements:
+        s = s.replace(old, new)
+    return s
+
+def _get_compiler_identity(executable):
+    # The size and mtime of the executable are included so that an upgrade is detected even if the version is the same.
+    executable_stat = os.stat(os.path.realpath(executable))
+    return '%s %s %s %s %s' % (config.CXX_COMPILER_NAME, config.CXX_COMPILER_VERSION, os.path.realpath(executable),
+                               executable_stat.st_size, executable_stat.st_mtime_ns)
+
+def _compute_compile_cache_key(executable, args, source, include_dirs):
+    hasher = hashlib.sha256()
+    def add(value):
+        hasher.update(value.encode('utf-8') + b'\0')
+    add(_get_compiler_identity(executable))
+    placeholders = _get_compile_cache_placeholders(source, include_dirs)
+    for arg in args:
+        add(_replace_all(arg, placeholders))
+    add(_hash_file(source))
+    # The generated code includes tmppy.h (or parts of it), and in some tests other generated headers.
+    for include_dir in include_dirs:
+        for dir_path, dir_names, file_names in os.walk(include_dir):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                path = os.path.join(dir_path, file_name)
+                add(os.path.relpath(path, include_dir))
+                add(_hash_file(path))
+    return hasher.hexdigest()
+
+def run_compile_command_with_cache(executable, args, source, include_dirs, run_compiler=_run_compiler):
+    '''Like run_command, but for a compilation whose only outcome is success/failure and the diagnostics.
+
+    If config.COMPILE_CACHE_DIR is set, the outcome is cached there, indexed by the hash of the source, the compiler,
+    the flags and the content of the include dirs, so that compiling the same code again (e.g. in the next test run)
+    is skipped.
+
+    `run_compiler` is the function that runs the compiler on a cache miss, e.g. _run_compiler_expecting_errors.
+    '''
+    if not config.COMPILE_CACHE_DIR:
+        return run_compiler(executable, args)
+
+    command = [executable] + args
+    placeholders = _get_compile_cache_placeholders(source, include_dirs)
+    key = _compute_compile_cache_key(executable, args, source, include_dirs)
+    cache_file_name = os.path.join(config.COMPILE_CACHE_DIR, key[:2], key + '.json')
+    try:
+        with open(cache_file_name) as cache_file:
+            outcome = json.load(cache_file)
+        print('Using the cached outcome of command:', pretty_print_command(command))
+    except (OSError, ValueError):
+        try:
+            stdout, stderr = run_compiler(executable, args)
+            outcome = {'returncode': 0, 'stdout': stdout, 'stderr': stderr}
+        except CommandFailedException as e:
+            outcome = {'returncode': e.error_code, 'stdout': e.stdout, 'stderr': e.stderr}
+        outcome['stdout'] = _replace_all(outcome['stdout'], placeholders)
+        outcome['stderr'] = _replace_all(outcome['stderr'], placeholders)
+        # Multiple test processes can write the same entry concurrently, so it's written to a temporary file first and
+        # then atomically renamed.
+        os.makedirs(os.path.dirname(cache_file_name), exist_ok=True)
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=os.path.dirname(cache_file_name), text=True)
+        with os.fdopen(file_descriptor, mode='w') as temporary_file:
+            json.dump(outcome, temporary_file)
+        os.replace(temporary_file_name, cache_file_name)
+
+    stdout = _replace_all(outcome['stdout'], [(new, old) for old, new in placeholders])
+    stderr = _replace_all(outcome['stderr'], [(new, old) for old, new in placeholders])
+    if outcome['returncode'] != 0:
+        raise CommandFailedException(command, stdout, stderr, outcome['returncode'])
+    return stdout, stderr
+
 class CompilationFailedException(Exception):
     def __init__(self, command, error_message):
         self.command = command
@@ -103,11 +294,27 @@ class PosixCompiler:
     def __init__(self):
         self.executable = config.CXX
         self.name = config.CXX_COMPILER_NAME
+        self.precompiled_runtime_flags = None
+        self.modules_supported = None
 
     def compile_discarding_output(self, source, include_dirs, args=[]):
         try:
             args = args + ['-c', source, '-o', os.path.devnull]
-            self._compile(include_dirs, args=args)
+            self._compile(include_dirs, args=args, cacheable_source=source)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stderr)
+
+    def check_syntax(self, source, include_dirs, args=[]):
+        try:
+            args = args + ['-fsyntax-only', source]
+            self._compile(include_dirs, args=args, cacheable_source=source)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stderr)
+
+    def compile_expecting_errors(self, source, include_dirs, args=[]):
+        try:
+            args = self._get_diagnostic_limit_flags() + args + ['-c', source, '-o', os.path.devnull]
+            self._compile(include_dirs, args=args, cacheable_source=source, run_compiler=_run_compiler_expecting_errors)
         except CommandFailedException as e:
             raise CompilationFailedException(e.command, e.stderr)
 
@@ -120,14 +327,164 @@ class PosixCompiler:
                 + ['-o', output_file_name]
             ))
 
-    def _compile(self, include_dirs, args):
+    def precompile_header(self, header, include_dirs, args=[]):
+        '''Precompiles a header, returning the flags that make a compilation use the precompiled header.
+
+        Returns None if the compiler doesn't support precompiled headers.
+        '''
+        if self.name not in ('GNU', 'Clang', 'AppleClang'):
+            return None
+        # GCC and Clang use the precompiled header instead of a header passed with -include when it's next to it, with
+        # this extension.
+        pch_file_name = header + ('.gch' if self.name == 'GNU' else '.pch')
+        try:
+            self._compile(include_dirs,
+                          args=args + ['-x', 'c++-header', header, '-o', pch_file_name],
+                          use_precompiled_runtime=False)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stderr)
+        # With -Winvalid-pch (and -Werror) GCC fails instead of silently parsing the header when the precompiled
+        # header can't be used.
+        return ['-include', header] + (['-Winvalid-pch'] if self.name == 'GNU' else [])
+
+    def compile_module_interface(self, source, module_name, output_dir, include_dirs):
+        '''Compiles a C++20 module interface unit, returning the flags to compile (in output_dir) TUs that import it.
+
+        Returns None if the compiler doesn't support C++20 modules.
+        '''
+        if not self._supports_modules():
+            return None
+        try:
+            self._compile_module_interface(source, module_name, output_dir, include_dirs)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stderr)
+        return self._get_module_flags(output_dir)
+
+    def compile_without_precompiled_runtime(self, source, include_dirs, args=[], cwd=None):
+        '''Compiles a source without the precompiled runtime and without using the compile cache.
+
+        This is used when `args` make the compilation use another precompiled header or C++20 modules, whose content is
+        not accounted for in the compile cache key.
+        '''
+        try:
+            self._compile(include_dirs,
+                          args=args + ['-c', source, '-o', os.path.devnull],
+                          use_precompiled_runtime=False,
+                          cwd=cwd)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stderr)
+
+    def _get_module_flags(self, output_dir):
+        if self.name == 'GNU':
+            # GCC saves the compiled module interface in the gcm.cache dir under the current dir, and looks for it there.
+            return ['-std=c++20', '-fmodules-ts']
+        else:
+            return ['-std=c++20', '-fprebuilt-module-path=%s' % output_dir]
+
+    def _compile_module_interface(self, source, module_name, output_dir, include_dirs):
+        if self.name == 'GNU':
+            args = ['-x', 'c++', '-c', source, '-o', os.path.devnull]
+        else:
+            args = ['-x', 'c++-module', '--precompile', source,
+                    '-o', os.path.join(output_dir, module_name + '.pcm')]
+        self._compile(include_dirs,
+                      args=self._get_module_flags(output_dir) + args,
+                      use_precompiled_runtime=False,
+                      cwd=output_dir)
+
+    def _supports_modules(self):
+        if self.modules_supported is None:
+            self.modules_supported = False
+            if self.name in ('GNU', 'Clang', 'AppleClang'):
+                # Older compilers don't support C++20 modules, or need other flags. This checks if a trivial module can
+                # be compiled and imported with the flags used above.
+                output_dir = tempfile.mkdtemp(dir=_get_temporary_dir())
+                module_source = os.path.join(output_dir, 'tmppy_modules_check.cppm')
+                with open(module_source, 'w') as file:
+                    file.write('export module tmppy_modules_check;\nexport int f() { return 0; }\n')
+                importing_source = os.path.join(output_dir, 'tmppy_modules_check.cpp')
+                with open(importing_source, 'w') as file:
+                    file.write('import tmppy_modules_check;\nint main() { return f(); }\n')
+                try:
+                    self._compile_module_interface(module_source, 'tmppy_modules_check', output_dir, include_dirs=[])
+                    self._compile([],
+                                  args=self._get_module_flags(output_dir) + ['-c', importing_source, '-o', os.path.devnull],
+                                  use_precompiled_runtime=False,
+                                  cwd=output_dir)
+                    self.modules_supported = True
+                except CommandFailedException:
+                    pass
+        return self.modules_supported
+
+    def _get_common_flags(self):
+        return (
+            ['-W', '-Wall', '-g0', '-Werror', '-std=%s' % config.CXX_STANDARD]
+            + (['-DTMPPY_DISABLE_BUILTINS'] if config.DISABLE_BUILTINS else [])
+        )
+
+    def _get_diagnostic_limit_flags(self):
+        # The py2tmp errors are reported in the first error, within the first few lines of its instantiation backtrace.
+        flags = ['-ftemplate-backtrace-limit=%s' % _TEMPLATE_BACKTRACE_LIMIT]
+        if self.name == 'GNU':
+            flags.append('-fmax-errors=%s' % _MAX_ERRORS)
+        else:
+            flags.append('-ferror-limit=%s' % _MAX_ERRORS)
+        return flags
+
+    def _get_precompiled_runtime_flags(self):
+        '''Returns the flags to use a precompiled tmppy.h, building it if needed.
+
+        The code generated by py2tmp only includes the TMPPy runtime headers (and the standard headers that they
+        include), so with a precompiled tmppy.h force-included the compiler doesn't need to parse any header.
+        '''
+        if not config.PRECOMPILE_RUNTIME or self.name not in ('GNU', 'Clang', 'AppleClang'):
+            return []
+        if self.precompiled_runtime_flags is None:
+            # The precompiled header can only be used with the same compiler and flags that it was built with, so these
+            # (and the content of the runtime headers) determine its location.
+            hasher = hashlib.sha256()
+            for value in [_get_compiler_identity(self.executable)] + self._get_common_flags():
+                hasher.update(value.encode('utf-8') + b'\0')
+            for file_name in sorted(os.listdir(os.path.join(config.MPYL_INCLUDE_DIR, 'tmppy'))):
+                hasher.update(_hash_file(os.path.join(config.MPYL_INCLUDE_DIR, 'tmppy', file_name)).encode('utf-8'))
+            pch_dir = os.path.join(os.path.dirname(os.path.abspath(config.__file__)), 'precompiled_runtime',
+                                   hasher.hexdigest()[:16])
+            header_file_name = os.path.join(pch_dir, 'tmppy.h')
+            # GCC and Clang use the precompiled header instead of a header passed with -include when it's next to it,
+            # with this extension.
+            pch_file_name = header_file_name + ('.gch' if self.name == 'GNU' else '.pch')
+            if not os.path.exists(pch_file_name):
+                os.makedirs(pch_dir, exist_ok=True)
+                # Multiple test processes might build it concurrently, so the files are written to temporary files
+                # that are then atomically renamed.
+                file_descriptor, temporary_header_file_name = tempfile.mkstemp(dir=pch_dir, text=True)
+                with os.fdopen(file_descriptor, mode='w') as file:
+                    file.write('#include <tmppy/tmppy.h>\n')
+                os.replace(temporary_header_file_name, header_file_name)
+                file_descriptor, temporary_pch_file_name = tempfile.mkstemp(dir=pch_dir)
+                os.close(file_descriptor)
+                _run_compiler(self.executable,
+                              self._get_common_flags()
+                              + ['-I%s' % config.MPYL_INCLUDE_DIR,
+                                 '-x', 'c++-header', header_file_name,
+                                 '-o', temporary_pch_file_name])
+                os.replace(temporary_pch_file_name, pch_file_name)
+            self.precompiled_runtime_flags = ['-include', header_file_name]
+        return self.precompiled_runtime_flags
+
+    def _compile(self, include_dirs, args, cacheable_source=None, run_compiler=_run_compiler,
+                 use_precompiled_runtime=True, cwd=None):
         include_flags = ['-I%s' % include_dir for include_dir in include_dirs]
         args = (
-            ['-W', '-Wall', '-g0', '-Werror', '-std=c++11']
+            self._get_common_flags()
+            + (self._get_precompiled_runtime_flags() if use_precompiled_runtime else [])
             + include_flags
             + args
         )
-        run_command(self.executable, args)
+        if cacheable_source:
+            run_compile_command_with_cache(self.executable, args, cacheable_source, include_dirs, run_compiler)
+        else:
+            run_compiler(self.executable, args, cwd=cwd)
 
 class MsvcCompiler:
     def __init__(self):
@@ -137,11 +494,29 @@ class MsvcCompiler:
     def compile_discarding_output(self, source, include_dirs, args=[]):
         try:
             args = args + ['/c', source]
-            self._compile(include_dirs, args = args)
+            self._compile(include_dirs, args = args, cacheable_source = source)
         except CommandFailedException as e:
             # Note that we use stdout here, unlike above. MSVC reports compilation warnings and errors on stdout.
             raise CompilationFailedException(e.command, e.stdout)
 
+    def check_syntax(self, source, include_dirs, args=[]):
+        try:
+            args = args + ['/Zs', source]
+            self._compile(include_dirs, args = args, cacheable_source = source)
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stdout)
+
+    def compile_expecting_errors(self, source, include_dirs, args=[]):
+        # MSVC has no flags to limit the diagnostics, so they're only capped when they're read.
+        try:
+            args = args + ['/c', source]
+            self._compile(include_dirs,
+                          args = args,
+                          cacheable_source = source,
+                          run_compiler = lambda executable, args: _run_compiler_expecting_errors(executable, args, diagnostics_on_stdout=True))
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stdout)
+
     def compile_and_link(self, source, include_dirs, output_file_name, args=[]):
         self._compile(
             include_dirs,
@@ -151,14 +526,40 @@ class MsvcCompiler:
                 + ['/Fe' + output_file_name]
             ))
 
-    def _compile(self, include_dirs, args):
+    def precompile_header(self, header, include_dirs, args=[]):
+        # Not implemented for MSVC, where a precompiled header needs a separate source to create it.
+        return None
+
+    def compile_module_interface(self, source, module_name, output_dir, include_dirs):
+        # Not implemented for MSVC.
+        return None
+
+    def compile_without_precompiled_runtime(self, source, include_dirs, args=[], cwd=None):
+        try:
+            self._compile(include_dirs, args = args + ['/c', source])
+        except CommandFailedException as e:
+            raise CompilationFailedException(e.command, e.stdout)
+
+    def _compile(self, include_dirs, args, cacheable_source=None, run_compiler=_run_compiler):
         include_flags = ['-I%s' % include_dir for include_dir in include_dirs]
+        # MSVC doesn't have a C++11 mode, and C++14 is the default.
+        std_flags = {
+            'c++11': [],
+            'c++14': [],
+            'c++17': ['/std:c++17'],
+            'c++20': ['/std:c++latest'],
+        }[config.CXX_STANDARD]
         args = (
             ['/nologo', '/FS', '/W4', '/D_SCL_SECURE_NO_WARNINGS', '/WX']
+            + std_flags
+            + (['/DTMPPY_DISABLE_BUILTINS'] if config.DISABLE_BUILTINS else [])
             + include_flags
             + args
         )
-        run_command(self.executable, args)
+        if cacheable_source:
+            run_compile_command_with_cache(self.executable, args, cacheable_source, include_dirs, run_compiler)
+        else:
+            run_compiler(self.executable, args)
 
 if config.CXX_COMPILER_NAME == 'MSVC':
     compiler = MsvcCompiler()
@@ -169,8 +570,20 @@ else:
 
 _assert_helper = unittest.TestCase()
 
+_temporary_dir = None
+
+def _get_temporary_dir():
+    # Each test process (e.g. each pytest-xdist worker) uses a separate temporary dir, so that concurrent tests don't
+    # interfere with each other and the files of a failed test are easy to find.
+    global _temporary_dir
+    if _temporary_dir is None:
+        _temporary_dir = tempfile.mkdtemp(prefix='tmppy-tests-%s-' % os.environ.get('PYTEST_XDIST_WORKER', 'main'))
+        # The dir is only removed if empty, the files of failed tests are kept to help debugging the failure.
+        atexit.register(try_remove_temporary_dir, _temporary_dir)
+    return _temporary_dir
+
 def _create_temporary_file(file_content, file_name_suffix=''):
-    file_descriptor, file_name = tempfile.mkstemp(text=True, suffix=file_name_suffix)
+    file_descriptor, file_name = tempfile.mkstemp(text=True, suffix=file_name_suffix, dir=_get_temporary_dir())
     file = os.fdopen(file_descriptor, mode='w')
     file.write(file_content)
     file.close()
@@ -191,11 +604,18 @@ def try_remove_temporary_file(filename):
         # This shouldn't cause the tests to fail, so we ignore the exception and go ahead.
         pass
 
+def try_remove_temporary_dir(dirname):
+    try:
+        os.rmdir(dirname)
+    except OSError:
+        # The dir is not empty.
+        pass
+
 def expect_cpp_code_compile_error_helper(check_error_fun, tmppy_source, module_ir2, module_ir1, cxx_source):
     source_file_name = _create_temporary_file(cxx_source, file_name_suffix='.cpp')
 
     try:
-        compiler.compile_discarding_output(
+        compiler.compile_expecting_errors(
             source=source_file_name,
             include_dirs=[config.MPYL_INCLUDE_DIR],
             args=[])
@@ -521,6 +941,10 @@ def expect_cpp_code_success(tmppy_source, module_ir2, module_ir1, cxx_source):
     :param source_code: The C++ source code. This will be dedented.
     """
 
+    # Code without a main() is purely compile-time, so unless TMPPY_TESTS_COMPILE_AND_RUN is enabled it's only checked
+    # with a syntax-only compilation (that still instantiates templates and checks static_asserts), skipping code
+    # generation, linking and running an empty executable.
+    syntax_only = 'main(' not in cxx_source and not config.COMPILE_AND_RUN
     if 'main(' not in cxx_source:
         cxx_source += textwrap.dedent('''
             int main() {
@@ -529,18 +953,28 @@ def expect_cpp_code_success(tmppy_source, module_ir2, module_ir1, cxx_source):
 
     source_file_name = _create_temporary_file(cxx_source, file_name_suffix='.cpp')
     executable_suffix = {'posix': '', 'nt': '.exe'}[os.name]
-    output_file_name = _create_temporary_file('', executable_suffix)
+    output_file_name = None if syntax_only else _create_temporary_file('', executable_suffix)
 
     e = None
 
     try:
-        compiler.compile_and_link(
-            source=source_file_name,
-            include_dirs=[config.MPYL_INCLUDE_DIR],
-            output_file_name=output_file_name,
-            args=[])
+        if syntax_only:
+            compiler.check_syntax(
+                source=source_file_name,
+                include_dirs=[config.MPYL_INCLUDE_DIR],
+                args=[])
+        else:
+            compiler.compile_and_link(
+                source=source_file_name,
+                include_dirs=[config.MPYL_INCLUDE_DIR],
+                output_file_name=output_file_name,
+                args=[])
+    except CompilationFailedException as e1:
+        e = e1
+        error_message = e1.error_message
     except CommandFailedException as e1:
         e = e1
+        error_message = e1.stderr
 
     if e:
         pytest.fail(
@@ -566,9 +1000,13 @@ def expect_cpp_code_success(tmppy_source, module_ir2, module_ir1, cxx_source):
                             tmppy_ir2 = str(module_ir2),
                             tmppy_ir1 = str(module_ir1),
                             cxx_source = add_line_numbers(cxx_source),
-                            error_message = _cap_to_lines(e.stderr, 40)),
+                            error_message = _cap_to_lines(error_message, 40)),
             pytrace=False)
 
+    if syntax_only:
+        try_remove_temporary_file(source_file_name)
+        return
+
     try:
         run_compiled_executable(output_file_name)
     except CommandFailedException as e1:
@@ -607,23 +1045,42 @@ def _get_function_body(f):
     return textwrap.dedent(''.join(source_code))
 
 def create_identifier_generator():
-    def identifier_generator_fun():
-        for i in itertools.count():
-            yield 'TmppyInternal_%s' % i
-    return iter(identifier_generator_fun())
-
-def _convert_tmppy_source_to_ir(python_source, identifier_generator):
+    return utils.IdentifierGenerator()
+
+def _serialization_roundtrip(ir, stage, identifier_generator):
+    # Each IR is serialized and deserialized before converting it further, to check that no information is lost when the
+    # conversion is split with --emit-ir and --from-ir.
+    snapshot = ir_serialization.IrSnapshot(stage=stage,
+                                           ir=ir,
+                                           identifier_generator=identifier_generator,
+                                           filename='<unknown>',
+                                           module_name='',
+                                           source_hash='',
+                                           function_types_by_name=dict(),
+                                           custom_types=[],
+                                           imported_modules=[],
+                                           imported_custom_types=[],
+                                           custom_type_template_names=dict(),
+                                           source_lines_by_toplevel_name=dict(),
+                                           assertion_sources_by_scope_name=dict())
+    return ir_serialization.deserialize_ir_snapshot(ir_serialization.serialize_ir_snapshot(snapshot)).ir
+
+def _convert_tmppy_source_to_ir(python_source, identifier_generator, module_interface_loader=None):
     filename='<unknown>'
     source_ast = ast.parse(python_source, filename)
-    module_ir3 = ast_to_ir3.module_ast_to_ir3(source_ast, filename, python_source.splitlines())
+    module_ir3 = ast_to_ir3.module_ast_to_ir3(source_ast, filename, python_source.splitlines(), module_interface_loader)
+    module_ir3 = _serialization_roundtrip(module_ir3, 'ir3', identifier_generator)
     module_ir2 = ir3_to_ir2.module_to_ir2(module_ir3, identifier_generator)
+    module_ir2 = _serialization_roundtrip(module_ir2, 'ir2', identifier_generator)
     module_ir1 = ir2_to_ir1.module_to_ir1(module_ir2, identifier_generator)
+    module_ir1 = _serialization_roundtrip(module_ir1, 'ir1', identifier_generator)
     return module_ir2, module_ir1
 
 def _convert_ir_to_cpp(module_ir, identifier_generator):
     header = ir1_to_ir0.module_to_ir0(module_ir, identifier_generator)
+    header = _serialization_roundtrip(header, 'ir0', identifier_generator)
 
-    result = ir0_to_cpp.header_to_cpp(header, identifier_generator)
+    result = ir0_to_cpp.header_to_cpp(header, identifier_generator, config.CXX_STANDARD)
     result = utils.clang_format(result)
 
     return result
@@ -673,9 +1130,280 @@ def _convert_to_cpp_expecting_success(tmppy_source):
                             error_message=e.args[0]),
             pytrace=False)
 
+def _create_modules(module_sources, cxx_std=config.CXX_STANDARD, output_mode='header'):
+    modules_dir = tempfile.mkdtemp(dir=_get_temporary_dir())
+    for module_name, module_source in module_sources.items():
+        with open(os.path.join(modules_dir, module_name + '.py'), 'w') as module_file:
+            module_file.write(textwrap.dedent(module_source))
+    converter = py2tmp_main.ModuleConverter(module_path=[],
+                                            output_dir=None,
+                                            verbose=False,
+                                            cxx_std=cxx_std,
+                                            output_mode=output_mode,
+                                            write_depfiles=False)
+    return modules_dir, converter
+
+def _convert_main_module_expecting_success(converter, modules_dir, tmppy_source):
+    e = None
+    try:
+        return converter.convert(os.path.join(modules_dir, 'test_main_module.py'))
+    except ast_to_ir3.CompilationError as e1:
+        e = e1
+    pytest.fail(
+        textwrap.dedent('''\
+            The conversion from TMPPy to C++ failed.
+            stderr was:
+            {error_message}
+            
+            TMPPy source:
+            {tmppy_source}
+            ''').format(tmppy_source=add_line_numbers(tmppy_source),
+                        error_message=e.args[0]),
+        pytrace=False)
+
+def _fail_with_compilation_error(e, tmppy_source, modules_dir):
+    pytest.fail(
+        textwrap.dedent('''\
+            The generated C++ source did not compile.
+            Compiler command line: {compiler_command}
+            Error message was:
+            {error_message}
+            
+            TMPPy source:
+            {tmppy_source}
+            
+            Generated files are in: {modules_dir}
+            ''').format(compiler_command=e.command,
+                        tmppy_source=add_line_numbers(tmppy_source),
+                        modules_dir=modules_dir,
+                        error_message=_cap_to_lines(e.error_message, 40)),
+        pytrace=False)
+
+def assert_compilation_succeeds_with_modules(module_sources):
+    '''Like assert_compilation_succeeds, but the test can import the TMPPy modules with the given names and sources.'''
+    def eval(f):
+        @wraps(f)
+        def wrapper():
+            tmppy_source = _get_function_body(f)
+            modules_dir, converter = _create_modules(dict(module_sources, test_main_module=tmppy_source))
+            interface = _convert_main_module_expecting_success(converter, modules_dir, tmppy_source)
+
+            cpp_source = '#include "%s"\n' % os.path.basename(interface.output_file_name)
+            source_file_name = os.path.join(modules_dir, 'test_main.cpp')
+            with open(source_file_name, 'w') as source_file:
+                source_file.write(cpp_source + 'int main() {\n}\n')
+            compile = compiler.compile_discarding_output if config.COMPILE_AND_RUN else compiler.check_syntax
+            e = None
+            try:
+                compile(source=source_file_name,
+                        include_dirs=[config.MPYL_INCLUDE_DIR, modules_dir],
+                        args=[])
+            except CompilationFailedException as e1:
+                e = e1
+            if e:
+                _fail_with_compilation_error(e, tmppy_source, modules_dir)
+        return wrapper
+    return eval
+
+def assert_compilation_succeeds_with_output_mode(output_mode: str):
+    '''Like assert_compilation_succeeds, but the code is generated with the given --output-mode.
+
+    With 'pch_header', the generated header is precompiled and then used in a TU. With 'module', the generated module
+    interface unit is compiled (with C++20) and then imported in a TU. The test is skipped if the compiler doesn't
+    support that.
+    '''
+    assert output_mode in ir0_to_cpp.OUTPUT_MODES
+    def eval(f):
+        @wraps(f)
+        def wrapper():
+            tmppy_source = _get_function_body(f)
+            modules_dir, converter = _create_modules(dict(test_main_module=tmppy_source),
+                                                     cxx_std='c++20' if output_mode == 'module' else config.CXX_STANDARD,
+                                                     output_mode=output_mode)
+            interface = _convert_main_module_expecting_success(converter, modules_dir, tmppy_source)
+
+            source_file_name = os.path.join(modules_dir, 'test_main.cpp')
+            include_dirs = [config.MPYL_INCLUDE_DIR, modules_dir]
+            e = None
+            try:
+                if output_mode == 'module':
+                    module_flags = compiler.compile_module_interface(
+                        interface.output_file_name, interface.module_name, modules_dir, include_dirs)
+                    if module_flags is None:
+                        pytest.skip('The compiler doesn\'t support C++20 modules.')
+                    with open(source_file_name, 'w') as source_file:
+                        source_file.write('import %s;\nint main() {\n}\n' % interface.module_name)
+                    compiler.compile_without_precompiled_runtime(source_file_name, include_dirs, module_flags,
+                                                                 cwd=modules_dir)
+                else:
+                    with open(source_file_name, 'w') as source_file:
+                        source_file.write('#include "%s"\nint main() {\n}\n' % os.path.basename(interface.output_file_name))
+                    if output_mode == 'pch_header':
+                        pch_flags = compiler.precompile_header(interface.output_file_name, include_dirs)
+                        if pch_flags is None:
+                            pytest.skip('The compiler doesn\'t support precompiled headers.')
+                    else:
+                        pch_flags = []
+                    compiler.compile_without_precompiled_runtime(source_file_name, include_dirs, pch_flags)
+            except CompilationFailedException as e1:
+                e = e1
+            if e:
+                _fail_with_compilation_error(e, tmppy_source, modules_dir)
+        return wrapper
+    return eval
+
+# When batching is enabled (with TMPPY_TESTS_BATCH_SIZE), the assert_compilation_succeeds tests of each test file are
+# compiled in batches, each in a single C++ translation unit (with the code of each test in a separate namespace), so
+# that e.g. tmppy.h is parsed once per batch instead of once per test. When a batch fails to compile, it's split in
+# half until the failing tests are isolated; these (and the tests that can't be batched) are then compiled on their own
+# as usual, so that the failure is reported normally.
+_batchable_tests_by_module = dict()  # type: Dict[str, List]
+_compiled_in_batch_by_test = dict()  # type: Dict[Tuple[str, str], bool]
+# The position of each test in the order in which pytest runs them, recorded once the tests are collected (and
+# reordered, see conftest.py).
+_run_index_by_test = dict()  # type: Dict[Tuple[str, str], int]
+
+def _test_key(f):
+    return f.__module__, f.__qualname__
+
+def _register_batchable_test(f):
+    _batchable_tests_by_module.setdefault(f.__module__, []).append(f)
+
+def set_test_run_order(test_functions):
+    '''Records the order in which the given tests will run, so that each batch contains the next tests to run.'''
+    _run_index_by_test.clear()
+    for index, test_function in enumerate(test_functions):
+        _run_index_by_test.setdefault(_test_key(test_function), index)
+
+def _compiled_successfully_in_batch(f):
+    if _test_key(f) not in _compiled_in_batch_by_test:
+        # The batch is formed with the tests of the same file that run after this one (and that weren't already
+        # compiled in a batch). When the order is unknown (e.g. outside of pytest), the definition order is used.
+        tests = sorted(_batchable_tests_by_module[f.__module__],
+                       key=lambda test: _run_index_by_test.get(_test_key(test), float('inf')))
+        batch = [test
+                 for test in tests[tests.index(f):]
+                 if _test_key(test) not in _compiled_in_batch_by_test][:config.BATCH_SIZE]
+        _compile_batch(batch)
+    return _compiled_in_batch_by_test[_test_key(f)]
+
+def _compile_batch(tests):
+    cpp_source_by_test = dict()
+    for test in tests:
+        _compiled_in_batch_by_test[_test_key(test)] = False
+        try:
+            identifier_generator = create_identifier_generator()
+            _, module_ir1 = _convert_tmppy_source_to_ir(_get_function_body(test), identifier_generator)
+            cpp_source = _convert_ir_to_cpp(module_ir1, identifier_generator)
+        except Exception:
+            # The error will be reported when the test is run on its own.
+            continue
+        # Tests with a main() have a runtime component, so they're not batched.
+        if 'main(' not in cpp_source:
+            cpp_source_by_test[test] = cpp_source
+
+    def compile_tests(tests):
+        # There's no point compiling a single test here, it'd be compiled again on its own to report the error.
+        if len(tests) <= 1:
+            return
+        if _try_compile_batch([(test.__name__, cpp_source_by_test[test]) for test in tests]):
+            for test in tests:
+                _compiled_in_batch_by_test[_test_key(test)] = True
+        else:
+            compile_tests(tests[:len(tests) // 2])
+            compile_tests(tests[len(tests) // 2:])
+
+    compile_tests([test for test in tests if test in cpp_source_by_test])
+
+def _try_compile_batch(cpp_source_by_namespace):
+    batch_cpp_source = ''
+    for namespace, cpp_source in cpp_source_by_namespace:
+        # The prelude of the generated code (the #include directives and the C++ standard check) must stay outside the
+        # namespace.
+        lines = cpp_source.splitlines(keepends=True)
+        prelude_length = next((index for index, line in enumerate(lines) if not line.startswith('#')), len(lines))
+        batch_cpp_source += ''.join(lines[:prelude_length])
+        batch_cpp_source += 'namespace %s {\n%s}\n' % (namespace, ''.join(lines[prelude_length:]))
+    batch_cpp_source += 'int main() {\n}\n'
+
+    source_file_name = _create_temporary_file(batch_cpp_source, file_name_suffix='.cpp')
+    if not config.COMPILE_AND_RUN:
+        try:
+            compiler.check_syntax(
+                source=source_file_name,
+                include_dirs=[config.MPYL_INCLUDE_DIR],
+                args=[])
+            return True
+        except CompilationFailedException:
+            return False
+        finally:
+            try_remove_temporary_file(source_file_name)
+
+    executable_suffix = {'posix': '', 'nt': '.exe'}[os.name]
+    output_file_name = _create_temporary_file('', executable_suffix)
+    try:
+        compiler.compile_and_link(
+            source=source_file_name,
+            include_dirs=[config.MPYL_INCLUDE_DIR],
+            output_file_name=output_file_name,
+            args=[])
+        run_compiled_executable(output_file_name)
+        return True
+    except CommandFailedException:
+        return False
+    finally:
+        try_remove_temporary_file(source_file_name)
+        try_remove_temporary_file(output_file_name)
+
+def _check_with_interpreter(tmppy_source, expected_error_regex=None):
+    '''Evaluates the test with the reference interpreter (in the semantic and cross_check modes) and checks the outcome.
+
+    If `expected_error_regex` is None the evaluation is expected to succeed, otherwise to fail with a matching message.
+    Returns True if the test doesn't need to be compiled, i.e. if the interpreter checked it in the semantic mode.
+    '''
+    if config.TEST_MODE == 'compile':
+        return False
+    module_ir2, _, _ = _convert_to_cpp_expecting_success(tmppy_source)
+    try:
+        ir2_interpreter.interpret_module(module_ir2)
+        error_message = None
+    except ir2_interpreter.UnsupportedConstructError:
+        # The compiler will check this test.
+        return False
+    except ir2_interpreter.EvaluationError as e:
+        error_message = e.args[0]
+
+    if expected_error_regex is None and error_message is not None:
+        failure_message = 'The reference interpreter reported an error, but the test should have succeeded.\nError: %s' % error_message
+    elif expected_error_regex is not None and error_message is None:
+        failure_message = 'Expected error %s but the reference interpreter evaluated the test successfully.' % expected_error_regex
+    elif expected_error_regex is not None and not re.search(expected_error_regex.replace(' ', ''), error_message.replace(' ', '')):
+        failure_message = 'Expected error %s but the reference interpreter reported a different error.\nError: %s' % (expected_error_regex, error_message)
+    else:
+        return config.TEST_MODE == 'semantic'
+
+    pytest.fail(
+        textwrap.dedent('''\
+            {failure_message}
+
+            TMPPy source:
+            {tmppy_source}
+
+            TMPPy IR2:
+            {tmppy_ir2}
+            ''').format(failure_message=failure_message,
+                        tmppy_source=add_line_numbers(tmppy_source),
+                        tmppy_ir2=str(module_ir2)),
+        pytrace=False)
+
 def assert_compilation_succeeds(f):
+    _register_batchable_test(f)
     @wraps(f)
     def wrapper():
+        if _check_with_interpreter(_get_function_body(f)):
+            return
+        if config.BATCH_SIZE > 1 and _compiled_successfully_in_batch(f):
+            return
         tmppy_source = _get_function_body(f)
         module_ir2, module_ir1, cpp_source = _convert_to_cpp_expecting_success(tmppy_source)
         expect_cpp_code_success(tmppy_source, module_ir2, module_ir1, cpp_source)
@@ -719,6 +1447,8 @@ def assert_compilation_fails_with_static_assert_error(expected_error_regex: str)
         @wraps(f)
         def wrapper():
             tmppy_source = _get_function_body(f)
+            if _check_with_interpreter(tmppy_source, expected_error_regex):
+                return
             module_ir2, module_ir1, cpp_source = _convert_to_cpp_expecting_success(tmppy_source)
             expect_cpp_code_generic_compile_error(
                 r'(error: static assertion failed: |error: static_assert failed .)' + expected_error_regex,
@@ -738,9 +1468,24 @@ def _get_line_from_diagnostic(diagnostic):
     return int(matches.group(1))
 
 def assert_conversion_fails(f):
+    return _assert_conversion_fails(f, module_sources=None)
+
+def assert_conversion_fails_with_modules(module_sources):
+    '''Like assert_conversion_fails, but the test can import the TMPPy modules with the given names and sources.'''
+    def eval(f):
+        return _assert_conversion_fails(f, module_sources)
+    return eval
+
+def _assert_conversion_fails(f, module_sources):
     @wraps(f)
     def wrapper():
         tmppy_source = _get_function_body(f)
+        if module_sources is None:
+            module_interface_loader = None
+        else:
+            modules_dir, converter = _create_modules(module_sources)
+            module_interface_loader = lambda module_name: converter.import_module(module_name,
+                                                                                  os.path.join(modules_dir, '<unknown>'))
         actual_source_lines = []
         expected_error_regex = None
         expected_error_line = None
@@ -769,7 +1514,8 @@ def assert_conversion_fails(f):
                 pytrace=False)
 
         try:
-            module_ir2, module_ir1 = _convert_tmppy_source_to_ir('\n'.join(actual_source_lines), create_identifier_generator())
+            module_ir2, module_ir1 = _convert_tmppy_source_to_ir('\n'.join(actual_source_lines), create_identifier_generator(),
+                                                                 module_interface_loader)
             e = None
         except ast_to_ir3.CompilationError as e1:
             e = e1
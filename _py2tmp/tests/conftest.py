@@ -0,0 +1,54 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from _py2tmp.testing import utils as testing_utils
+
+# The duration of each test in the last run is saved in the pytest cache, and the next run starts from the slowest
+# tests. When tests run in parallel (with pytest-xdist), this avoids ending the run with a few workers busy with long
+# tests while the others are idle.
+
+_DURATIONS_CACHE_KEY = 'tmppy/test_durations'
+
+_durations_by_test = dict()
+
+def _is_xdist_worker(config):
+    return hasattr(config, 'workerinput')
+
+def pytest_collection_modifyitems(session, config, items):
+    # The cache is not available when running with -p no:cacheprovider.
+    if not hasattr(config, 'cache'):
+        return
+    # This must give the same order in all pytest-xdist workers, so it only depends on the durations saved by the
+    # previous run.
+    previous_durations_by_test = config.cache.get(_DURATIONS_CACHE_KEY, dict())
+    # Tests that weren't run before go first, since their duration is unknown. The sort is stable, so tests with the same
+    # duration keep the order of definition.
+    items.sort(key=lambda item: -previous_durations_by_test.get(item.nodeid, float('inf')))
+
+def pytest_collection_finish(session):
+    # This is called after pytest_collection_modifyitems, so this is the order in which the tests will run.
+    testing_utils.set_test_run_order([item.function for item in session.items if hasattr(item, 'function')])
+
+def pytest_runtest_logreport(report):
+    # With pytest-xdist, this is also called in the controller process, for the reports of all workers.
+    _durations_by_test[report.nodeid] = _durations_by_test.get(report.nodeid, 0) + report.duration
+
+def pytest_sessionfinish(session):
+    if not hasattr(session.config, 'cache'):
+        return
+    if _is_xdist_worker(session.config) or not _durations_by_test:
+        return
+    durations_by_test = session.config.cache.get(_DURATIONS_CACHE_KEY, dict())
+    durations_by_test.update(_durations_by_test)
+    session.config.cache.set(_DURATIONS_CACHE_KEY, durations_by_test)
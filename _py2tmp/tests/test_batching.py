@@ -0,0 +1,54 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from _py2tmp.testing import utils as testing_utils
+
+def _test_a():
+    pass
+
+def _test_b():
+    pass
+
+def _test_c():
+    pass
+
+def _test_d():
+    pass
+
+def _get_batches(monkeypatch, run_order, batch_size=2):
+    monkeypatch.setattr(testing_utils, '_batchable_tests_by_module', {__name__: [_test_a, _test_b, _test_c, _test_d]})
+    monkeypatch.setattr(testing_utils, '_compiled_in_batch_by_test', dict())
+    monkeypatch.setattr(testing_utils, '_run_index_by_test', dict())
+    monkeypatch.setattr(testing_utils.config, 'BATCH_SIZE', batch_size)
+    batches = []
+    def compile_batch(tests):
+        batches.append([test.__name__ for test in tests])
+        for test in tests:
+            testing_utils._compiled_in_batch_by_test[testing_utils._test_key(test)] = True
+    monkeypatch.setattr(testing_utils, '_compile_batch', compile_batch)
+
+    if run_order is not None:
+        testing_utils.set_test_run_order(run_order)
+    for test in run_order or [_test_a, _test_b, _test_c, _test_d]:
+        assert testing_utils._compiled_successfully_in_batch(test)
+    return batches
+
+def test_batches_follow_definition_order_when_run_order_unknown(monkeypatch):
+    assert _get_batches(monkeypatch, run_order=None) == [['_test_a', '_test_b'], ['_test_c', '_test_d']]
+
+def test_batches_follow_run_order(monkeypatch):
+    # E.g. after conftest.py sorted the tests by duration.
+    assert _get_batches(monkeypatch, run_order=[_test_d, _test_b, _test_a, _test_c]) == [['_test_d', '_test_b'],
+                                                                                          ['_test_a', '_test_c']]
@@ -33,3 +33,68 @@ def test_import_symbol_as_alias_error():
 @assert_compilation_succeeds
 def test_import_multiple_ok():
     from typing import List, Callable
+
+_MODULE_SOURCES = {
+    'my_module': '''\
+        from tmppy import Type
+        class MyError(Exception):
+            def __init__(self, b: bool):
+                self.message = 'error in my_module'
+                self.b = b
+        class MyPair:
+            def __init__(self, x: int, t: Type):
+                self.x = x
+                self.t = t
+        def f(x: int):
+            if x == 0:
+                raise MyError(True)
+            return x + 1
+        def make_pair(x: int):
+            return MyPair(x, Type('int'))
+        def helper(b: bool):
+            return not b
+        ''',
+    'my_other_module': '''\
+        from my_module import f
+        def g(x: int):
+            return f(x) * 2
+        ''',
+}
+
+@assert_compilation_succeeds_with_modules(_MODULE_SOURCES)
+def test_import_from_user_module_ok():
+    from tmppy import Type
+    from my_module import f, make_pair, MyPair, MyError
+    from my_other_module import g
+    def h(x: int):
+        try:
+            return g(x)
+        except MyError as e:
+            return -1
+    def get_x(x: int):
+        return make_pair(x).x
+    assert f(1) == 2
+    assert h(1) == 4
+    assert h(0) == -1
+    assert get_x(5) == 5
+    assert make_pair(3) == MyPair(3, Type('int'))
+
+@assert_conversion_fails_with_modules(_MODULE_SOURCES)
+def test_import_from_user_module_undefined_symbol_error():
+    from my_module import f, g  # error: The module my_module doesn't define a function or type called g.
+
+@assert_conversion_fails_with_modules(_MODULE_SOURCES)
+def test_import_from_user_module_redefinition_of_symbol_not_imported_error():
+    from my_module import f  # note: The module was imported here.
+    def helper(x: int):  # error: helper is already defined in the imported module my_module \(or in a module imported by it\).
+        return x
+
+@assert_conversion_fails_with_modules(_MODULE_SOURCES)
+def test_import_from_user_module_redefinition_of_imported_symbol_error():
+    from my_module import f  # note: The previous declaration was here.
+    def f(x: int):  # error: f was already defined in this scope.
+        return x
+
+@assert_conversion_fails_with_modules(_MODULE_SOURCES)
+def test_import_unknown_user_module_error():
+    from nonexistent_module import f  # error: The only modules that can be imported in TMPPy are: tmppy, typing and the TMPPy modules in the module path
@@ -0,0 +1,184 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import textwrap
+from fractions import Fraction
+
+import pytest
+
+from _py2tmp import instantiation_cost
+from _py2tmp import ir_serialization
+from _py2tmp import main as py2tmp_main
+from _py2tmp.instantiation_cost import Polynomial
+
+_SOURCE = '''\
+from tmppy import Type
+from typing import List
+def recursive(n: int) -> int:
+    if n == 0:
+        return 0
+    else:
+        return recursive(n - 1)
+def sum_range(n: int) -> int:
+    return sum(range(n))
+def double_all(l: List[int]):
+    return [x * 2 for x in l]
+def is_int(t: Type):
+    return t == Type('int')
+'''
+
+def _get_ir0(source):
+    snapshot = ir_serialization.deserialize_ir_snapshot(py2tmp_main.convert_to_cpp(textwrap.dedent(source),
+                                                                                   filename='my_module.py',
+                                                                                   emit_ir='ir0'))
+    return snapshot.ir.content, snapshot.function_types_by_name.keys()
+
+def _estimate(source=_SOURCE, cxx_std='c++11', builtins=True):
+    toplevel_elems, function_names = _get_ir0(source)
+    return instantiation_cost.estimate_instantiation_costs(toplevel_elems, function_names, cxx_std, builtins)
+
+def _check_template_depth(source, cxx_std='c++11', builtins=True, template_depth=900):
+    toplevel_elems, function_names = _get_ir0(source)
+    estimates = instantiation_cost.estimate_instantiation_costs(toplevel_elems, function_names, cxx_std, builtins)
+    return instantiation_cost.check_template_depth('my_module.py', toplevel_elems, estimates, template_depth, cxx_std,
+                                                   builtins)
+
+def test_polynomial_arithmetic():
+    n = Polynomial.variable('N(f)')
+    p = 3 * n * n + Fraction(1, 8) * n + 2
+    assert str(p) == '3*N(f)*N(f) + 1/8*N(f) + 2'
+    assert p.variables == ['N(f)']
+    assert p.constant_term == 2
+    assert p.evaluate({'N(f)': 4}) == 51
+    assert str(Polynomial()) == '0'
+    assert str(Polynomial.constant(2).upper_bound_with(n + 1)) == 'N(f) + 2'
+
+def test_polynomial_evaluate_rounds_up():
+    assert (Fraction(1, 8) * Polynomial.variable('L')).evaluate({'L': 9}) == 2
+
+def test_recursive_function_expressed_in_terms_of_recursion_variable():
+    estimate = _estimate()['recursive']
+    assert estimate.depth.variables == ['N(recursive)']
+    assert estimate.instantiations.variables == ['N(recursive)']
+
+def test_type_comparison_uses_is_same_intrinsic_with_builtins():
+    estimate = _estimate(builtins=True)['is_int']
+    assert estimate.runtime_templates == []
+    assert estimate.external_templates == []
+    assert estimate.instantiations == Polynomial.constant(1)
+
+def test_type_comparison_instantiates_std_is_same_without_builtins():
+    estimate = _estimate(builtins=False)['is_int']
+    assert estimate.runtime_templates == ['std::is_same']
+    assert estimate.external_templates == []
+    assert estimate.instantiations == Polynomial.constant(2)
+
+@pytest.mark.parametrize('cxx_std', ['c++11', 'c++14'])
+def test_sum_depth_proportional_to_list_length_before_cxx17(cxx_std):
+    estimate = _estimate(cxx_std=cxx_std)['sum_range']
+    assert 'Int64ListSum' in estimate.runtime_templates
+    assert estimate.depth.coefficients_by_monomial[(instantiation_cost.LIST_LENGTH_VARIABLE,)] == Fraction(1, 8)
+
+@pytest.mark.parametrize('cxx_std', ['c++17', 'c++20'])
+def test_sum_depth_independent_of_list_length_with_cxx17(cxx_std):
+    estimate = _estimate(cxx_std=cxx_std)['sum_range']
+    assert instantiation_cost.LIST_LENGTH_VARIABLE not in estimate.depth.variables
+
+def test_range_depth_logarithmic_without_builtins():
+    assert instantiation_cost.LOG_LIST_LENGTH_VARIABLE not in _estimate(builtins=True)['sum_range'].depth.variables
+    assert instantiation_cost.LOG_LIST_LENGTH_VARIABLE in _estimate(builtins=False)['sum_range'].depth.variables
+
+def test_list_comprehension_helper_counted_once_per_element():
+    estimate = _estimate()['double_all']
+    [transform_template_name] = [template_name
+                                 for template_name in estimate.runtime_templates
+                                 if template_name.startswith('Transform')]
+    transform_instantiations, _ = instantiation_cost.get_runtime_template_costs('c++11', True)[transform_template_name]
+    list_length_monomial = (instantiation_cost.LIST_LENGTH_VARIABLE,)
+    # At least one more instantiation per element, for the helper generated for the list comprehension.
+    assert (estimate.instantiations.coefficients_by_monomial[list_length_monomial]
+            >= transform_instantiations.coefficients_by_monomial[list_length_monomial] + 1)
+
+def test_list_concat_all_logarithmic_depth():
+    [concat_all_template_name] = [template_name
+                                  for template_name in _estimate('''\
+                                      from typing import List
+                                      def f(l: List[int]):
+                                          return [x for x in l if x > 3]
+                                      ''')['f'].runtime_templates
+                                  if template_name.endswith('ConcatAll')]
+    _, depth = instantiation_cost.get_runtime_template_costs('c++17', True)[concat_all_template_name]
+    assert depth.variables == [instantiation_cost.LOG_LIST_LENGTH_VARIABLE]
+
+def test_format_report():
+    report = instantiation_cost.format_report('my_module.py', _estimate(), 900)
+    assert report.startswith('Estimated template instantiations for the functions in my_module.py '
+                             '(for c++11, with compiler intrinsics):\n')
+    assert 'N(recursive) is the number of recursive calls made by recursive' in report
+    assert '-ftemplate-depth=900 allows N(recursive) <= ' in report
+    assert 'L is the length of the longest list processed' in report
+    assert 'std::is_same' not in report
+
+def test_format_report_without_builtins():
+    report = instantiation_cost.format_report('my_module.py', _estimate(builtins=False), 900, 'c++11', builtins=False)
+    assert '(for c++11, without compiler intrinsics)' in report
+    assert 'uses these TMPPy runtime templates: std::is_same' in report
+
+def test_template_depth_warning_for_large_sum_before_cxx17():
+    source = '''\
+        assert sum(range(10000)) == 49995000
+        '''
+    [warning] = _check_template_depth(source, cxx_std='c++11')
+    assert warning.startswith('my_module.py:1: warning: this instantiation of Int64ListSum (with lists of up to 10000 '
+                              'elements) is likely to exceed -ftemplate-depth=900')
+    assert _check_template_depth(source, cxx_std='c++17') == []
+
+def test_no_template_depth_warning_for_small_sum():
+    assert _check_template_depth('''\
+        assert sum(range(100)) == 4950
+        ''') == []
+
+def test_template_depth_warning_for_recursive_function():
+    warnings = _check_template_depth('''\
+        def f(n: int) -> int:
+            if n == 0:
+                return 0
+            else:
+                return f(n - 1)
+        assert f(3) == 0
+        assert f(5000) == 0
+        ''')
+    [warning] = warnings
+    assert warning.startswith('my_module.py:7: warning: this instantiation of f (with an int argument up to 5000) is '
+                              'likely to exceed -ftemplate-depth=900')
+
+def test_instantiation_report_and_template_depth_flags(tmpdir, capsys):
+    source_file_name = os.path.join(str(tmpdir), 'my_module.py')
+    with open(source_file_name, 'w') as file:
+        file.write('assert sum(range(10000)) == 49995000\n')
+    converter = py2tmp_main.ModuleConverter(module_path=[],
+                                            output_dir=None,
+                                            verbose=False,
+                                            cxx_std='c++14',
+                                            output_mode='header',
+                                            write_depfiles=False,
+                                            instantiation_report=True,
+                                            template_depth=900,
+                                            builtins=False)
+    converter.convert(source_file_name)
+    out, err = capsys.readouterr()
+    assert '(for c++14, without compiler intrinsics)' in out
+    assert '%s:1: warning: this instantiation of Int64ListSum' % source_file_name in err
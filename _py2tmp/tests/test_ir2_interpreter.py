@@ -0,0 +1,255 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Unit tests for the reference interpreter of IR2. The other tests only run it in the semantic and cross_check modes
+# (see TMPPY_TESTS_MODE), these check it directly.
+
+import textwrap
+
+import pytest
+
+from _py2tmp import ir2_interpreter
+from _py2tmp import ir_serialization
+from _py2tmp import main as py2tmp_main
+
+def _interpret(source):
+    serialized_ir = py2tmp_main.convert_to_cpp(textwrap.dedent(source), filename='my_module.py', emit_ir='ir2')
+    return ir2_interpreter.interpret_module(ir_serialization.deserialize_ir_snapshot(serialized_ir).ir)
+
+def _expect_evaluation_error(source, expected_error_regex):
+    with pytest.raises(ir2_interpreter.EvaluationError, match=expected_error_regex):
+        _interpret(source)
+
+@pytest.mark.parametrize('type1, type2', [
+    ('const int*', 'int const *'),
+    ('const volatile int', 'volatile const int'),
+    ('unsigned long int', 'long unsigned'),
+    ('int[3]', 'int [3]'),
+    ('int(*)(float, ...)', 'int (*) (float,...)'),
+    ('std::pair<int, const char*>', 'std::pair<int,char const*>'),
+])
+def test_equivalent_types_are_equal(type1, type2):
+    _interpret('''\
+        from tmppy import Type
+        assert Type('%s') == Type('%s')
+        ''' % (type1, type2))
+
+@pytest.mark.parametrize('type1, type2', [
+    ('int*', 'int'),
+    ('const int*', 'int* const'),
+    ('long', 'long long'),
+    ('int[3]', 'int[4]'),
+    ('std::pair<int, int>', 'std::pair<int, float>'),
+])
+def test_different_types_are_not_equal(type1, type2):
+    _interpret('''\
+        from tmppy import Type
+        assert Type('%s') != Type('%s')
+        ''' % (type1, type2))
+
+def test_type_literal_with_args():
+    _interpret('''\
+        from tmppy import Type
+        assert Type('const T*', T=Type('int')) == Type('int const*')
+        assert Type('std::pair<T, U>', T=Type('int'), U=Type('float')) == Type('std::pair<int, float>')
+        # cv-qualifiers are not duplicated, and references collapse.
+        assert Type('const T', T=Type('const int')) == Type('const int')
+        assert Type('T&', T=Type('int&&')) == Type('int&')
+        assert Type('T&&', T=Type('int&')) == Type('int&')
+        assert Type('T&&', T=Type('int&&')) == Type('int&&')
+        ''')
+
+def test_type_needing_cpp_compiler_unsupported():
+    with pytest.raises(ir2_interpreter.UnsupportedConstructError):
+        _interpret('''\
+            from tmppy import Type
+            assert Type('std::remove_pointer<int*>::type') == Type('int')
+            ''')
+
+def test_match_selects_most_specialized_case():
+    _interpret('''\
+        from tmppy import Type, TypePattern, match
+        def f(x: Type):
+            return match(x)({
+                TypePattern('T*'):
+                    lambda T:
+                        Type('double'),
+                TypePattern('int*'):
+                    lambda:
+                        Type('int'),
+                TypePattern('T'):
+                    lambda T:
+                        Type('void'),
+            })
+        assert f(Type('int*')) == Type('int')
+        assert f(Type('float*')) == Type('double')
+        assert f(Type('float')) == Type('void')
+        ''')
+
+def test_match_binds_type_variables():
+    _interpret('''\
+        from tmppy import Type, TypePattern, match
+        def f(x: Type):
+            return match(x)({
+                TypePattern('T(*)(U)'):
+                    lambda T, U:
+                        Type('double'),
+                TypePattern('int(*)(T)'):
+                    lambda T:
+                        T,
+            })
+        assert f(Type('int(*)(float)')) == Type('float')
+        assert f(Type('char(*)(float)')) == Type('double')
+        ''')
+
+def test_match_ambiguous_error():
+    _expect_evaluation_error('''\
+        from tmppy import Type, TypePattern, match
+        def f(x: Type):
+            return match(x)({
+                TypePattern('int(*)(T)'):
+                    lambda T:
+                        T,
+                TypePattern('T(*)(int)'):
+                    lambda T:
+                        T,
+            })
+        assert f(Type('int(*)(int)')) == Type('int')
+        ''',
+        'Ambiguous match')
+
+def test_match_no_match_error():
+    _expect_evaluation_error('''\
+        from tmppy import Type, TypePattern, match
+        def f(x: Type):
+            return match(x)({
+                TypePattern('T*'):
+                    lambda T:
+                        T,
+            })
+        assert f(Type('int')) == Type('int')
+        ''',
+        'No match')
+
+def test_int_division_rounds_towards_zero():
+    _interpret('''\
+        def div(x: int, y: int):
+            return x // y
+        def mod(x: int, y: int):
+            return x % y
+        assert div(7, 2) == 3
+        assert div(-7, 2) == -3
+        assert div(7, -2) == -3
+        assert div(-7, -2) == 3
+        assert mod(7, 2) == 1
+        assert mod(-7, 2) == -1
+        assert mod(7, -2) == 1
+        assert mod(-7, -2) == -1
+        ''')
+
+def test_int_division_by_zero_error():
+    _expect_evaluation_error('''\
+        def div(x: int, y: int):
+            return x // y
+        assert div(7, 0) == 0
+        ''',
+        'Division by zero')
+
+def test_int64_limits():
+    _interpret('''\
+        def add(x: int, y: int):
+            return x + y
+        assert add(9223372036854775806, 1) == 9223372036854775807
+        assert add(-9223372036854775807, -1) < 0
+        ''')
+
+@pytest.mark.parametrize('expr', [
+    'add(9223372036854775807, 1)',
+    'add(-9223372036854775807, -2)',
+    'mul(4294967296, 4294967296)',
+    'sum([9223372036854775807, 1])',
+])
+def test_int64_overflow_error(expr):
+    _expect_evaluation_error('''\
+        def add(x: int, y: int):
+            return x + y
+        def mul(x: int, y: int):
+            return x * y
+        assert %s == 0
+        ''' % expr,
+        'Integer overflow')
+
+def test_assertion_failure_error():
+    _expect_evaluation_error('''\
+        def f(x: int):
+            return x + 1
+        assert f(1) == 3, 'f is wrong'
+        ''',
+        'TMPPy assertion failed: f is wrong')
+
+def test_exception_caught():
+    _interpret('''\
+        from tmppy import Type
+        class MyError(Exception):
+            def __init__(self, x: int):
+                self.message = 'Something went wrong'
+                self.x = x
+        def f(x: int):
+            if x == 0:
+                raise MyError(x + 1)
+            return x
+        def g(x: int):
+            try:
+                return f(x)
+            except MyError as e:
+                return -e.x
+        assert g(0) == -1
+        assert g(5) == 5
+        ''')
+
+def test_uncaught_exception_error():
+    _expect_evaluation_error('''\
+        class MyError(Exception):
+            def __init__(self, x: int):
+                self.message = 'Something went wrong'
+                self.x = x
+        def f(x: int):
+            if x == 0:
+                raise MyError(x)
+            return x
+        assert f(0) == 0
+        ''',
+        'Something went wrong')
+
+def test_exception_in_list_comprehension_error():
+    _expect_evaluation_error('''\
+        class MyError1(Exception):
+            def __init__(self, x: int):
+                self.message = 'Something went wrong 1'
+                self.x = x
+        class MyError2(Exception):
+            def __init__(self, x: int):
+                self.message = 'Something went wrong 2'
+                self.x = x
+        def f(x: int):
+            if x == 1:
+                raise MyError1(x)
+            if x == 2:
+                raise MyError2(x)
+            return x
+        assert [f(x) for x in [0, 1, 2]] == [0, 1, 2]
+        ''',
+        # The exception raised for the first element is reported, as in the generated code.
+        'Something went wrong 1')
@@ -0,0 +1,59 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from _py2tmp import ir_serialization
+from _py2tmp import main as py2tmp_main
+from _py2tmp import module_interface
+
+_SOURCE = '''\
+def f(x: int):
+    return x + 1
+assert f(3) == 4
+'''
+
+@pytest.mark.parametrize('stage', ir_serialization.IR_STAGES)
+def test_resuming_from_ir_gives_same_result(stage):
+    serialized_ir = py2tmp_main.convert_to_cpp(_SOURCE, emit_ir=stage)
+    assert py2tmp_main.convert_ir_to_cpp(serialized_ir) == py2tmp_main.convert_to_cpp(_SOURCE)
+
+def test_load_not_an_ir_file_error():
+    with pytest.raises(ir_serialization.IrLoadError, match='Not a TMPPy IR file'):
+        ir_serialization.deserialize_ir_snapshot(b'some other content')
+
+def test_load_modified_ir_file_error():
+    serialized_ir = py2tmp_main.convert_to_cpp(_SOURCE, emit_ir='ir2')
+    modified_ir = serialized_ir[:-1] + bytes([serialized_ir[-1] ^ 1])
+    with pytest.raises(ir_serialization.IrLoadError, match='different version of py2tmp'):
+        ir_serialization.deserialize_ir_snapshot(modified_ir)
+
+def test_load_truncated_ir_file_error():
+    serialized_ir = py2tmp_main.convert_to_cpp(_SOURCE, emit_ir='ir2')
+    with pytest.raises(ir_serialization.IrLoadError, match='different version of py2tmp'):
+        ir_serialization.deserialize_ir_snapshot(serialized_ir[:20])
+
+def test_load_ir_file_from_other_py2tmp_version_error(monkeypatch):
+    serialized_ir = py2tmp_main.convert_to_cpp(_SOURCE, emit_ir='ir2')
+    monkeypatch.setattr(module_interface, 'compute_compiler_hash', lambda: 'some other hash')
+    with pytest.raises(ir_serialization.IrLoadError, match='different version of py2tmp'):
+        ir_serialization.deserialize_ir_snapshot(serialized_ir)
+
+def test_modified_ir_file_is_not_unpickled(monkeypatch):
+    serialized_ir = py2tmp_main.convert_to_cpp(_SOURCE, emit_ir='ir2')
+    def fail(*args, **kwargs):
+        raise AssertionError('The IR file was unpickled')
+    monkeypatch.setattr(ir_serialization.pickle, 'loads', fail)
+    with pytest.raises(ir_serialization.IrLoadError):
+        ir_serialization.deserialize_ir_snapshot(serialized_ir + b'\0')
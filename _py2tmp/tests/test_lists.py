@@ -467,9 +467,85 @@ def test_list_comprehension_from_custom_type_list_throws_in_function_caught_succ
 def test_list_comprehension_with_multiple_for_clauses_error():
     assert [y for x in [[1], [2]] for y in x]  # error: List comprehensions with multiple "for" clauses are not currently supported.
 
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_success():
+    from tmppy import Type, empty_list
+    assert [x for x in [1, 2] if x != 1] == [2]
+    assert [2 * x for x in [1, 2, 3, 4] if x % 2 == 0] == [4, 8]
+    assert [not b for b in [True, False, True] if b] == [False, False]
+    assert [Type('T*', T=x) for x in [Type('int'), Type('float')] if x != Type('int')] == [Type('float*')]
+    assert [x for x in [1, 2, 3] if x > 5] == empty_list(int)
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_custom_type_success():
+    class Int:
+        def __init__(self, n: int):
+            self.n = n
+    assert [x for x in [Int(1), Int(2), Int(3)] if x.n != 2] == [Int(1), Int(3)]
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_and_in_result_success():
+    def f(n: int):
+        return [x > 1 and x < n for x in [1, 2, 3, 4]]
+    assert f(4) == [False, True, True, False]
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_multiple_if_clauses_success():
+    assert [x for x in [1, 2, 3, 4, 5, 6] if x % 2 == 0 if x != 4] == [2, 6]
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_using_function_arg_success():
+    from typing import List
+    def f(l: List[int], n: int):
+        return [x + n for x in l if x > n]
+    assert f([1, 5, 2, 7], 2) == [7, 9]
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_long_list_success():
+    def f(n: int):
+        return [x for x in range(n) if x % 3 == 0]
+    assert len(f(5000)) == 1667
+    assert f(5000)[-1] == 4998
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_result_not_evaluated_for_filtered_out_elements_success():
+    from typing import List
+    def f(l: List[int], n: int):
+        return [l[x] for x in range(n) if x < len(l)]
+    assert f([5, 6, 7], 10) == [5, 6, 7]
+
+@assert_compilation_fails_with_static_assert_error('Something went wrong')
+def test_list_comprehension_with_if_clause_throws_toplevel():
+    class MyError(Exception):
+        def __init__(self, b: bool):
+            self.message = 'Something went wrong'
+            self.b = b
+    def f(n: int):
+        if n == 2:
+            raise MyError(True)
+        return True
+    assert [x for x in [1, 2, 3] if f(x)] == [1, 3]
+
+@assert_compilation_succeeds
+def test_list_comprehension_with_if_clause_throws_in_function_caught_success():
+    class MyError(Exception):
+        def __init__(self, n: int):
+            self.message = 'Something went wrong'
+            self.n = n
+    def f(n: int):
+        if n == 2:
+            raise MyError(n)
+        return True
+    def g(b: bool):
+        try:
+            return [x for x in [1, 2, 3] if f(x)]
+        except MyError as e:
+            return [e.n]
+    assert g(True) == [2]
+
 @assert_conversion_fails
-def test_list_comprehension_with_if_clause_error():
-    assert [x for x in [1, 2] if x != 1]  # error: "if" clauses in list comprehensions are not currently supported.
+def test_list_comprehension_with_if_clause_not_bool_error():
+    assert [x for x in [1, 2] if x]  # error: The condition in a list comprehension must have type bool, but was: int
 
 @assert_conversion_fails
 def test_list_comprehension_with_unpacking_error():
@@ -491,6 +567,167 @@ def test_list_comprehension_transforming_to_function_list_error():
         return b
     assert [f for x in [1, 2]]  # error: Creating lists of functions is not supported. The elements of this list have type: \(bool\) -> bool
 
+@assert_compilation_succeeds
+def test_range_success():
+    assert range(4) == [0, 1, 2, 3]
+
+@assert_compilation_succeeds
+def test_range_with_begin_success():
+    assert range(-2, 3) == [-2, -1, 0, 1, 2]
+
+@assert_compilation_succeeds
+def test_range_empty_success():
+    from tmppy import empty_list
+    assert range(0) == empty_list(int)
+    assert range(5, 5) == empty_list(int)
+    assert range(5, 2) == empty_list(int)
+
+@assert_compilation_succeeds
+def test_range_with_vars_success():
+    def f(n: int):
+        l = range(n)
+        return [2 * x for x in l]
+    assert f(3) == [0, 2, 4]
+
+@assert_compilation_succeeds
+def test_range_long_success():
+    assert sum([x for x in range(2000)]) == 1999000
+    assert sum(range(1000, 3000)) == 3999000
+
+@assert_conversion_fails
+def test_range_bool_error():
+    assert range(True) == [0]  # error: The arguments of range\(\) must have type int. Got type: bool
+
+@assert_conversion_fails
+def test_range_bool_error_using_var():
+    def f(b: bool):  # note: b was defined here
+        return range(1, b)  # error: The arguments of range\(\) must have type int. Got type: bool
+
+@assert_conversion_fails
+def test_range_with_keyword_argument_error():
+    assert range(3, stop=5) == [3, 4]  # error: Keyword arguments are not supported.
+
+@assert_conversion_fails
+def test_range_with_step_error():
+    assert range(0, 10, 2) == [0, 2, 4, 6, 8]  # error: range\(\) takes 1 or 2 arguments. Got: 3
+
+@assert_compilation_succeeds
+def test_len_success():
+    from tmppy import Type, empty_list
+    assert len([5, 1, 34]) == 3
+    assert len([True, True]) == 2
+    assert len([Type('int'), Type('int')]) == 2
+    assert len(empty_list(int)) == 0
+
+@assert_compilation_succeeds
+def test_len_with_vars_success():
+    def f(n: int):
+        l = range(n)
+        return len(l + [n])
+    assert f(5) == 6
+
+@assert_conversion_fails
+def test_len_set_error():
+    assert len({1, 2}) == 2  # error: The argument of len\(\) must be a list. Got type: Set\[int\]
+
+@assert_conversion_fails
+def test_len_int_error_using_var():
+    def f(n: int):  # note: n was defined here
+        return len(n)  # error: The argument of len\(\) must be a list. Got type: int
+
+@assert_conversion_fails
+def test_len_with_multiple_arguments_error():
+    assert len([1], [2]) == 1  # error: len\(\) takes 1 argument. Got: 2
+
+@assert_compilation_succeeds
+def test_list_index_success():
+    from tmppy import Type
+    assert [5, 1, 34][1] == 1
+    assert [True, False][1] == False
+    assert [Type('int'), Type('float'), Type('double')][2] == Type('double')
+
+@assert_compilation_succeeds
+def test_list_index_negative_success():
+    from tmppy import Type
+    assert [5, 1, 34][-1] == 34
+    assert [True, False][-2] == True
+    assert [Type('int'), Type('float'), Type('double')][-3] == Type('int')
+
+@assert_compilation_succeeds
+def test_list_index_custom_type_success():
+    class Int:
+        def __init__(self, n: int):
+            self.n = n
+    assert [Int(3), Int(7)][1] == Int(7)
+    assert [Int(3), Int(7)][0].n == 3
+
+@assert_compilation_succeeds
+def test_list_index_with_vars_success():
+    def f(n: int):
+        l = range(n, 2 * n)
+        return l[n - 1]
+    assert f(3) == 5
+    assert f(1000) == 1999
+
+@assert_compilation_fails_with_static_assert_error('TMPPy list index out of range')
+def test_list_index_out_of_range_error():
+    def f(n: int):
+        return [1, 2, 3][n]
+    assert f(3) == 1
+
+@assert_compilation_fails_with_static_assert_error('TMPPy list index out of range')
+def test_list_index_negative_out_of_range_error():
+    def f(n: int):
+        return [1, 2, 3][n]
+    assert f(-4) == 1
+
+@assert_conversion_fails
+def test_list_index_bool_error():
+    assert [1, 2][True] == 2  # error: List indices must be ints, but this value has type bool.
+
+@assert_conversion_fails
+def test_int_index_error():
+    def f(n: int):
+        return n[0]  # error: Subscripting is only supported for lists, but this value has type int.
+
+@assert_conversion_fails
+def test_list_slice_error():
+    assert [1, 2][0:1] == [1]  # error: Slices are not supported.
+
+@assert_compilation_succeeds
+def test_in_list_success():
+    from tmppy import Type
+    assert 34 in [5, 1, 34]
+    assert not (3 in [5, 1, 34])
+    assert True in [False, True]
+    assert Type('float') in [Type('int'), Type('float')]
+    assert Type('double') not in [Type('int'), Type('float')]
+
+@assert_compilation_succeeds
+def test_in_list_with_duplicates_success():
+    class Int:
+        def __init__(self, n: int):
+            self.n = n
+    assert 1 in [1, 1, 2, 2]
+    assert Int(2) in [Int(1), Int(2), Int(2)]
+    assert Int(3) not in [Int(1), Int(2), Int(2)]
+
+@assert_compilation_succeeds
+def test_in_list_with_vars_success():
+    def f(n: int):
+        return 999 in range(n)
+    assert f(1000) == True
+    assert f(999) == False
+
+@assert_conversion_fails
+def test_in_list_type_mismatch_error():
+    assert True in [1, 2]  # error: Type mismatch in "in": bool vs List\[int\]
+
+@assert_conversion_fails
+def test_in_int_error():
+    def f(n: int):
+        return 1 in n  # error: The RHS of "in" must be a list, but this value has type int.
+
 @assert_compilation_succeeds
 def test_sum_success():
     assert sum([5, 1, 34]) == 40
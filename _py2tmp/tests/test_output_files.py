@@ -0,0 +1,172 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import textwrap
+
+from _py2tmp import main as py2tmp_main
+from _py2tmp import module_interface
+from _py2tmp import utils
+
+# An mtime in the past, set on the outputs to check whether a later conversion rewrites them.
+_OLD_MTIME = 1000000000
+
+def _write_module(dir_name, module_name, source):
+    source_file_name = os.path.join(str(dir_name), module_name + '.py')
+    with open(source_file_name, 'w') as file:
+        file.write(textwrap.dedent(source))
+    return source_file_name
+
+def _create_converter(write_depfiles=False):
+    return py2tmp_main.ModuleConverter(module_path=[],
+                                       output_dir=None,
+                                       verbose=False,
+                                       cxx_std='c++11',
+                                       output_mode='header',
+                                       write_depfiles=write_depfiles)
+
+def _set_old_mtime(file_names):
+    for file_name in file_names:
+        os.utime(file_name, (_OLD_MTIME, _OLD_MTIME))
+
+def test_write_file_if_changed_keeps_mtime_when_unchanged(tmpdir):
+    file_name = str(tmpdir.join('f.h'))
+    utils.write_file_if_changed(file_name, 'content')
+    _set_old_mtime([file_name])
+    utils.write_file_if_changed(file_name, 'content')
+    assert os.path.getmtime(file_name) == _OLD_MTIME
+    utils.write_file_if_changed(file_name, 'new content')
+    assert os.path.getmtime(file_name) != _OLD_MTIME
+    with open(file_name) as file:
+        assert file.read() == 'new content'
+
+def test_write_file_if_changed_binary(tmpdir):
+    file_name = str(tmpdir.join('f.bin'))
+    utils.write_file_if_changed(file_name, b'\x00\x01')
+    _set_old_mtime([file_name])
+    utils.write_file_if_changed(file_name, b'\x00\x01')
+    assert os.path.getmtime(file_name) == _OLD_MTIME
+    utils.write_file_if_changed(file_name, b'\x00\x02')
+    with open(file_name, 'rb') as file:
+        assert file.read() == b'\x00\x02'
+
+def test_rerunning_conversion_keeps_outputs_unchanged(tmpdir):
+    source_file_name = _write_module(tmpdir, 'my_module', '''\
+        def f(x: int):
+            return x + 1
+        assert f(3) == 4
+        ''')
+    converter = _create_converter(write_depfiles=True)
+    converter.convert(source_file_name)
+    output_file_name = converter.output_file_name_for_source_file(source_file_name)
+    output_file_names = [output_file_name,
+                         output_file_name + '.d',
+                         converter.interface_file_name_for_source_file(source_file_name)]
+    _set_old_mtime(output_file_names)
+
+    # A new converter, as in a separate py2tmp run.
+    _create_converter(write_depfiles=True).convert(source_file_name)
+    for file_name in output_file_names:
+        assert os.path.getmtime(file_name) == _OLD_MTIME, file_name
+
+def test_rerunning_conversion_after_source_change_rewrites_output(tmpdir):
+    source_file_name = _write_module(tmpdir, 'my_module', '''\
+        def f(x: int):
+            return x + 1
+        ''')
+    converter = _create_converter()
+    converter.convert(source_file_name)
+    output_file_name = converter.output_file_name_for_source_file(source_file_name)
+    _set_old_mtime([output_file_name])
+
+    _write_module(tmpdir, 'my_module', '''\
+        def f(x: int):
+            return x + 2
+        ''')
+    _create_converter().convert(source_file_name)
+    assert os.path.getmtime(output_file_name) != _OLD_MTIME
+
+def _read_depfile(depfile_name):
+    with open(depfile_name) as file:
+        content = file.read().replace('\\\n', ' ')
+    target, dependencies = content.split(': ', 1)
+    return target, dependencies.split()
+
+def test_depfile_lists_imported_module_sources(tmpdir):
+    my_module_file_name = _write_module(tmpdir, 'my_module', '''\
+        def f(x: int):
+            return x + 1
+        ''')
+    my_other_module_file_name = _write_module(tmpdir, 'my_other_module', '''\
+        from my_module import f
+        def g(x: int):
+            return f(x) * 2
+        ''')
+    main_module_file_name = _write_module(tmpdir, 'main_module', '''\
+        from my_other_module import g
+        assert g(1) == 4
+        ''')
+    converter = _create_converter(write_depfiles=True)
+    converter.convert(main_module_file_name)
+
+    output_file_name = converter.output_file_name_for_source_file(main_module_file_name)
+    target, dependencies = _read_depfile(output_file_name + '.d')
+    assert target == output_file_name
+    assert dependencies[0] == main_module_file_name
+    # Also the modules imported indirectly.
+    assert os.path.abspath(my_other_module_file_name) in dependencies
+    assert os.path.abspath(my_module_file_name) in dependencies
+    # The py2tmp sources.
+    assert os.path.abspath(py2tmp_main.__file__) in dependencies
+    assert os.path.abspath(module_interface.__file__) in dependencies
+
+def test_depfile_escapes_special_characters():
+    assert (py2tmp_main._depfile_content('out dir/f.h', ['my dir/f#1.py', 'g$.py'])
+            == 'out\\ dir/f.h: my\\ dir/f\\#1.py \\\n  g$$.py\n')
+
+def test_interface_records_which_functions_may_throw(tmpdir):
+    source_file_name = _write_module(tmpdir, 'my_module', '''\
+        class MyError(Exception):
+            def __init__(self, b: bool):
+                self.message = 'error in my_module'
+                self.b = b
+        def f(x: int):
+            if x == 0:
+                raise MyError(True)
+            return x + 1
+        def g(x: int):
+            return x + 1
+        ''')
+    interface = _create_converter().convert(source_file_name)
+    assert sorted(interface.function_may_throw_by_name.keys()) == ['f', 'g']
+    # This is conservative: functions that can't throw (like g) are also considered as possibly throwing.
+    assert interface.function_may_throw_by_name['f']
+
+def test_adding_function_keeps_identifiers_of_toplevel_assertions():
+    source = textwrap.dedent('''\
+        def f(x: int):
+            return x + 1
+        assert f(3) == 4
+        assert [f(x) for x in [1, 2]] == [2, 3]
+        assert [f(x) for x in [1, 2]] == [2, 3]
+        ''')
+    new_source = textwrap.dedent('''\
+        def g(x: int):
+            return x * 2
+        ''') + source
+    identifiers = set(re.findall('TmppyInternal_[0-9a-f]+', py2tmp_main.convert_to_cpp(source)))
+    new_identifiers = set(re.findall('TmppyInternal_[0-9a-f]+', py2tmp_main.convert_to_cpp(new_source)))
+    # The assertions moved to different lines, but the identifiers generated for them are the same.
+    assert identifiers <= new_identifiers
@@ -0,0 +1,118 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import textwrap
+
+import pytest
+
+from py2tmp.testing import *
+from _py2tmp import main as py2tmp_main
+from _py2tmp.testing import utils as testing_utils
+
+@assert_compilation_succeeds_with_output_mode('pch_header')
+def test_pch_header_function_ok():
+    def f(x: int):
+        return x + 1
+    assert f(3) == 4
+
+@assert_compilation_succeeds_with_output_mode('pch_header')
+def test_pch_header_custom_types_and_exceptions_ok():
+    from tmppy import Type
+    class MyError(Exception):
+        def __init__(self, b: bool):
+            self.message = 'Something went wrong'
+            self.b = b
+    class MyPair:
+        def __init__(self, x: int, t: Type):
+            self.x = x
+            self.t = t
+    def f(b: bool):
+        if b:
+            raise MyError(b)
+        return MyPair(1, Type('int'))
+    def g(b: bool):
+        try:
+            return f(b).x
+        except MyError as e:
+            return 2
+    assert g(False) == 1
+    assert g(True) == 2
+
+@assert_compilation_succeeds_with_output_mode('pch_header')
+def test_pch_header_lists_ok():
+    def f(n: int):
+        return sum([x for x in range(n) if x % 2 == 0])
+    assert f(10) == 20
+
+@assert_compilation_succeeds_with_output_mode('module')
+def test_module_function_ok():
+    def f(x: int):
+        return x + 1
+    assert f(3) == 4
+
+@assert_compilation_succeeds_with_output_mode('module')
+def test_module_custom_types_and_exceptions_ok():
+    from tmppy import Type
+    class MyError(Exception):
+        def __init__(self, b: bool):
+            self.message = 'Something went wrong'
+            self.b = b
+    class MyPair:
+        def __init__(self, x: int, t: Type):
+            self.x = x
+            self.t = t
+    def f(b: bool):
+        if b:
+            raise MyError(b)
+        return MyPair(1, Type('int'))
+    def g(b: bool):
+        try:
+            return f(b).x
+        except MyError as e:
+            return 2
+    assert g(False) == 1
+    assert g(True) == 2
+
+@assert_compilation_succeeds_with_output_mode('module')
+def test_module_lists_ok():
+    def f(n: int):
+        return sum([x for x in range(n) if x % 2 == 0])
+    assert f(10) == 20
+
+def test_module_source_file_name_starting_with_digit(tmpdir):
+    source_file_name = os.path.join(str(tmpdir), '1mod.py')
+    with open(source_file_name, 'w') as file:
+        file.write(textwrap.dedent('''\
+            def f(x: int):
+                return x + 1
+            assert f(3) == 4
+            '''))
+    converter = py2tmp_main.ModuleConverter(module_path=[],
+                                            output_dir=None,
+                                            verbose=False,
+                                            cxx_std='c++20',
+                                            output_mode='module',
+                                            write_depfiles=False)
+    interface = converter.convert(source_file_name)
+    assert interface.module_name == '_1mod'
+    with open(interface.output_file_name) as file:
+        assert 'export module _1mod;\n' in file.read()
+
+    module_flags = testing_utils.compiler.compile_module_interface(interface.output_file_name,
+                                                                   interface.module_name,
+                                                                   str(tmpdir),
+                                                                   [testing_utils.config.MPYL_INCLUDE_DIR])
+    if module_flags is None:
+        pytest.skip('The compiler doesn\'t support C++20 modules.')
@@ -0,0 +1,122 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from _py2tmp import main as py2tmp_main
+from _py2tmp import parallel_lowering
+from _py2tmp import utils
+
+_SOURCE = '''\
+from tmppy import Type
+from typing import List
+class MyError(Exception):
+    def __init__(self, b: bool):
+        self.message = 'Something went wrong'
+        self.b = b
+class MyPair:
+    def __init__(self, x: int, t: Type):
+        self.x = x
+        self.t = t
+def f(x: int):
+    if x == 0:
+        raise MyError(True)
+    return x + 1
+def g(x: int):
+    try:
+        return f(x)
+    except MyError as e:
+        return -1
+def h(l: List[int]):
+    return sum([f(x) for x in l if x > 2])
+def make_pair(x: int):
+    return MyPair(g(x), Type('int'))
+def is_int(t: Type):
+    return t == Type('int')
+assert g(0) == -1
+assert g(1) == 2
+assert h([1, 2, 3, 4]) == 9
+assert make_pair(3).x == 4
+assert is_int(make_pair(3).t)
+'''
+
+# Identical assertions are converted in different scopes (by their index), so they can still be converted in different
+# processes.
+_SOURCE_WITH_DUPLICATE_ASSERTIONS = _SOURCE + '''\
+assert g(1) == 2
+assert g(1) == 2
+assert is_int(Type('int'))
+assert is_int(Type('int'))
+'''
+
+@pytest.fixture
+def lowering_results(monkeypatch):
+    '''Records the results of parallel_lowering.lower_module_to_ir0, to check that the parallel lowering was used.'''
+    results = []
+    lower_module_to_ir0 = parallel_lowering.lower_module_to_ir0
+    def recording_lower_module_to_ir0(*args, **kwargs):
+        result = lower_module_to_ir0(*args, **kwargs)
+        results.append(result)
+        return result
+    monkeypatch.setattr(parallel_lowering, 'lower_module_to_ir0', recording_lower_module_to_ir0)
+    return results
+
+@pytest.mark.parametrize('source', [_SOURCE, _SOURCE_WITH_DUPLICATE_ASSERTIONS])
+@pytest.mark.parametrize('module_name', [None, 'my_module'])
+def test_parallel_lowering_same_result_as_sequential(source, module_name, lowering_results):
+    sequential_result = py2tmp_main.convert_to_cpp(source, module_name=module_name, jobs=1)
+    assert lowering_results == []
+    parallel_result = py2tmp_main.convert_to_cpp(source, module_name=module_name, jobs=2)
+    assert len(lowering_results) == 1 and lowering_results[0] is not None
+    assert parallel_result == sequential_result
+
+def test_parallel_lowering_more_jobs_than_functions_same_result_as_sequential(lowering_results):
+    assert py2tmp_main.convert_to_cpp(_SOURCE, jobs=64) == py2tmp_main.convert_to_cpp(_SOURCE, jobs=1)
+    assert len(lowering_results) == 1 and lowering_results[0] is not None
+
+def test_parallel_lowering_identifier_collision_falls_back_to_sequential(monkeypatch, lowering_results):
+    sequential_result = py2tmp_main.convert_to_cpp(_SOURCE, jobs=1)
+    # Simulates a collision between the identifiers generated by different processes.
+    monkeypatch.setattr(utils.IdentifierGenerator, 'merge', lambda self, other: False)
+    parallel_result = py2tmp_main.convert_to_cpp(_SOURCE, jobs=2)
+    assert lowering_results == [None]
+    assert parallel_result == sequential_result
+
+def test_identifier_generator_merge_collision():
+    identifier_generator = utils.IdentifierGenerator()
+    other_identifier_generator = utils.IdentifierGenerator()
+    with identifier_generator.scope('f'):
+        identifier = next(identifier_generator)
+    with other_identifier_generator.scope('g'):
+        next(other_identifier_generator)
+    # A different origin for the same identifier, as if the hashes of the two origins collided.
+    other_identifier_generator.origins_by_identifier[identifier] = 'g#1'
+
+    assert not identifier_generator.merge(other_identifier_generator)
+    # The generator is unchanged.
+    assert identifier_generator.origins_by_identifier == {identifier: 'f#0'}
+    assert dict(identifier_generator.next_index_by_scope) == {'f': 1}
+
+def test_identifier_generator_merge_same_origin_ok():
+    identifier_generator = utils.IdentifierGenerator()
+    other_identifier_generator = utils.IdentifierGenerator()
+    with identifier_generator.scope('f'):
+        identifier = next(identifier_generator)
+    with other_identifier_generator.scope('f'):
+        assert next(other_identifier_generator) == identifier
+    with other_identifier_generator.scope('g'):
+        other_identifier = next(other_identifier_generator)
+
+    assert identifier_generator.merge(other_identifier_generator)
+    assert identifier_generator.origins_by_identifier == {identifier: 'f#0', other_identifier: 'g#0'}
@@ -385,9 +385,23 @@ def test_set_comprehension_from_custom_type_set_throws_in_function_caught_succes
 def test_set_comprehension_with_multiple_for_clauses_error():
     assert {y for x in {{1}, {2}} for y in x}  # error: Set comprehensions with multiple "for" clauses are not currently supported.
 
+@assert_compilation_succeeds
+def test_set_comprehension_with_if_clause_success():
+    from tmppy import Type
+    assert {x for x in {1, 2} if x != 1} == {2}
+    assert {x % 3 for x in {1, 2, 4, 5, 6} if x != 6} == {1, 2}
+    assert {Type('T*', T=x) for x in {Type('int'), Type('float')} if x != Type('int')} == {Type('float*')}
+
+@assert_compilation_succeeds
+def test_set_comprehension_over_variable_with_if_clause_success():
+    def f(n: int):
+        s = {n, n + 1, n + 2}
+        return {x * 2 for x in s if x != n}
+    assert f(3) == {8, 10}
+
 @assert_conversion_fails
-def test_set_comprehension_with_if_clause_error():
-    assert {x for x in {1, 2} if x != 1}  # error: "if" clauses in set comprehensions are not currently supported.
+def test_set_comprehension_with_if_clause_not_bool_error():
+    assert {x for x in {1, 2} if x}  # error: The condition in a set comprehension must have type bool, but was: int
 
 @assert_conversion_fails
 def test_set_comprehension_with_unpacking_error():
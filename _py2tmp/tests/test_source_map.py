@@ -0,0 +1,200 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import re
+import textwrap
+
+import pytest
+
+from _py2tmp import ir0
+from _py2tmp import ir_serialization
+from _py2tmp import main as py2tmp_main
+from _py2tmp import source_map
+from _py2tmp.testing import utils as testing_utils
+
+_SOURCE = '''\
+def f(x: int):
+    if x == 0:
+        y = 1
+    else:
+        y = 2
+    return y + x
+class MyType:
+    def __init__(self, x: int):
+        self.x = x
+assert f(0) == 1
+assert f(5) == 7, 'not: 3: a location'
+'''
+
+def _get_template_defns_by_description(toplevel_elems):
+    result = dict()
+    def process_elems(elems):
+        for elem in elems:
+            if isinstance(elem, ir0.TemplateDefn):
+                result.setdefault(elem.description, []).append(elem)
+                for specialization in [elem.main_definition] + elem.specializations:
+                    if specialization:
+                        process_elems(specialization.body)
+    process_elems(toplevel_elems)
+    return result
+
+def _compute_source_map(source=_SOURCE):
+    snapshot = ir_serialization.deserialize_ir_snapshot(py2tmp_main.convert_to_cpp(source,
+                                                                                   filename='my_module.py',
+                                                                                   emit_ir='ir0'))
+    toplevel_elems = snapshot.ir.content
+    locations_by_identifier = source_map.compute_source_map(snapshot,
+                                                            source_map.get_template_source_lines(toplevel_elems))
+    return locations_by_identifier, _get_template_defns_by_description(toplevel_elems)
+
+def _convert(tmpdir, **kwargs):
+    source_file_name = os.path.join(str(tmpdir), 'my_module.py')
+    with open(source_file_name, 'w') as file:
+        file.write(_SOURCE)
+    converter = py2tmp_main.ModuleConverter(module_path=[],
+                                            output_dir=None,
+                                            verbose=False,
+                                            cxx_std='c++11',
+                                            output_mode='header',
+                                            write_depfiles=False,
+                                            **kwargs)
+    converter.convert(source_file_name)
+    return converter, source_file_name
+
+def test_if_else_helper_mapped_to_branch_lines():
+    locations_by_identifier, template_defns_by_description = _compute_source_map()
+    [if_else_template_defn] = template_defns_by_description['(meta)function generated for an if-else statement']
+    location = locations_by_identifier[if_else_template_defn.name]
+    assert (location.kind, location.name, location.file, location.line) == ('function', 'f', 'my_module.py', 2)
+    assert location.specialization_lines == [3, 5]
+
+def test_code_after_if_else_mapped_to_first_statement_after_it():
+    locations_by_identifier, template_defns_by_description = _compute_source_map()
+    [then_template_defn] = template_defns_by_description['(meta)function wrapping the code after an if-else statement']
+    location = locations_by_identifier[then_template_defn.name]
+    assert (location.kind, location.name, location.line) == ('function', 'f', 6)
+
+def test_function_and_custom_type_mapped_to_definition_line():
+    locations_by_identifier, _ = _compute_source_map()
+    assert str(locations_by_identifier['f']) == 'my_module.py:1 (function f)'
+    custom_type_locations = {str(location)
+                             for location in locations_by_identifier.values()
+                             if location.kind == 'custom_type'}
+    assert custom_type_locations == {'my_module.py:7 (custom type MyType)'}
+
+def test_assertions_mapped_to_their_line():
+    locations_by_identifier, _ = _compute_source_map()
+    assertion_locations = {str(location)
+                           for location in locations_by_identifier.values()
+                           if location.kind == 'assertion'}
+    # The location is not parsed from the message, so a message that looks like a location doesn't matter.
+    assert assertion_locations == {'my_module.py:10 (assertion assert f(0) == 1)',
+                                   'my_module.py:11 (assertion assert f(5) == 7, \'not: 3: a location\')'}
+
+def test_write_source_maps(tmpdir):
+    converter, source_file_name = _convert(tmpdir, write_source_maps=True)
+    output_file_name = converter.output_file_name_for_source_file(source_file_name)
+    source_map_file_name = os.path.join(str(tmpdir), 'my_module' + source_map.SOURCE_MAP_FILE_SUFFIX)
+    with open(source_map_file_name) as file:
+        content = json.load(file)
+    assert content['format_version'] == source_map.FORMAT_VERSION
+    assert content['source_file'] == source_file_name
+
+    locations_by_identifier = source_map.load_source_map(source_map_file_name)
+    with open(output_file_name) as file:
+        [if_else_template_name] = re.findall(r'struct (TmppyInternal_[0-9a-f]+)<[^\n]*, true>', file.read())
+    assert str(locations_by_identifier['f']) == '%s:1 (function f)' % source_file_name
+    assert str(locations_by_identifier[if_else_template_name]) == '%s:2 (function f)' % source_file_name
+    assert locations_by_identifier[if_else_template_name].specialization_lines == [3, 5]
+
+def test_load_source_map_rejects_other_format_version(tmpdir):
+    source_map_file_name = str(tmpdir.join('my_module' + source_map.SOURCE_MAP_FILE_SUFFIX))
+    with open(source_map_file_name, 'w') as file:
+        json.dump({'format_version': source_map.FORMAT_VERSION - 1, 'source_file': 'my_module.py', 'identifiers': {}},
+                  file)
+    with pytest.raises(source_map.SourceMapLoadError, match='different version of py2tmp'):
+        source_map.load_source_map(source_map_file_name)
+
+def test_load_source_map_corrupted(tmpdir):
+    source_map_file_name = str(tmpdir.join('my_module' + source_map.SOURCE_MAP_FILE_SUFFIX))
+    with open(source_map_file_name, 'w') as file:
+        file.write('{')
+    with pytest.raises(source_map.SourceMapLoadError, match='corrupted source map'):
+        source_map.load_source_map(source_map_file_name)
+
+def test_line_directives(tmpdir):
+    converter, source_file_name = _convert(tmpdir, line_directives=True)
+    with open(converter.output_file_name_for_source_file(source_file_name)) as file:
+        output = file.read()
+    def line_directive(line):
+        return re.escape('#line %s "%s"\n' % (line, source_file_name))
+    # The templates generated for f, for the if-else and for the code after it. The directive is repeated before each
+    # line of the generated code.
+    assert re.search(line_directive(1) + r'template <[^\n]*> struct f ', output)
+    assert re.search(line_directive(3) + r'template <[^\n]*>\n' + line_directive(3)
+                     + r'struct TmppyInternal_[0-9a-f]+<[^\n]*, true>',
+                     output)
+    assert re.search(line_directive(5) + r'template <[^\n]*>\n' + line_directive(5)
+                     + r'struct TmppyInternal_[0-9a-f]+<[^\n]*, false>',
+                     output)
+    assert re.search(line_directive(6) + r'template <[^\n]*>\n' + line_directive(6)
+                     + r'struct TmppyInternal_[0-9a-f]+ {',
+                     output)
+    assert re.search(line_directive(10) + 'static_assert', output)
+    assert re.search(line_directive(11) + 'static_assert', output)
+
+def test_line_directives_exact_in_compiler_diagnostics(tmpdir):
+    source_file_name = os.path.join(str(tmpdir), 'my_module.py')
+    with open(source_file_name, 'w') as file:
+        file.write(textwrap.dedent('''\
+            from tmppy import Type
+
+            def f(n: int) -> int:
+                assert n != 3
+                if n == 0:
+                    return 0
+                else:
+                    return f(n - 1) + 1
+
+            def g(x: Type):
+                return x
+
+            assert f(5) == 5
+            '''))
+    converter = py2tmp_main.ModuleConverter(module_path=[],
+                                            output_dir=None,
+                                            verbose=False,
+                                            cxx_std=testing_utils.config.CXX_STANDARD,
+                                            output_mode='header',
+                                            write_depfiles=False,
+                                            line_directives=True)
+    converter.convert(source_file_name)
+    cpp_file_name = os.path.join(str(tmpdir), 'main.cpp')
+    with open(cpp_file_name, 'w') as file:
+        file.write('#include "my_module.h"\n')
+
+    with pytest.raises(testing_utils.CompilationFailedException) as e:
+        testing_utils.compiler.compile_discarding_output(cpp_file_name,
+                                                         include_dirs=[testing_utils.config.MPYL_INCLUDE_DIR,
+                                                                       str(tmpdir)])
+    # GCC and Clang report e.g. "my_module.py:4:11", MSVC reports "my_module.py(4)".
+    reported_lines = [int(line)
+                      for line in re.findall(re.escape(source_file_name) + r'[:(]([0-9]+)', e.value.error_message)]
+    assert 4 in reported_lines
+    assert 13 in reported_lines
+    # The whole instantiation backtrace is within f, apart from the toplevel assertion.
+    assert all(3 <= line <= 8 or line == 13 for line in reported_lines), e.value.error_message
@@ -0,0 +1,100 @@
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+from _py2tmp import source_map
+
+_TIME_TRACE_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        '..', '..', 'extras', 'benchmark', 'time_trace_profile.py')
+
+# A trace as written by Clang's -ftime-trace (only the relevant fields), for an instantiation of f<5> that instantiates
+# the helper for an if-else in f, that in turn instantiates f<4>. Then std::is_same is instantiated.
+_TRACE = {
+    'traceEvents': [
+        {'ph': 'X', 'name': 'Source', 'ts': 0, 'dur': 1000, 'tid': 1, 'args': {'detail': 'main.cpp'}},
+        {'ph': 'X', 'name': 'InstantiateClass', 'ts': 0, 'dur': 100, 'tid': 1, 'args': {'detail': 'f<5>'}},
+        {'ph': 'X', 'name': 'InstantiateClass', 'ts': 10, 'dur': 50, 'tid': 1,
+         'args': {'detail': 'TmppyInternal_0123456789<5, false>'}},
+        {'ph': 'X', 'name': 'InstantiateClass', 'ts': 20, 'dur': 20, 'tid': 1, 'args': {'detail': 'f<4>'}},
+        {'ph': 'X', 'name': 'InstantiateClass', 'ts': 200, 'dur': 30, 'tid': 1,
+         'args': {'detail': 'std::is_same<int, int>'}},
+    ],
+}
+
+_LOCATIONS_BY_IDENTIFIER = {
+    'f': source_map.SourceLocation(kind='function', name='f', file='foo.py', line=1, specialization_lines=[]),
+    'TmppyInternal_0123456789': source_map.SourceLocation(kind='function', name='f', file='foo.py', line=2,
+                                                          specialization_lines=[3, 5]),
+}
+
+def _load_time_trace_profile_module():
+    spec = importlib.util.spec_from_file_location('time_trace_profile', _TIME_TRACE_PROFILE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_compute_hot_spots():
+    time_trace_profile = _load_time_trace_profile_module()
+    hot_spots = time_trace_profile.compute_hot_spots(_TRACE, _LOCATIONS_BY_IDENTIFIER)
+    assert [(hot_spot.source, hot_spot.self_time_us, hot_spot.total_time_us, hot_spot.num_instantiations)
+            for hot_spot in hot_spots] == [
+        # The time of f<4> is only counted once in the total time, since it's nested in f<5>.
+        ('foo.py:1 (function f)', 70, 100, 2),
+        ('(template is_same)', 30, 30, 1),
+        ('foo.py:2 (function f)', 30, 50, 1),
+    ]
+
+def test_profile_existing_trace(tmpdir):
+    trace_file_name = str(tmpdir.join('main.json'))
+    with open(trace_file_name, 'w') as file:
+        json.dump(_TRACE, file)
+    source_map_file_name = str(tmpdir.join('foo' + source_map.SOURCE_MAP_FILE_SUFFIX))
+    with open(source_map_file_name, 'w') as file:
+        file.write(source_map.serialize_source_map('foo.py', _LOCATIONS_BY_IDENTIFIER))
+
+    output = subprocess.check_output([sys.executable, _TIME_TRACE_PROFILE_PATH,
+                                      '--trace', trace_file_name,
+                                      '--source-map', source_map_file_name,
+                                      '--max-hot-spots', '2'],
+                                     universal_newlines=True)
+    assert output.splitlines() == [
+        'Total template instantiation time: 0.1ms',
+        ' Self time         Total time Instantiations  Source',
+        '     0.1ms  53.8%       0.1ms              2  foo.py:1 (function f)',
+        '     0.0ms  23.1%       0.0ms              1  (template is_same)',
+        '(1 more not shown)',
+    ]
+
+def test_profile_rejects_source_map_of_other_version(tmpdir):
+    trace_file_name = str(tmpdir.join('main.json'))
+    with open(trace_file_name, 'w') as file:
+        json.dump(_TRACE, file)
+    source_map_file_name = str(tmpdir.join('foo' + source_map.SOURCE_MAP_FILE_SUFFIX))
+    with open(source_map_file_name, 'w') as file:
+        json.dump({'format_version': source_map.FORMAT_VERSION - 1, 'source_file': 'foo.py', 'identifiers': {}}, file)
+
+    process = subprocess.run([sys.executable, _TIME_TRACE_PROFILE_PATH,
+                              '--trace', trace_file_name,
+                              '--source-map', source_map_file_name],
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    assert process.returncode != 0
+    assert 'this source map was written by a different version of py2tmp' in process.stderr
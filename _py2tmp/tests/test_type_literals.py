@@ -64,6 +64,20 @@ def test_type_function_pointer_literal_success():
     from tmppy import Type
     assert Type('T(*)(U, V)', T=Type('int'), U=Type('float'), V=Type('double')) == Type('int(*)(float, double)')
 
+@assert_compilation_succeeds
+def test_type_literals_with_different_spellings_of_the_same_type_success():
+    from tmppy import Type
+    assert Type('int const *') == Type('const int*')
+    assert Type('const T', T=Type('int&')) == Type('int&')
+    assert Type('T&&', T=Type('int&')) == Type('int&')
+    assert Type('unsigned') == Type('unsigned int')
+
+@assert_compilation_succeeds
+def test_type_literals_with_different_types_success():
+    from tmppy import Type
+    assert Type('int* const') != Type('const int*')
+    assert Type('int*[3]') != Type('int(*)[3]')
+
 @assert_conversion_fails
 def test_type_literal_no_arguments_error():
     from tmppy import Type
@@ -12,9 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import os
 import re
 import subprocess
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
 from enum import Enum
+from typing import Dict, Union
 
 import typed_ast.ast3 as ast
 
@@ -40,13 +46,18 @@ def ir_to_string(ir_elem, line_indent=''):
 
     if ir_elem is None:
         return 'None'
-    elif isinstance(ir_elem, (str, bool, Enum)):
+    elif isinstance(ir_elem, (str, bool, int, Enum)):
         return repr(ir_elem)
-    elif isinstance(ir_elem, list):
+    elif isinstance(ir_elem, (list, tuple)):
         return ('['
                 + ','.join('\n' + next_line_indent + ir_to_string(child_node, next_line_indent)
                            for child_node in ir_elem)
                 + ']')
+    elif isinstance(ir_elem, dict):
+        return ('{'
+                + ','.join('\n' + next_line_indent + repr(key) + ': ' + ir_to_string(value, next_line_indent)
+                           for key, value in ir_elem.items())
+                + '}')
     else:
         return (ir_elem.__class__.__name__
                 + '('
@@ -88,3 +99,98 @@ def replace_identifiers(cpp_type, replacements):
         last_index = match.end()
     result_parts.append(cpp_type[last_index:])
     return ''.join(result_parts)
+
+def write_file_if_changed(file_name: str, content: Union[str, bytes]):
+    '''Writes `content` (text or binary) to `file_name`, unless the file already has that content.
+
+    This avoids bumping the file's mtime (and therefore triggering the recompilation of everything that depends on it)
+    when the output didn't actually change. The file is written atomically, so a concurrent reader (or an interrupted
+    conversion) never sees a partially-written file.
+    '''
+    binary_mode = 'b' if isinstance(content, bytes) else ''
+    try:
+        with open(file_name, 'r' + binary_mode) as file:
+            if file.read() == content:
+                return
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+
+    dir_name = os.path.dirname(os.path.abspath(file_name))
+    fd, temp_file_name = tempfile.mkstemp(dir=dir_name, prefix='.' + os.path.basename(file_name) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w' + binary_mode) as temp_file:
+            temp_file.write(content)
+        # mkstemp() creates the file as only readable by the current user, while we want the usual permissions.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_file_name, 0o666 & ~umask)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        os.unlink(temp_file_name)
+        raise
+
+class IdentifierGenerator:
+    '''Generates the internal identifiers (TmppyInternal_...) used in the generated code.
+
+    Each identifier is derived from a hash of its origin: the scope it's generated in (e.g. the conversion of a specific
+    function in a specific phase) and its position within that scope. This way a local change in the source only
+    changes the identifiers generated for the affected scopes, and the generated code for the rest of the module stays
+    the same (so e.g. compilation caches are still effective for the code using it).
+
+    When converting a module that can be imported by (or import) other modules, `module_name` must be specified, so that
+    the identifiers generated for different modules don't clash when the generated headers are included together.
+    '''
+    def __init__(self, module_name: str = ''):
+        self.module_name = module_name
+        self.current_scope = ''
+        self.next_index_by_scope = defaultdict(int)
+        self.origins_by_identifier = dict()  # type: Dict[str, str]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        index = self.next_index_by_scope[self.current_scope]
+        self.next_index_by_scope[self.current_scope] += 1
+        return self.identifier_for_origin('%s#%s' % (self.current_scope, index))
+
+    def identifier_for_origin(self, origin: str):
+        identifier = self._hash_identifier(origin)
+        # This is very unlikely to happen, but if it does we still need the generated identifiers to be unique.
+        collision_index = 0
+        while self.origins_by_identifier.get(identifier, origin) != origin:
+            collision_index += 1
+            identifier = self._hash_identifier('%s#collision%s' % (origin, collision_index))
+        self.origins_by_identifier[identifier] = origin
+        return identifier
+
+    def merge(self, other: 'IdentifierGenerator'):
+        '''Adds the identifiers generated by `other` (e.g. in another process) to the ones generated by this generator.
+
+        The two generators must have been used for disjoint scopes (except for identifiers with the same origin, that
+        are the same in both). Returns False (without changing this generator) if an identifier generated by `other`
+        collides with a different one generated by this generator; in that case the identifiers generated by `other`
+        are not the ones that this generator would have generated, so they can't be used.
+        '''
+        assert other.module_name == self.module_name
+        for identifier, origin in other.origins_by_identifier.items():
+            if self.origins_by_identifier.get(identifier, origin) != origin:
+                return False
+        self.origins_by_identifier.update(other.origins_by_identifier)
+        for scope, next_index in other.next_index_by_scope.items():
+            self.next_index_by_scope[scope] = max(self.next_index_by_scope[scope], next_index)
+        return True
+
+    @contextmanager
+    def scope(self, *origin: str):
+        previous_scope = self.current_scope
+        self.current_scope = '/'.join(origin)
+        try:
+            yield
+        finally:
+            self.current_scope = previous_scope
+
+    def _hash_identifier(self, origin: str):
+        if self.module_name:
+            origin = '%s:%s' % (self.module_name, origin)
+        return 'TmppyInternal_' + hashlib.sha256(origin.encode('utf-8')).hexdigest()[:10]
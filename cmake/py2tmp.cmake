@@ -0,0 +1,174 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Helpers to convert TMPPy sources to C++ headers as part of a CMake build. Example usage:
+#
+#   include(path/to/py2tmp.cmake)
+#   py2tmp_generate_headers(GENERATED_HEADERS
+#                           SOURCES foo.py bar.py
+#                           CXX_STD c++14)
+#   add_library(mylib mylib.cpp ${GENERATED_HEADERS})
+#   target_include_directories(mylib PRIVATE ${CMAKE_CURRENT_BINARY_DIR})
+#
+# Each header is regenerated when any of the files listed in the dependency file written by py2tmp changes: its source
+# and the py2tmp sources (so that upgrading py2tmp regenerates the headers). py2tmp doesn't touch a header whose content
+# didn't change, so the TUs that include it are only recompiled when needed. Dependency files are used with all
+# generators in CMake >= 3.20, and with the Ninja generator in older versions.
+#
+# Sources can import each other (and the other TMPPy modules in the directories passed with --module-path in EXTRA_ARGS);
+# the dependency files also list the sources of the imported modules. The headers generated for the imported modules
+# are written in the same OUTPUT_DIR, where the headers importing them expect to find them.
+#
+# Arguments:
+#   SOURCES: the TMPPy sources (.py files) to convert.
+#   OUTPUT_DIR: where to write the generated headers. Defaults to CMAKE_CURRENT_BINARY_DIR.
+#   CXX_STD: the C++ standard that the generated headers will be compiled with (see py2tmp's --cxx-std).
+#   OUTPUT_MODE: the kind of file generated for each source (see py2tmp's --output-mode). With "module", the outputs are
+#                C++20 module interface units (.cppm) instead of headers, and CXX_STD must be c++20.
+#   EXTRA_ARGS: additional arguments to pass to py2tmp.
+#
+# The generated header paths are stored in the variable named by the first argument.
+#
+# The py2tmp executable is searched in the PATH, set PY2TMP_EXECUTABLE to override it.
+
+find_program(PY2TMP_EXECUTABLE py2tmp)
+
+function(py2tmp_generate_headers OUTPUT_VAR)
+  cmake_parse_arguments(PY2TMP "" "OUTPUT_DIR;CXX_STD;OUTPUT_MODE" "SOURCES;EXTRA_ARGS" ${ARGN})
+
+  if(NOT PY2TMP_EXECUTABLE)
+    message(FATAL_ERROR "py2tmp not found. Set PY2TMP_EXECUTABLE to the path of the py2tmp executable.")
+  endif()
+  if(NOT PY2TMP_OUTPUT_DIR)
+    set(PY2TMP_OUTPUT_DIR "${CMAKE_CURRENT_BINARY_DIR}")
+  endif()
+  set(CXX_STD_ARGS)
+  if(PY2TMP_CXX_STD)
+    set(CXX_STD_ARGS --cxx-std ${PY2TMP_CXX_STD})
+  endif()
+  set(OUTPUT_MODE_ARGS)
+  set(OUTPUT_SUFFIX ".h")
+  if(PY2TMP_OUTPUT_MODE)
+    set(OUTPUT_MODE_ARGS --output-mode ${PY2TMP_OUTPUT_MODE})
+    if(PY2TMP_OUTPUT_MODE STREQUAL "module")
+      set(OUTPUT_SUFFIX ".cppm")
+    endif()
+  endif()
+
+  # With policy CMP0116, CMake itself converts the paths in the dependency files to the ones expected by the generator.
+  # Without it (CMake < 3.20) dependency files are only supported with Ninja, that expects the output paths in them to be
+  # relative to the top-level build dir, so in that case we run py2tmp from there and pass a relative output dir.
+  if(POLICY CMP0116)
+    cmake_policy(PUSH)
+    cmake_policy(SET CMP0116 NEW)
+    set(USE_DEPFILES TRUE)
+    set(WORKING_DIR "${CMAKE_CURRENT_BINARY_DIR}")
+    set(OUTPUT_DIR_ARG "${PY2TMP_OUTPUT_DIR}")
+  elseif(CMAKE_GENERATOR MATCHES "Ninja")
+    set(USE_DEPFILES TRUE)
+    set(WORKING_DIR "${CMAKE_BINARY_DIR}")
+    file(RELATIVE_PATH OUTPUT_DIR_ARG "${CMAKE_BINARY_DIR}" "${PY2TMP_OUTPUT_DIR}")
+    if(NOT OUTPUT_DIR_ARG)
+      set(OUTPUT_DIR_ARG ".")
+    endif()
+  else()
+    set(USE_DEPFILES FALSE)
+    set(WORKING_DIR "${CMAKE_CURRENT_BINARY_DIR}")
+    set(OUTPUT_DIR_ARG "${PY2TMP_OUTPUT_DIR}")
+  endif()
+
+  set(OUTPUTS)
+  foreach(SOURCE ${PY2TMP_SOURCES})
+    get_filename_component(SOURCE_PATH "${SOURCE}" ABSOLUTE)
+    get_filename_component(SOURCE_NAME "${SOURCE}" NAME)
+    string(REGEX REPLACE "\\.py$" "${OUTPUT_SUFFIX}" OUTPUT_NAME "${SOURCE_NAME}")
+    set(OUTPUT "${PY2TMP_OUTPUT_DIR}/${OUTPUT_NAME}")
+
+    set(DEPFILE_ARGS)
+    if(USE_DEPFILES)
+      set(DEPFILE_ARGS DEPFILE "${OUTPUT}.d")
+    endif()
+
+    add_custom_command(
+      OUTPUT "${OUTPUT}"
+      COMMAND "${PY2TMP_EXECUTABLE}" --output-dir "${OUTPUT_DIR_ARG}" --write-depfiles ${CXX_STD_ARGS}
+              ${OUTPUT_MODE_ARGS} ${PY2TMP_EXTRA_ARGS} "${SOURCE_PATH}"
+      DEPENDS "${SOURCE_PATH}"
+      ${DEPFILE_ARGS}
+      WORKING_DIRECTORY "${WORKING_DIR}"
+      COMMENT "Converting ${SOURCE_NAME} to C++ with py2tmp"
+      VERBATIM)
+    list(APPEND OUTPUTS "${OUTPUT}")
+  endforeach()
+
+  if(POLICY CMP0116)
+    cmake_policy(POP)
+  endif()
+
+  set(${OUTPUT_VAR} ${OUTPUTS} PARENT_SCOPE)
+endfunction()
+
+# Adds an object library target with a precompiled tmppy.h (the TMPPy runtime, that the generated headers include), so
+# that the targets compiling generated code don't need to parse the runtime and standard headers again in each TU.
+# Example usage:
+#
+#   py2tmp_add_precompiled_runtime(tmppy_pch CXX_STD c++14)
+#   add_library(mylib mylib.cpp ${GENERATED_HEADERS})
+#   target_link_libraries(mylib PRIVATE tmppy_pch)
+#   target_precompile_headers(mylib REUSE_FROM tmppy_pch)
+#
+# Linking the target adds the TMPPy include dir to the include path. With REUSE_FROM, the precompiled header is built
+# once and tmppy.h is force-included in the TUs of the target; this requires the target to have the same compile
+# options as the precompiled runtime (in particular the C++ standard). Without REUSE_FROM, mylib can instead precompile
+# its own copy with target_precompile_headers(mylib PRIVATE <tmppy/tmppy.h>), e.g. when its flags differ.
+#
+# This requires CMake >= 3.16 and, for REUSE_FROM, a compiler supported by target_precompile_headers (GCC, Clang or
+# MSVC).
+#
+# Arguments:
+#   CXX_STD: the C++ standard to compile the precompiled header with (e.g. c++14), that must be the one used by the
+#            targets reusing it. Defaults to the standard in CMAKE_CXX_STANDARD, if any.
+#   COMPILE_OPTIONS: additional compile options for the precompiled header (e.g. -DTMPPY_DISABLE_BUILTINS).
+#
+# The TMPPy include dir is searched next to this file (both in the source tree and in an installation), set
+# TMPPY_INCLUDE_DIR to override it.
+
+find_path(TMPPY_INCLUDE_DIR tmppy/tmppy.h
+          HINTS "${CMAKE_CURRENT_LIST_DIR}/../include" "${CMAKE_CURRENT_LIST_DIR}/../../../include"
+          NO_DEFAULT_PATH)
+
+function(py2tmp_add_precompiled_runtime TARGET_NAME)
+  cmake_parse_arguments(PY2TMP "" "CXX_STD" "COMPILE_OPTIONS" ${ARGN})
+
+  if(CMAKE_VERSION VERSION_LESS 3.16)
+    message(FATAL_ERROR "py2tmp_add_precompiled_runtime() requires CMake >= 3.16.")
+  endif()
+  if(NOT TMPPY_INCLUDE_DIR)
+    message(FATAL_ERROR "tmppy/tmppy.h not found. Set TMPPY_INCLUDE_DIR to the directory containing it.")
+  endif()
+
+  # An object library needs at least a source, the precompiled header is built as part of compiling this one.
+  set(SOURCE "${CMAKE_CURRENT_BINARY_DIR}/${TARGET_NAME}.cpp")
+  file(WRITE "${SOURCE}" "// Generated by py2tmp_add_precompiled_runtime().\n")
+  add_library(${TARGET_NAME} OBJECT "${SOURCE}")
+  target_include_directories(${TARGET_NAME} PUBLIC "${TMPPY_INCLUDE_DIR}")
+  target_precompile_headers(${TARGET_NAME} PRIVATE <tmppy/tmppy.h>)
+  if(PY2TMP_CXX_STD)
+    string(REGEX REPLACE "^c\\+\\+" "" CXX_STANDARD_NUMBER "${PY2TMP_CXX_STD}")
+    set_target_properties(${TARGET_NAME} PROPERTIES CXX_STANDARD ${CXX_STANDARD_NUMBER} CXX_STANDARD_REQUIRED ON)
+  endif()
+  if(PY2TMP_COMPILE_OPTIONS)
+    target_compile_options(${TARGET_NAME} PRIVATE ${PY2TMP_COMPILE_OPTIONS})
+  endif()
+endfunction()
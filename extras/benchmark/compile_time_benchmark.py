@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Benchmarks the compile time of the C++ code generated by py2tmp.
+
+Each benchmark generates a TMPPy module of a given size (e.g. one processing a list of a given length), converts it to a
+header with py2tmp and compiles a source file including that header with the local GCC or Clang (in a POSIX
+environment). For each size this records the compile time (the minimum over the repetitions), the peak RSS of the
+compiler and, with Clang, the number of template instantiations (counted from the -ftime-trace output).
+
+Example usage:
+
+    extras/benchmark/compile_time_benchmark.py --cxx clang++ --output baseline.json
+    (... change py2tmp ...)
+    extras/benchmark/compile_time_benchmark.py --cxx clang++ --compare baseline.json
+
+With --compare, the exit code is 1 if the compile time of any benchmark increased more than --max-regression compared
+to the baseline.
+
+With --precompiled-runtime, tmppy.h is precompiled once and force-included in each compilation, as done by the tests
+and by py2tmp_add_precompiled_runtime() in py2tmp.cmake. Comparing with a baseline without it shows the time saved by
+the precompiled header:
+
+    extras/benchmark/compile_time_benchmark.py --output baseline.json
+    extras/benchmark/compile_time_benchmark.py --precompiled-runtime --compare baseline.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from _py2tmp import main as py2tmp_main
+
+import tmppy_module_generator
+from tmppy_module_generator import ModuleParams
+
+TMPPY_INCLUDE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include')
+
+# Bump this when the format of the results changes.
+RESULTS_FORMAT_VERSION = 1
+
+def _generate_list_module(length: int):
+    list_elems = ', '.join(str(i) for i in range(length))
+    return '\n'.join([
+        'def f(n: int):',
+        '    l = [x * n for x in [%s]]' % list_elems,
+        '    return sum(l)',
+        '',
+        'assert f(2) == %s' % (length * (length - 1)),
+        '',
+    ])
+
+def _generate_recursion_module(depth: int):
+    return '\n'.join([
+        'def f(n: int) -> int:',
+        '    if n == 0:',
+        '        return 0',
+        '    else:',
+        '        return 1 + f(n - 1)',
+        '',
+        'assert f(%s) == %s' % (depth, depth),
+        '',
+    ])
+
+def _generate_set_module(size: int):
+    set_elems = ', '.join(str(i) for i in range(size))
+    reversed_set_elems = ', '.join(str(i) for i in reversed(range(size)))
+    return '\n'.join([
+        'def f(n: int):',
+        '    s = {x * n for x in {%s}}' % set_elems,
+        '    return sum(s)',
+        '',
+        'assert f(2) == %s' % (size * (size - 1)),
+        'assert {%s} == {%s}' % (set_elems, reversed_set_elems),
+        '',
+    ])
+
+def _generate_functions_module(num_functions: int):
+    return tmppy_module_generator.generate_module(ModuleParams(num_functions=num_functions,
+                                                               if_nesting_depth=3,
+                                                               list_comprehension_size=5,
+                                                               num_custom_types=5,
+                                                               num_exception_types=5))
+
+# The module generator for each benchmark, and the sizes used by default.
+BENCHMARKS = {
+    'list_length': (_generate_list_module, [10, 100, 500]),
+    'recursion_depth': (_generate_recursion_module, [10, 100, 400]),
+    'set_size': (_generate_set_module, [10, 50, 200]),
+    'num_functions': (_generate_functions_module, [10, 50, 200]),
+}
+
+# Runs a command, and saves its run time and the peak RSS of its processes in the file passed as first argument.
+# The peak RSS is measured in a separate process instead of in this script because a process's peak RSS includes the
+# one of the process it was forked from, before the exec (so it would be at least the RSS of this script).
+_MEASURING_WRAPPER = '''
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+start = time.perf_counter()
+exit_code = subprocess.call(sys.argv[2:])
+seconds = time.perf_counter() - start
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+if platform.system() != 'Darwin':
+    peak_rss *= 1024
+with open(sys.argv[1], 'w') as file:
+    json.dump([seconds, peak_rss], file)
+sys.exit(exit_code)
+'''
+
+class Compiler:
+    def __init__(self, executable: str, cxx_std: str, extra_flags: list):
+        self.executable = executable
+        self.cxx_std = cxx_std
+        self.extra_flags = extra_flags
+        version_output = subprocess.check_output([executable, '--version'], universal_newlines=True)
+        self.version = version_output.splitlines()[0]
+        self.is_clang = 'clang' in version_output
+        self.precompiled_runtime_header = None
+
+    def precompile_runtime(self, output_dir: str):
+        '''Precompiles tmppy.h, that will then be force-included in all compilations.'''
+        # GCC and Clang use the precompiled header instead of a header passed with -include when it's next to it, with
+        # this extension.
+        header_file_name = os.path.join(output_dir, 'tmppy.h')
+        with open(header_file_name, 'w') as header_file:
+            header_file.write('#include <tmppy/tmppy.h>\n')
+        args = [
+            self.executable,
+            '-std=' + self.cxx_std,
+            '-I', TMPPY_INCLUDE_DIR,
+            '-x', 'c++-header', header_file_name,
+            '-o', header_file_name + ('.pch' if self.is_clang else '.gch'),
+        ] + self.extra_flags
+        try:
+            subprocess.check_output(args, stderr=subprocess.STDOUT, universal_newlines=True)
+        except subprocess.CalledProcessError as e:
+            raise Exception('Precompiling tmppy.h failed: %s\n%s' % (' '.join(args), e.output))
+        self.precompiled_runtime_header = header_file_name
+
+    def compile(self, source_file_name: str, output_dir: str):
+        '''Compiles a source file, returning (seconds, peak RSS in bytes, number of template instantiations).
+
+        The number of template instantiations is None if the compiler doesn't report it.
+        '''
+        object_file_name = os.path.join(output_dir, 'main.o')
+        args = [
+            self.executable,
+            '-std=' + self.cxx_std,
+            '-I', TMPPY_INCLUDE_DIR,
+            '-I', output_dir,
+            # Deep recursion in TMPPy functions needs a correspondingly deep template instantiation.
+            '-ftemplate-depth=10000',
+            '-c', source_file_name,
+            '-o', object_file_name,
+        ]
+        if self.precompiled_runtime_header:
+            args += ['-include', self.precompiled_runtime_header]
+        if self.is_clang:
+            # This writes main.json next to the object file.
+            args += ['-ftime-trace', '-ftime-trace-granularity=0']
+        args += self.extra_flags
+
+        measurements_file_name = os.path.join(output_dir, 'measurements.json')
+        try:
+            subprocess.check_output([sys.executable, '-c', _MEASURING_WRAPPER, measurements_file_name] + args,
+                                    stderr=subprocess.STDOUT,
+                                    universal_newlines=True)
+        except subprocess.CalledProcessError as e:
+            raise Exception('Compilation failed: %s\n%s' % (' '.join(args), e.output))
+        with open(measurements_file_name) as measurements_file:
+            seconds, peak_rss = json.load(measurements_file)
+
+        num_instantiations = None
+        if self.is_clang:
+            with open(os.path.join(output_dir, 'main.json')) as time_trace_file:
+                time_trace = json.load(time_trace_file)
+            num_instantiations = sum(1
+                                     for event in time_trace['traceEvents']
+                                     if event.get('ph') == 'X' and event.get('name', '').startswith('Instantiate'))
+        return seconds, peak_rss, num_instantiations
+
+def run_benchmark(compiler: Compiler, name: str, size: int, repetitions: int):
+    module_generator, _ = BENCHMARKS[name]
+    source = module_generator(size)
+    header = py2tmp_main.convert_to_cpp(source, filename=name + '.py', cxx_std=compiler.cxx_std)
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(output_dir, 'benchmark.h'), 'w') as header_file:
+            header_file.write(header)
+        source_file_name = os.path.join(output_dir, 'main.cpp')
+        with open(source_file_name, 'w') as source_file:
+            source_file.write('#include "benchmark.h"\n')
+
+        all_seconds = []
+        peak_rss = 0
+        for _ in range(repetitions):
+            seconds, repetition_peak_rss, num_instantiations = compiler.compile(source_file_name, output_dir)
+            all_seconds.append(seconds)
+            peak_rss = max(peak_rss, repetition_peak_rss)
+    finally:
+        shutil.rmtree(output_dir)
+
+    return {
+        'name': name,
+        'size': size,
+        'generated_cpp_lines': len(header.splitlines()),
+        'seconds': min(all_seconds),
+        'peak_rss_bytes': peak_rss,
+        'template_instantiations': num_instantiations,
+    }
+
+def _get_py2tmp_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _format_change(old_value, new_value):
+    if not old_value or new_value is None:
+        return 'n/a'
+    return '%+.1f%%' % ((new_value - old_value) * 100 / old_value)
+
+def print_results(results):
+    print('%-18s %8s %10s %12s %15s' % ('Benchmark', 'Size', 'Time', 'Peak RSS', 'Instantiations'))
+    for benchmark_results in results['benchmarks']:
+        print('%-18s %8s %9.3fs %11.1fM %15s' % (
+            benchmark_results['name'],
+            benchmark_results['size'],
+            benchmark_results['seconds'],
+            benchmark_results['peak_rss_bytes'] / 1e6,
+            benchmark_results['template_instantiations'] if benchmark_results['template_instantiations'] is not None else '-'))
+
+def compare_results(baseline_results, results, max_regression: float):
+    '''Prints the changes from the baseline, returning the benchmarks whose compile time regressed too much.'''
+    if (baseline_results['compiler'], baseline_results['cxx_std']) != (results['compiler'], results['cxx_std']):
+        print('Warning: the baseline was recorded with %s (%s), these results with %s (%s).' % (
+            baseline_results['compiler'], baseline_results['cxx_std'], results['compiler'], results['cxx_std']))
+
+    baseline_results_by_benchmark = {(benchmark_results['name'], benchmark_results['size']): benchmark_results
+                                     for benchmark_results in baseline_results['benchmarks']}
+    regressions = []
+    print('%-18s %8s %10s %10s %9s %9s %15s' % ('Benchmark', 'Size', 'Old time', 'New time', 'Change',
+                                                'RSS', 'Instantiations'))
+    for benchmark_results in results['benchmarks']:
+        baseline_benchmark_results = baseline_results_by_benchmark.get((benchmark_results['name'],
+                                                                        benchmark_results['size']))
+        if not baseline_benchmark_results:
+            continue
+        old_seconds = baseline_benchmark_results['seconds']
+        new_seconds = benchmark_results['seconds']
+        print('%-18s %8s %9.3fs %9.3fs %9s %9s %15s' % (
+            benchmark_results['name'],
+            benchmark_results['size'],
+            old_seconds,
+            new_seconds,
+            _format_change(old_seconds, new_seconds),
+            _format_change(baseline_benchmark_results['peak_rss_bytes'], benchmark_results['peak_rss_bytes']),
+            _format_change(baseline_benchmark_results['template_instantiations'],
+                           benchmark_results['template_instantiations'])))
+        if new_seconds > old_seconds * (1 + max_regression):
+            regressions.append('%s (size %s)' % (benchmark_results['name'], benchmark_results['size']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the compile time of the C++ code generated by py2tmp.')
+    parser.add_argument('--cxx', default=os.environ.get('CXX', 'g++'),
+                        help='The C++ compiler to use (GCC or Clang). Default: $CXX, or g++')
+    parser.add_argument('--cxx-std', default='c++11', help='The C++ standard to generate code for. Default: c++11')
+    parser.add_argument('--cxx-flags', default='',
+                        help='Additional (space-separated) flags to pass to the compiler, e.g. "-O2"')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS.keys()), default=sorted(BENCHMARKS.keys()),
+                        help='The benchmarks to run. Default: all')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='The sizes to run the benchmarks with (e.g. list lengths for list_length). Default: '
+                             'a few sizes specific to each benchmark')
+    parser.add_argument('--repetitions', type=int, default=3,
+                        help='How many times each compilation is run; the minimum time is reported. Default: 3')
+    parser.add_argument('--output', help='If specified, the results are saved in this file, as JSON (e.g. to be '
+                                         'used as a baseline with --compare)')
+    parser.add_argument('--compare', help='A results file saved by a previous run with --output, to compare the '
+                                          'results with')
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help='With --compare, a compile time increase larger than this fraction is reported as a '
+                             'regression. Default: 0.1')
+    parser.add_argument('--precompiled-runtime', action='store_true',
+                        help='If specified, tmppy.h is precompiled and the precompiled header is used in all the '
+                             'compilations')
+    args = parser.parse_args()
+
+    compiler = Compiler(args.cxx, args.cxx_std, args.cxx_flags.split())
+    precompiled_runtime_dir = None
+    if args.precompiled_runtime:
+        precompiled_runtime_dir = tempfile.mkdtemp()
+        compiler.precompile_runtime(precompiled_runtime_dir)
+    results = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'py2tmp_revision': _get_py2tmp_revision(),
+        'compiler': compiler.version,
+        'cxx_std': args.cxx_std,
+        'cxx_flags': args.cxx_flags,
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'repetitions': args.repetitions,
+        'precompiled_runtime': args.precompiled_runtime,
+        'benchmarks': [],
+    }
+    try:
+        for name in args.benchmarks:
+            _, default_sizes = BENCHMARKS[name]
+            for size in args.sizes or default_sizes:
+                results['benchmarks'].append(run_benchmark(compiler, name, size, args.repetitions))
+    finally:
+        if precompiled_runtime_dir:
+            shutil.rmtree(precompiled_runtime_dir)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as compare_file:
+            baseline_results = json.load(compare_file)
+        if baseline_results.get('format_version') != RESULTS_FORMAT_VERSION:
+            raise Exception('%s was written by an incompatible version of this benchmark.' % args.compare)
+        regressions = compare_results(baseline_results, results, args.max_regression)
+        if regressions:
+            print('Compile time regressions: ' + ', '.join(regressions))
+            sys.exit(1)
+    else:
+        print_results(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Benchmarks the throughput and memory usage of py2tmp itself, on synthetic TMPPy modules.
+
+Each benchmark converts a module generated by tmppy_module_generator.py. For each phase of the conversion this measures
+the time (the minimum over the repetitions), the throughput in IR nodes/s and TMPPy source lines/s and the peak memory
+allocated during that phase. It also measures the time and peak memory of a whole convert_to_cpp() call, that doesn't
+keep the intermediate IRs of the whole module in memory.
+
+Example usage:
+
+    extras/benchmark/py2tmp_benchmark.py --output results.json
+    (... change py2tmp ...)
+    extras/benchmark/py2tmp_benchmark.py --output new_results.json --compare results.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from enum import Enum
+
+import typed_ast.ast3 as ast
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from _py2tmp import ast_to_ir3
+from _py2tmp import ir3_to_ir2
+from _py2tmp import ir2_to_ir1
+from _py2tmp import ir1_to_ir0
+from _py2tmp import ir0_to_cpp
+from _py2tmp import main as py2tmp_main
+from _py2tmp import utils
+
+import tmppy_module_generator
+from tmppy_module_generator import ModuleParams
+
+# Each of these stresses a different part of the conversion. The sizes are multiplied by --scale.
+BENCHMARKS = {
+    'many_functions': ModuleParams(num_functions=200, if_nesting_depth=1, list_comprehension_size=2,
+                                   num_custom_types=0, num_exception_types=0),
+    'deep_if_else_nesting': ModuleParams(num_functions=20, if_nesting_depth=20, list_comprehension_size=2,
+                                         num_custom_types=0, num_exception_types=0),
+    'large_list_comprehensions': ModuleParams(num_functions=20, if_nesting_depth=1, list_comprehension_size=50,
+                                              num_custom_types=0, num_exception_types=0),
+    'many_custom_types': ModuleParams(num_functions=50, if_nesting_depth=1, list_comprehension_size=2,
+                                      num_custom_types=50, num_exception_types=0),
+    'heavy_try_except': ModuleParams(num_functions=50, if_nesting_depth=1, list_comprehension_size=2,
+                                     num_custom_types=0, num_exception_types=20),
+    'mixed': ModuleParams(num_functions=100, if_nesting_depth=5, list_comprehension_size=10,
+                          num_custom_types=10, num_exception_types=10),
+}
+
+# Bump this when the format of the results changes.
+RESULTS_FORMAT_VERSION = 1
+
+PHASES = ('parse', 'ast_to_ir3', 'ir3_to_ir2', 'ir2_to_ir1', 'ir1_to_ir0', 'ir0_to_cpp', 'clang_format')
+
+def _scale_params(params: ModuleParams, scale: float):
+    scaled_params = params.to_dict()
+    # Only the number of functions is scaled, the other parameters are kept as they are so that each benchmark still
+    # stresses the same thing.
+    scaled_params['num_functions'] = max(1, int(params.num_functions * scale))
+    return ModuleParams(**scaled_params)
+
+def _count_nodes(node):
+    if isinstance(node, (list, tuple)):
+        return sum(_count_nodes(child) for child in node)
+    elif isinstance(node, dict):
+        return sum(_count_nodes(child) for child in node.values())
+    elif isinstance(node, ast.AST):
+        return 1 + sum(_count_nodes(child) for child in ast.iter_child_nodes(node))
+    elif isinstance(node, (str, bool, int, Enum)) or node is None:
+        return 0
+    else:
+        return 1 + sum(_count_nodes(child) for child in node.__dict__.values())
+
+def _get_phase_functions(source: str, filename: str):
+    '''Returns the phases of a conversion of `source`, as (phase, function) pairs.
+
+    Each function takes the output of the previous phase (the source, for the first one).
+    '''
+    identifier_generator = utils.IdentifierGenerator()
+    phase_functions = [
+        ('parse', lambda source: ast.parse(source, filename=filename)),
+        ('ast_to_ir3', lambda module_ast: ast_to_ir3.module_ast_to_ir3(module_ast, filename, source.splitlines())),
+        ('ir3_to_ir2', lambda module_ir3: ir3_to_ir2.module_to_ir2(module_ir3, identifier_generator)),
+        ('ir2_to_ir1', lambda module_ir2: ir2_to_ir1.module_to_ir1(module_ir2, identifier_generator)),
+        ('ir1_to_ir0', lambda module_ir1: ir1_to_ir0.module_to_ir0(module_ir1, identifier_generator)),
+        ('ir0_to_cpp', lambda header: ir0_to_cpp.header_to_cpp(header, identifier_generator)),
+        ('clang_format', utils.clang_format),
+    ]
+    assert tuple(phase for phase, _ in phase_functions) == PHASES
+    return phase_functions
+
+def _measure_phase_times(source: str, filename: str):
+    seconds_by_phase = dict()
+    input_nodes_by_phase = dict()
+    phase_output = source
+    for phase, phase_function in _get_phase_functions(source, filename):
+        phase_input = phase_output
+        # The phases taking a string as input don't have nodes to count.
+        input_nodes_by_phase[phase] = None if isinstance(phase_input, str) else _count_nodes(phase_input)
+        start = time.perf_counter()
+        phase_output = phase_function(phase_input)
+        seconds_by_phase[phase] = time.perf_counter() - start
+    return seconds_by_phase, input_nodes_by_phase, phase_output
+
+def _measure_phase_memory(source: str, filename: str):
+    peak_memory_by_phase = dict()
+    phase_output = source
+    tracemalloc.start()
+    try:
+        for phase, phase_function in _get_phase_functions(source, filename):
+            phase_input = phase_output
+            tracemalloc.clear_traces()
+            phase_output = phase_function(phase_input)
+            _, peak_memory_by_phase[phase] = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_memory_by_phase
+
+def _measure_convert_to_cpp(source: str, filename: str, repetitions: int):
+    seconds = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        py2tmp_main.convert_to_cpp(source, filename)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        py2tmp_main.convert_to_cpp(source, filename)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak_memory
+
+def run_benchmark(name: str, params: ModuleParams, repetitions: int):
+    source = tmppy_module_generator.generate_module(params)
+    filename = name + '.py'
+    source_lines = len(source.splitlines())
+
+    seconds_by_phase = {phase: [] for phase in PHASES}
+    for _ in range(repetitions):
+        seconds_by_this_phase, input_nodes_by_phase, cpp_source = _measure_phase_times(source, filename)
+        for phase, seconds in seconds_by_this_phase.items():
+            seconds_by_phase[phase].append(seconds)
+    peak_memory_by_phase = _measure_phase_memory(source, filename)
+
+    phase_results = dict()
+    for phase in PHASES:
+        seconds = min(seconds_by_phase[phase])
+        input_nodes = input_nodes_by_phase[phase]
+        phase_results[phase] = {
+            'seconds': seconds,
+            'input_nodes': input_nodes,
+            'nodes_per_second': input_nodes / seconds if input_nodes is not None else None,
+            'lines_per_second': source_lines / seconds,
+            'peak_memory_bytes': peak_memory_by_phase[phase],
+        }
+
+    convert_to_cpp_seconds, convert_to_cpp_peak_memory = _measure_convert_to_cpp(source, filename, repetitions)
+
+    return {
+        'name': name,
+        'params': params.to_dict(),
+        'source_lines': source_lines,
+        'cpp_lines': len(cpp_source.splitlines()),
+        'phases': phase_results,
+        'convert_to_cpp': {
+            'seconds': convert_to_cpp_seconds,
+            'lines_per_second': source_lines / convert_to_cpp_seconds,
+            'peak_memory_bytes': convert_to_cpp_peak_memory,
+        },
+    }
+
+def _get_py2tmp_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _format_change(old_value, new_value):
+    if not old_value:
+        return 'n/a'
+    return '%+.1f%%' % ((new_value - old_value) * 100 / old_value)
+
+def print_comparison(old_results, new_results):
+    old_benchmark_results_by_name = {benchmark_results['name']: benchmark_results
+                                     for benchmark_results in old_results['benchmarks']}
+    print('%-28s %-16s %12s %12s %9s %12s %12s %9s' % ('Benchmark', 'Phase', 'Old time', 'New time', 'Change',
+                                                       'Old memory', 'New memory', 'Change'))
+    for benchmark_results in new_results['benchmarks']:
+        old_benchmark_results = old_benchmark_results_by_name.get(benchmark_results['name'])
+        if not old_benchmark_results:
+            continue
+        if old_benchmark_results['params'] != benchmark_results['params']:
+            print('%-28s (skipped, the benchmark parameters changed)' % benchmark_results['name'])
+            continue
+        rows = [(phase, old_benchmark_results['phases'].get(phase), benchmark_results['phases'][phase])
+                for phase in PHASES]
+        rows.append(('convert_to_cpp', old_benchmark_results['convert_to_cpp'], benchmark_results['convert_to_cpp']))
+        for phase, old_phase_results, new_phase_results in rows:
+            if not old_phase_results:
+                continue
+            print('%-28s %-16s %11.3fs %11.3fs %9s %11.1fM %11.1fM %9s' % (
+                benchmark_results['name'],
+                phase,
+                old_phase_results['seconds'],
+                new_phase_results['seconds'],
+                _format_change(old_phase_results['seconds'], new_phase_results['seconds']),
+                old_phase_results['peak_memory_bytes'] / 1e6,
+                new_phase_results['peak_memory_bytes'] / 1e6,
+                _format_change(old_phase_results['peak_memory_bytes'], new_phase_results['peak_memory_bytes'])))
+
+def print_results(results):
+    print('%-28s %-16s %10s %12s %12s %12s' % ('Benchmark', 'Phase', 'Time', 'Nodes/s', 'Lines/s', 'Peak memory'))
+    for benchmark_results in results['benchmarks']:
+        rows = [(phase, benchmark_results['phases'][phase]) for phase in PHASES]
+        rows.append(('convert_to_cpp', benchmark_results['convert_to_cpp']))
+        for phase, phase_results in rows:
+            nodes_per_second = phase_results.get('nodes_per_second')
+            print('%-28s %-16s %9.3fs %12s %12.0f %11.1fM' % (
+                benchmark_results['name'],
+                phase,
+                phase_results['seconds'],
+                '%.0f' % nodes_per_second if nodes_per_second is not None else '-',
+                phase_results['lines_per_second'],
+                phase_results['peak_memory_bytes'] / 1e6))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks py2tmp on synthetic TMPPy modules.')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS.keys()), default=sorted(BENCHMARKS.keys()),
+                        help='The benchmarks to run. Default: all')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplies the number of functions in each benchmark module by this. Default: 1')
+    parser.add_argument('--repetitions', type=int, default=3,
+                        help='How many times each benchmark is run; the minimum time is reported. Default: 3')
+    parser.add_argument('--output', help='If specified, the results are saved in this file, as JSON')
+    parser.add_argument('--compare', help='A results file saved by a previous run with --output (e.g. with an older '
+                                          'version of py2tmp), to compare the results with')
+    args = parser.parse_args()
+
+    results = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'py2tmp_revision': _get_py2tmp_revision(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'scale': args.scale,
+        'repetitions': args.repetitions,
+        'benchmarks': [],
+    }
+    for name in args.benchmarks:
+        params = _scale_params(BENCHMARKS[name], args.scale)
+        results['benchmarks'].append(run_benchmark(name, params, args.repetitions))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as compare_file:
+            old_results = json.load(compare_file)
+        if old_results.get('format_version') != RESULTS_FORMAT_VERSION:
+            raise Exception('%s was written by an incompatible version of this benchmark.' % args.compare)
+        print_comparison(old_results, results)
+    else:
+        print_results(results)
+
+if __name__ == '__main__':
+    main()
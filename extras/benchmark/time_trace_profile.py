@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Profiles the compilation of C++ code using headers generated by py2tmp, in terms of the TMPPy source.
+
+This compiles a source file with Clang's -ftime-trace and attributes the time spent instantiating each template to the
+TMPPy function, assertion or custom type it was generated for, using the source maps written by
+py2tmp --write-source-maps. Then it prints the hot spots, e.g.:
+
+    Self time  Total time  Instantiations  Source
+      812.3ms     1204.1ms            4200  foo.py:10 (function f)
+      ...
+
+The self time of a template instantiation excludes the time spent in the instantiations that it triggers, while the
+total time includes it (but the time spent in nested instantiations attributed to the same source is only counted
+once).
+
+Example usage:
+
+    py2tmp foo.py --write-source-maps
+    extras/benchmark/time_trace_profile.py main.cpp --source-map foo.tmppymap --cxx clang++ --cxx-flags='-Iinclude'
+
+An existing trace (e.g. generated by a build with -ftime-trace) can be analyzed instead with --trace.
+'''
+
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from _py2tmp import source_map
+
+TMPPY_INCLUDE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include')
+
+# The -ftime-trace events for template instantiations. Their "detail" is the instantiated template, e.g. "f<5>".
+_INSTANTIATION_EVENT_NAMES = ('InstantiateClass', 'InstantiateFunction')
+
+# The template name in an event detail like "ns::TmppyInternal_1234567890<int, 5>".
+_TEMPLATE_NAME_REGEX = re.compile(r'^\s*(?:[A-Za-z_][A-Za-z_0-9]*::)*([A-Za-z_][A-Za-z_0-9]*)')
+
+class HotSpot:
+    def __init__(self, source: str):
+        self.source = source
+        self.self_time_us = 0
+        self.total_time_us = 0
+        self.num_instantiations = 0
+
+def run_clang_with_time_trace(cxx: str, cxx_flags: List[str], source_file_name: str, output_dir: str):
+    object_file_name = os.path.join(output_dir, 'main.o')
+    subprocess.check_call([cxx, '-I', TMPPY_INCLUDE_DIR, '-ftime-trace', '-ftime-trace-granularity=0']
+                          + cxx_flags + ['-c', source_file_name, '-o', object_file_name])
+    # Clang writes the trace next to the object file.
+    return os.path.join(output_dir, 'main.json')
+
+def _get_instantiation_events(trace: dict):
+    events = [event
+              for event in trace['traceEvents']
+              if event.get('ph') == 'X' and event.get('name') in _INSTANTIATION_EVENT_NAMES]
+    # Sorting by start time (and then by decreasing duration) puts each event after the ones enclosing it.
+    events.sort(key=lambda event: (event.get('tid', 0), event['ts'], -event['dur']))
+    return events
+
+def compute_hot_spots(trace: dict, locations_by_identifier: Dict[str, source_map.SourceLocation]):
+    '''Attributes the template instantiation time in the trace to TMPPy sources, returning a list of HotSpot.
+
+    Instantiations of templates that are not in the source maps (e.g. the ones in the TMPPy runtime or in the standard
+    library) are attributed to the template itself.
+    '''
+    hot_spots_by_source = dict()  # type: Dict[str, HotSpot]
+
+    def hot_spot_for_event(event: dict):
+        match = _TEMPLATE_NAME_REGEX.match(event.get('args', {}).get('detail', ''))
+        template_name = match.group(1) if match else '<unknown>'
+        location = locations_by_identifier.get(template_name)
+        source = str(location) if location else '(template %s)' % template_name
+        if source not in hot_spots_by_source:
+            hot_spots_by_source[source] = HotSpot(source)
+        return hot_spots_by_source[source]
+
+    # The stack of (event, hot spot, time of the children) for the events enclosing the current one.
+    stack = []
+    num_active_events_by_source = defaultdict(int)
+    def pop_event():
+        event, hot_spot, children_time_us = stack.pop()
+        hot_spot.self_time_us += event['dur'] - children_time_us
+        num_active_events_by_source[hot_spot.source] -= 1
+        if num_active_events_by_source[hot_spot.source] == 0:
+            # This is the outermost instantiation for this source, so its time includes all the nested ones.
+            hot_spot.total_time_us += event['dur']
+        if stack:
+            stack[-1][2] += event['dur']
+
+    for event in _get_instantiation_events(trace):
+        while stack and (stack[-1][0].get('tid', 0) != event.get('tid', 0)
+                         or stack[-1][0]['ts'] + stack[-1][0]['dur'] <= event['ts']):
+            pop_event()
+        hot_spot = hot_spot_for_event(event)
+        hot_spot.num_instantiations += 1
+        num_active_events_by_source[hot_spot.source] += 1
+        stack.append([event, hot_spot, 0])
+    while stack:
+        pop_event()
+
+    return sorted(hot_spots_by_source.values(), key=lambda hot_spot: (-hot_spot.self_time_us, hot_spot.source))
+
+def print_hot_spots(hot_spots: List[HotSpot], max_hot_spots: int):
+    total_self_time_us = sum(hot_spot.self_time_us for hot_spot in hot_spots)
+    print('Total template instantiation time: %.1fms' % (total_self_time_us / 1000))
+    print('%10s %6s %11s %14s  %s' % ('Self time', '', 'Total time', 'Instantiations', 'Source'))
+    for hot_spot in hot_spots[:max_hot_spots]:
+        print('%8.1fms %5.1f%% %9.1fms %14s  %s' % (
+            hot_spot.self_time_us / 1000,
+            100 * hot_spot.self_time_us / total_self_time_us if total_self_time_us else 0,
+            hot_spot.total_time_us / 1000,
+            hot_spot.num_instantiations,
+            hot_spot.source))
+    if len(hot_spots) > max_hot_spots:
+        print('(%s more not shown)' % (len(hot_spots) - max_hot_spots))
+
+def main():
+    parser = argparse.ArgumentParser(description='Profiles the compilation of code using headers generated by py2tmp, '
+                                                 'attributing the template instantiation time to the TMPPy source.')
+    parser.add_argument('source', nargs='?', help='The C++ source file to compile (not needed with --trace)')
+    parser.add_argument('--source-map', action='append', default=[], required=True,
+                        help='A source map written by py2tmp --write-source-maps for a header used by the source '
+                             '(can be specified multiple times)')
+    parser.add_argument('--trace', help='If specified, analyzes this existing -ftime-trace output instead of '
+                                        'compiling the source')
+    parser.add_argument('--cxx', default='clang++', help='The Clang executable. Default: clang++')
+    parser.add_argument('--cxx-flags', default='',
+                        help='Additional flags for the compiler (e.g. -I flags and -std=c++17), as a single string')
+    parser.add_argument('--max-hot-spots', type=int, default=20,
+                        help='The maximum number of hot spots to print. Default: 20')
+    args = parser.parse_args()
+
+    if bool(args.source) == bool(args.trace):
+        parser.error('Exactly one of a source file and --trace must be specified')
+
+    locations_by_identifier = dict()
+    for source_map_file_name in args.source_map:
+        try:
+            locations_by_identifier.update(source_map.load_source_map(source_map_file_name))
+        except source_map.SourceMapLoadError as e:
+            parser.error(e.args[0])
+
+    if args.trace:
+        with open(args.trace) as trace_file:
+            trace = json.load(trace_file)
+    else:
+        with tempfile.TemporaryDirectory() as output_dir:
+            trace_file_name = run_clang_with_time_trace(args.cxx, shlex.split(args.cxx_flags), args.source, output_dir)
+            with open(trace_file_name) as trace_file:
+                trace = json.load(trace_file)
+
+    print_hot_spots(compute_hot_spots(trace, locations_by_identifier), args.max_hot_spots)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#  Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Generates synthetic TMPPy modules of parameterized size, for benchmarks.
+
+The generated modules are valid TMPPy, and they contain toplevel assertions checking the results of all their
+functions, so the generated C++ code can also be compiled (e.g. to benchmark the compile time of the generated code).
+'''
+
+import argparse
+
+class ModuleParams:
+    '''The parameters of a generated module.
+
+    Each of the `num_functions` functions:
+    * raises one of the `num_exception_types` exception types (if any) for some inputs; a wrapper function catches it.
+    * has `if_nesting_depth` nested if/else statements.
+    * computes a list comprehension over a list of `list_comprehension_size` elements in the innermost branch.
+    * constructs an instance of one of the `num_custom_types` custom types (if any) there.
+    '''
+    def __init__(self,
+                 num_functions: int,
+                 if_nesting_depth: int,
+                 list_comprehension_size: int,
+                 num_custom_types: int,
+                 num_exception_types: int):
+        assert num_functions >= 1
+        assert list_comprehension_size >= 1
+        self.num_functions = num_functions
+        self.if_nesting_depth = if_nesting_depth
+        self.list_comprehension_size = list_comprehension_size
+        self.num_custom_types = num_custom_types
+        self.num_exception_types = num_exception_types
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+def generate_module(params: ModuleParams):
+    lines = ['from tmppy import Type', '']
+
+    for i in range(params.num_custom_types):
+        lines += [
+            'class Value%s:' % i,
+            '    def __init__(self, x: int, t: Type):',
+            '        self.x = x',
+            '        self.t = t',
+            '',
+        ]
+
+    for i in range(params.num_exception_types):
+        lines += [
+            'class Error%s(Exception):' % i,
+            '    def __init__(self, x: int):',
+            '        self.message = \'Error%s was raised\'' % i,
+            '        self.x = x',
+            '',
+        ]
+
+    for i in range(params.num_functions):
+        lines += _generate_function(i, params)
+
+    for i in range(params.num_functions):
+        x = params.if_nesting_depth
+        lines.append('assert %s(%s) == %s' % (_top_function_name(i, params), x, _expected_result(i, x, params)))
+        if params.num_exception_types:
+            lines.append('assert %s(-1) == -%s' % (_top_function_name(i, params), i + 2))
+
+    return '\n'.join(lines) + '\n'
+
+def _top_function_name(i: int, params: ModuleParams):
+    if params.num_exception_types:
+        return 'g%s' % i
+    return 'f%s' % i
+
+def _generate_function(i: int, params: ModuleParams):
+    lines = ['def f%s(x: int):' % i]
+    if params.num_exception_types:
+        lines += [
+            '    if x == -1:',
+            '        raise Error%s(-%s)' % (i % params.num_exception_types, i + 2),
+        ]
+
+    indent = '    '
+    for depth in range(params.if_nesting_depth):
+        lines.append(indent + 'if x > %s:' % depth)
+        indent += '    '
+
+    list_elems = ', '.join('x + %s' % j for j in range(params.list_comprehension_size))
+    lines.append(indent + 'l = [v * %s + x for v in [%s]]' % (i + 1, list_elems))
+    if params.num_custom_types:
+        lines += [
+            indent + 'value = Value%s(x, Type(\'int\'))' % (i % params.num_custom_types),
+            indent + 'return sum(l) + value.x',
+        ]
+    else:
+        lines.append(indent + 'return sum(l)')
+
+    for depth in reversed(range(params.if_nesting_depth)):
+        indent = indent[:-4]
+        lines += [
+            indent + 'else:',
+            indent + '    return %s' % depth,
+        ]
+    lines.append('')
+
+    if params.num_exception_types:
+        lines += [
+            'def g%s(x: int):' % i,
+            '    try:',
+            '        return f%s(x)' % i,
+            '    except Error%s as e:' % (i % params.num_exception_types),
+            '        return e.x',
+            '',
+        ]
+    return lines
+
+def _expected_result(i: int, x: int, params: ModuleParams):
+    n = params.list_comprehension_size
+    result = sum((x + j) * (i + 1) + x for j in range(n))
+    if params.num_custom_types:
+        result += x
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a synthetic TMPPy module, for benchmarks.')
+    parser.add_argument('--num-functions', type=int, default=100)
+    parser.add_argument('--if-nesting-depth', type=int, default=3)
+    parser.add_argument('--list-comprehension-size', type=int, default=10)
+    parser.add_argument('--num-custom-types', type=int, default=10)
+    parser.add_argument('--num-exception-types', type=int, default=10)
+    parser.add_argument('--output', required=True, help='The file where to write the generated module')
+    args = parser.parse_args()
+
+    params = ModuleParams(num_functions=args.num_functions,
+                          if_nesting_depth=args.if_nesting_depth,
+                          list_comprehension_size=args.list_comprehension_size,
+                          num_custom_types=args.num_custom_types,
+                          num_exception_types=args.num_exception_types)
+    with open(args.output, 'w') as file:
+        file.write(generate_module(params))
+
+if __name__ == '__main__':
+    main()
@@ -92,6 +92,11 @@ echo Normalized C++ Standard library location: $(readlink -f $(echo '#include <v
 case "$1" in
 DebugPlain)           CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Debug   -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic -D_GLIBCXX_DEBUG -O2") ;;
 ReleasePlain)         CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic") ;;
+ReleaseCxx14)         CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic" -DTMPPY_TESTS_CXX_STANDARD=c++14) ;;
+ReleaseCxx17)         CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic" -DTMPPY_TESTS_CXX_STANDARD=c++17) ;;
+ReleaseNoBuiltins)    CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic" -DTMPPY_TESTS_DISABLE_BUILTINS=ON) ;;
+ReleaseCrossCheck)    CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic" -DTMPPY_TESTS_MODE=cross_check) ;;
+ReleaseNoPrecompiledRuntime) CMAKE_ARGS=(-DCMAKE_BUILD_TYPE=Release -DCMAKE_CXX_FLAGS="$STLARG -Werror -pedantic" -DTMPPY_TESTS_PRECOMPILE_RUNTIME=OFF) ;;
 *) echo "Error: you need to specify one of the supported postsubmit modes (see postsubmit.sh)."; exit 1 ;;
 esac
 
@@ -27,9 +27,9 @@ def determine_compiler_kind(compiler):
   else:
     raise Exception('Unexpected compiler: %s' % compiler)
 
-def determine_tests(smoke_tests, exclude_tests, include_only_tests):
+def determine_tests(smoke_tests, extra_tests, exclude_tests, include_only_tests):
   tests = ['ReleasePlain', 'DebugPlain']
-  for smoke_test in smoke_tests:
+  for smoke_test in smoke_tests + extra_tests:
     if smoke_test not in tests:
       tests += [smoke_test]
   excessive_excluded_tests = set(exclude_tests) - set(tests)
@@ -52,7 +52,7 @@ def generate_export_statements_for_env(env):
 def generate_env_string_for_env(env):
   return ' '.join(['%s=%s' % (var_name, value) for (var_name, value) in sorted(env.items())])
 
-def add_ubuntu_tests(ubuntu_version, compiler, stl=None, smoke_tests=[], exclude_tests=[], include_only_tests=None):
+def add_ubuntu_tests(ubuntu_version, compiler, stl=None, smoke_tests=[], extra_tests=[], exclude_tests=[], include_only_tests=None):
   env = {
     'UBUNTU': ubuntu_version,
     'COMPILER': compiler
@@ -64,6 +64,7 @@ def add_ubuntu_tests(ubuntu_version, compiler, stl=None, smoke_tests=[], exclude
   test_environment_template = {'os': 'linux', 'compiler': compiler_kind,
                                'install': '%s extras/scripts/travis_ci_install_linux.sh' % export_statements}
   tests = determine_tests(smoke_tests,
+                          extra_tests=extra_tests,
                           exclude_tests=exclude_tests,
                           include_only_tests=include_only_tests)
   for test in tests:
@@ -77,7 +78,7 @@ def add_ubuntu_tests(ubuntu_version, compiler, stl=None, smoke_tests=[], exclude
       build_matrix_rows.append(test_environment)
 
 
-def add_osx_tests(compiler, xcode_version=None, stl=None, smoke_tests=[], exclude_tests=[], include_only_tests=None):
+def add_osx_tests(compiler, xcode_version=None, stl=None, smoke_tests=[], extra_tests=[], exclude_tests=[], include_only_tests=None):
   env = {'COMPILER': compiler}
   if stl is not None:
     env['STL'] = stl
@@ -89,6 +90,7 @@ def add_osx_tests(compiler, xcode_version=None, stl=None, smoke_tests=[], exclud
     test_environment_template['osx_image'] = 'xcode%s' % xcode_version
 
   tests = determine_tests(smoke_tests,
+                          extra_tests=extra_tests,
                           exclude_tests=exclude_tests,
                           include_only_tests=include_only_tests)
   for test in tests:
@@ -102,8 +104,12 @@ def add_osx_tests(compiler, xcode_version=None, stl=None, smoke_tests=[], exclud
       build_matrix_rows.append(test_environment)
 
 
-add_ubuntu_tests(ubuntu_version='17.10', compiler='gcc-7', smoke_tests=['DebugPlain', 'ReleasePlain'])
-add_ubuntu_tests(ubuntu_version='17.10', compiler='clang-5.0', stl='libstdc++', smoke_tests=['DebugPlain', 'ReleasePlain'])
+add_ubuntu_tests(ubuntu_version='17.10', compiler='gcc-7', smoke_tests=['DebugPlain', 'ReleasePlain'],
+                 extra_tests=['ReleaseCxx14', 'ReleaseCxx17', 'ReleaseNoBuiltins', 'ReleaseCrossCheck',
+                              'ReleaseNoPrecompiledRuntime'])
+add_ubuntu_tests(ubuntu_version='17.10', compiler='clang-5.0', stl='libstdc++', smoke_tests=['DebugPlain', 'ReleasePlain'],
+                 extra_tests=['ReleaseCxx14', 'ReleaseCxx17', 'ReleaseNoBuiltins', 'ReleaseCrossCheck',
+                              'ReleaseNoPrecompiledRuntime'])
 
 add_ubuntu_tests(ubuntu_version='17.04', compiler='gcc-6', smoke_tests=['DebugPlain', 'ReleasePlain'])
 add_ubuntu_tests(ubuntu_version='17.04', compiler='clang-4.0', stl='libstdc++', smoke_tests=['DebugPlain', 'ReleasePlain'])
@@ -0,0 +1,58 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_ALWAYS_H
+#define TMPPY_ALWAYS_H
+
+#include <tmppy/config.h>
+
+template <bool>
+struct AlwaysTrueFromBool {
+  static constexpr bool value = true;
+};
+
+template <int64_t>
+struct AlwaysTrueFromInt64 {
+  static constexpr bool value = true;
+};
+
+template <typename>
+struct AlwaysTrueFromType {
+  static constexpr bool value = true;
+};
+
+template <typename>
+struct AlwaysFalseFromType {
+  static constexpr bool value = false;
+};
+
+#if TMPPY_CPLUSPLUS >= 201402L
+
+// Variable template equivalents of the AlwaysTrueFrom* templates above. Instantiating a variable template is cheaper
+// than instantiating a class template, so py2tmp uses these instead when generating code for C++14 or later.
+
+template <bool>
+constexpr bool AlwaysTrueFromBoolValue = true;
+
+template <int64_t>
+constexpr bool AlwaysTrueFromInt64Value = true;
+
+template <typename>
+constexpr bool AlwaysTrueFromTypeValue = true;
+
+#endif // TMPPY_CPLUSPLUS >= 201402L
+
+#endif // TMPPY_ALWAYS_H
@@ -0,0 +1,72 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_CONFIG_H
+#define TMPPY_CONFIG_H
+
+#include <cstdint>
+#include <type_traits>
+
+// MSVC only reports the actual language standard in __cplusplus when /Zc:__cplusplus is used, while _MSVC_LANG is
+// always set correctly.
+#ifdef _MSVC_LANG
+#define TMPPY_CPLUSPLUS _MSVC_LANG
+#else
+#define TMPPY_CPLUSPLUS __cplusplus
+#endif
+
+// Compiler intrinsics are used (when available) instead of the equivalent templates, since they don't require any
+// template instantiation. Define TMPPY_DISABLE_BUILTINS to always use the portable implementations instead.
+#if defined(__has_builtin) && !defined(TMPPY_DISABLE_BUILTINS)
+#define TMPPY_HAS_BUILTIN(builtin) __has_builtin(builtin)
+#else
+#define TMPPY_HAS_BUILTIN(builtin) 0
+#endif
+
+#if TMPPY_HAS_BUILTIN(__is_same)
+#define TMPPY_HAS_BUILTIN_IS_SAME 1
+#else
+#define TMPPY_HAS_BUILTIN_IS_SAME 0
+#endif
+
+#if TMPPY_HAS_BUILTIN(__type_pack_element)
+#define TMPPY_HAS_BUILTIN_TYPE_PACK_ELEMENT 1
+#else
+#define TMPPY_HAS_BUILTIN_TYPE_PACK_ELEMENT 0
+#endif
+
+#if TMPPY_HAS_BUILTIN(__make_integer_seq)
+#define TMPPY_HAS_BUILTIN_MAKE_INTEGER_SEQ 1
+#else
+#define TMPPY_HAS_BUILTIN_MAKE_INTEGER_SEQ 0
+#endif
+
+#if TMPPY_HAS_BUILTIN(__integer_pack)
+#define TMPPY_HAS_BUILTIN_INTEGER_PACK 1
+#else
+#define TMPPY_HAS_BUILTIN_INTEGER_PACK 0
+#endif
+
+// This is variadic so that it can be used with types that contain commas, e.g. TMPPY_IS_SAME(List<int, float>, T).
+#if TMPPY_HAS_BUILTIN_IS_SAME
+#define TMPPY_IS_SAME(...) __is_same(__VA_ARGS__)
+#elif TMPPY_CPLUSPLUS >= 201703L
+#define TMPPY_IS_SAME(...) std::is_same_v<__VA_ARGS__>
+#else
+#define TMPPY_IS_SAME(...) std::is_same<__VA_ARGS__>::value
+#endif
+
+#endif // TMPPY_CONFIG_H
@@ -0,0 +1,68 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_GET_FIRST_ERROR_H
+#define TMPPY_GET_FIRST_ERROR_H
+
+#include <tmppy/config.h>
+#include <tmppy/list.h>
+
+// GetFirstError is used with one argument per element in list comprehensions, so it must not instantiate a template
+// for each of them. In the common case where there are no errors this takes a constant number of instantiations, and
+// otherwise the leading voids are skipped 8 at a time.
+
+template <typename T>
+struct GetFirstErrorVoid {
+  using type = void;
+};
+
+template <typename... Ts>
+struct GetFirstErrorHelper {
+  using type = void;
+};
+
+template <typename... Ts>
+struct GetFirstErrorHelper<void, void, void, void, void, void, void, void, Ts...> {
+  using type = typename GetFirstErrorHelper<Ts...>::type;
+};
+
+template <typename... Ts>
+struct GetFirstErrorHelper<void, Ts...> {
+  using type = typename GetFirstErrorHelper<Ts...>::type;
+};
+
+template <typename T, typename... Ts>
+struct GetFirstErrorHelper<T, Ts...> {
+  using type = T;
+};
+
+template <bool all_void, typename... Ts>
+struct GetFirstErrorIfAny {
+  using type = void;
+};
+
+template <typename... Ts>
+struct GetFirstErrorIfAny<false, Ts...> {
+  using type = typename GetFirstErrorHelper<Ts...>::type;
+};
+
+template <typename... Ts>
+struct GetFirstError {
+  using type = typename GetFirstErrorIfAny<TMPPY_IS_SAME(List<Ts...>, List<typename GetFirstErrorVoid<Ts>::type...>),
+                                           Ts...>::type;
+};
+
+#endif // TMPPY_GET_FIRST_ERROR_H
@@ -0,0 +1,128 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+
+#ifndef TMPPY_LIST_ACCESS_H
+#define TMPPY_LIST_ACCESS_H
+
+#include <tmppy/list.h>
+#include <tmppy/list_range.h>
+
+// These don't instantiate a template for each element of the list, so their instantiation depth doesn't depend on the
+// length of the list.
+
+template <typename L>
+struct TypeListSize;
+
+template <typename... Ts>
+struct TypeListSize<List<Ts...>> {
+  static constexpr int64_t value = sizeof...(Ts);
+};
+
+template <typename L>
+struct Int64ListSize;
+
+template <int64_t... ns>
+struct Int64ListSize<Int64List<ns...>> {
+  static constexpr int64_t value = sizeof...(ns);
+};
+
+template <typename L>
+struct BoolListSize;
+
+template <bool... bs>
+struct BoolListSize<BoolList<bs...>> {
+  static constexpr int64_t value = sizeof...(bs);
+};
+
+// TypeListGetNonNegative<i, Ts...>::type is the i-th type in Ts (with 0 <= i < sizeof...(Ts)).
+
+#if TMPPY_HAS_BUILTIN_TYPE_PACK_ELEMENT
+
+template <int64_t i, typename... Ts>
+struct TypeListGetNonNegative {
+  using type = __type_pack_element<i, Ts...>;
+};
+
+#else // !TMPPY_HAS_BUILTIN_TYPE_PACK_ELEMENT
+
+// Without builtins, each type is wrapped in a base class tagged with its index. Overload resolution then finds the
+// only base class with the desired index, without any recursion.
+
+template <int64_t i, typename T>
+struct TypeListGetLeaf {
+  using type = T;
+};
+
+template <typename Indexes, typename... Ts>
+struct TypeListGetLeaves;
+
+template <int64_t... is, typename... Ts>
+struct TypeListGetLeaves<Int64List<is...>, Ts...> : TypeListGetLeaf<is, Ts>... {};
+
+template <int64_t i, typename T>
+TypeListGetLeaf<i, T> TypeListGetSelect(TypeListGetLeaf<i, T>*);
+
+template <int64_t i, typename... Ts>
+struct TypeListGetNonNegative {
+  using type = typename decltype(TypeListGetSelect<i>(
+      static_cast<TypeListGetLeaves<typename Int64ListIota<sizeof...(Ts)>::type, Ts...>*>(nullptr)))::type;
+};
+
+#endif // TMPPY_HAS_BUILTIN_TYPE_PACK_ELEMENT
+
+// Negative indexes count from the end of the list, like in Python. If the index is out of range, this reports an error
+// and then returns OutOfRange (to avoid further errors).
+template <typename L, int64_t i, typename OutOfRange>
+struct TypeListGetHelper;
+
+template <typename... Ts, int64_t i, typename OutOfRange>
+struct TypeListGetHelper<List<Ts...>, i, OutOfRange> {
+  static constexpr int64_t size = sizeof...(Ts);
+  static constexpr bool in_range = -size <= i && i < size;
+  static_assert(in_range, "TMPPy list index out of range");
+  using type = typename TypeListGetNonNegative<(in_range ? (i < 0 ? i + size : i) : size), Ts..., OutOfRange>::type;
+};
+
+template <typename L, int64_t i>
+struct TypeListGet;
+
+template <typename... Ts, int64_t i>
+struct TypeListGet<List<Ts...>, i> {
+  using type = typename TypeListGetHelper<List<Ts...>, i, void>::type;
+};
+
+template <typename L, int64_t i>
+struct Int64ListGet;
+
+template <int64_t... ns, int64_t i>
+struct Int64ListGet<Int64List<ns...>, i> {
+  static constexpr int64_t value = TypeListGetHelper<List<std::integral_constant<int64_t, ns>...>,
+                                                     i,
+                                                     std::integral_constant<int64_t, 0>>::type::value;
+};
+
+template <typename L, int64_t i>
+struct BoolListGet;
+
+template <bool... bs, int64_t i>
+struct BoolListGet<BoolList<bs...>, i> {
+  static constexpr bool value = TypeListGetHelper<List<std::integral_constant<bool, bs>...>,
+                                                  i,
+                                                  std::integral_constant<bool, false>>::type::value;
+};
+
+#endif // TMPPY_LIST_ACCESS_H
@@ -0,0 +1,189 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_LIST_CONCAT_H
+#define TMPPY_LIST_CONCAT_H
+
+#include <tmppy/list.h>
+#include <tmppy/list_range.h>
+
+template <typename L1, typename L2>
+struct TypeListConcat;
+
+template <typename... Ts, typename... Us>
+struct TypeListConcat<List<Ts...>, List<Us...>> {
+  using type = List<Ts..., Us...>;
+};
+
+template <typename L1, typename L2>
+struct Int64ListConcat;
+
+template <int64_t... ns, int64_t... ms>
+struct Int64ListConcat<Int64List<ns...>, Int64List<ms...>> {
+  using type = Int64List<ns..., ms...>;
+};
+
+template <typename L1, typename L2>
+struct BoolListConcat;
+
+template <bool... bs1, bool... bs2>
+struct BoolListConcat<BoolList<bs1...>, BoolList<bs2...>> {
+  using type = BoolList<bs1..., bs2...>;
+};
+
+// *ListConcatAll<List<L1, ..., Ln>>::type is the concatenation of the lists L1, ..., Ln. This is used e.g. for list
+// comprehensions with an "if" clause, where each element is mapped to a list with 0 or 1 elements, so n can be large
+// and the instantiation depth must not grow linearly with it.
+
+#if TMPPY_CPLUSPLUS >= 201703L && !defined(__clang__)
+
+// A single fold expression, with no recursive instantiations at all.
+// Clang rejects fold expressions with more operands than -fbracket-depth (256 by default), so it uses the generic
+// implementation below instead.
+
+template <typename L>
+struct ListConcatAllFoldWrapper {
+  using type = L;
+};
+
+template <typename... Ts, typename... Us>
+ListConcatAllFoldWrapper<List<Ts..., Us...>> operator+(ListConcatAllFoldWrapper<List<Ts...>>,
+                                                        ListConcatAllFoldWrapper<List<Us...>>);
+
+template <int64_t... ns, int64_t... ms>
+ListConcatAllFoldWrapper<Int64List<ns..., ms...>> operator+(ListConcatAllFoldWrapper<Int64List<ns...>>,
+                                                             ListConcatAllFoldWrapper<Int64List<ms...>>);
+
+template <bool... bs1, bool... bs2>
+ListConcatAllFoldWrapper<BoolList<bs1..., bs2...>> operator+(ListConcatAllFoldWrapper<BoolList<bs1...>>,
+                                                              ListConcatAllFoldWrapper<BoolList<bs2...>>);
+
+template <typename Ls, typename Empty>
+struct ListConcatAll;
+
+template <typename... Ls, typename Empty>
+struct ListConcatAll<List<Ls...>, Empty> {
+  using type = typename decltype((ListConcatAllFoldWrapper<Ls>{} + ... + ListConcatAllFoldWrapper<Empty>{}))::type;
+};
+
+#else // TMPPY_CPLUSPLUS >= 201703L && !defined(__clang__)
+
+// A tree merge. Starting with step=1, each round replaces the i-th list with the concatenation of the i-th and the
+// (i+step)-th lists when i is a multiple of 2*step, and with the empty list otherwise; then it doubles step. After
+// ceil(log2(n)) rounds the first list is the result.
+// Each round has constant depth: the lists shifted by step positions are computed with a single function template
+// argument deduction, and the merge is a single pack expansion.
+
+template <typename T, int64_t>
+struct ListConcatAllAlways {
+  using type = T;
+};
+
+template <typename T>
+struct ListConcatAllWrapper {};
+
+template <typename Is>
+struct ListConcatAllShifter;
+
+template <int64_t... is>
+struct ListConcatAllShifter<Int64List<is...>> {
+  // The first sizeof...(is) arguments are matched against the void* parameters, the rest are deduced as Ts.
+  template <typename... Ts>
+  static List<Ts...> drop(typename ListConcatAllAlways<void*, is>::type..., ListConcatAllWrapper<Ts>*...);
+
+  // List<L_step, ..., L_n-1, Empty, ..., Empty>, where step=sizeof...(is) and Empty is repeated step times.
+  template <typename Empty, typename... Ls>
+  struct Shift {
+    using type = decltype(drop(static_cast<ListConcatAllWrapper<Ls>*>(nullptr)...,
+                               static_cast<ListConcatAllWrapper<typename ListConcatAllAlways<Empty, is>::type>*>(nullptr)...));
+  };
+};
+
+template <bool merge, typename L1, typename L2, typename Empty>
+struct ListConcatAllMerge {
+  using type = Empty;
+};
+
+template <typename... Ts, typename... Us>
+struct ListConcatAllMerge<true, List<Ts...>, List<Us...>, List<>> {
+  using type = List<Ts..., Us...>;
+};
+
+template <int64_t... ns, int64_t... ms>
+struct ListConcatAllMerge<true, Int64List<ns...>, Int64List<ms...>, Int64List<>> {
+  using type = Int64List<ns..., ms...>;
+};
+
+template <bool... bs1, bool... bs2>
+struct ListConcatAllMerge<true, BoolList<bs1...>, BoolList<bs2...>, BoolList<>> {
+  using type = BoolList<bs1..., bs2...>;
+};
+
+template <int64_t step, typename Is, typename Ls, typename ShiftedLs, typename Empty>
+struct ListConcatAllRound;
+
+template <int64_t step, int64_t... is, typename... Ls, typename... ShiftedLs, typename Empty>
+struct ListConcatAllRound<step, Int64List<is...>, List<Ls...>, List<ShiftedLs...>, Empty> {
+  using type = List<typename ListConcatAllMerge<is % (2 * step) == 0, Ls, ShiftedLs, Empty>::type...>;
+};
+
+template <bool done, int64_t step, typename Ls, typename Empty>
+struct ListConcatAllHelper;
+
+template <int64_t step, typename Empty>
+struct ListConcatAllHelper<true, step, List<>, Empty> {
+  using type = Empty;
+};
+
+template <int64_t step, typename L, typename... Ls, typename Empty>
+struct ListConcatAllHelper<true, step, List<L, Ls...>, Empty> {
+  using type = L;
+};
+
+template <int64_t step, typename... Ls, typename Empty>
+struct ListConcatAllHelper<false, step, List<Ls...>, Empty> {
+  using ShiftedLs = typename ListConcatAllShifter<typename Int64ListIota<step>::type>::template Shift<Empty, Ls...>::type;
+  using MergedLs = typename ListConcatAllRound<step, typename Int64ListIota<sizeof...(Ls)>::type,
+                                               List<Ls...>, ShiftedLs, Empty>::type;
+  using type = typename ListConcatAllHelper<(2 * step >= sizeof...(Ls)), 2 * step, MergedLs, Empty>::type;
+};
+
+template <typename Ls, typename Empty>
+struct ListConcatAll;
+
+template <typename... Ls, typename Empty>
+struct ListConcatAll<List<Ls...>, Empty> {
+  using type = typename ListConcatAllHelper<(1 >= sizeof...(Ls)), 1, List<Ls...>, Empty>::type;
+};
+
+#endif // TMPPY_CPLUSPLUS >= 201703L && !defined(__clang__)
+
+template <typename Ls>
+struct TypeListConcatAll {
+  using type = typename ListConcatAll<Ls, List<>>::type;
+};
+
+template <typename Ls>
+struct Int64ListConcatAll {
+  using type = typename ListConcatAll<Ls, Int64List<>>::type;
+};
+
+template <typename Ls>
+struct BoolListConcatAll {
+  using type = typename ListConcatAll<Ls, BoolList<>>::type;
+};
+
+#endif // TMPPY_LIST_CONCAT_H
@@ -0,0 +1,88 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+
+#ifndef TMPPY_LIST_RANGE_H
+#define TMPPY_LIST_RANGE_H
+
+#include <tmppy/list.h>
+
+// Int64ListIota<n>::type is Int64List<0, 1, ..., n-1>.
+
+#if TMPPY_HAS_BUILTIN_MAKE_INTEGER_SEQ
+
+template <typename T, T... ns>
+struct Int64ListIotaHelper {
+  using type = Int64List<ns...>;
+};
+
+template <int64_t n>
+struct Int64ListIota {
+  using type = typename __make_integer_seq<Int64ListIotaHelper, int64_t, n>::type;
+};
+
+#elif TMPPY_HAS_BUILTIN_INTEGER_PACK
+
+template <int64_t n>
+struct Int64ListIota {
+  using type = Int64List<__integer_pack(n)...>;
+};
+
+#else // !TMPPY_HAS_BUILTIN_MAKE_INTEGER_SEQ && !TMPPY_HAS_BUILTIN_INTEGER_PACK
+
+// Without builtins, the list is built by doubling a list of half the size, so the instantiation depth is O(log(n)).
+
+template <typename L, int64_t m, bool add_last>
+struct Int64ListIotaDouble;
+
+template <int64_t... ns, int64_t m>
+struct Int64ListIotaDouble<Int64List<ns...>, m, false> {
+  using type = Int64List<ns..., (m + ns)...>;
+};
+
+template <int64_t... ns, int64_t m>
+struct Int64ListIotaDouble<Int64List<ns...>, m, true> {
+  using type = Int64List<ns..., (m + ns)..., 2 * m>;
+};
+
+template <int64_t n>
+struct Int64ListIota {
+  using type = typename Int64ListIotaDouble<typename Int64ListIota<n / 2>::type, n / 2, n % 2 == 1>::type;
+};
+
+template <>
+struct Int64ListIota<0> {
+  using type = Int64List<>;
+};
+
+#endif // TMPPY_HAS_BUILTIN_MAKE_INTEGER_SEQ
+
+template <int64_t begin, typename L>
+struct Int64ListShift;
+
+template <int64_t begin, int64_t... ns>
+struct Int64ListShift<begin, Int64List<ns...>> {
+  using type = Int64List<(begin + ns)...>;
+};
+
+// Int64ListRange<begin, end>::type is Int64List<begin, begin+1, ..., end-1> (or Int64List<> if end <= begin), like
+// range(begin, end) in Python.
+template <int64_t begin, int64_t end>
+struct Int64ListRange {
+  using type = typename Int64ListShift<begin, typename Int64ListIota<(end > begin ? end - begin : 0)>::type>::type;
+};
+
+#endif // TMPPY_LIST_RANGE_H
@@ -0,0 +1,88 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_LIST_REDUCTIONS_H
+#define TMPPY_LIST_REDUCTIONS_H
+
+#include <tmppy/list.h>
+
+#if TMPPY_CPLUSPLUS >= 201703L
+
+// In C++17 and later we use fold expressions, so that these don't need any additional instantiation.
+
+template <typename L>
+struct Int64ListSum;
+
+template <int64_t... ns>
+struct Int64ListSum<Int64List<ns...>> {
+  static constexpr int64_t value = (ns + ... + 0);
+};
+
+template <typename L>
+struct BoolListAll;
+
+template <bool... bs>
+struct BoolListAll<BoolList<bs...>> {
+  static constexpr bool value = (bs && ...);
+};
+
+template <typename L>
+struct BoolListAny;
+
+template <bool... bs>
+struct BoolListAny<BoolList<bs...>> {
+  static constexpr bool value = (bs || ...);
+};
+
+#else // TMPPY_CPLUSPLUS >= 201703L
+
+template <typename L>
+struct Int64ListSum {
+  static constexpr int64_t value = 0;
+};
+
+template <int64_t n, int64_t... ns>
+struct Int64ListSum<Int64List<n, ns...>> {
+  static constexpr int64_t value = n + Int64ListSum<Int64List<ns...>>::value;
+};
+
+// This takes 8 elements at a time, so that long lists (e.g. the ones returned by range()) don't exceed the maximum
+// template instantiation depth.
+template <int64_t n0, int64_t n1, int64_t n2, int64_t n3, int64_t n4, int64_t n5, int64_t n6, int64_t n7,
+          int64_t... ns>
+struct Int64ListSum<Int64List<n0, n1, n2, n3, n4, n5, n6, n7, ns...>> {
+  static constexpr int64_t value = n0 + n1 + n2 + n3 + n4 + n5 + n6 + n7 + Int64ListSum<Int64List<ns...>>::value;
+};
+
+template <typename L>
+struct BoolListAll;
+
+template <bool... bs>
+struct BoolListAll<BoolList<bs...>> {
+  static constexpr bool value = TMPPY_IS_SAME(BoolList<bs...>, BoolList<(bs || true)...>);
+};
+
+template <typename L>
+struct BoolListAny;
+
+template <bool... bs>
+struct BoolListAny<BoolList<bs...>> {
+  static constexpr bool value = !TMPPY_IS_SAME(BoolList<bs...>, BoolList<(bs && false)...>);
+};
+
+#endif // TMPPY_CPLUSPLUS >= 201703L
+
+#endif // TMPPY_LIST_REDUCTIONS_H
@@ -0,0 +1,83 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_LIST_TO_SET_H
+#define TMPPY_LIST_TO_SET_H
+
+#include <tmppy/list.h>
+#include <tmppy/set.h>
+
+template <typename Acc, template <typename Acc1, bool b1> class F, bool... bs>
+struct FoldBoolsToType {
+  using type = Acc;
+};
+
+template <typename Acc, template <typename Acc1, bool b1> class F, bool b, bool... bs>
+struct FoldBoolsToType<Acc, F, b, bs...> {
+  using type = typename FoldBoolsToType<typename F<Acc, b>::type,
+                                        F,
+                                        bs...>::type;
+};
+
+template <typename L>
+struct BoolListToSet;
+
+template <bool... bs>
+struct BoolListToSet<BoolList<bs...>> {
+  using type = typename FoldBoolsToType<BoolList<>, AddToBoolSet, bs...>::type;
+};
+
+template <typename Acc, template <typename Acc1, int64_t n1> class F, int64_t... ns>
+struct FoldInt64sToType {
+  using type = Acc;
+};
+
+template <typename Acc, template <typename Acc1, int64_t n1> class F, int64_t n, int64_t... ns>
+struct FoldInt64sToType<Acc, F, n, ns...> {
+  using type = typename FoldInt64sToType<typename F<Acc, n>::type,
+                                         F,
+                                         ns...>::type;
+};
+
+template <typename L>
+struct Int64ListToSet;
+
+template <int64_t... ns>
+struct Int64ListToSet<Int64List<ns...>> {
+  using type = typename FoldInt64sToType<Int64List<>, AddToInt64Set, ns...>::type;
+};
+
+template <typename Acc, template <typename Acc1, typename T1> class F, typename... Ts>
+struct FoldTypesToType {
+  using type = Acc;
+};
+
+template <typename Acc, template <typename Acc1, typename T1> class F, typename T, typename... Ts>
+struct FoldTypesToType<Acc, F, T, Ts...> {
+  using type = typename FoldTypesToType<typename F<Acc, T>::type,
+                                         F,
+                                         Ts...>::type;
+};
+
+template <typename L>
+struct TypeListToSet;
+
+template <typename... Ts>
+struct TypeListToSet<List<Ts...>> {
+  using type = typename FoldTypesToType<List<>, AddToTypeSet, Ts...>::type;
+};
+
+#endif // TMPPY_LIST_TO_SET_H
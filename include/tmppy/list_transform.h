@@ -0,0 +1,104 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_LIST_TRANSFORM_H
+#define TMPPY_LIST_TRANSFORM_H
+
+#include <tmppy/list.h>
+#include <tmppy/get_first_error.h>
+
+template <typename L, template <bool> class F>
+struct TransformBoolListToBoolList;
+
+template <bool... bs, template <bool> class F>
+struct TransformBoolListToBoolList<BoolList<bs...>, F> {
+  using error = typename GetFirstError<typename F<bs>::error...>::type;
+  using type = BoolList<F<bs>::value...>;
+};
+
+template <typename L, template <bool> class F>
+struct TransformBoolListToInt64List;
+
+template <bool... bs, template <bool> class F>
+struct TransformBoolListToInt64List<BoolList<bs...>, F> {
+  using error = typename GetFirstError<typename F<bs>::error...>::type;
+  using type = Int64List<F<bs>::value...>;
+};
+
+template <typename L, template <bool> class F>
+struct TransformBoolListToTypeList;
+
+template <bool... bs, template <bool> class F>
+struct TransformBoolListToTypeList<BoolList<bs...>, F> {
+  using error = typename GetFirstError<typename F<bs>::error...>::type;
+  using type = List<typename F<bs>::type...>;
+};
+
+template <typename L, template <int64_t> class F>
+struct TransformInt64ListToBoolList;
+
+template <int64_t... ns, template <int64_t> class F>
+struct TransformInt64ListToBoolList<Int64List<ns...>, F> {
+  using error = typename GetFirstError<typename F<ns>::error...>::type;
+  using type = BoolList<F<ns>::value...>;
+};
+
+template <typename L, template <int64_t> class F>
+struct TransformInt64ListToInt64List;
+
+template <int64_t... ns, template <int64_t> class F>
+struct TransformInt64ListToInt64List<Int64List<ns...>, F> {
+  using error = typename GetFirstError<typename F<ns>::error...>::type;
+  using type = Int64List<F<ns>::value...>;
+};
+
+template <typename L, template <int64_t> class F>
+struct TransformInt64ListToTypeList;
+
+template <int64_t... ns, template <int64_t> class F>
+struct TransformInt64ListToTypeList<Int64List<ns...>, F> {
+  using error = typename GetFirstError<typename F<ns>::error...>::type;
+  using type = List<typename F<ns>::type...>;
+};
+
+template <typename L, template <typename> class F>
+struct TransformTypeListToBoolList;
+
+template <typename... Ts, template <typename> class F>
+struct TransformTypeListToBoolList<List<Ts...>, F> {
+  using error = typename GetFirstError<typename F<Ts>::error...>::type;
+  using type = BoolList<F<Ts>::value...>;
+};
+
+template <typename L, template <typename> class F>
+struct TransformTypeListToInt64List;
+
+template <typename... Ts, template <typename> class F>
+struct TransformTypeListToInt64List<List<Ts...>, F> {
+  using error = typename GetFirstError<typename F<Ts>::error...>::type;
+  using type = Int64List<F<Ts>::value...>;
+};
+
+template <typename L, template <typename> class F>
+struct TransformTypeListToTypeList;
+
+template <typename... Ts, template <typename> class F>
+struct TransformTypeListToTypeList<List<Ts...>, F> {
+  using error = typename GetFirstError<typename F<Ts>::error...>::type;
+  using type = List<typename F<Ts>::type...>;
+};
+
+#endif // TMPPY_LIST_TRANSFORM_H
@@ -0,0 +1,96 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_SELECT1ST_H
+#define TMPPY_SELECT1ST_H
+
+#include <tmppy/config.h>
+
+template <bool b, bool>
+struct Select1stBoolBool {
+  static constexpr bool value = b;
+};
+
+template <bool b, int64_t>
+struct Select1stBoolInt64 {
+  static constexpr bool value = b;
+};
+
+template <bool b, typename>
+struct Select1stBoolType {
+  static constexpr bool value = b;
+};
+
+template <int64_t n, bool>
+struct Select1stInt64Bool {
+  static constexpr int64_t value = n;
+};
+
+template <int64_t n, int64_t>
+struct Select1stInt64Int64 {
+  static constexpr int64_t value = n;
+};
+
+template <int64_t n, typename>
+struct Select1stInt64Type {
+  static constexpr int64_t value = n;
+};
+
+template <typename T, bool>
+struct Select1stTypeBool {
+  // We intentionally use `value` instead of `type`, for simplicity of the implementation.
+  using value = T;
+};
+
+template <typename T, int64_t>
+struct Select1stTypeInt64 {
+  // We intentionally use `value` instead of `type`, for simplicity of the implementation.
+  using value = T;
+};
+
+template <typename T, typename>
+struct Select1stTypeType {
+  // We intentionally use `value` instead of `type`, for simplicity of the implementation.
+  using value = T;
+};
+
+#if TMPPY_CPLUSPLUS >= 201402L
+
+// Variable template equivalents of the Select1st* templates above (for the variants that return a value).
+// Instantiating a variable template is cheaper than instantiating a class template, so py2tmp uses these instead when
+// generating code for C++14 or later.
+
+template <bool b, bool>
+constexpr bool Select1stBoolBoolValue = b;
+
+template <bool b, int64_t>
+constexpr bool Select1stBoolInt64Value = b;
+
+template <bool b, typename>
+constexpr bool Select1stBoolTypeValue = b;
+
+template <int64_t n, bool>
+constexpr int64_t Select1stInt64BoolValue = n;
+
+template <int64_t n, int64_t>
+constexpr int64_t Select1stInt64Int64Value = n;
+
+template <int64_t n, typename>
+constexpr int64_t Select1stInt64TypeValue = n;
+
+#endif // TMPPY_CPLUSPLUS >= 201402L
+
+#endif // TMPPY_SELECT1ST_H
@@ -0,0 +1,161 @@
+/*
+ * Copyright 2017 Google Inc. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef TMPPY_SET_H
+#define TMPPY_SET_H
+
+#include <tmppy/always.h>
+#include <tmppy/list.h>
+
+template <typename AllFalseListIfNotPresent, typename AllFalseList, typename S, bool b>
+struct AddToBoolSetHelper {
+  using type = S;
+};
+
+template <typename AllFalseList, bool... bs, bool b>
+struct AddToBoolSetHelper<AllFalseList, AllFalseList, BoolList<bs...>, b> {
+  using type = BoolList<bs..., b>;
+};
+
+template <typename S, bool b>
+struct AddToBoolSet;
+
+template <bool... bs, bool b>
+struct AddToBoolSet<BoolList<bs...>, b> {
+  using type = typename AddToBoolSetHelper<BoolList<(bs == b)...>,
+                                           BoolList<(bs && false)...>,
+                                           BoolList<bs...>,
+                                           b>::type;
+};
+
+template <typename AllFalseListIfNotPresent, typename AllFalseList, typename S, int64_t n>
+struct AddToInt64SetHelper {
+  using type = S;
+};
+
+template <typename AllFalseList, int64_t... ns, int64_t n>
+struct AddToInt64SetHelper<AllFalseList, AllFalseList, Int64List<ns...>, n> {
+  using type = Int64List<ns..., n>;
+};
+
+template <typename S, int64_t n>
+struct AddToInt64Set;
+
+template <int64_t... ns, int64_t n>
+struct AddToInt64Set<Int64List<ns...>, n> {
+  using type = typename AddToInt64SetHelper<BoolList<(ns == n)...>,
+                                            BoolList<(ns && false)...>,
+                                            Int64List<ns...>,
+                                            n>::type;
+};
+
+template <typename AllFalseListIfNotPresent, typename AllFalseList, typename S, typename T>
+struct AddToTypeSetHelper {
+  using type = S;
+};
+
+template <typename AllFalseList, typename... Ts, typename T>
+struct AddToTypeSetHelper<AllFalseList, AllFalseList, List<Ts...>, T> {
+  using type = List<Ts..., T>;
+};
+
+template <typename S, typename T>
+struct AddToTypeSet;
+
+template <typename... Ts, typename T>
+struct AddToTypeSet<List<Ts...>, T> {
+  using type = typename AddToTypeSetHelper<BoolList<TMPPY_IS_SAME(Ts, T)...>,
+                                           BoolList<AlwaysFalseFromType<Ts>::value...>,
+                                           List<Ts...>,
+                                           T>::type;
+};
+
+template <typename S, bool b>
+struct IsInBoolSet;
+
+template <bool... bs, bool b>
+struct IsInBoolSet<BoolList<bs...>, b> {
+#if TMPPY_CPLUSPLUS >= 201703L
+  static constexpr bool value = ((bs == b) || ...);
+#else
+  static constexpr bool value = !TMPPY_IS_SAME(BoolList<(bs == b)...>,
+                                               BoolList<(bs && false)...>);
+#endif
+};
+
+template <typename S1, typename S2>
+struct BoolSetEquals;
+
+template <bool... bs1, bool... bs2>
+struct BoolSetEquals<BoolList<bs1...>, BoolList<bs2...>> {
+  static constexpr bool value =
+      TMPPY_IS_SAME(BoolList<IsInBoolSet<BoolList<bs1...>, bs2>::value...,
+                             IsInBoolSet<BoolList<bs2...>, bs1>::value...>,
+                    BoolList<(bs2 || true)...,
+                             (bs1 || true)...>);
+};
+
+template <typename S, int64_t n>
+struct IsInInt64Set;
+
+template <int64_t... ns, int64_t n>
+struct IsInInt64Set<Int64List<ns...>, n> {
+#if TMPPY_CPLUSPLUS >= 201703L
+  static constexpr bool value = ((ns == n) || ...);
+#else
+  static constexpr bool value = !TMPPY_IS_SAME(BoolList<(ns == n)...>,
+                                               BoolList<(ns && false)...>);
+#endif
+};
+
+template <typename S1, typename S2>
+struct Int64SetEquals;
+
+template <int64_t... ns1, int64_t... ns2>
+struct Int64SetEquals<Int64List<ns1...>, Int64List<ns2...>> {
+  static constexpr bool value =
+      TMPPY_IS_SAME(BoolList<IsInInt64Set<Int64List<ns1...>, ns2>::value...,
+                             IsInInt64Set<Int64List<ns2...>, ns1>::value...>,
+                    BoolList<(ns2 || true)...,
+                             (ns1 || true)...>);
+};
+
+template <typename S, typename T>
+struct IsInTypeSet;
+
+template <typename... Ts, typename T>
+struct IsInTypeSet<List<Ts...>, T> {
+#if TMPPY_CPLUSPLUS >= 201703L
+  static constexpr bool value = (TMPPY_IS_SAME(Ts, T) || ...);
+#else
+  static constexpr bool value = !TMPPY_IS_SAME(BoolList<TMPPY_IS_SAME(Ts, T)...>,
+                                               BoolList<AlwaysFalseFromType<Ts>::value...>);
+#endif
+};
+
+template <typename S1, typename S2>
+struct TypeSetEquals;
+
+template <typename... Ts, typename... Us>
+struct TypeSetEquals<List<Ts...>, List<Us...>> {
+  static constexpr bool value =
+      TMPPY_IS_SAME(BoolList<IsInTypeSet<List<Ts...>, Us>::value...,
+                             IsInTypeSet<List<Us...>, Ts>::value...>,
+                    BoolList<AlwaysTrueFromType<Us>::value...,
+                             AlwaysTrueFromType<Ts>::value...>);
+};
+
+#endif // TMPPY_SET_H
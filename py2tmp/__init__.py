@@ -12,4 +12,4 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from _py2tmp.main import convert_to_cpp, main
+from _py2tmp.main import convert_to_cpp, convert_ir_to_cpp, main
@@ -12,4 +12,4 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from _py2tmp.testing.utils import assert_compilation_succeeds, assert_compilation_fails, assert_compilation_fails_with_generic_error, assert_compilation_fails_with_static_assert_error, assert_conversion_fails, assert_conversion_fails_with_codegen_error
+from _py2tmp.testing.utils import assert_compilation_succeeds, assert_compilation_fails, assert_compilation_fails_with_generic_error, assert_compilation_fails_with_static_assert_error, assert_conversion_fails, assert_conversion_fails_with_codegen_error, assert_compilation_succeeds_with_modules, assert_conversion_fails_with_modules, assert_compilation_succeeds_with_output_mode
@@ -15,6 +15,7 @@
 
 import setuptools
 import codecs
+import glob
 import os
 import m2r
 
@@ -46,7 +47,8 @@ setuptools.setup(
     ],
 
     packages=setuptools.find_packages(exclude=['*.tests', 'extras']),
-    data_files=[('include/tmppy', ['include/tmppy/tmppy.h'])],
+    data_files=[('include/tmppy', sorted(glob.glob('include/tmppy/*.h'))),
+                ('share/tmppy/cmake', ['cmake/py2tmp.cmake'])],
     entry_points={
         'console_scripts': ['py2tmp=py2tmp:main'],
     },